@@ -3,6 +3,7 @@ from pydantic import field_validator
 from functools import lru_cache
 import secrets
 import warnings
+from typing import Optional
 
 # Insecure default JWT key - used only to detect if user hasn't set a real key
 _INSECURE_DEFAULT_JWT_KEY = "your-super-secret-jwt-key-change-in-production"
@@ -19,27 +20,105 @@ class Settings(BaseSettings):
     database_url: str = "sqlite:///./linkedin_content_saas.db"
     
     # AI Provider Selection
-    ai_provider: str = "openrouter"  # Options: "openai", "gemini", "claude", or "openrouter"
+    ai_provider: str = "openrouter"  # Options: "openai", "gemini", "claude", "openrouter", or offline "mock" / "replay"
     
     # OpenRouter (unified API for multiple providers)
     openrouter_api_key: str = ""
     openrouter_model: str = "anthropic/claude-3.5-haiku"  # Content generation model
     openrouter_onboarding_model: str = "google/gemini-2.5-flash"  # Onboarding/CV analysis model
+    openrouter_small_model: str = "google/gemini-2.5-flash-lite"  # Small-tier tasks (titles, image prompts, validation)
     
     # OpenAI
     openai_api_key: str = ""
     openai_model: str = "gpt-4o"  # Options: gpt-4o, gpt-4o-mini, gpt-3.5-turbo
     openai_onboarding_model: str = ""  # Separate model for onboarding (CV analysis). If empty, uses openai_model
+    openai_small_model: str = "gpt-4o-mini"  # Small-tier tasks. If empty, uses openai_model
     
     # Gemini
     gemini_api_key: str = ""
     gemini_model: str = "gemini-2.5-flash"  # Options: gemini-2.5-flash, gemini-2.5-flash-lite, gemini-2.0-flash-exp, gemini-2.0-flash-lite-exp, gemini-1.5-flash, gemini-1.5-pro
     gemini_onboarding_model: str = ""  # Separate model for onboarding (CV analysis). If empty, uses gemini_model
+    gemini_small_model: str = "gemini-2.5-flash-lite"  # Small-tier tasks. If empty, uses gemini_model
     
     # Claude (Anthropic)
     claude_api_key: str = ""
     claude_model: str = "claude-haiku-4-5"  # Options: claude-opus-4-5, claude-sonnet-4-5, claude-haiku-4-5
-    
+    claude_small_model: str = "claude-haiku-4-5"  # Small-tier tasks. If empty, uses claude_model
+
+    # Model tiers: route short tasks (titles, image prompts, CV validation) to each provider's small model
+    model_tier_routing_enabled: bool = True
+    model_tier_overrides: str = ""  # Comma-separated task:tier, e.g. "image_prompt:standard,comment:small"
+
+    # LLM client tuning (shared async clients, one per provider per process)
+    ai_request_timeout_seconds: float = 120.0
+    ai_sdk_max_retries: int = 2
+    ai_blocking_executor_workers: int = 8  # Only used for SDK calls without an async client
+
+    # LLM routing: failover and hedged requests across providers
+    ai_fallback_providers: str = ""  # Comma-separated, tried in order after AI_PROVIDER, e.g. "openai,gemini"
+    ai_router_window_size: int = 200  # Latency/error samples kept per provider+model
+    ai_router_window_seconds: float = 600.0
+    ai_router_min_samples: int = 10  # Samples needed before health and percentiles are used
+    ai_router_unhealthy_error_rate: float = 0.5  # Routes at or above this error rate are tried last
+    ai_hedge_enabled: bool = False  # Send a second request to the next route when the first is slow
+    ai_hedge_percentile: float = 95.0  # Hedge once a request exceeds this latency percentile
+    ai_hedge_min_delay_seconds: float = 2.0
+
+    # Offline providers for load testing (AI_PROVIDER=mock or AI_PROVIDER=replay)
+    llm_mock_latency_ms_mean: float = 800.0  # Simulated completion latency (normal distribution)
+    llm_mock_latency_ms_stddev: float = 250.0
+    llm_mock_output_tokens_mean: int = 350  # Target size of free-form mock text (normal distribution)
+    llm_mock_output_tokens_stddev: int = 120
+    llm_mock_seed: Optional[int] = None  # Set for reproducible mock content and timings
+    llm_replay_mode: str = "replay"  # "record": call llm_replay_upstream and save; "replay": serve saved responses
+    llm_replay_dir: str = "./llm_recordings"
+    llm_replay_upstream: str = "openrouter"  # Provider recorded from (also resolves model names in replay)
+    llm_replay_on_miss: str = "error"  # Replay with no recording: "error" or "mock"
+    llm_replay_latency: bool = False  # Sleep for the recorded latency when replaying
+
+    # Concurrency bulkheads per provider+model (queue instead of tripping provider 429s)
+    bulkhead_llm_max_concurrent: int = 16
+    bulkhead_llm_max_queue: int = 64
+    bulkhead_llm_max_wait_seconds: float = 30.0
+    bulkhead_image_max_concurrent: int = 4
+    bulkhead_image_max_queue: int = 32
+    bulkhead_image_max_wait_seconds: float = 90.0
+    bulkhead_default_retry_after_seconds: int = 5
+    bulkhead_overrides: str = ""  # JSON, e.g. {"llm:openai:gpt-4o": {"max_concurrent": 32}}
+
+    # Circuit breakers per dependency (Brave, Cloudflare, each LLM provider/model)
+    circuit_breaker_enabled: bool = True
+    circuit_breaker_failure_threshold: int = 5  # Consecutive failures before opening
+    circuit_breaker_recovery_seconds: float = 30.0  # Open time before a trial call
+    circuit_breaker_half_open_max_calls: int = 1
+
+    # Share one upstream call between concurrent identical AI requests (trending topics, research)
+    ai_single_flight_enabled: bool = True
+
+    # Conversation history budget: recent turns verbatim, older turns as a rolling summary
+    conversation_summary_enabled: bool = True
+    conversation_history_token_budget: int = 3000  # Recent turns sent verbatim
+    conversation_history_min_recent_messages: int = 2  # Always send at least the last exchange
+    conversation_summary_min_tokens: int = 800  # Fold older turns once this many are waiting
+    conversation_summary_max_words: int = 250
+
+    # Refinement fast path: edits of the previous post use a compact prompt
+    refinement_fast_path_enabled: bool = True
+    refinement_image_prompt_min_similarity: float = 0.3  # Below this word overlap, image prompts are regenerated
+
+    # Onboarding profile builds run as background jobs (/api/onboarding/process/jobs)
+    onboarding_job_ttl_seconds: int = 900  # Finished jobs stay fetchable this long
+
+    # Post prompt prefix cache (instructions, TOON profile, writing style, format rules)
+    prompt_prefix_cache_size: int = 1024  # Profiles kept in the LRU; 0 disables caching
+
+    # Bulk post generation (/api/generate/bulk)
+    bulk_generation_max_concurrency: int = 3  # Posts generated in parallel per batch
+
+    # Outbound HTTP connection pools (Brave, Cloudflare, LinkedIn)
+    http_client_keepalive_expiry_seconds: float = 30.0
+    http_client_http2_enabled: bool = True  # Requires the h2 package (httpx[http2])
+
     # Brave Search API
     brave_api_key: str = ""
     brave_search_enabled: bool = True
@@ -88,6 +167,26 @@ class Settings(BaseSettings):
     # File uploads
     upload_dir: str = "uploads"
     max_upload_size: int = 10 * 1024 * 1024  # 10MB
+    # CV text extraction runs in a worker process with these budgets
+    pdf_extraction_max_pages: int = 30
+    pdf_extraction_max_chars: int = 200_000
+    pdf_extraction_timeout_seconds: float = 20.0
+    pdf_extraction_max_concurrency: int = 2  # Worker processes at once per app process
+
+    # Media store for generated images and carousel PDFs (content-addressed, deduplicated)
+    media_store_backend: str = "filesystem"  # filesystem | s3 (S3-compatible: AWS, R2, MinIO; needs boto3)
+    media_store_path: str = "media"
+    media_s3_bucket: str = ""
+    media_s3_prefix: str = "media/"
+    media_s3_endpoint_url: str = ""  # Empty for AWS S3
+    media_s3_region: str = ""
+    media_s3_access_key_id: str = ""
+    media_s3_secret_access_key: str = ""
+    media_url_prefix: str = "/api/media"
+    media_url_ttl_seconds: int = 3600  # Signed media URLs are valid for 1-2x this
+    media_sweep_grace_seconds: int = 3600  # Unreferenced blobs younger than this are kept by the sweep
+    # Also return base64 for stored media in image/PDF responses (older clients); reads every blob back
+    media_inline_base64_responses: bool = False
     
     # LinkedIn OAuth
     linkedin_client_id: str = ""
@@ -7,7 +7,7 @@ import os
 import sqlalchemy as sa
 from .config import get_settings
 from .database import engine, Base
-from .routers import auth, onboarding, generation, comments, admin, admin_auth, user, conversations, images, pdfs, subscription, credit_purchase, env_config, ai_config, test_subscription, notifications, errors, error_dashboard
+from .routers import auth, onboarding, generation, comments, admin, admin_auth, user, conversations, images, pdfs, subscription, credit_purchase, env_config, ai_config, test_subscription, notifications, errors, error_dashboard, media
 from .services.scheduler_service import start_scheduler, stop_scheduler
 from .logging_config import setup_logging, get_logger
 from .core.error_handler import global_exception_handler, error_logger
@@ -114,6 +114,7 @@ app.include_router(admin_auth.router, prefix="/api/admin/auth", tags=["admin-aut
 app.include_router(admin.router, prefix="/api/admin", tags=["admin"])
 app.include_router(images.router, prefix="/api/images", tags=["images"])
 app.include_router(pdfs.router, prefix="/api/pdfs", tags=["pdfs"])
+app.include_router(media.router, prefix="/api/media", tags=["media"])
 app.include_router(subscription.router, prefix="/api/subscription", tags=["subscription"])
 app.include_router(credit_purchase.router, prefix="/api/credits", tags=["credits"])
 app.include_router(notifications.router, tags=["notifications"])
@@ -153,10 +154,11 @@ async def http_exception_handler(request: Request, exc: HTTPException):
             environment=environment
         )
     
-    # Return standard FastAPI HTTP error response
+    # Return standard FastAPI HTTP error response (keep headers such as Retry-After)
     return JSONResponse(
         status_code=exc.status_code,
-        content={"detail": exc.detail}
+        content={"detail": exc.detail},
+        headers=getattr(exc, "headers", None)
     )
 
 @app.exception_handler(Exception)
@@ -197,6 +199,14 @@ async def startup_event():
         print("✅ Scheduler started - checking for scheduled posts every 5 minutes")
     except Exception as e:
         print(f"⚠️  Failed to start scheduler: {e}")
+    
+    # Open pooled HTTP clients for outbound integrations (keep-alive connections)
+    try:
+        from .services.http_clients import start_http_clients
+        start_http_clients()
+        print("✅ HTTP client pools started")
+    except Exception as e:
+        print(f"⚠️  Failed to start HTTP client pools: {e}")
 
 @app.on_event("shutdown")
 async def shutdown_event():
@@ -209,6 +219,22 @@ async def shutdown_event():
         print("✅ Scheduler stopped")
     except Exception as e:
         print(f"⚠️  Error stopping scheduler: {e}")
+    
+    # Close shared LLM provider clients (connection pools)
+    try:
+        from .services.llm_providers import close_llm_providers
+        await close_llm_providers()
+        print("✅ LLM provider clients closed")
+    except Exception as e:
+        print(f"⚠️  Error closing LLM provider clients: {e}")
+    
+    # Close pooled HTTP clients for outbound integrations
+    try:
+        from .services.http_clients import close_http_clients
+        await close_http_clients()
+        print("✅ HTTP client pools closed")
+    except Exception as e:
+        print(f"⚠️  Error closing HTTP client pools: {e}")
 
 @app.get("/")
 async def root():
@@ -1,5 +1,5 @@
 from sqlalchemy import Column, String, Text, Integer, Boolean, DateTime, ForeignKey, LargeBinary, JSON, Enum as SQLEnum, Float
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, deferred
 from datetime import datetime
 import uuid
 from .database import Base
@@ -67,7 +67,7 @@ class UserProfile(Base):
     
     # CV storage
     cv_filename = Column(String(255))
-    cv_data = Column(LargeBinary)
+    cv_data = deferred(Column(LargeBinary))  # Deferred: only loaded with undefer() or on access
     cv_text = Column(Text)
     
     # Generated context
@@ -99,6 +99,8 @@ class Conversation(Base):
     id = Column(String(36), primary_key=True, default=generate_uuid)
     user_id = Column(String(36), ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
     title = Column(String(255), nullable=False)
+    history_summary = Column(Text)  # Rolling summary of turns older than the recent window
+    history_summary_message_count = Column(Integer, default=0)  # Leading messages folded into history_summary
     created_at = Column(DateTime, default=datetime.utcnow, index=True)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -115,7 +117,10 @@ class ConversationMessage(Base):
     role = Column(SQLEnum(MessageRole), nullable=False)
     content = Column(Text, nullable=False)
     post_id = Column(String(36), ForeignKey("generated_posts.id", ondelete="SET NULL"))
-    attachments = Column(JSON)  # Image attachments for user messages
+    attachments = deferred(Column(JSON))  # Image attachments for user messages (deferred)
+    # Prompt-ready content (sanitized + PII-redacted), computed once at write time
+    prompt_content = Column(Text)
+    prompt_ruleset_version = Column(String(32))  # Ruleset that produced prompt_content
     created_at = Column(DateTime, default=datetime.utcnow, index=True)
     
     # Relationships
@@ -135,7 +140,7 @@ class GeneratedPost(Base):
     
     # Generation context
     generation_options = Column(JSON)  # Toggles used during generation
-    attachments = Column(JSON)  # File references
+    attachments = deferred(Column(JSON))  # File references (deferred)
     
     # User interaction
     user_edited_content = Column(Text)
@@ -158,7 +163,8 @@ class GeneratedImage(Base):
     post_id = Column(String(36), ForeignKey("generated_posts.id", ondelete="CASCADE"), nullable=False, index=True)
     user_id = Column(String(36), ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
     
-    image_data = Column(Text, nullable=False)  # Base64 encoded image
+    image_key = Column(String(80))  # Media store key (sha256.ext); see services/media_store.py
+    image_data = deferred(Column(Text))  # Legacy inline base64, NULL once moved to the media store (deferred)
     prompt = Column(Text, nullable=False)
     model = Column(String(255))
     image_metadata = Column(JSON)  # Renamed from 'metadata' to avoid SQLAlchemy conflict
@@ -177,8 +183,10 @@ class GeneratedPDF(Base):
     post_id = Column(String(36), ForeignKey("generated_posts.id", ondelete="CASCADE"), nullable=False, index=True)
     user_id = Column(String(36), ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
     
-    pdf_data = Column(Text, nullable=False)  # Base64 encoded PDF
-    slide_images = Column(JSON)  # Array of base64 slide images for preview
+    pdf_key = Column(String(80))  # Media store key of the PDF
+    slide_keys = Column(JSON)  # Media store keys of the slide images, in order
+    pdf_data = deferred(Column(Text))  # Legacy inline base64 PDF, NULL once moved to the media store (deferred)
+    slide_images = deferred(Column(JSON))  # Legacy inline base64 slides (deferred)
     slide_count = Column(Integer, nullable=False)
     prompts = Column(JSON, nullable=False)  # Array of prompts used for each slide
     model = Column(String(255))
@@ -380,6 +388,7 @@ class UsageTracking(Base):
     input_tokens = Column(Integer, default=0)
     output_tokens = Column(Integer, default=0)
     total_tokens = Column(Integer, default=0)
+    cached_input_tokens = Column(Integer, default=0)  # Portion of input_tokens served from the provider's prompt cache
     
     # Cost tracking
     estimated_cost = Column(Integer, default=0)  # Store in cents to avoid float precision issues
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Response
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status, UploadFile, File, Response
 from sqlalchemy.orm import Session
 from sqlalchemy import func, and_
 from typing import List, Optional
@@ -39,6 +39,7 @@ from ..services.usage_tracking_service import (
     get_usage_timeline, get_revenue_summary
 )
 from ..services import credit_service
+from ..services.media_store import collect_media_keys, release_media
 from ..services.cost_calculator import cents_to_cost
 
 router = APIRouter()
@@ -696,6 +697,7 @@ async def get_user_credit_transactions(
 @router.delete("/users/{user_id}")
 async def delete_user(
     user_id: str,
+    background_tasks: BackgroundTasks,
     admin: Admin = Depends(get_current_admin),
     db: Session = Depends(get_db)
 ):
@@ -703,8 +705,11 @@ async def delete_user(
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
+    # Blobs outlive their rows; release the user's once the rows are gone
+    media_keys = collect_media_keys(db, user_id)
     db.delete(user)
     db.commit()
+    background_tasks.add_task(release_media, media_keys)
     
     return {"success": True, "message": "User deleted successfully"}
 
@@ -1718,3 +1723,49 @@ async def get_notification_logs(
         )
         for log in logs
     ]
+
+
+@router.get("/system/http-pools")
+async def get_http_pool_stats(
+    admin: Admin = Depends(get_current_admin)
+):
+    """Connection pool statistics for outbound integrations (Brave, Cloudflare, LinkedIn)"""
+    from ..services.http_clients import get_http_pool_stats, http2_available
+    
+    return {
+        "http2_available": http2_available(),
+        "pools": get_http_pool_stats()
+    }
+
+
+@router.get("/system/bulkheads")
+async def get_bulkhead_stats(
+    admin: Admin = Depends(get_current_admin)
+):
+    """Concurrency, queue depth, queue time and rejections per provider/model bulkhead"""
+    from ..services.bulkheads import get_bulkhead_stats as _get_bulkhead_stats
+    
+    return {"bulkheads": _get_bulkhead_stats()}
+
+
+@router.get("/system/circuit-breakers")
+async def get_circuit_breakers(
+    admin: Admin = Depends(get_current_admin)
+):
+    """State (closed/open/half_open) and failure counts per external dependency"""
+    from ..services.circuit_breakers import get_circuit_breaker_stats
+    
+    return {"breakers": get_circuit_breaker_stats()}
+
+
+@router.post("/system/circuit-breakers/{name:path}/reset")
+async def reset_circuit_breaker(
+    name: str,
+    admin: Admin = Depends(get_current_admin)
+):
+    """Force a breaker closed, e.g. after a provider confirms an outage is over"""
+    from ..services.circuit_breakers import get_circuit_breaker_registry
+    
+    if not get_circuit_breaker_registry().reset(name):
+        raise HTTPException(status_code=404, detail="Circuit breaker not found")
+    return {"message": f"Circuit breaker {name} reset", "name": name}
@@ -101,6 +101,12 @@ class AIConfigUpdateRequest(BaseModel):
     temperature: Optional[float] = None
 
 
+class ModelTierUpdateRequest(BaseModel):
+    enabled: Optional[bool] = None
+    task_tiers: Optional[Dict[str, str]] = None  # task class -> "small" | "onboarding" | "standard"
+    small_models: Optional[Dict[str, str]] = None  # provider -> model id
+
+
 class AITestRequest(BaseModel):
     provider: Optional[str] = None
     prompt: str = "Say 'Hello, I am working!' in exactly 5 words."
@@ -598,3 +604,128 @@ async def get_available_providers(admin: Admin = Depends(get_current_admin)) ->
         "text_providers": AI_PROVIDERS,
         "image_providers": IMAGE_PROVIDERS
     }
+
+
+@router.get("/ai/router-stats")
+async def get_ai_router_stats(admin: Admin = Depends(get_current_admin)) -> Dict:
+    """Rolling latency (p50/p95), error rate, failover and hedge counts per provider and model, plus single-flight coalescing"""
+    from ..services.llm_router import get_llm_router_stats, parse_fallback_providers
+    from ..services.single_flight import get_single_flight_stats
+    
+    settings = get_settings()
+    return {
+        "primary_provider": settings.ai_provider,
+        "fallback_providers": parse_fallback_providers(settings.ai_fallback_providers),
+        "hedge_enabled": settings.ai_hedge_enabled,
+        "hedge_percentile": settings.ai_hedge_percentile,
+        "routes": get_llm_router_stats(),
+        "single_flight": get_single_flight_stats()
+    }
+
+
+# Providers with a {PROVIDER}_SMALL_MODEL setting
+SMALL_MODEL_PROVIDERS = ("openrouter", "openai", "gemini", "claude")
+
+
+def _small_models(settings) -> Dict[str, str]:
+    from ..services.model_tiers import get_model_tier_router
+    overrides = get_model_tier_router().small_models
+    return {
+        provider: overrides.get(provider) or getattr(settings, f"{provider}_small_model", "")
+        for provider in SMALL_MODEL_PROVIDERS
+    }
+
+
+@router.get("/ai/model-tiers")
+async def get_model_tiers(admin: Admin = Depends(get_current_admin)) -> Dict:
+    """Task class -> model tier routing table and the small model used per provider"""
+    from ..services.model_tiers import TIERS, get_model_tier_router
+    
+    settings = get_settings()
+    tier_router = get_model_tier_router()
+    return {
+        "enabled": tier_router.enabled,
+        "tiers": list(TIERS),
+        "tasks": tier_router.table(),
+        "small_models": _small_models(settings),
+    }
+
+
+@router.put("/ai/model-tiers")
+async def update_model_tiers(
+    request: ModelTierUpdateRequest,
+    admin: Admin = Depends(get_current_admin)
+) -> Dict:
+    """Update model tier routing; applied immediately and persisted to .env"""
+    from ..services.model_tiers import TASK_TIERS, TIERS, format_tier_overrides, get_model_tier_router
+    
+    tier_router = get_model_tier_router()
+    env_vars = read_env_file()
+    updated_fields = []
+    
+    if request.task_tiers is not None:
+        for task, tier in request.task_tiers.items():
+            if task not in TASK_TIERS:
+                raise HTTPException(status_code=400, detail=f"Unknown task: {task}")
+            if tier not in TIERS:
+                raise HTTPException(status_code=400, detail=f"Invalid tier for {task}: {tier}")
+    if request.small_models is not None:
+        for provider, model in request.small_models.items():
+            if provider not in SMALL_MODEL_PROVIDERS:
+                raise HTTPException(status_code=400, detail=f"Invalid provider: {provider}")
+            if not model.strip():
+                raise HTTPException(status_code=400, detail=f"Small model for {provider} cannot be empty")
+    
+    if request.enabled is not None:
+        tier_router.configure(enabled=request.enabled)
+        env_vars["MODEL_TIER_ROUTING_ENABLED"] = str(request.enabled).lower()
+        updated_fields.append("enabled")
+    
+    if request.task_tiers is not None:
+        tier_router.configure(overrides={**tier_router.overrides, **request.task_tiers})
+        env_vars["MODEL_TIER_OVERRIDES"] = format_tier_overrides(tier_router.overrides)
+        updated_fields.append("task_tiers")
+    
+    if request.small_models is not None:
+        tier_router.configure(small_models=request.small_models)
+        for provider, model in request.small_models.items():
+            env_vars[f"{provider.upper()}_SMALL_MODEL"] = model
+        updated_fields.append("small_models")
+    
+    write_env_file(env_vars)
+    
+    return {
+        "success": True,
+        "message": f"Updated: {', '.join(updated_fields)}",
+        "updated_fields": updated_fields,
+        "tasks": tier_router.table(),
+        "note": "Changes take effect immediately for new requests"
+    }
+
+
+@router.get("/ai/tier-stats")
+async def get_ai_tier_stats(admin: Admin = Depends(get_current_admin)) -> Dict:
+    """Latency (p50/p95), tokens and cost per model tier, with the tasks and models behind each"""
+    from ..services.model_tiers import get_model_tier_router
+    
+    tier_router = get_model_tier_router()
+    return {
+        "enabled": tier_router.enabled,
+        "tiers": tier_router.stats()
+    }
+
+
+@router.get("/ai/prompt-cache-stats")
+async def get_ai_prompt_cache_stats(admin: Admin = Depends(get_current_admin)) -> Dict:
+    """Hit rate, size and evictions of the per-profile post prompt prefix cache"""
+    from ..services.prompt_assembly import get_prompt_cache_stats
+    
+    return get_prompt_cache_stats()
+
+
+@router.get("/media-store-stats")
+async def get_media_store_stats(admin: Admin = Depends(get_current_admin)) -> Dict:
+    """Backend, blobs written and uploads deduplicated by the media store in this process"""
+    from ..services.media_store import get_media_store
+    
+    return get_media_store().stats()
@@ -135,7 +135,8 @@ async def generate_comment(
         comment_content = await generate_completion(
             system_prompt=system_prompt,
             user_message=f"Generate a valuable comment for this post, adding unique insight from my expertise:\n\n{post_text}",
-            temperature=0.8
+            temperature=0.8,
+            task="comment"
         )
         
         # Save to database
@@ -1,18 +1,21 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, undefer
 from pydantic import BaseModel
 from typing import Optional, List
 import uuid
 from datetime import datetime
 
+from ..config import get_settings
 from ..database import get_db
 from ..routers.auth import get_current_user_id
 from ..services.cloudflare_ai import generate_image, generate_image_from_post
 from ..services.usage_tracking_service import log_image_generation
 from ..services import credit_service
+from ..services.media_store import load_media_base64, media_url, save_media_base64
 from ..models import GeneratedPost, GeneratedImage
 
 router = APIRouter()
+settings = get_settings()
 
 class ImageGenerationRequest(BaseModel):
     prompt: str
@@ -30,7 +33,8 @@ class ImageFromPostRequest(BaseModel):
 
 class ImageGenerationResponse(BaseModel):
     image_id: str
-    image: str  # base64 encoded
+    image: Optional[str] = None  # base64 encoded; omitted for saved images unless media_inline_base64_responses
+    image_url: Optional[str] = None  # Set once the image is saved to the media store
     format: str
     prompt: str
     model: str
@@ -41,7 +45,8 @@ class ImageGenerationResponse(BaseModel):
 
 class ImageHistoryItem(BaseModel):
     id: str
-    image: str  # base64 encoded
+    image: Optional[str] = None  # base64 encoded; see media_inline_base64_responses
+    image_url: Optional[str] = None
     prompt: str
     model: Optional[str]
     is_current: bool
@@ -72,6 +77,7 @@ async def generate_image_endpoint(
         )
         
         image_id = str(uuid.uuid4())
+        image_key = None
         is_current = False
         
         # If post_id provided, save to database
@@ -94,11 +100,12 @@ async def generate_image_endpoint(
             ).update({"is_current": False})
             
             # Save new image
+            image_key = await save_media_base64(result["image"])
             generated_image = GeneratedImage(
                 id=image_id,
                 post_id=request.post_id,
                 user_id=user_id,
-                image_data=result["image"],
+                image_key=image_key,
                 prompt=request.prompt,
                 model=result["metadata"]["model"],
                 image_metadata=result["metadata"],
@@ -110,7 +117,9 @@ async def generate_image_endpoint(
         
         return ImageGenerationResponse(
             image_id=image_id,
-            image=result["image"],
+            # Unsaved images have no URL, so they always come back inline
+            image=result["image"] if not image_key or settings.media_inline_base64_responses else None,
+            image_url=media_url(image_key),
             format=result["format"],
             prompt=request.prompt,
             model=result["metadata"]["model"],
@@ -236,11 +245,12 @@ async def generate_image_for_post(
         
         # Save new image
         image_id = str(uuid.uuid4())
+        image_key = await save_media_base64(result["image"])
         generated_image = GeneratedImage(
             id=image_id,
             post_id=post_id,
             user_id=user_id,
-            image_data=result["image"],
+            image_key=image_key,
             prompt=result["metadata"]["prompt"],
             model=result["metadata"]["model"],
             image_metadata=result["metadata"],
@@ -298,7 +308,8 @@ async def generate_image_for_post(
         
         return ImageGenerationResponse(
             image_id=image_id,
-            image=result["image"],
+            image=result["image"] if settings.media_inline_base64_responses else None,
+            image_url=media_url(image_key),
             format=result["format"],
             prompt=result["metadata"]["prompt"],
             model=result["metadata"]["model"],
@@ -417,11 +428,12 @@ async def generate_image_with_custom_prompt(
         
         # Save new image
         image_id = str(uuid.uuid4())
+        image_key = await save_media_base64(result["image"])
         generated_image = GeneratedImage(
             id=image_id,
             post_id=post_id,
             user_id=user_id,
-            image_data=result["image"],
+            image_key=image_key,
             prompt=request.custom_prompt,
             model=result["metadata"]["model"],
             image_metadata=result["metadata"],
@@ -434,7 +446,8 @@ async def generate_image_with_custom_prompt(
         
         return ImageGenerationResponse(
             image_id=image_id,
-            image=result["image"],
+            image=result["image"] if settings.media_inline_base64_responses else None,
+            image_url=media_url(image_key),
             format=result["format"],
             prompt=request.custom_prompt,
             model=result["metadata"]["model"],
@@ -547,6 +560,16 @@ async def regenerate_image_prompt(
             detail=f"Image prompt regeneration failed: {str(e)}"
         )
 
+async def _inline_image(image: GeneratedImage) -> Optional[str]:
+    """
+    Base64 for responses: from the row while it has not been moved to the media
+    store, otherwise only with media_inline_base64_responses (older clients);
+    current clients load image_url instead.
+    """
+    if image.image_key and not settings.media_inline_base64_responses:
+        return None
+    return await load_media_base64(image.image_key, image.image_data)
+
 @router.get("/history/{post_id}", response_model=ImageHistoryResponse)
 async def get_image_history(
     post_id: str,
@@ -569,7 +592,7 @@ async def get_image_history(
         )
     
     # Get all images for this post
-    images = db.query(GeneratedImage).filter(
+    images = db.query(GeneratedImage).options(undefer(GeneratedImage.image_data)).filter(
         GeneratedImage.post_id == post_id
     ).order_by(GeneratedImage.created_at.desc()).all()
     
@@ -583,7 +606,8 @@ async def get_image_history(
         images=[
             ImageHistoryItem(
                 id=img.id,
-                image=img.image_data,
+                image=await _inline_image(img),
+                image_url=media_url(img.image_key),
                 prompt=img.prompt,
                 model=img.model,
                 is_current=img.is_current,
@@ -616,7 +640,7 @@ async def get_current_image(
         )
     
     # Get current image
-    current_image = db.query(GeneratedImage).filter(
+    current_image = db.query(GeneratedImage).options(undefer(GeneratedImage.image_data)).filter(
         GeneratedImage.post_id == post_id,
         GeneratedImage.is_current == True
     ).first()
@@ -626,7 +650,8 @@ async def get_current_image(
     
     return {
         "image_id": current_image.id,
-        "image": current_image.image_data,
+        "image": await _inline_image(current_image),
+        "image_url": media_url(current_image.image_key),
         "prompt": current_image.prompt,
         "model": current_image.model,
         "created_at": current_image.created_at.isoformat()
@@ -0,0 +1,73 @@
+"""
+Media downloads from the content-addressed media store.
+
+Drafts are private, but <img> tags cannot send an auth header, so the image
+and PDF endpoints (which check the caller owns the row) return signed URLs
+instead: /api/media/{key}?expires=...&signature=... (see media_url). A URL
+works for one to two MEDIA_URL_TTL_SECONDS windows; a leaked URL stops
+working when it expires, not before. Responses are cacheable by the browser
+only (Cache-Control: private) until then, and support single byte ranges
+(PDF viewers, resumable downloads).
+"""
+import asyncio
+import time
+from typing import Optional
+
+from fastapi import APIRouter, Header, HTTPException, Query, status
+from fastapi.responses import Response, StreamingResponse
+
+from ..services.media_store import (
+    content_type_for, get_media_store, is_valid_key, parse_range, verify_media_signature
+)
+
+router = APIRouter()
+
+
+@router.get("/{key}")
+async def get_media(
+    key: str,
+    expires: Optional[int] = Query(default=None),
+    signature: Optional[str] = Query(default=None),
+    range_header: Optional[str] = Header(default=None, alias="Range"),
+    if_none_match: Optional[str] = Header(default=None)
+):
+    """
+    Stream a stored image or PDF, honouring Range and If-None-Match
+    """
+    if not is_valid_key(key):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Media not found")
+    if not verify_media_signature(key, expires, signature):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Media link is invalid or has expired")
+
+    backend = get_media_store().backend
+    size = await asyncio.to_thread(backend.size, key)
+    if size is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Media not found")
+
+    etag = f'"{key.split(".", 1)[0]}"'
+    headers = {"Accept-Ranges": "bytes", "ETag": etag, "Cache-Control": f"private, max-age={max(0, expires - int(time.time()))}"}
+    if if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    try:
+        byte_range = parse_range(range_header, size)
+    except ValueError:
+        return Response(
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+            headers={**headers, "Content-Range": f"bytes */{size}"}
+        )
+
+    status_code = status.HTTP_200_OK
+    start, end = 0, size - 1
+    if byte_range is not None:
+        start, end = byte_range
+        status_code = status.HTTP_206_PARTIAL_CONTENT
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+
+    return StreamingResponse(
+        backend.iter_range(key, start, end),
+        status_code=status_code,
+        media_type=content_type_for(key),
+        headers=headers
+    )
@@ -1,18 +1,23 @@
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
+import json
 
-from ..database import get_db
+from ..config import get_settings
+from ..database import get_db, SessionLocal
 from ..models import UserProfile
 from ..routers.auth import get_current_user_id
-from ..services.file_processor import extract_text_from_pdf
+from ..services.pdf_extraction import extract_pdf_text
 from ..services.profile_builder import build_user_profile, update_user_profile_in_db
+from ..services.onboarding_jobs import JobFailed, get_onboarding_jobs
 from ..services.ai_service import validate_cv_content
 from ..services.usage_tracking_service import log_onboarding_usage
 from ..utils.toon_parser import parse_toon_to_dict, dict_to_toon
 
 router = APIRouter()
+settings = get_settings()
 
 
 def _ensure_context_json_consolidated(profile, db: Session) -> Dict[str, Any]:
@@ -234,14 +239,20 @@ async def upload_cv(
     if not file.filename.lower().endswith('.pdf'):
         raise HTTPException(status_code=400, detail="Only PDF files are supported. Please upload your CV as a PDF.")
     
-    # Read file data
-    cv_data = await file.read()
+    # Read at most one byte past the limit, so an oversized upload is never buffered whole
+    cv_data = await file.read(settings.max_upload_size + 1)
+    if len(cv_data) > settings.max_upload_size:
+        raise HTTPException(
+            status_code=413,
+            detail=f"File too large. The maximum size is {settings.max_upload_size // (1024 * 1024)}MB."
+        )
     
-    # Extract text from PDF
+    # Extract text from PDF (worker process, page/character/time budgets)
     try:
-        cv_text = await extract_text_from_pdf(cv_data)
+        extraction = await extract_pdf_text(cv_data)
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Failed to process PDF file: {str(e)}")
+    cv_text = extraction.text
     
     # Validate that the document is actually a CV using AI
     try:
@@ -274,6 +285,7 @@ async def upload_cv(
         "success": True,
         "filename": file.filename,
         "text_length": len(cv_text),
+        "extraction": extraction.diagnostics(),
         "message": "CV uploaded and validated successfully"
     }
 
@@ -310,6 +322,94 @@ async def import_posts(
         "message": "Writing samples saved successfully"
     }
 
+async def _build_and_save_profile(
+    profile: UserProfile,
+    user_id: str,
+    style_choice: str,
+    db: Session,
+    progress=None
+) -> Dict[str, Any]:
+    """
+    Run the profile pipeline for an uploaded CV, save the result and
+    return the /process response payload.
+    """
+    # Build user profile using AI with TOON context
+    profile_data = await build_user_profile(
+        user_id=user_id,
+        cv_text=profile.cv_text,
+        writing_samples=profile.writing_samples or [],
+        style_choice=style_choice,
+        db=db,
+        progress=progress
+    )
+    
+    # Update profile in database
+    updated_profile = await update_user_profile_in_db(
+        user_id=user_id,
+        profile_data=profile_data,
+        cv_data=None,  # The uploaded CV is already stored; don't load the blob
+        cv_filename=profile.cv_filename,
+        cv_text=profile.cv_text,
+        writing_samples=profile.writing_samples or [],
+        db=db
+    )
+    
+    # Move to preview step
+    updated_profile.onboarding_step = 5
+    db.commit()
+    
+    # Track token usage for onboarding
+    token_usage = profile_data.get("token_usage")
+    if token_usage:
+        try:
+            log_onboarding_usage(
+                db=db,
+                user_id=user_id,
+                input_tokens=token_usage.get("input_tokens", 0),
+                output_tokens=token_usage.get("output_tokens", 0),
+                model=token_usage.get("model", "unknown"),
+                provider=token_usage.get("provider", "unknown"),
+                metadata=token_usage.get("details")
+            )
+        except Exception as e:
+            # Don't fail onboarding if tracking fails
+            print(f"Warning: Failed to track onboarding usage: {str(e)}")
+    
+    # Return structured profile context (parsed from TOON)
+    context_json = profile_data.get("context_json", {})
+    
+    return {
+        "success": True,
+        "message": "Profile generated successfully",
+        "profile": {
+            "profile_md": profile_data["profile_md"],
+            "writing_style_md": profile_data["writing_style_md"],
+            "profile_context": {
+                "personal_info": {
+                    "name": context_json.get("name", ""),
+                    "current_role": context_json.get("current_role", ""),
+                    "company": context_json.get("company", ""),
+                    "industry": context_json.get("industry", ""),
+                    "years_experience": context_json.get("years_experience", 0)
+                },
+                "expertise": context_json.get("expertise", []),
+                "target_audience": context_json.get("target_audience", []),
+                "content_strategy": {
+                    "content_goals": context_json.get("content_goals", []),
+                    "posting_frequency": context_json.get("posting_frequency", "2-3x per week"),
+                    "tone": context_json.get("tone", "professional")
+                },
+                "content_mix": context_json.get("content_mix", []),
+                "content_ideas_evergreen": context_json.get("content_ideas_evergreen", []),
+                "content_ideas_trending": context_json.get("content_ideas_trending", []),
+                "ai_generated_fields": profile_data.get("ai_generated_fields", [])
+            },
+            "context_json": context_json,  # Legacy field
+            "preferences": profile_data["preferences"],
+            "token_usage": profile_data.get("token_usage")
+        }
+    }
+
 @router.post("/process")
 async def process_onboarding(
     request: ProcessRequest,
@@ -318,93 +418,101 @@ async def process_onboarding(
 ):
     """
     Process CV and writing samples to generate profile with TOON context
-    Step 4 - Main processing
+    Step 4 - Main processing (blocking; see /process/jobs for the background variant)
     """
     profile = db.query(UserProfile).filter(UserProfile.user_id == user_id).first()
     if not profile or not profile.cv_text:
         raise HTTPException(status_code=400, detail="CV not found. Please upload CV first.")
     
     try:
-        # Build user profile using AI with TOON context
-        profile_data = await build_user_profile(
-            user_id=user_id,
-            cv_text=profile.cv_text,
-            writing_samples=profile.writing_samples or [],
-            style_choice=request.style_choice,
-            db=db
-        )
-        
-        # Update profile in database
-        updated_profile = await update_user_profile_in_db(
-            user_id=user_id,
-            profile_data=profile_data,
-            cv_data=profile.cv_data,
-            cv_filename=profile.cv_filename,
-            cv_text=profile.cv_text,
-            writing_samples=profile.writing_samples or [],
-            db=db
-        )
-        
-        # Move to preview step
-        updated_profile.onboarding_step = 5
-        db.commit()
-        
-        # Track token usage for onboarding
-        token_usage = profile_data.get("token_usage")
-        if token_usage:
-            try:
-                log_onboarding_usage(
-                    db=db,
-                    user_id=user_id,
-                    input_tokens=token_usage.get("input_tokens", 0),
-                    output_tokens=token_usage.get("output_tokens", 0),
-                    model=token_usage.get("model", "unknown"),
-                    provider=token_usage.get("provider", "unknown"),
-                    metadata=token_usage.get("details")
-                )
-            except Exception as e:
-                # Don't fail onboarding if tracking fails
-                print(f"Warning: Failed to track onboarding usage: {str(e)}")
-        
-        # Return structured profile context (parsed from TOON)
-        context_json = profile_data.get("context_json", {})
-        
-        return {
-            "success": True,
-            "message": "Profile generated successfully",
-            "profile": {
-                "profile_md": profile_data["profile_md"],
-                "writing_style_md": profile_data["writing_style_md"],
-                "profile_context": {
-                    "personal_info": {
-                        "name": context_json.get("name", ""),
-                        "current_role": context_json.get("current_role", ""),
-                        "company": context_json.get("company", ""),
-                        "industry": context_json.get("industry", ""),
-                        "years_experience": context_json.get("years_experience", 0)
-                    },
-                    "expertise": context_json.get("expertise", []),
-                    "target_audience": context_json.get("target_audience", []),
-                    "content_strategy": {
-                        "content_goals": context_json.get("content_goals", []),
-                        "posting_frequency": context_json.get("posting_frequency", "2-3x per week"),
-                        "tone": context_json.get("tone", "professional")
-                    },
-                    "content_mix": context_json.get("content_mix", []),
-                    "content_ideas_evergreen": context_json.get("content_ideas_evergreen", []),
-                    "content_ideas_trending": context_json.get("content_ideas_trending", []),
-                    "ai_generated_fields": profile_data.get("ai_generated_fields", [])
-                },
-                "context_json": context_json,  # Legacy field
-                "preferences": profile_data["preferences"],
-                "token_usage": profile_data.get("token_usage")
-            }
-        }
+        return await _build_and_save_profile(profile, user_id, request.style_choice, db)
     except Exception as e:
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Profile generation failed: {str(e)}")
 
+def _sse_event(event: str, data: Dict[str, Any]) -> str:
+    """Format a single Server-Sent Events message."""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+@router.post("/process/jobs", status_code=202)
+async def start_process_job(
+    request: ProcessRequest,
+    user_id: str = Depends(get_current_user_id),
+    db: Session = Depends(get_db)
+):
+    """
+    Start profile generation as a background job (Step 4)
+    Returns the job id right away; follow progress on /process/jobs/{job_id}/events
+    or poll /process/jobs/{job_id}. A job already running for the user is returned
+    instead of starting a second one.
+    """
+    profile = db.query(UserProfile).filter(UserProfile.user_id == user_id).first()
+    if not profile or not profile.cv_text:
+        raise HTTPException(status_code=400, detail="CV not found. Please upload CV first.")
+    
+    async def run(progress):
+        # The request-scoped session is closed once this handler returns,
+        # so the job uses its own session.
+        job_db = SessionLocal()
+        try:
+            job_profile = job_db.query(UserProfile).filter(UserProfile.user_id == user_id).first()
+            if not job_profile or not job_profile.cv_text:
+                raise JobFailed("CV not found. Please upload CV first.", status_code=400)
+            return await _build_and_save_profile(job_profile, user_id, request.style_choice, job_db, progress)
+        finally:
+            job_db.close()
+    
+    job = get_onboarding_jobs().start(user_id, run)
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "events_url": f"/api/onboarding/process/jobs/{job.id}/events"
+    }
+
+@router.get("/process/jobs/{job_id}")
+async def get_process_job(
+    job_id: str,
+    user_id: str = Depends(get_current_user_id)
+):
+    """
+    Status of a profile generation job: per-stage progress, and the
+    /process response payload once completed
+    """
+    job = get_onboarding_jobs().get(job_id, user_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.snapshot()
+
+@router.get("/process/jobs/{job_id}/events")
+async def stream_process_job(
+    job_id: str,
+    user_id: str = Depends(get_current_user_id)
+):
+    """
+    Progress of a profile generation job as Server-Sent Events.
+    Events already emitted are replayed first, so reconnecting is safe:
+    - stage: {"stage": "...", "status": "running" | "completed" | "failed"}
+    - done: the /process response payload
+    - error: {"detail": "...", "status_code": int}
+    """
+    job = get_onboarding_jobs().get(job_id, user_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    async def event_stream():
+        async for event in job.subscribe():
+            yield _sse_event(event["event"], event["data"])
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"
+        }
+    )
+
 @router.get("/preview", response_model=OnboardingPreviewResponse)
 async def get_preview(
     user_id: str = Depends(get_current_user_id),
@@ -461,7 +569,7 @@ async def update_profile_field(
     Update a specific field in the profile context
     Used for inline editing during onboarding review
     """
-    from ..utils.toon_parser import parse_toon_to_dict, dict_to_toon
+    from ..utils.toon_parser import dict_to_toon, patch_toon_field, toon_section_keys
     
     profile = db.query(UserProfile).filter(UserProfile.user_id == user_id).first()
     if not profile:
@@ -470,48 +578,60 @@ async def update_profile_field(
     try:
         # Get current context
         context_json = profile.context_json or {}
+        previous_keys = list(context_json.keys())
+        updated_key = None
         
         # Update the specific field
         if section == "personal_info":
             if field in ["name", "current_role", "company", "industry", "years_experience"]:
-                context_json[field] = value
+                updated_key = field
         elif section == "expertise":
             if not isinstance(value, list):
                 raise HTTPException(status_code=400, detail="Expertise must be an array")
-            context_json["expertise"] = value
+            updated_key = "expertise"
         elif section == "target_audience":
             if not isinstance(value, list):
                 raise HTTPException(status_code=400, detail="Target audience must be an array")
-            context_json["target_audience"] = value
+            updated_key = "target_audience"
         elif section == "content_strategy":
-            if field in ["posting_frequency", "tone"]:
-                context_json[field] = value
-            elif field == "content_goals":
-                context_json["content_goals"] = value
+            if field in ["posting_frequency", "tone", "content_goals"]:
+                updated_key = field
         elif section == "content_mix":
             if not isinstance(value, list):
                 raise HTTPException(status_code=400, detail="Content mix must be an array")
-            context_json["content_mix"] = value
+            updated_key = "content_mix"
         elif section == "content_ideas_evergreen":
             if not isinstance(value, list):
                 raise HTTPException(status_code=400, detail="Content ideas must be an array")
-            context_json["content_ideas_evergreen"] = value
+            updated_key = "content_ideas_evergreen"
         elif section == "content_ideas_trending":
             if not isinstance(value, list):
                 raise HTTPException(status_code=400, detail="Content ideas must be an array")
-            context_json["content_ideas_trending"] = value
+            updated_key = "content_ideas_trending"
         elif section == "additional_context":
             # Store additional_context in context_json
-            context_json["additional_context"] = value
+            updated_key = "additional_context"
         else:
             raise HTTPException(status_code=400, detail=f"Unknown section: {section}")
         
+        if updated_key:
+            context_json[updated_key] = value
+        
         # Update database
         profile.context_json = context_json
         
-        # Always regenerate TOON format from updated context_json
+        # Keep the stored TOON in step with context_json. When it already has the
+        # sections of context_json (written by dict_to_toon), only the edited
+        # section is re-serialized; otherwise the whole document is regenerated.
         try:
-            toon_context = dict_to_toon(context_json)
+            toon_context = None
+            stored = profile.custom_instructions or ""
+            if updated_key and stored.startswith("TOON_CONTEXT:\n"):
+                stored_toon = stored[len("TOON_CONTEXT:\n"):]
+                if toon_section_keys(stored_toon) == previous_keys:
+                    toon_context = patch_toon_field(stored_toon, updated_key, value)
+            if toon_context is None:
+                toon_context = dict_to_toon(context_json)
             profile.custom_instructions = f"TOON_CONTEXT:\n{toon_context}"
         except Exception as e:
             print(f"Warning: Could not regenerate TOON: {str(e)}")
@@ -1,19 +1,22 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, undefer
 from pydantic import BaseModel
 from typing import Optional, List, Dict
 import uuid
 from datetime import datetime
 import asyncio
 
+from ..config import get_settings
 from ..database import get_db
 from ..routers.auth import get_current_user_id
 from ..services.cloudflare_ai import generate_image
 from ..services.pdf_service import create_carousel_pdf
 from ..services.usage_tracking_service import log_image_generation
+from ..services.media_store import load_media_base64, load_media_base64_list, media_url, save_media_base64
 from ..models import GeneratedPost, GeneratedPDF, GeneratedImage
 
 router = APIRouter()
+settings = get_settings()
 
 # In-memory progress tracking (in production, use Redis or similar)
 pdf_generation_progress: Dict[str, Dict] = {}
@@ -25,8 +28,10 @@ class CarouselPDFGenerationRequest(BaseModel):
 
 class PDFGenerationResponse(BaseModel):
     pdf_id: str
-    pdf: str  # base64 encoded
+    pdf: Optional[str] = None  # base64 encoded; see media_inline_base64_responses
     slide_images: Optional[List[str]] = None  # Array of base64 slide images for preview
+    pdf_url: Optional[str] = None
+    slide_urls: Optional[List[str]] = None
     format: str
     slide_count: int
     prompts: List[str]
@@ -37,8 +42,10 @@ class PDFGenerationResponse(BaseModel):
 
 class PDFHistoryItem(BaseModel):
     id: str
-    pdf: str  # base64 encoded
+    pdf: Optional[str] = None  # base64 encoded; see media_inline_base64_responses
     slide_images: Optional[List[str]] = None  # Array of base64 slide images
+    pdf_url: Optional[str] = None
+    slide_urls: Optional[List[str]] = None
     slide_count: int
     prompts: List[str]
     is_current: bool
@@ -108,7 +115,7 @@ async def generate_carousel_pdf(
     existing_slide_images = []
     existing_prompts = []
     if is_partial_regeneration:
-        current_pdf = db.query(GeneratedPDF).filter(
+        current_pdf = db.query(GeneratedPDF).options(undefer(GeneratedPDF.slide_images)).filter(
             GeneratedPDF.post_id == request.post_id,
             GeneratedPDF.is_current == True
         ).first()
@@ -119,7 +126,7 @@ async def generate_carousel_pdf(
                 detail="No current PDF found for partial regeneration"
             )
         
-        existing_slide_images = current_pdf.slide_images if current_pdf.slide_images else []
+        existing_slide_images = await load_media_base64_list(current_pdf.slide_keys, current_pdf.slide_images)
         existing_prompts = current_pdf.prompts if current_pdf.prompts else []
         
         # Validate slide indices
@@ -171,60 +178,31 @@ async def generate_carousel_pdf(
             prompts_to_process = request.prompts
         
         for i, prompt in enumerate(prompts_to_process):
-            # Retry logic for rate limit errors
-            max_retries = 3
-            retry_delay = 2  # Start with 2 seconds
-            result = None
-            last_error = None
+            # Update progress
+            pdf_generation_progress[request.post_id]["current"] = i + 1
             
-            for attempt in range(max_retries):
-                try:
-                    # Update progress
-                    pdf_generation_progress[request.post_id]["current"] = i + 1
-                    
-                    # Generate images at LinkedIn's exact carousel dimensions
-                    # Square format: 1080x1080 (most common and recommended)
-                    result = await generate_image(
-                        prompt=prompt,
-                        guidance=7.5,
-                        num_steps=25,
-                        height=1080,
-                        width=1080
-                    )
-                    # Success - break out of retry loop
-                    break
-                    
-                except Exception as e:
-                    error_message = str(e)
-                    is_rate_limit = "429" in error_message or "Capacity temporarily exceeded" in error_message or "rate limit" in error_message.lower()
-                    
-                    if is_rate_limit and attempt < max_retries - 1:
-                        # Rate limit error - retry with exponential backoff
-                        wait_time = retry_delay * (2 ** attempt)  # 2s, 4s, 8s
-                        print(f"Rate limit hit for slide {i + 1}, attempt {attempt + 1}/{max_retries}. Waiting {wait_time}s before retry...")
-                        await asyncio.sleep(wait_time)
-                        last_error = e
-                        continue
-                    else:
-                        # Not a rate limit or max retries reached - raise immediately
-                        raise
-            
-            # If we exhausted retries, raise the last error
-            if result is None:
-                error_message = str(last_error) if last_error else f"Failed to generate image for slide {i + 1} after {max_retries} attempts"
+            # Generate images at LinkedIn's exact carousel dimensions
+            # Square format: 1080x1080 (most common and recommended)
+            # Concurrency is bounded by the Cloudflare image bulkhead; when it is
+            # saturated (or Cloudflare returns 429) a 503 with Retry-After is raised
+            # instead of sleeping and retrying inside the request.
+            try:
+                result = await generate_image(
+                    prompt=prompt,
+                    guidance=7.5,
+                    num_steps=25,
+                    height=1080,
+                    width=1080
+                )
+            except HTTPException:
                 pdf_generation_progress[request.post_id]["status"] = "error"
-                is_rate_limit = "429" in error_message or "Capacity temporarily exceeded" in error_message or "rate limit" in error_message.lower()
-                
-                if is_rate_limit:
-                    raise HTTPException(
-                        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-                        detail=f"Cloudflare API rate limit exceeded after {max_retries} retries. Please wait a moment and try again. Error: {error_message}"
-                    )
-                else:
-                    raise HTTPException(
-                        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                        detail=f"Failed to generate image for slide {i + 1}: {error_message}"
-                    )
+                raise
+            except Exception as e:
+                pdf_generation_progress[request.post_id]["status"] = "error"
+                raise HTTPException(
+                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    detail=f"Failed to generate image for slide {i + 1}: {str(e)}"
+                )
             
             # Validate image result
             try:
@@ -363,14 +341,19 @@ async def generate_carousel_pdf(
             GeneratedPDF.post_id == request.post_id
         ).update({"is_current": False})
         
-        # Save PDF to database (including slide images for preview)
+        # Save the PDF and slide images (for preview) to the media store; unchanged
+        # slides of a partial regeneration resolve to the blobs already stored
         pdf_id = str(uuid.uuid4())
+        pdf_key = await save_media_base64(pdf_result["pdf"])
+        slide_keys = list(await asyncio.gather(
+            *(save_media_base64(slide) for slide in pdf_result.get("slide_images", []))
+        ))
         generated_pdf = GeneratedPDF(
             id=pdf_id,
             post_id=request.post_id,
             user_id=user_id,
-            pdf_data=pdf_result["pdf"],
-            slide_images=pdf_result.get("slide_images", []),  # Store slide images for preview
+            pdf_key=pdf_key,
+            slide_keys=slide_keys,
             slide_count=pdf_result["slide_count"],
             prompts=final_prompts,
             model=model_used or "cloudflare",
@@ -411,10 +394,13 @@ async def generate_carousel_pdf(
             token_usage = gen_options.get("token_usage", {})
             updated_cloudflare_cost = token_usage.get("cloudflare_cost")
         
+        inline = settings.media_inline_base64_responses
         return PDFGenerationResponse(
             pdf_id=pdf_id,
-            pdf=pdf_result["pdf"],
-            slide_images=pdf_result.get("slide_images", []),
+            pdf=pdf_result["pdf"] if inline else None,
+            slide_images=pdf_result.get("slide_images", []) if inline else None,
+            pdf_url=media_url(pdf_key),
+            slide_urls=[media_url(key) for key in slide_keys],
             format=pdf_result["format"],
             slide_count=pdf_result["slide_count"],
             prompts=final_prompts,
@@ -443,6 +429,19 @@ async def cleanup_progress(post_id: str):
     if post_id in pdf_generation_progress:
         del pdf_generation_progress[post_id]
 
+async def _inline_pdf(pdf: GeneratedPDF) -> Dict[str, Optional[object]]:
+    """
+    Base64 PDF and slides for responses: from the row while it has not been moved
+    to the media store, otherwise only with media_inline_base64_responses (older
+    clients); current clients load pdf_url and slide_urls instead.
+    """
+    if pdf.pdf_key and not settings.media_inline_base64_responses:
+        return {"pdf": None, "slide_images": None}
+    return {
+        "pdf": await load_media_base64(pdf.pdf_key, pdf.pdf_data),
+        "slide_images": await load_media_base64_list(pdf.slide_keys, pdf.slide_images),
+    }
+
 @router.get("/history/{post_id}", response_model=PDFHistoryResponse)
 async def get_pdf_history(
     post_id: str,
@@ -465,7 +464,9 @@ async def get_pdf_history(
         )
     
     # Get all PDFs for this post
-    pdfs = db.query(GeneratedPDF).filter(
+    pdfs = db.query(GeneratedPDF).options(
+        undefer(GeneratedPDF.pdf_data), undefer(GeneratedPDF.slide_images)
+    ).filter(
         GeneratedPDF.post_id == post_id
     ).order_by(GeneratedPDF.created_at.desc()).all()
     
@@ -479,8 +480,9 @@ async def get_pdf_history(
         pdfs=[
             PDFHistoryItem(
                 id=pdf.id,
-                pdf=pdf.pdf_data,
-                slide_images=pdf.slide_images if pdf.slide_images else [],
+                **await _inline_pdf(pdf),
+                pdf_url=media_url(pdf.pdf_key),
+                slide_urls=[media_url(key) for key in pdf.slide_keys or []],
                 slide_count=pdf.slide_count,
                 prompts=pdf.prompts,
                 is_current=pdf.is_current,
@@ -513,7 +515,9 @@ async def get_current_pdf(
         )
     
     # Get current PDF
-    current_pdf = db.query(GeneratedPDF).filter(
+    current_pdf = db.query(GeneratedPDF).options(
+        undefer(GeneratedPDF.pdf_data), undefer(GeneratedPDF.slide_images)
+    ).filter(
         GeneratedPDF.post_id == post_id,
         GeneratedPDF.is_current == True
     ).first()
@@ -523,8 +527,9 @@ async def get_current_pdf(
     
     return {
         "pdf_id": current_pdf.id,
-        "pdf": current_pdf.pdf_data,
-        "slide_images": current_pdf.slide_images if current_pdf.slide_images else [],
+        **await _inline_pdf(current_pdf),
+        "pdf_url": media_url(current_pdf.pdf_key),
+        "slide_urls": [media_url(key) for key in current_pdf.slide_keys or []],
         "slide_count": current_pdf.slide_count,
         "prompts": current_pdf.prompts,
         "created_at": current_pdf.created_at.isoformat()
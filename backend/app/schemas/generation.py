@@ -6,6 +6,7 @@ from datetime import datetime
 MAX_MESSAGE_LENGTH = 10000  # 10K chars max for user messages
 MAX_ATTACHMENT_SIZE = 5 * 1024 * 1024  # 5MB per attachment
 MAX_ATTACHMENTS = 10
+MAX_BULK_TOPICS = 20  # Posts per bulk generation request
 
 
 class PostGenerationRequest(BaseModel):
@@ -21,10 +22,26 @@ class PostGenerationRequest(BaseModel):
             raise ValueError('Message cannot be empty or whitespace only')
         return v.strip()
 
+class BulkGenerationRequest(BaseModel):
+    topics: List[str] = Field(default_factory=list, max_length=MAX_BULK_TOPICS)
+    fill_week: bool = False  # Pick topics from the user's saved content ideas instead
+    count: int = Field(default=5, ge=1, le=MAX_BULK_TOPICS)  # Posts to generate when fill_week is set
+    options: Dict[str, Any] = Field(default_factory=dict)  # Same options as PostGenerationRequest, applied to every item
+    
+    @field_validator('topics')
+    @classmethod
+    def validate_topics(cls, v):
+        topics = [topic.strip() for topic in v if topic and topic.strip()]
+        for topic in topics:
+            if len(topic) > MAX_MESSAGE_LENGTH:
+                raise ValueError(f'Each topic must be at most {MAX_MESSAGE_LENGTH} characters')
+        return topics
+
 class TokenUsage(BaseModel):
     input_tokens: int
     output_tokens: int
     total_tokens: int
+    cached_tokens: int = 0  # Input tokens served from the provider's prompt cache (included in input_tokens)
     model: Optional[str] = None
     provider: Optional[str] = None
     details: Optional[Dict[str, Dict[str, int]]] = None  # Breakdown by call type
@@ -55,6 +72,8 @@ class PostGenerationResponse(BaseModel):
     title: Optional[str] = None  # Title for the conversation
     created_at: datetime
     token_usage: Optional[TokenUsage] = None
+    stage_timings_ms: Optional[Dict[str, float]] = None  # Latency per pipeline stage (main_completion, image_prompt, ...)
+    refinement_savings: Optional[Dict[str, Any]] = None  # Set when the refinement fast path was used
     
     class Config:
         from_attributes = True
@@ -1,13 +1,18 @@
-from openai import OpenAI
-import google.generativeai as genai
-from anthropic import Anthropic
-from typing import Dict, List, Optional, Any
+from typing import AsyncIterator, Dict, List, Optional, Any, Type
 from ..config import get_settings
 from .brave_search import search_web, format_search_results
-from ..utils.pii_redaction import redact_pii, detect_pii_in_text
+from .llm_providers import LLMProvider, PROVIDER_CLASSES, get_llm_provider
+from .llm_router import Route, get_llm_router, parse_fallback_providers
+from .bulkheads import ServiceOverloadedError, bulkhead_slot
+from .circuit_breakers import CircuitOpenError, circuit_breaker, is_circuit_open
+from .single_flight import completion_key, get_single_flight
+from .model_tiers import get_model_tier_router
+from .structured_output import ResponseSchema, structured_payload
+from ..utils.pii_redaction import redact_pii
 import logging
 import copy
 import re
+import time
 import base64
 from pydantic import BaseModel, Field, ValidationError
 from typing import Literal
@@ -55,6 +60,42 @@ class TrendingTopicResponse(BaseModel):
     source: str = "web_search"
 
 
+class ContentIdeaList(BaseModel):
+    """Schema for the evergreen content ideas LLM response."""
+    ideas: List[ContentIdeaResponse]
+
+
+class TrendingTopicList(BaseModel):
+    """Schema for the trending topics LLM response."""
+    topics: List[TrendingTopicResponse]
+
+
+class PostResponse(BaseModel):
+    """Schema for a generated text or video script post."""
+    title: str
+    post_content: str
+    hashtags: List[str] = Field(default_factory=list)
+
+
+class ImagePostResponse(PostResponse):
+    """Schema for a text + image post."""
+    image_prompt: str
+
+
+class CarouselPostResponse(PostResponse):
+    """Schema for a carousel post (one image prompt per slide)."""
+    image_prompts: List[str]
+
+
+def post_response_model(post_type: str) -> Type[PostResponse]:
+    """Response schema for a post type (mirrors format_instructions.get_json_format)."""
+    if post_type == 'carousel':
+        return CarouselPostResponse
+    if post_type in ('image', 'text_with_image'):
+        return ImagePostResponse
+    return PostResponse
+
+
 class ContextJsonResponse(BaseModel):
     """Schema for context.json LLM response."""
     name: str = "User"
@@ -265,26 +306,6 @@ pii_logger = logging.getLogger("pii_redaction")
 
 settings = get_settings()
 
-# Initialize OpenAI client
-openai_client = OpenAI(api_key=settings.openai_api_key) if settings.openai_api_key else None
-
-# Initialize Gemini client
-if settings.gemini_api_key:
-    genai.configure(api_key=settings.gemini_api_key)
-
-# Initialize Claude client (Anthropic SDK v0.39.0+)
-claude_client = Anthropic(api_key=settings.claude_api_key) if settings.claude_api_key else None
-
-# Initialize OpenRouter client (OpenAI-compatible API with custom base URL)
-openrouter_client = OpenAI(
-    base_url="https://openrouter.ai/api/v1",
-    api_key=settings.openrouter_api_key,
-    default_headers={
-        "HTTP-Referer": settings.frontend_url,
-        "X-Title": "PostInAi"
-    }
-) if settings.openrouter_api_key else None
-
 async def generate_completion(
     system_prompt: str,
     user_message: str,
@@ -293,10 +314,16 @@ async def generate_completion(
     use_search: bool = False,
     conversation_history: Optional[List[Dict[str, str]]] = None,
     image_attachments: Optional[List[Dict[str, Any]]] = None,
-    use_onboarding_model: bool = False
+    use_onboarding_model: bool = False,
+    cacheable_prefix: Optional[str] = None,
+    task: Optional[str] = None,
+    response_model: Optional[Type[BaseModel]] = None
 ) -> tuple[str, Dict[str, Any]]:
     """
-    Generate a completion using OpenAI, Gemini, or Claude based on AI_PROVIDER setting
+    Generate a completion using OpenRouter, OpenAI, Gemini, or Claude based on AI_PROVIDER setting.
+    Calls go through shared async SDK clients, so concurrent requests do not block the event loop.
+    If the primary provider times out or errors, the request fails over to AI_FALLBACK_PROVIDERS.
+    The task class picks the model tier (small/onboarding/standard) on every provider.
     
     Args:
         system_prompt: System instructions
@@ -307,17 +334,159 @@ async def generate_completion(
         conversation_history: Optional list of previous messages in format [{"role": "user|assistant", "content": "..."}]
         image_attachments: Optional list of image attachments for vision analysis [{"type": "image/jpeg", "data": "base64...", "name": "file.jpg"}]
         use_onboarding_model: If True, uses the onboarding-specific model (for CV analysis)
+        cacheable_prefix: Optional leading part of system_prompt that is identical across
+            requests; marked for provider prompt caching
+        task: Task class from model_tiers.TASK_TIERS (e.g. "conversation_title"); decides
+            the model tier unless model is given
+        response_model: Optional pydantic model; requests provider-native structured output
+            (JSON schema / forced tool) where the provider supports it
     
     Returns:
         Tuple of (response_text, token_usage_dict) where token_usage_dict contains:
-        - input_tokens: int
+        - input_tokens: int (full prompt size, including cached tokens)
         - output_tokens: int
         - total_tokens: int
+        - cached_tokens: int (prompt tokens served from the provider's cache)
         - model: str
         - provider: str
-"""
-    provider = settings.ai_provider.lower()
+        - structured_output: bool (only present when the provider enforced response_model)
+    """
+    user_message, conversation_history, temperature = await _prepare_completion_inputs(
+        user_message, temperature, use_search, conversation_history, image_attachments
+    )
     
+    tier_router = get_model_tier_router()
+    tier = tier_router.tier_for(task, use_onboarding_model)
+    routes = _resolve_routes(model, tier)
+    started = time.perf_counter()
+    token_usage = None
+    try:
+        response_text, token_usage = await _generate_with_routes(
+            routes, system_prompt, user_message, temperature, conversation_history, image_attachments, cacheable_prefix,
+            ResponseSchema.from_model(response_model) if response_model else None
+        )
+        return response_text, token_usage
+    finally:
+        tier_router.record(task, tier, (time.perf_counter() - started) * 1000, token_usage)
+
+async def generate_shared_completion(
+    system_prompt: str,
+    user_message: str,
+    model: Optional[str] = None,
+    temperature: float = 0.7,
+    use_search: bool = False,
+    task: Optional[str] = None,
+    response_model: Optional[Type[BaseModel]] = None
+) -> tuple[str, Dict[str, Any]]:
+    """
+    generate_completion for requests that many users make with identical inputs.
+    Concurrent calls with the same (system_prompt, user_message, model or task,
+    temperature, use_search) share a single upstream call and its token usage.
+    Not for personalised requests (conversation history, attachments, profile context).
+    """
+    async def call() -> tuple[str, Dict[str, Any]]:
+        return await generate_completion(
+            system_prompt=system_prompt,
+            user_message=user_message,
+            model=model,
+            temperature=temperature,
+            use_search=use_search,
+            task=task,
+            response_model=response_model
+        )
+    
+    if not settings.ai_single_flight_enabled:
+        return await call()
+    key = completion_key(system_prompt, user_message, model or task, temperature, use_search)
+    return await get_single_flight().do(key, call)
+
+async def stream_completion(
+    system_prompt: str,
+    user_message: str,
+    model: Optional[str] = None,
+    temperature: float = 0.7,
+    use_search: bool = False,
+    conversation_history: Optional[List[Dict[str, str]]] = None,
+    image_attachments: Optional[List[Dict[str, Any]]] = None,
+    use_onboarding_model: bool = False,
+    token_usage: Optional[Dict[str, Any]] = None,
+    cacheable_prefix: Optional[str] = None,
+    task: Optional[str] = None
+) -> AsyncIterator[str]:
+    """
+    Stream a completion as raw text deltas using the provider's streaming API.
+    
+    Applies the same input bounds, PII redaction and web search as generate_completion.
+    Deltas are NOT output-sanitized; callers must run sanitize_llm_output on the
+    assembled text before persisting or treating it as final.
+    
+    Args:
+        Same as generate_completion, plus:
+        token_usage: Optional dict filled with the token usage once the stream completes
+    
+    Yields:
+        Text deltas as they arrive from the provider
+    """
+    user_message, conversation_history, temperature = await _prepare_completion_inputs(
+        user_message, temperature, use_search, conversation_history, image_attachments
+    )
+    
+    tier_router = get_model_tier_router()
+    tier = tier_router.tier_for(task, use_onboarding_model)
+    routes = _available_routes(_resolve_routes(model, tier))
+    if token_usage is None:
+        token_usage = {}
+    
+    async def stream_route(route: Route) -> AsyncIterator[str]:
+        # Hold the provider/model bulkhead slot for the whole stream
+        async with circuit_breaker(f"llm:{route.key}"), bulkhead_slot(f"llm:{route.key}"):
+            async for delta in route.provider.stream(
+                system_prompt=system_prompt,
+                user_message=user_message,
+                model=route.model,
+                temperature=temperature,
+                conversation_history=conversation_history,
+                image_attachments=image_attachments,
+                token_usage=token_usage,
+                cacheable_prefix=cacheable_prefix
+            ):
+                yield delta
+    
+    try:
+        # SECURITY: Validate all image attachments before processing
+        if image_attachments:
+            for img in image_attachments:
+                validate_image_attachment(img)
+        
+        started = time.perf_counter()
+        completed = False
+        try:
+            async for delta in get_llm_router().stream(routes, stream_route):
+                yield delta
+            completed = True
+        finally:
+            tier_router.record(task, tier, (time.perf_counter() - started) * 1000, token_usage if completed else None)
+    except (AIServiceError, ServiceOverloadedError, CircuitOpenError):
+        raise
+    except ValueError as e:
+        # SECURITY: Image validation errors - safe to show to user
+        raise AIServiceError(str(e), str(e))
+    except Exception as e:
+        route_names = ", ".join(route.key for route in routes)
+        pii_logger.exception(f"LLM streaming call failed (routes: {route_names})")
+        raise AIServiceError("Content generation failed. Please try again.", f"LLM API error: {str(e)}")
+
+async def _prepare_completion_inputs(
+    user_message: str,
+    temperature: float,
+    use_search: bool,
+    conversation_history: Optional[List[Dict[str, str]]],
+    image_attachments: Optional[List[Dict[str, Any]]]
+) -> tuple[str, Optional[List[Dict[str, str]]], float]:
+    """
+    Enforce input bounds, redact PII and prepend web search results.
+    Returns (user_message, conversation_history, temperature) ready to send to a provider.
+    """
     # SECURITY: Validate and enforce input bounds (LLM08 mitigation)
     user_message, conversation_history, temperature = validate_input_bounds(
         user_message, conversation_history, temperature
@@ -332,15 +501,15 @@ async def generate_completion(
         conversation_history = copy.deepcopy(conversation_history)
     
     # PII Redaction: Protect sensitive data before sending to external LLMs
-    # Redact PII from user message (may contain CV data, personal info)
-    if detect_pii_in_text(user_message):
-        pii_logger.debug("PII detected in user_message, applying redaction")  # SECURITY: Use DEBUG, not INFO
-        user_message = redact_pii(user_message, context="user_message")
+    # Redact PII from user message (may contain CV data, personal info).
+    # One scan detects and redacts; text without PII is returned unchanged.
+    user_message = redact_pii(user_message, context="user_message")
     
     # Redact PII from conversation history if present
+    # (entries loaded from the database are stored already redacted)
     if conversation_history:
         for i, msg in enumerate(conversation_history):
-            if msg.get("content") and detect_pii_in_text(msg["content"]):
+            if msg.get("content") and not msg.get("pii_redacted"):
                 conversation_history[i]["content"] = redact_pii(
                     msg["content"], 
                     context=f"conversation_history[{i}]"
@@ -348,7 +517,10 @@ async def generate_completion(
     
     # Perform web search if requested (unified across all providers)
     search_context = ""
-    if use_search and settings.brave_search_enabled:
+    if use_search and settings.brave_search_enabled and is_circuit_open("brave"):
+        # Brave is known to be down: skip instead of waiting for it to time out
+        pii_logger.info("Web search skipped: Brave circuit breaker is open")
+    elif use_search and settings.brave_search_enabled:
         try:
             # SECURITY: Sanitize search query before sending to external API
             sanitized_query = sanitize_search_query(user_message)
@@ -362,441 +534,138 @@ async def generate_completion(
             pii_logger.warning(f"Web search failed: {type(e).__name__}")
             # Continue without search results
     
-    if provider == "openrouter":
-        # OpenRouter: select model based on onboarding flag
-        if model:
-            or_model = model
-        elif use_onboarding_model and settings.openrouter_onboarding_model:
-            or_model = settings.openrouter_onboarding_model
-        else:
-            or_model = settings.openrouter_model
-        return await _generate_with_openrouter(system_prompt, user_message, or_model, temperature, conversation_history, image_attachments)
-    elif provider == "gemini":
-        return await _generate_with_gemini(system_prompt, user_message, temperature, conversation_history, image_attachments, use_onboarding_model)
-    elif provider == "openai":
-        # Use model from settings if not explicitly provided
-        if model:
-            openai_model = model
-        elif use_onboarding_model and settings.openai_onboarding_model:
-            openai_model = settings.openai_onboarding_model
-        else:
-            openai_model = settings.openai_model
-        return await _generate_with_openai(system_prompt, user_message, openai_model, temperature, conversation_history, image_attachments)
-    elif provider == "claude":
-        claude_model = model or settings.claude_model
-        return await _generate_with_claude(system_prompt, user_message, claude_model, temperature, conversation_history, image_attachments)
-    else:
-        pii_logger.error(f"Unknown AI provider attempted: {provider}")
-        raise AIServiceError("Content generation failed. Please try again.", f"Unknown AI provider: {provider}")
+    return user_message, conversation_history, temperature
 
-async def _generate_with_openrouter(
-    system_prompt: str,
-    user_message: str,
-    model: str = "anthropic/claude-3.5-haiku",
-    temperature: float = 0.7,
-    conversation_history: Optional[List[Dict[str, str]]] = None,
-    image_attachments: Optional[List[Dict[str, Any]]] = None
-) -> tuple[str, Dict[str, Any]]:
+def _resolve_routes(model: Optional[str], tier: str) -> List[Route]:
     """
-    Generate a completion using OpenRouter API (OpenAI-compatible) with optional vision support.
-    Routes to any model available on OpenRouter (Gemini, Claude, GPT, etc.) via a single API key.
+    Resolve the primary provider (AI_PROVIDER) followed by AI_FALLBACK_PROVIDERS.
+    An explicit model override only applies to the primary; every other route
+    uses its own model for the tier.
+    """
+    tier_router = get_model_tier_router()
+    provider = settings.ai_provider.lower()
+    if provider not in PROVIDER_CLASSES:
+        pii_logger.error(f"Unknown AI provider attempted: {provider}")
+        raise AIServiceError("Content generation failed. Please try again.", f"Unknown AI provider: {provider}")
     
-    Args:
-        system_prompt: System instructions
-        user_message: Current user query
-        model: OpenRouter model ID (e.g., "anthropic/claude-3.5-haiku", "google/gemini-2.5-flash")
-        temperature: Generation temperature
-        conversation_history: Optional list of previous messages [{"role": "user|assistant", "content": "..."}]
-        image_attachments: Optional list of image attachments for vision [{"type": "image/jpeg", "data": "base64...", "name": "file.jpg"}]
+    llm = get_llm_provider(provider)
+    routes = [Route(llm, model or tier_router.model_for(llm, tier))]
     
-    Returns:
-        Tuple of (response_text, token_usage_dict)
+    for fallback in parse_fallback_providers(settings.ai_fallback_providers):
+        if fallback == provider:
+            continue
+        if fallback not in PROVIDER_CLASSES:
+            pii_logger.warning(f"Ignoring unknown fallback AI provider: {fallback}")
+            continue
+        fallback_llm = get_llm_provider(fallback)
+        if fallback_llm.is_configured():
+            routes.append(Route(fallback_llm, tier_router.model_for(fallback_llm, tier)))
+    return routes
+
+def _available_routes(routes: List[Route]) -> List[Route]:
     """
-    if not openrouter_client:
-        raise AIServiceError("OpenRouter service not available. Please try again later.", "OpenRouter API key not configured")
-    
-    try:
-        # Build messages array with system prompt, conversation history, and current user message
-        messages = [{"role": "system", "content": system_prompt}]
-        
-        # Add conversation history if provided
-        if conversation_history:
-            for msg in conversation_history:
-                role = msg.get("role", "user")
-                if role not in ["user", "assistant"]:
-                    role = "user"
-                messages.append({
-                    "role": role,
-                    "content": msg.get("content", "")
-                })
-        
-        # Build user message content (with optional images for vision)
-        if image_attachments and len(image_attachments) > 0:
-            # SECURITY: Validate all image attachments before processing
-            for img in image_attachments:
-                validate_image_attachment(img)
-            
-            # Use multimodal content format for vision
-            user_content = [{"type": "text", "text": user_message}]
-            for img in image_attachments:
-                user_content.append({
-                    "type": "image_url",
-                    "image_url": {
-                        "url": f"data:{img['type']};base64,{img['data']}",
-                        "detail": "high"
-                    }
-                })
-            messages.append({"role": "user", "content": user_content})
-            pii_logger.debug(f"OpenRouter ({model}): Processing {len(image_attachments)} image(s) for vision analysis")
-        else:
-            messages.append({"role": "user", "content": user_message})
-        
-        response = openrouter_client.chat.completions.create(
-            model=model,
-            messages=messages,
-            temperature=temperature
+    Drop routes without credentials and move routes whose circuit breaker is
+    open to the back (they fail fast if reached); raise if nothing is left.
+    """
+    available = [route for route in routes if route.provider.is_configured()]
+    if not available:
+        display_name = routes[0].provider.display_name
+        raise AIServiceError(
+            f"{display_name} service not available. Please try again later.",
+            f"{display_name} API key not configured"
         )
-        
-        # Extract token usage
-        usage = response.usage
-        token_usage = {
-            "input_tokens": usage.prompt_tokens if usage else 0,
-            "output_tokens": usage.completion_tokens if usage else 0,
-            "total_tokens": usage.total_tokens if usage else 0,
-            "model": model,
-            "provider": "openrouter"
-        }
-        
-        response_text = response.choices[0].message.content
-        
-        # SECURITY: Sanitize output before returning (LLM02 mitigation)
-        sanitized_response = sanitize_llm_output(response_text, user_message)
-        
-        return sanitized_response, token_usage
-    
-    except AIServiceError:
-        raise  # Re-raise our safe exceptions
-    except ValueError as e:
-        # SECURITY: Image validation errors - safe to show to user
-        raise AIServiceError(str(e), str(e))
-    except Exception as e:
-        pii_logger.exception(f"OpenRouter API call failed (model: {model})")
-        raise AIServiceError("Content generation failed. Please try again.", f"OpenRouter API error: {str(e)}")
+    return sorted(available, key=lambda route: is_circuit_open(f"llm:{route.key}"))
 
-async def _generate_with_openai(
+async def _generate_with_provider(
+    llm: LLMProvider,
     system_prompt: str,
     user_message: str,
-    model: str = "gpt-4o",
+    model: str,
     temperature: float = 0.7,
     conversation_history: Optional[List[Dict[str, str]]] = None,
-    image_attachments: Optional[List[Dict[str, Any]]] = None
+    image_attachments: Optional[List[Dict[str, Any]]] = None,
+    cacheable_prefix: Optional[str] = None
 ) -> tuple[str, Dict[str, Any]]:
     """
-    Generate a completion using OpenAI API with optional vision support
+    Generate a completion through a single provider with no failover.
     
     Args:
+        llm: Provider instance from llm_providers.get_llm_provider
         system_prompt: System instructions
         user_message: Current user query
-        model: Model name
+        model: Resolved model name for the provider
         temperature: Generation temperature
         conversation_history: Optional list of previous messages [{"role": "user|assistant", "content": "..."}]
         image_attachments: Optional list of image attachments for vision [{"type": "image/jpeg", "data": "base64...", "name": "file.jpg"}]
+        cacheable_prefix: Optional stable leading part of system_prompt for prompt caching
     
     Returns:
         Tuple of (response_text, token_usage_dict)
     """
-    if not openai_client:
-        raise AIServiceError("OpenAI service not available. Please try again later.", "OpenAI API key not configured")
-    
-    try:
-        # Build messages array with system prompt, conversation history, and current user message
-        messages = [{"role": "system", "content": system_prompt}]
-        
-        # Add conversation history if provided
-        if conversation_history:
-            for msg in conversation_history:
-                # Ensure role is valid (user or assistant)
-                role = msg.get("role", "user")
-                if role not in ["user", "assistant"]:
-                    role = "user"
-                messages.append({
-                    "role": role,
-                    "content": msg.get("content", "")
-                })
-        
-        # Build user message content (with optional images for vision)
-        if image_attachments and len(image_attachments) > 0:
-            # SECURITY: Validate all image attachments before processing
-            for img in image_attachments:
-                validate_image_attachment(img)
-            
-            # Use multimodal content format for vision
-            user_content = [{"type": "text", "text": user_message}]
-            for img in image_attachments:
-                user_content.append({
-                    "type": "image_url",
-                    "image_url": {
-                        "url": f"data:{img['type']};base64,{img['data']}",
-                        "detail": "high"
-                    }
-                })
-            messages.append({"role": "user", "content": user_content})
-            pii_logger.debug(f"OpenAI: Processing {len(image_attachments)} image(s) for vision analysis")
-        else:
-            # Standard text-only message
-            messages.append({"role": "user", "content": user_message})
-        
-        response = openai_client.chat.completions.create(
-            model=model,
-            messages=messages,
-            temperature=temperature
-        )
-        
-        # Extract token usage
-        usage = response.usage
-        token_usage = {
-            "input_tokens": usage.prompt_tokens if usage else 0,
-            "output_tokens": usage.completion_tokens if usage else 0,
-            "total_tokens": usage.total_tokens if usage else 0,
-            "model": model,
-            "provider": "openai"
-        }
-        
-        # SECURITY: Sanitize output before returning (LLM02 mitigation)
-        response_text = response.choices[0].message.content
-        sanitized_response = sanitize_llm_output(response_text, user_message)
-        
-        return sanitized_response, token_usage
-    except AIServiceError:
-        raise  # Re-raise our safe exceptions
-    except ValueError as e:
-        # SECURITY: Image validation errors - safe to show to user
-        raise AIServiceError(str(e), str(e))
-    except Exception as e:
-        pii_logger.exception("OpenAI API call failed")
-        raise AIServiceError("Content generation failed. Please try again.", f"OpenAI API error: {str(e)}")
+    return await _generate_with_routes(
+        [Route(llm, model)], system_prompt, user_message, temperature, conversation_history, image_attachments, cacheable_prefix
+    )
 
-async def _generate_with_gemini(
+async def _generate_with_routes(
+    routes: List[Route],
     system_prompt: str,
     user_message: str,
     temperature: float = 0.7,
     conversation_history: Optional[List[Dict[str, str]]] = None,
     image_attachments: Optional[List[Dict[str, Any]]] = None,
-    use_onboarding_model: bool = False
+    cacheable_prefix: Optional[str] = None,
+    response_schema: Optional[ResponseSchema] = None
 ) -> tuple[str, Dict[str, Any]]:
     """
-    Generate a completion using Google Gemini API (new google-genai SDK) with optional vision support
-    NOTE: Google Search grounding REMOVED - web search now handled by Brave API
+    Generate a completion through the LLM router (failover/hedging across routes)
+    with optional vision support.
     
     Args:
-        system_prompt: System instructions
-        user_message: Current user query
-        temperature: Generation temperature
-        conversation_history: Optional list of previous messages [{"role": "user|assistant", "content": "..."}]
-        image_attachments: Optional list of image attachments for vision [{"type": "image/jpeg", "data": "base64...", "name": "file.jpg"}]
-        use_onboarding_model: If True, uses the onboarding-specific model (for CV analysis)
+        routes: Candidate (provider, model) routes, primary first
+        response_schema: Structured output schema, applied on routes that support it
+        Other args as in _generate_with_provider
     
     Returns:
-        Tuple of (response_text, token_usage_dict)
+        Tuple of (response_text, token_usage_dict) from whichever route answered
     """
-    if not settings.gemini_api_key:
-        raise AIServiceError("Gemini service not available. Please try again later.", "Gemini API key not configured")
+    routes = _available_routes(routes)
     
-    try:
-        # Select the appropriate model
-        if use_onboarding_model and settings.gemini_onboarding_model:
-            model_to_use = settings.gemini_onboarding_model
-        else:
-            model_to_use = settings.gemini_model
-        
-        # Create model instance
-        model = genai.GenerativeModel(model_to_use)
-        
-        # Build conversation history string if provided
-        history_text = ""
-        if conversation_history:
-            history_parts = []
-            for msg in conversation_history:
-                role = msg.get("role", "user")
-                content = msg.get("content", "")
-                if role == "user":
-                    history_parts.append(f"User: {content}")
-                elif role == "assistant":
-                    history_parts.append(f"Assistant: {content}")
-            if history_parts:
-                history_text = "\n\n".join(history_parts) + "\n\n"
-        
-        # Combine system prompt, conversation history, and current user message
-        combined_prompt = f"{system_prompt}\n\n{history_text}User: {user_message}"
-        
-        # Build contents with optional images for vision
-        if image_attachments and len(image_attachments) > 0:
-            # SECURITY: Validate all image attachments before processing
-            for img in image_attachments:
-                validate_image_attachment(img)
-            
-            # Use multimodal content format for vision
-            contents = [combined_prompt]
-            for img in image_attachments:
-                # Decode base64 and add image part
-                image_bytes = base64.b64decode(img['data'])
-                contents.append({
-                    'mime_type': img['type'],
-                    'data': image_bytes
-                })
-            pii_logger.debug(f"Gemini: Processing {len(image_attachments)} image(s) for vision analysis")
-        else:
-            contents = combined_prompt
-        
-        # Generate content
-        response = model.generate_content(
-            contents,
-            generation_config=genai.types.GenerationConfig(
+    async def complete_route(route: Route) -> tuple[str, Dict[str, Any]]:
+        # Breaker fails fast on a known outage (the router moves on to the next route);
+        # bulkhead per provider/model queues here rather than trip provider rate limits
+        async with circuit_breaker(f"llm:{route.key}"), bulkhead_slot(f"llm:{route.key}"):
+            return await route.provider.complete(
+                system_prompt=system_prompt,
+                user_message=user_message,
+                model=route.model,
                 temperature=temperature,
+                conversation_history=conversation_history,
+                image_attachments=image_attachments,
+                cacheable_prefix=cacheable_prefix,
+                response_schema=response_schema
             )
-        )
-        
-        # Extract token usage from usage_metadata
-        usage_metadata = getattr(response, 'usage_metadata', None)
-        if usage_metadata:
-            token_usage = {
-                "input_tokens": getattr(usage_metadata, 'prompt_token_count', 0) or 0,
-                "output_tokens": getattr(usage_metadata, 'candidates_token_count', 0) or 0,
-                "total_tokens": getattr(usage_metadata, 'total_token_count', 0) or 0,
-                "model": model_to_use,
-                "provider": "gemini"
-            }
-        else:
-            # Fallback if usage_metadata is not available
-            token_usage = {
-                "input_tokens": 0,
-                "output_tokens": 0,
-                "total_tokens": 0,
-                "model": model_to_use,
-                "provider": "gemini"
-            }
-        
-        # SECURITY: Sanitize output before returning (LLM02 mitigation)
-        sanitized_response = sanitize_llm_output(response.text, user_message)
-        
-        return sanitized_response, token_usage
-    except AIServiceError:
-        raise  # Re-raise our safe exceptions
-    except ValueError as e:
-        # SECURITY: Image validation errors - safe to show to user
-        raise AIServiceError(str(e), str(e))
-    except Exception as e:
-        pii_logger.exception("Gemini API call failed")
-        raise AIServiceError("Content generation failed. Please try again.", f"Gemini API error: {str(e)}")
-
-async def _generate_with_claude(
-    system_prompt: str,
-    user_message: str,
-    model: str = "claude-haiku-4-5",
-    temperature: float = 0.7,
-    conversation_history: Optional[List[Dict[str, str]]] = None,
-    image_attachments: Optional[List[Dict[str, Any]]] = None
-) -> tuple[str, Dict[str, Any]]:
-    """
-    Generate a completion using Anthropic Claude API
-    
-    Model naming verified: claude-haiku-4-5, claude-sonnet-4-5, claude-opus-4-5
-    SDK version: anthropic>=0.39.0
-    
-    Args:
-        system_prompt: System instructions
-        user_message: Current user query
-        model: Claude model to use (e.g., claude-haiku-4-5)
-        temperature: Generation temperature
-        conversation_history: Optional list of previous messages
-        image_attachments: Optional list of image attachments
-    
-    Returns:
-        Tuple of (response_text, token_usage_dict)
-    """
-    if not claude_client:
-        raise AIServiceError("Claude service not available. Please try again later.", "Claude API key not configured")
     
     try:
-        # Build messages list
-        messages = []
-        
-        # Add conversation history
-        if conversation_history:
-            for msg in conversation_history:
-                role = msg.get("role", "user")
-                content = msg.get("content", "")
-                if role in ["user", "assistant"]:
-                    messages.append({"role": role, "content": content})
-        
-        # Build current message content
-        current_content = []
-        
-        # Add images if present (Claude supports vision)
-        if image_attachments and len(image_attachments) > 0:
-            # SECURITY: Validate all image attachments before processing
+        # SECURITY: Validate all image attachments before processing
+        if image_attachments:
             for img in image_attachments:
                 validate_image_attachment(img)
-            
-            for img in image_attachments:
-                current_content.append({
-                    "type": "image",
-                    "source": {
-                        "type": "base64",
-                        "media_type": img['type'],
-                        "data": img['data']
-                    }
-                })
-            pii_logger.debug(f"Claude: Processing {len(image_attachments)} image(s) for vision analysis")
-        
-        # Add text
-        current_content.append({
-            "type": "text",
-            "text": user_message
-        })
-        
-        messages.append({
-            "role": "user",
-            "content": current_content if len(current_content) > 1 else user_message
-        })
         
-        # Call Claude API (Anthropic SDK v0.39.0+)
-        response = claude_client.messages.create(
-            model=model,
-            max_tokens=4096,
-            temperature=temperature,
-            system=system_prompt,
-            messages=messages
-        )
-        
-        # Extract response text
-        response_text = ""
-        for block in response.content:
-            if block.type == "text":
-                response_text += block.text
-        
-        # Build token usage dict
-        token_usage = {
-            "input_tokens": response.usage.input_tokens,
-            "output_tokens": response.usage.output_tokens,
-            "total_tokens": response.usage.input_tokens + response.usage.output_tokens,
-            "model": model,
-            "provider": "claude"
-        }
+        response_text, token_usage = await get_llm_router().run(routes, complete_route)
         
         # SECURITY: Sanitize output before returning (LLM02 mitigation)
         sanitized_response = sanitize_llm_output(response_text, user_message)
         
         return sanitized_response, token_usage
-    
-    except AIServiceError:
-        raise  # Re-raise our safe exceptions
+    except (AIServiceError, ServiceOverloadedError, CircuitOpenError):
+        raise  # Re-raise our safe exceptions (overload/outage surfaces as 503 + Retry-After)
     except ValueError as e:
         # SECURITY: Image validation errors - safe to show to user
         raise AIServiceError(str(e), str(e))
     except Exception as e:
-        pii_logger.exception("Claude API call failed")
-        raise AIServiceError("Content generation failed. Please try again.", f"Claude API error: {str(e)}")
+        route_names = ", ".join(route.key for route in routes)
+        pii_logger.exception(f"LLM API call failed (routes: {route_names})")
+        raise AIServiceError("Content generation failed. Please try again.", f"LLM API error: {str(e)}")
 
 async def validate_cv_content(cv_text: str) -> tuple[bool, str, Dict[str, Any]]:
     """
@@ -842,15 +711,19 @@ Be strict but fair. If the document has most CV elements, consider it valid even
             system_prompt=system_prompt,
             user_message=f"Analyze this document and determine if it's a CV/Resume:\n\n{wrapped_cv}",
             temperature=0.2,
-            use_onboarding_model=True
+            use_onboarding_model=True,  # Used when tier routing is disabled
+            task="cv_validation",
+            response_model=CVValidationResponse
         )
         
-        import json
-        cleaned_result = parse_llm_json(result)
-        raw_validation = json.loads(cleaned_result)
-        
-        # SECURITY: Validate JSON structure using pydantic
-        validation = CVValidationResponse(**raw_validation)
+        validation = structured_payload(token_usage, result, CVValidationResponse)
+        if validation is None:
+            import json
+            cleaned_result = parse_llm_json(result)
+            raw_validation = json.loads(cleaned_result)
+            
+            # SECURITY: Validate JSON structure using pydantic
+            validation = CVValidationResponse(**raw_validation)
         
         if validation.is_cv:
             message = f"Document validated as a CV/Resume. {validation.reason}"
@@ -940,7 +813,7 @@ Extract ACTUAL information from the CV. Use REAL numbers, projects, and specific
     from ..utils.prompt_security import sanitize_user_input
     sanitized_cv_text, _ = sanitize_user_input(cv_text, strict=False)
     
-    result, token_usage = await generate_completion(system_prompt, sanitized_cv_text, use_onboarding_model=True)
+    result, token_usage = await generate_completion(system_prompt, sanitized_cv_text, task="profile_from_cv")
     return result, token_usage
 
 async def analyze_writing_style(posts: List[str]) -> tuple[str, Dict[str, Any]]:
@@ -1006,7 +879,7 @@ Be extremely specific. Use EXACT quotes from the posts as evidence. The goal is
     sanitized_posts = [sanitize_user_input(post, strict=False)[0] for post in posts]
     posts_text = "\n\n---POST---\n\n".join(sanitized_posts)
     
-    result, token_usage = await generate_completion(system_prompt, f"Analyze these posts:\n\n{posts_text}", use_onboarding_model=True)
+    result, token_usage = await generate_completion(system_prompt, f"Analyze these posts:\n\n{posts_text}", task="writing_style")
     return result, token_usage
 
 async def generate_context_json(cv_text: str, profile_md: str) -> Dict:
@@ -1046,13 +919,18 @@ Return a JSON object with this structure:
     wrapped_cv = wrap_user_content(cv_text, "cv_content")
     wrapped_profile = wrap_user_content(profile_md, "profile_content")
     
-    result, _ = await generate_completion(
+    result, token_usage = await generate_completion(
         system_prompt,
         f"CV:\n{wrapped_cv}\n\nProfile:\n{wrapped_profile}",
         temperature=0.3,
-        use_onboarding_model=True
+        task="context_json",
+        response_model=ContextJsonResponse
     )
     
+    structured = structured_payload(token_usage, result, ContextJsonResponse)
+    if structured is not None:
+        return structured.model_dump()
+    
     # Parse JSON
     import json
     try:
@@ -1150,7 +1028,7 @@ Output only TOON format, no explanations."""
         system_prompt=system_prompt,
         user_message=f"CV Content:\n\n{sanitized_cv_text}\n\n{f'Industry Hint: {industry_hint}' if industry_hint else ''}",
         temperature=0.5,
-        use_onboarding_model=True
+        task="profile_context"
     )
     
     # Parse metadata from the TOON result
@@ -1252,13 +1130,18 @@ Create 10-15 unique, specific ideas based on their actual experience."""
             system_prompt=system_prompt,
             user_message=user_message,
             temperature=0.7,
-            use_onboarding_model=True
+            task="evergreen_ideas",
+            response_model=ContentIdeaList
         )
         
-        # Parse JSON array
-        import json
-        cleaned_result = parse_llm_json(result)
-        raw_ideas = json.loads(cleaned_result)
+        structured = structured_payload(token_usage, result, ContentIdeaList)
+        if structured is not None:
+            raw_ideas = [idea.model_dump() for idea in structured.ideas]
+        else:
+            # Parse JSON array
+            import json
+            cleaned_result = parse_llm_json(result)
+            raw_ideas = json.loads(cleaned_result)
         
         # SECURITY: Validate each idea using pydantic
         validated_ideas = []
@@ -1381,7 +1264,8 @@ Output ONLY the title, nothing else."""
         title, token_usage = await generate_completion(
             system_prompt=system_prompt,
             user_message=wrapped_message,
-            temperature=0.5
+            temperature=0.5,
+            task="conversation_title"
         )
         # Clean up the title
         title = title.strip().strip('"').strip("'")
@@ -1448,25 +1332,33 @@ Focus on:
 - Practical, actionable topics
 - Mix of technical and strategic topics"""
     
+    # Canonical order/spacing so users with the same tags share one request
+    expertise_areas = sorted({area.strip() for area in expertise_areas if area and area.strip()}, key=str.lower)
     user_message = f"""Find trending topics for someone with this background:
 
 Expertise Areas: {', '.join(expertise_areas)}
-Industry: {industry}
+Industry: {(industry or '').strip()}
 
 Search for current trends, hot topics, and emerging discussions in their field that would make great LinkedIn content."""
 
     try:
-        result, token_usage = await generate_completion(
+        result, token_usage = await generate_shared_completion(
             system_prompt=system_prompt,
             user_message=user_message,
             temperature=0.7,
-            use_search=True  # Enable web search
+            use_search=True,  # Enable web search
+            task="trending_topics",
+            response_model=TrendingTopicList
         )
         
-        # Parse JSON
-        import json
-        cleaned_result = parse_llm_json(result)
-        raw_topics = json.loads(cleaned_result)
+        structured = structured_payload(token_usage, result, TrendingTopicList)
+        if structured is not None:
+            raw_topics = [topic.model_dump() for topic in structured.topics]
+        else:
+            # Parse JSON
+            import json
+            cleaned_result = parse_llm_json(result)
+            raw_topics = json.loads(cleaned_result)
         
         # SECURITY: Validate each topic using pydantic
         validated_topics = []
@@ -1540,11 +1432,12 @@ Keep it focused and actionable for LinkedIn content creation."""
         user_message += f"\n\nContext: {wrapped_context}"
 
     try:
-        result, token_usage = await generate_completion(
+        result, token_usage = await generate_shared_completion(
             system_prompt=system_prompt,
             user_message=user_message,
             temperature=0.7,
-            use_search=True
+            use_search=True,
+            task="topic_research"
         )
         return result
     except AIServiceError:
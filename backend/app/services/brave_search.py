@@ -6,6 +6,8 @@ Verified implementation using latest Brave API specs (2026)
 import httpx
 from typing import Dict, List, Optional
 from ..config import get_settings
+from .http_clients import use_http_client
+from .circuit_breakers import circuit_breaker
 
 settings = get_settings()
 
@@ -47,7 +49,8 @@ async def search_web(
     }
     
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
+        # Raises CircuitOpenError immediately while Brave is known to be down
+        async with circuit_breaker("brave"), use_http_client("brave") as client:
             response = await client.get(
                 "https://api.search.brave.com/res/v1/web/search",  # Verified endpoint
                 headers=headers,
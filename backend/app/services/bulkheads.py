@@ -0,0 +1,227 @@
+"""
+Concurrency Bulkheads for Outbound Providers
+
+Caps concurrent calls per provider and model (LLM completions, Cloudflare
+image generation) so a burst of users queues inside the app instead of
+tripping provider rate limits for everyone.
+
+Each bulkhead has:
+- max_concurrent: calls allowed in flight at once
+- max_queue: callers allowed to wait for a slot
+- max_wait_seconds: how long a queued caller waits before giving up
+
+When the queue is full (or the wait times out) callers get a
+ServiceOverloadedError: an HTTP 503 with a Retry-After header estimated
+from recent call durations.
+
+Names follow "<kind>:<provider>:<model>", e.g. "llm:openai:gpt-4o" or
+"image:cloudflare:@cf/leonardo/lucid-origin". Limits come from the kind
+defaults in settings, optionally overridden per provider or per model via
+BULKHEAD_OVERRIDES (JSON), e.g.:
+    {"llm:openrouter": {"max_concurrent": 32}, "image:cloudflare": {"max_concurrent": 2}}
+"""
+import asyncio
+import json
+import logging
+import math
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, replace
+from typing import Any, AsyncIterator, Deque, Dict, Optional
+
+from fastapi import HTTPException
+
+from ..config import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Samples kept for queue-time and call-duration statistics
+_SAMPLE_WINDOW = 200
+
+
+class ServiceOverloadedError(HTTPException):
+    """
+    A provider is at capacity (local bulkhead full or upstream 429).
+    Surfaces as 503 with Retry-After so clients back off instead of retrying hot.
+    """
+
+    def __init__(self, service: str, retry_after: int, reason: str = "at capacity"):
+        self.service = service
+        self.retry_after = retry_after
+        super().__init__(
+            status_code=503,
+            detail=f"The {service.split(':')[1] if ':' in service else service} service is busy ({reason}). Please retry in {retry_after} seconds.",
+            headers={"Retry-After": str(retry_after)}
+        )
+
+
+@dataclass
+class BulkheadConfig:
+    """Limits for one bulkhead."""
+    max_concurrent: int = 8
+    max_queue: int = 32
+    max_wait_seconds: float = 30.0
+
+
+class Bulkhead:
+    """
+    Semaphore-backed concurrency limit with a bounded wait queue.
+
+    Not thread-safe: used from the single event loop that serves requests.
+    """
+
+    def __init__(self, name: str, config: BulkheadConfig):
+        self.name = name
+        self.config = config
+        self._semaphore = asyncio.Semaphore(config.max_concurrent)
+        self.active = 0
+        self.waiting = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.max_waiting_seen = 0
+        self._queue_times_ms: Deque[float] = deque(maxlen=_SAMPLE_WINDOW)
+        self._call_times_ms: Deque[float] = deque(maxlen=_SAMPLE_WINDOW)
+
+    def retry_after(self) -> int:
+        """Seconds until a slot is likely free, from recent call durations and queue depth."""
+        if not self._call_times_ms:
+            return settings.bulkhead_default_retry_after_seconds
+        avg_call_seconds = sum(self._call_times_ms) / len(self._call_times_ms) / 1000
+        slots_ahead = (self.waiting + 1) / max(1, self.config.max_concurrent)
+        return max(1, min(120, math.ceil(avg_call_seconds * slots_ahead)))
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """Hold one concurrency slot for the duration of the block."""
+        queued_at = time.perf_counter()
+        if not self._semaphore.locked():
+            # Free slot: acquire() returns without suspending
+            await self._semaphore.acquire()
+        else:
+            if self.waiting >= self.config.max_queue:
+                self.rejected += 1
+                logger.warning(f"Bulkhead {self.name} full ({self.active} active, {self.waiting} queued); rejecting")
+                raise ServiceOverloadedError(self.name, self.retry_after(), "queue full")
+            self.waiting += 1
+            self.max_waiting_seen = max(self.max_waiting_seen, self.waiting)
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), timeout=self.config.max_wait_seconds)
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                logger.warning(f"Bulkhead {self.name}: waited {self.config.max_wait_seconds}s without a slot")
+                raise ServiceOverloadedError(self.name, self.retry_after(), "queue timeout")
+            finally:
+                self.waiting -= 1
+
+        self._queue_times_ms.append((time.perf_counter() - queued_at) * 1000)
+        self.active += 1
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self.completed += 1
+            self._call_times_ms.append((time.perf_counter() - started_at) * 1000)
+            self._semaphore.release()
+
+    def stats(self) -> Dict[str, Any]:
+        queue_times = sorted(self._queue_times_ms)
+        return {
+            "max_concurrent": self.config.max_concurrent,
+            "max_queue": self.config.max_queue,
+            "max_wait_seconds": self.config.max_wait_seconds,
+            "active": self.active,
+            "waiting": self.waiting,
+            "max_waiting_seen": self.max_waiting_seen,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+            "queue_time_avg_ms": round(sum(queue_times) / len(queue_times), 1) if queue_times else 0.0,
+            "queue_time_p95_ms": round(queue_times[min(len(queue_times) - 1, int(0.95 * len(queue_times)))], 1) if queue_times else 0.0,
+        }
+
+
+class BulkheadRegistry:
+    """Creates bulkheads on first use with limits resolved from settings."""
+
+    def __init__(self, defaults: Optional[Dict[str, BulkheadConfig]] = None, overrides: Optional[Dict[str, Dict]] = None):
+        self.defaults = defaults if defaults is not None else {
+            "llm": BulkheadConfig(
+                max_concurrent=settings.bulkhead_llm_max_concurrent,
+                max_queue=settings.bulkhead_llm_max_queue,
+                max_wait_seconds=settings.bulkhead_llm_max_wait_seconds,
+            ),
+            "image": BulkheadConfig(
+                max_concurrent=settings.bulkhead_image_max_concurrent,
+                max_queue=settings.bulkhead_image_max_queue,
+                max_wait_seconds=settings.bulkhead_image_max_wait_seconds,
+            ),
+        }
+        self.overrides = overrides if overrides is not None else _parse_overrides(settings.bulkhead_overrides)
+        self._bulkheads: Dict[str, Bulkhead] = {}
+        self._lock = threading.Lock()
+
+    def config_for(self, name: str) -> BulkheadConfig:
+        """Kind default, then provider override ("llm:openai"), then model override ("llm:openai:gpt-4o")."""
+        parts = name.split(":", 2)
+        config = self.defaults.get(parts[0], BulkheadConfig())
+        for depth in (2, 3):
+            key = ":".join(parts[:depth])
+            if depth <= len(parts) and key in self.overrides:
+                config = replace(config, **self.overrides[key])
+        return config
+
+    def get(self, name: str) -> Bulkhead:
+        bulkhead = self._bulkheads.get(name)
+        if bulkhead is None:
+            with self._lock:
+                bulkhead = self._bulkheads.get(name)
+                if bulkhead is None:
+                    bulkhead = Bulkhead(name, self.config_for(name))
+                    self._bulkheads[name] = bulkhead
+        return bulkhead
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {name: bulkhead.stats() for name, bulkhead in list(self._bulkheads.items())}
+
+
+def _parse_overrides(raw: str) -> Dict[str, Dict]:
+    if not raw:
+        return {}
+    try:
+        parsed = json.loads(raw)
+    except json.JSONDecodeError:
+        logger.error("BULKHEAD_OVERRIDES is not valid JSON; ignoring")
+        return {}
+    allowed = set(BulkheadConfig.__dataclass_fields__)
+    return {
+        key: {field: value for field, value in limits.items() if field in allowed}
+        for key, limits in parsed.items()
+        if isinstance(limits, dict)
+    }
+
+
+# Global instance
+_bulkhead_registry: Optional[BulkheadRegistry] = None
+
+
+def get_bulkhead_registry() -> BulkheadRegistry:
+    """Get the global bulkhead registry instance"""
+    global _bulkhead_registry
+    if _bulkhead_registry is None:
+        _bulkhead_registry = BulkheadRegistry()
+    return _bulkhead_registry
+
+
+def bulkhead_slot(name: str):
+    """Convenience wrapper: `async with bulkhead_slot("llm:openai:gpt-4o"):`"""
+    return get_bulkhead_registry().get(name).slot()
+
+
+def get_bulkhead_stats() -> Dict[str, Dict[str, Any]]:
+    """Convenience function for admin monitoring"""
+    return get_bulkhead_registry().stats()
@@ -0,0 +1,292 @@
+"""
+Circuit Breakers for External Dependencies
+
+Remembers when a dependency (Brave Search, Cloudflare Workers AI, an LLM
+provider/model) is failing so requests fail fast instead of each waiting
+for its own timeout against a dead endpoint.
+
+States per dependency:
+- closed:    calls go through; consecutive failures are counted
+- open:      calls are rejected immediately with CircuitOpenError (503 +
+             Retry-After) until the recovery timeout elapses
+- half_open: a limited number of trial calls are let through; a success
+             closes the breaker, a failure opens it again
+
+Only dependency failures trip a breaker: timeouts, connection errors and
+5xx responses. Client errors (4xx), validation errors and local bulkhead
+rejections do not.
+
+Names follow the bulkhead convention: "brave", "cloudflare",
+"llm:<provider>:<model>".
+
+Usage:
+    async with circuit_breaker("brave"):
+        response = await client.get(...)
+"""
+import logging
+import math
+import threading
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from enum import Enum
+from typing import Any, AsyncIterator, Dict, Optional
+
+from fastapi import HTTPException
+
+from ..config import get_settings
+from .bulkheads import ServiceOverloadedError
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+class CircuitState(str, Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(HTTPException):
+    """
+    A dependency's breaker is open. Raised before any network call is made.
+    Surfaces as 503 with Retry-After set to the remaining open time.
+    """
+
+    def __init__(self, service: str, retry_after: int):
+        self.service = service
+        self.retry_after = retry_after
+        super().__init__(
+            status_code=503,
+            detail=f"The {service.split(':')[1] if ':' in service else service} service is temporarily unavailable. Please retry in {retry_after} seconds.",
+            headers={"Retry-After": str(retry_after)}
+        )
+
+
+def is_dependency_failure(error: BaseException) -> bool:
+    """Whether an error means the dependency itself is unhealthy."""
+    if isinstance(error, (CircuitOpenError, ServiceOverloadedError, ValueError)):
+        return False
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    if status is None and isinstance(getattr(error, "code", None), int):
+        status = error.code  # google.api_core exceptions
+    if status is None:
+        # Timeouts, connection resets and unknown SDK errors
+        return True
+    return status == 408 or status >= 500
+
+
+@dataclass
+class CircuitBreakerConfig:
+    """Thresholds for one breaker."""
+    failure_threshold: int = 5  # Consecutive failures that open the breaker
+    recovery_seconds: float = 30.0  # Time spent open before trial calls are allowed
+    half_open_max_calls: int = 1  # Concurrent trial calls while half-open
+
+
+class CircuitBreaker:
+    """Closed/open/half-open breaker for one dependency."""
+
+    def __init__(self, name: str, config: CircuitBreakerConfig):
+        self.name = name
+        self.config = config
+        self.state = CircuitState.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self.half_open_in_flight = 0
+        self.total_calls = 0
+        self.total_failures = 0
+        self.rejected = 0
+        self.times_opened = 0
+        self.last_failure: Optional[str] = None
+        self.last_state_change = time.time()
+        self._lock = threading.Lock()
+
+    def _set_state(self, state: CircuitState):
+        if state != self.state:
+            logger.warning(f"Circuit breaker {self.name}: {self.state.value} -> {state.value}")
+            self.state = state
+            self.last_state_change = time.time()
+
+    def retry_after(self) -> int:
+        """Seconds until the breaker will let a trial call through."""
+        if self.opened_at is None:
+            return 1
+        remaining = self.config.recovery_seconds - (time.monotonic() - self.opened_at)
+        return max(1, math.ceil(remaining))
+
+    def is_open(self) -> bool:
+        """True if a call made now would be rejected without trying."""
+        with self._lock:
+            return not self._can_attempt()
+
+    def _can_attempt(self) -> bool:
+        if self.state == CircuitState.OPEN:
+            if time.monotonic() - self.opened_at < self.config.recovery_seconds:
+                return False
+            self._set_state(CircuitState.HALF_OPEN)
+            self.half_open_in_flight = 0
+        if self.state == CircuitState.HALF_OPEN:
+            return self.half_open_in_flight < self.config.half_open_max_calls
+        return True
+
+    def before_call(self) -> bool:
+        """
+        Admit a call or raise CircuitOpenError.
+        Returns True if the call is a half-open trial.
+        """
+        with self._lock:
+            if not self._can_attempt():
+                self.rejected += 1
+                raise CircuitOpenError(self.name, self.retry_after())
+            self.total_calls += 1
+            if self.state == CircuitState.HALF_OPEN:
+                self.half_open_in_flight += 1
+                return True
+            return False
+
+    def record_success(self, trial: bool = False):
+        with self._lock:
+            if trial:
+                self.half_open_in_flight = max(0, self.half_open_in_flight - 1)
+            self.consecutive_failures = 0
+            if self.state != CircuitState.CLOSED:
+                self.opened_at = None
+                self._set_state(CircuitState.CLOSED)
+
+    def record_failure(self, error: BaseException, trial: bool = False):
+        with self._lock:
+            if trial:
+                self.half_open_in_flight = max(0, self.half_open_in_flight - 1)
+            self.total_failures += 1
+            self.consecutive_failures += 1
+            self.last_failure = type(error).__name__
+            if self.state == CircuitState.HALF_OPEN or self.consecutive_failures >= self.config.failure_threshold:
+                if self.state != CircuitState.OPEN:
+                    self.times_opened += 1
+                self.opened_at = time.monotonic()
+                self._set_state(CircuitState.OPEN)
+
+    def release_trial(self):
+        """A half-open trial ended without a verdict (cancelled or a non-dependency error)."""
+        with self._lock:
+            self.half_open_in_flight = max(0, self.half_open_in_flight - 1)
+
+    @asynccontextmanager
+    async def guard(self) -> AsyncIterator[None]:
+        """Run a block through the breaker, recording its outcome."""
+        trial = self.before_call()
+        try:
+            yield
+        except Exception as e:
+            if is_dependency_failure(e):
+                self.record_failure(e, trial)
+            elif trial and isinstance(e, (CircuitOpenError, ServiceOverloadedError)):
+                # Rejected locally before reaching the dependency
+                self.release_trial()
+            elif trial:
+                # The dependency answered; a 4xx is not evidence it is down
+                self.record_success(trial)
+            raise
+        except BaseException:
+            # Cancellation says nothing about the dependency
+            if trial:
+                self.release_trial()
+            raise
+        else:
+            self.record_success(trial)
+
+    def reset(self):
+        """Force the breaker closed (admin action)."""
+        with self._lock:
+            self.consecutive_failures = 0
+            self.opened_at = None
+            self.half_open_in_flight = 0
+            self._set_state(CircuitState.CLOSED)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            # Reading state may move an expired open breaker to half-open
+            self._can_attempt()
+            return {
+                "state": self.state.value,
+                "consecutive_failures": self.consecutive_failures,
+                "failure_threshold": self.config.failure_threshold,
+                "recovery_seconds": self.config.recovery_seconds,
+                "retry_after_seconds": self.retry_after() if self.state == CircuitState.OPEN else 0,
+                "total_calls": self.total_calls,
+                "total_failures": self.total_failures,
+                "rejected": self.rejected,
+                "times_opened": self.times_opened,
+                "last_failure": self.last_failure,
+                "last_state_change": self.last_state_change,
+            }
+
+
+class CircuitBreakerRegistry:
+    """Creates breakers on first use with thresholds from settings."""
+
+    def __init__(self, config: Optional[CircuitBreakerConfig] = None):
+        self.config = config or CircuitBreakerConfig(
+            failure_threshold=settings.circuit_breaker_failure_threshold,
+            recovery_seconds=settings.circuit_breaker_recovery_seconds,
+            half_open_max_calls=settings.circuit_breaker_half_open_max_calls,
+        )
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str) -> CircuitBreaker:
+        breaker = self._breakers.get(name)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.get(name)
+                if breaker is None:
+                    breaker = CircuitBreaker(name, self.config)
+                    self._breakers[name] = breaker
+        return breaker
+
+    def reset(self, name: str) -> bool:
+        breaker = self._breakers.get(name)
+        if breaker is None:
+            return False
+        breaker.reset()
+        return True
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {name: breaker.stats() for name, breaker in list(self._breakers.items())}
+
+
+# Global instance
+_circuit_breaker_registry: Optional[CircuitBreakerRegistry] = None
+
+
+def get_circuit_breaker_registry() -> CircuitBreakerRegistry:
+    """Get the global circuit breaker registry instance"""
+    global _circuit_breaker_registry
+    if _circuit_breaker_registry is None:
+        _circuit_breaker_registry = CircuitBreakerRegistry()
+    return _circuit_breaker_registry
+
+
+@asynccontextmanager
+async def circuit_breaker(name: str) -> AsyncIterator[None]:
+    """Convenience wrapper: `async with circuit_breaker("brave"):` (no-op when disabled)"""
+    if not settings.circuit_breaker_enabled:
+        yield
+        return
+    async with get_circuit_breaker_registry().get(name).guard():
+        yield
+
+
+def is_circuit_open(name: str) -> bool:
+    """True if calls to `name` are currently being rejected."""
+    if not settings.circuit_breaker_enabled:
+        return False
+    return get_circuit_breaker_registry().get(name).is_open()
+
+
+def get_circuit_breaker_stats() -> Dict[str, Dict[str, Any]]:
+    """Convenience function for admin monitoring"""
+    return get_circuit_breaker_registry().stats()
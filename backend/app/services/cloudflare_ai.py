@@ -7,6 +7,9 @@ import httpx
 import base64
 from typing import Optional, Dict, Any
 from ..config import get_settings
+from .http_clients import use_http_client
+from .bulkheads import ServiceOverloadedError, bulkhead_slot
+from .circuit_breakers import CircuitOpenError, circuit_breaker
 
 settings = get_settings()
 
@@ -106,7 +109,12 @@ async def generate_image(
             payload["seed"] = max(0, seed)
     
     try:
-        async with httpx.AsyncClient(timeout=60.0) as client:
+        # Bulkhead: cap concurrent image generations per model so bursts queue
+        # instead of hitting Cloudflare's "Capacity temporarily exceeded" 429s
+        # Circuit breaker first so an outage fails fast without waiting in the queue
+        async with circuit_breaker("cloudflare"), \
+                bulkhead_slot(f"image:cloudflare:{settings.cloudflare_image_model}"), \
+                use_http_client("cloudflare") as client:
             response = await client.post(url, json=payload, headers=headers)
             response.raise_for_status()
             
@@ -173,7 +181,17 @@ async def generate_image(
                 }
             }
     
+    except (ServiceOverloadedError, CircuitOpenError):
+        raise
     except httpx.HTTPStatusError as e:
+        if e.response is not None and e.response.status_code == 429:
+            # Upstream capacity limit: surface as 503 + Retry-After like a full bulkhead
+            retry_after = e.response.headers.get("retry-after", "")
+            raise ServiceOverloadedError(
+                "cloudflare",
+                int(retry_after) if retry_after.isdigit() else settings.bulkhead_default_retry_after_seconds,
+                "rate limited"
+            )
         error_detail = "Unknown error"
         try:
             if hasattr(e, 'response') and e.response:
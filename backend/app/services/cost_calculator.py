@@ -5,6 +5,7 @@ Calculates costs for various AI providers and services
 from typing import Dict, Optional
 from sqlalchemy.orm import Session
 from ..models import AdminSetting
+from ..utils.cost_calculator import cached_input_price_ratio
 
 
 # Pricing in USD per 1M tokens (as of January 2025)
@@ -45,15 +46,17 @@ PRICING_TABLE = {
 def calculate_text_generation_cost(
     input_tokens: int,
     output_tokens: int,
-    model: str
+    model: str,
+    cached_tokens: int = 0
 ) -> float:
     """
     Calculate cost for text generation
     
     Args:
-        input_tokens: Number of input tokens
+        input_tokens: Number of input tokens (including cached tokens)
         output_tokens: Number of output tokens
         model: Model name
+        cached_tokens: Input tokens served from the prompt cache (billed at a discount)
     
     Returns:
         Cost in USD (as float)
@@ -63,7 +66,10 @@ def calculate_text_generation_cost(
         # Unknown model, return 0 cost
         return 0.0
     
-    input_cost = (input_tokens / 1_000_000) * pricing["input"]
+    cached_tokens = min(max(cached_tokens, 0), input_tokens)
+    uncached_tokens = input_tokens - cached_tokens
+    input_cost = (uncached_tokens / 1_000_000) * pricing["input"]
+    input_cost += (cached_tokens / 1_000_000) * pricing["input"] * cached_input_price_ratio(model)
     output_cost = (output_tokens / 1_000_000) * pricing["output"]
     
     return round(input_cost + output_cost, 8)
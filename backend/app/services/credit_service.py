@@ -211,7 +211,9 @@ def deduct_credits_v2(
             "credits_deducted": 0,
             "credits_remaining": -1,
             "action_type": action_type,
-            "source": "unlimited"
+            "source": "unlimited",
+            "from_subscription": 0.0,
+            "from_purchased": 0.0
         }
     
     purchased_balance = get_purchased_credits_balance(db, user_id)
@@ -232,11 +234,13 @@ def deduct_credits_v2(
     # Use subscription credits first
     if subscription_available >= amount:
         # All from subscription
+        from_subscription, from_purchased = amount, 0.0
         subscription.subscription_credits_used += amount
         credits_after_total = (subscription.subscription_credits_limit - subscription.subscription_credits_used) + purchased_balance.balance
     else:
         # Use subscription + purchased
         remaining = amount - subscription_available
+        from_subscription, from_purchased = max(0.0, subscription_available), remaining
         subscription.subscription_credits_used = subscription.subscription_credits_limit
         purchased_balance.balance -= remaining
         credits_after_total = purchased_balance.balance
@@ -279,7 +283,9 @@ def deduct_credits_v2(
         "credits_deducted": amount,
         "credits_remaining": credits_after_total,
         "action_type": action_type,
-        "source": source
+        "source": source,
+        "from_subscription": from_subscription,
+        "from_purchased": from_purchased
     }
 
 
@@ -415,6 +421,84 @@ def add_credits(
     }
 
 
+def refund_deducted_credits(
+    db: Session,
+    user_id: str,
+    deduction: Dict,
+    amount: float,
+    description: str,
+    post_id: Optional[str] = None
+) -> Dict:
+    """
+    Refund part (or all) of an earlier deduct_credits_v2 result to the sources it came from
+    
+    Purchased credits are returned first (they never expire), then the rest
+    reduces subscription usage. Unlike add_credits, credits taken from the
+    purchased balance are not turned into subscription credits.
+    
+    Args:
+        db: Database session
+        user_id: User ID
+        deduction: Dict returned by deduct_credits_v2 (uses from_subscription / from_purchased)
+        amount: Credits to refund, at most the deducted amount
+        description: Description/reason
+        post_id: Optional post ID
+    
+    Returns:
+        Dict with transaction details and the per-source split
+    """
+    from_purchased = deduction.get("from_purchased", 0.0)
+    from_subscription = deduction.get("from_subscription", 0.0)
+    amount = min(amount, from_purchased + from_subscription)
+    if amount <= 0:
+        return {"transaction_id": None, "credits_added": 0.0, "to_purchased": 0.0, "to_subscription": 0.0}
+    
+    subscription = ensure_subscription_exists(db, user_id)
+    purchased_balance = get_purchased_credits_balance(db, user_id)
+    credits_before = (subscription.subscription_credits_limit - subscription.subscription_credits_used) + purchased_balance.balance
+    
+    to_purchased = min(amount, from_purchased)
+    to_subscription = amount - to_purchased
+    purchased_balance.balance += to_purchased
+    subscription.subscription_credits_used = max(0.0, subscription.subscription_credits_used - to_subscription)
+    credits_after = (subscription.subscription_credits_limit - subscription.subscription_credits_used) + purchased_balance.balance
+    
+    transaction = CreditTransaction(
+        id=str(uuid.uuid4()),
+        user_id=user_id,
+        post_id=post_id,
+        action_type="credit_refund",
+        credits_used=amount,  # Positive for addition
+        credits_before=int(credits_before),
+        credits_after=int(credits_after),
+        description=f"{description} ({to_purchased} purchased, {to_subscription} subscription)",
+        created_at=datetime.utcnow()
+    )
+    
+    db.add(transaction)
+    db.commit()
+    db.refresh(subscription)
+    db.refresh(purchased_balance)
+    
+    log_credit_transaction(
+        user_id=user_id,
+        action="refund",
+        credits_before=credits_before,
+        credits_after=credits_after,
+        credits_changed=amount,
+        description=description
+    )
+    logger.info(f"Refunded {amount} credits to user {user_id} ({to_purchased} purchased, {to_subscription} subscription): {description}")
+    
+    return {
+        "transaction_id": transaction.id,
+        "credits_added": amount,
+        "credits_remaining": credits_after,
+        "to_purchased": to_purchased,
+        "to_subscription": to_subscription
+    }
+
+
 def admin_grant_credits(
     db: Session,
     user_id: str,
@@ -2,22 +2,18 @@ import os
 from typing import Tuple
 import base64
 from PIL import Image
-from io import BytesIO
-import PyPDF2
+
+from .pdf_extraction import extract_pdf_text
 
 async def extract_text_from_pdf(pdf_data: bytes) -> str:
     """
     Extract text content from PDF file
+    Runs in a worker process within the configured page/character/time budgets;
+    use pdf_extraction.extract_pdf_text directly for the diagnostics.
     """
     try:
-        pdf_file = BytesIO(pdf_data)
-        pdf_reader = PyPDF2.PdfReader(pdf_file)
-        
-        text = ""
-        for page in pdf_reader.pages:
-            text += page.extract_text() + "\n"
-        
-        return text.strip()
+        result = await extract_pdf_text(pdf_data)
+        return result.text
     except Exception as e:
         raise Exception(f"Failed to extract text from PDF: {str(e)}")
 
@@ -0,0 +1,233 @@
+"""
+Shared HTTP Client Pools
+
+One long-lived httpx.AsyncClient per outbound integration (Brave Search,
+Cloudflare Workers AI, LinkedIn) so requests reuse keep-alive connections
+instead of paying a new TCP + TLS handshake on every call.
+
+Clients are started at application startup and closed on shutdown. Services
+borrow them with:
+
+    async with use_http_client("brave") as client:
+        response = await client.get(...)
+
+Leaving the block does NOT close the client; the connection goes back to the pool.
+The clients are shared by every user's requests, so they never store cookies.
+"""
+import http.cookiejar
+import importlib.util
+import logging
+import threading
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, Optional
+
+import httpx
+
+from ..config import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+@dataclass
+class HostPoolConfig:
+    """Connection pool and timeout settings for one outbound integration"""
+    timeout: float
+    connect_timeout: float = 10.0
+    max_connections: int = 20
+    max_keepalive_connections: int = 10
+    http2: bool = True  # Only used when the h2 package is installed
+
+
+# Per-integration pool settings. Requests may still pass their own timeout
+# (e.g. LinkedIn document uploads) which overrides these defaults.
+HOST_POOLS: Dict[str, HostPoolConfig] = {
+    # api.search.brave.com
+    "brave": HostPoolConfig(timeout=30.0, connect_timeout=5.0, max_connections=20, max_keepalive_connections=10),
+    # api.cloudflare.com - image generation is slow, keep fewer but longer-lived connections
+    "cloudflare": HostPoolConfig(timeout=60.0, connect_timeout=10.0, max_connections=10, max_keepalive_connections=5),
+    # api.linkedin.com, www.linkedin.com (OAuth) and LinkedIn upload URLs
+    "linkedin": HostPoolConfig(timeout=30.0, connect_timeout=10.0, max_connections=20, max_keepalive_connections=10),
+}
+
+
+def _no_cookies_jar() -> http.cookiejar.CookieJar:
+    """A jar that ignores Set-Cookie and sends nothing: no state between users' requests."""
+    return http.cookiejar.CookieJar(policy=http.cookiejar.DefaultCookiePolicy(allowed_domains=[]))
+
+
+def http2_available() -> bool:
+    """HTTP/2 requires the optional h2 package (httpx[http2])"""
+    return importlib.util.find_spec("h2") is not None
+
+
+@dataclass
+class _PoolCounters:
+    requests: int = 0
+    errors: int = 0
+    in_flight: int = 0
+    total_time_ms: float = 0.0
+    created_at: float = 0.0
+
+
+class HTTPClientManager:
+    """
+    Registry of pooled httpx.AsyncClient instances keyed by integration name.
+
+    Clients are created on start() or lazily on first use, so scripts and
+    tests that never run the FastAPI startup hook still work.
+    """
+
+    def __init__(self, pools: Optional[Dict[str, HostPoolConfig]] = None):
+        self.pools = pools if pools is not None else HOST_POOLS
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._counters: Dict[str, _PoolCounters] = {}
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Create all configured clients up front."""
+        for name in self.pools:
+            self.get_client(name)
+        logger.info(
+            f"HTTP client pools started: {', '.join(self.pools)} "
+            f"(http2={'on' if http2_available() else 'unavailable'})"
+        )
+
+    def _build_client(self, name: str) -> httpx.AsyncClient:
+        config = self.pools[name]
+        use_http2 = (
+            config.http2
+            and settings.http_client_http2_enabled
+            and http2_available()
+        )
+        return httpx.AsyncClient(
+            timeout=httpx.Timeout(config.timeout, connect=config.connect_timeout),
+            limits=httpx.Limits(
+                max_connections=config.max_connections,
+                max_keepalive_connections=config.max_keepalive_connections,
+                keepalive_expiry=settings.http_client_keepalive_expiry_seconds
+            ),
+            http2=use_http2,
+            cookies=_no_cookies_jar()
+        )
+
+    def get_client(self, name: str) -> httpx.AsyncClient:
+        """Return the shared client for an integration, creating it if needed."""
+        if name not in self.pools:
+            raise KeyError(f"Unknown HTTP client pool: {name}")
+        client = self._clients.get(name)
+        if client is None or client.is_closed:
+            with self._lock:
+                client = self._clients.get(name)
+                if client is None or client.is_closed:
+                    client = self._build_client(name)
+                    self._clients[name] = client
+                    self._counters[name] = _PoolCounters(created_at=time.time())
+        return client
+
+    @asynccontextmanager
+    async def use(self, name: str) -> AsyncIterator[httpx.AsyncClient]:
+        """Borrow a pooled client for the duration of a block (never closes it)."""
+        client = self.get_client(name)
+        counters = self._counters[name]
+        counters.in_flight += 1
+        counters.requests += 1
+        start = time.perf_counter()
+        try:
+            yield client
+        except Exception:
+            counters.errors += 1
+            raise
+        finally:
+            counters.in_flight -= 1
+            counters.total_time_ms += (time.perf_counter() - start) * 1000
+
+    async def aclose(self):
+        """Close all clients and their connection pools."""
+        clients = list(self._clients.items())
+        self._clients.clear()
+        for name, client in clients:
+            try:
+                await client.aclose()
+            except Exception as e:
+                logger.warning(f"Error closing HTTP client pool '{name}': {e}")
+
+    def stats(self) -> Dict[str, Dict]:
+        """Per-pool request counters and live connection counts."""
+        result = {}
+        for name, config in self.pools.items():
+            client = self._clients.get(name)
+            counters = self._counters.get(name, _PoolCounters())
+            connections = _connection_stats(client) if client is not None and not client.is_closed else {}
+            result[name] = {
+                "started": client is not None and not client.is_closed,
+                "requests": counters.requests,
+                "errors": counters.errors,
+                "in_flight": counters.in_flight,
+                "avg_time_ms": round(counters.total_time_ms / counters.requests, 1) if counters.requests else 0.0,
+                "connections": connections,
+                "limits": {
+                    "max_connections": config.max_connections,
+                    "max_keepalive_connections": config.max_keepalive_connections,
+                    "timeout": config.timeout,
+                    "connect_timeout": config.connect_timeout,
+                }
+            }
+        return result
+
+
+def _connection_stats(client: httpx.AsyncClient) -> Dict[str, int]:
+    """Inspect the underlying httpcore pool; returns {} if internals change."""
+    pool = getattr(getattr(client, "_transport", None), "_pool", None)
+    connections = getattr(pool, "connections", None)
+    if connections is None:
+        return {}
+    stats = {"total": 0, "idle": 0, "active": 0, "http2": 0}
+    for connection in connections:
+        stats["total"] += 1
+        try:
+            if connection.is_idle():
+                stats["idle"] += 1
+            else:
+                stats["active"] += 1
+            info = connection.info()
+            if "HTTP/2" in info:
+                stats["http2"] += 1
+        except Exception:
+            continue
+    return stats
+
+
+# Global instance
+_http_client_manager: Optional[HTTPClientManager] = None
+
+
+def get_http_client_manager() -> HTTPClientManager:
+    """Get the global HTTP client manager instance"""
+    global _http_client_manager
+    if _http_client_manager is None:
+        _http_client_manager = HTTPClientManager()
+    return _http_client_manager
+
+
+def start_http_clients():
+    """Create pooled clients at application startup"""
+    get_http_client_manager().start()
+
+
+async def close_http_clients():
+    """Close pooled clients at application shutdown"""
+    if _http_client_manager is not None:
+        await _http_client_manager.aclose()
+
+
+def use_http_client(name: str):
+    """Convenience wrapper: `async with use_http_client("brave") as client:`"""
+    return get_http_client_manager().use(name)
+
+
+def get_http_pool_stats() -> Dict[str, Dict]:
+    """Convenience function for admin monitoring"""
+    return get_http_client_manager().stats()
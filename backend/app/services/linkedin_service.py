@@ -7,6 +7,7 @@ import io
 import asyncio
 import json
 from ..config import get_settings
+from .http_clients import use_http_client
 
 settings = get_settings()
 
@@ -38,7 +39,7 @@ class LinkedInService:
     @staticmethod
     async def exchange_code_for_token(code: str) -> Dict:
         """Exchange authorization code for access token"""
-        async with httpx.AsyncClient() as client:
+        async with use_http_client("linkedin") as client:
             response = await client.post(
                 LINKEDIN_TOKEN_URL,
                 data={
@@ -59,7 +60,7 @@ class LinkedInService:
     @staticmethod
     async def get_user_profile(access_token: str) -> Dict:
         """Fetch user profile from LinkedIn"""
-        async with httpx.AsyncClient() as client:
+        async with use_http_client("linkedin") as client:
             profile_response = await client.get(
                 f"{LINKEDIN_API_BASE}/userinfo",
                 headers={"Authorization": f"Bearer {access_token}"}
@@ -78,7 +79,7 @@ class LinkedInService:
         This will return an empty list if posts cannot be accessed.
         """
         try:
-            async with httpx.AsyncClient() as client:
+            async with use_http_client("linkedin") as client:
                 # Try the UGC Posts API (requires special permissions)
                 posts_response = await client.get(
                     f"{LINKEDIN_API_BASE}/ugcPosts",
@@ -122,7 +123,7 @@ class LinkedInService:
     @staticmethod
     async def refresh_access_token(refresh_token: str) -> Dict:
         """Refresh expired access token"""
-        async with httpx.AsyncClient() as client:
+        async with use_http_client("linkedin") as client:
             response = await client.post(
                 LINKEDIN_TOKEN_URL,
                 data={
@@ -152,7 +153,7 @@ class LinkedInService:
         Returns:
             Asset URN (e.g., "urn:li:digitalmediaAsset:C5522AQGTYER3k3ByHQ")
         """
-        async with httpx.AsyncClient() as client:
+        async with use_http_client("linkedin") as client:
             person_urn = f"urn:li:person:{linkedin_id}"
             
             # Step 1: Register upload using Assets API (required for UGC posts)
@@ -227,7 +228,7 @@ class LinkedInService:
         Returns:
             Document URN (e.g., "urn:li:document:C5522AQGTYER3k3ByHQ")
         """
-        async with httpx.AsyncClient() as client:
+        async with use_http_client("linkedin") as client:
             person_urn = f"urn:li:person:{linkedin_id}"
             
             # Try Documents API first (separate API for documents)
@@ -544,7 +545,7 @@ class LinkedInService:
         Returns:
             Dict with post ID and URL
         """
-        async with httpx.AsyncClient() as client:
+        async with use_http_client("linkedin") as client:
             # Get user's person URN
             person_urn = f"urn:li:person:{linkedin_id}"
             
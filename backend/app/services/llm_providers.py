@@ -0,0 +1,1141 @@
+"""
+LLM Provider Clients
+
+Async provider abstraction over the OpenAI, OpenRouter, Gemini and Claude SDKs,
+plus offline mock and record/replay providers for load testing.
+Each provider owns one SDK client that is created lazily on first use and reused
+for the lifetime of the process, so completions never block the event loop and
+connection pools are shared between requests.
+
+Providers only translate a completion request into the provider-native payload
+and normalise the response into (text, token_usage). Security checks, PII
+redaction and output sanitization stay in ai_service.
+"""
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from openai import AsyncOpenAI
+from anthropic import AsyncAnthropic
+import google.generativeai as genai
+
+from ..config import get_settings
+from .mock_llm_responses import CHARS_PER_TOKEN, build_response, detect_scenario
+from .structured_output import ResponseSchema
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
+CLAUDE_MAX_TOKENS = 4096
+# OpenRouter model families that need cache_control breakpoints for prompt caching
+OPENROUTER_CACHE_CONTROL_PREFIXES = ("anthropic/", "google/gemini")
+# OpenAI models that accept a json_schema response_format
+OPENAI_STRUCTURED_OUTPUT_PREFIXES = ("gpt-4o", "gpt-4.1", "gpt-5", "o1", "o3", "o4")
+# Gemini models that accept response_mime_type/response_schema
+GEMINI_STRUCTURED_OUTPUT_PREFIXES = ("gemini-1.5", "gemini-2", "gemini-3")
+
+
+# =============================================================================
+# Bounded executor for SDK calls that have no native async client
+# =============================================================================
+
+_blocking_executor: Optional[ThreadPoolExecutor] = None
+
+
+def get_blocking_executor() -> ThreadPoolExecutor:
+    """Get the shared, size-bounded executor for blocking SDK calls."""
+    global _blocking_executor
+    if _blocking_executor is None:
+        _blocking_executor = ThreadPoolExecutor(
+            max_workers=settings.ai_blocking_executor_workers,
+            thread_name_prefix="llm-blocking"
+        )
+    return _blocking_executor
+
+
+async def run_blocking(func: Callable, *args, **kwargs) -> Any:
+    """Run a blocking callable on the bounded executor without stalling the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_blocking_executor(), lambda: func(*args, **kwargs))
+
+
+def empty_token_usage(model: str, provider: str) -> Dict[str, Any]:
+    """Token usage dict used when a provider does not report usage."""
+    return {
+        "input_tokens": 0,
+        "output_tokens": 0,
+        "total_tokens": 0,
+        "cached_tokens": 0,
+        "model": model,
+        "provider": provider
+    }
+
+
+def split_cacheable_prefix(system_prompt: str, cacheable_prefix: Optional[str]) -> Tuple[str, str]:
+    """
+    Split system_prompt into (cacheable prefix, remainder).
+
+    Returns ("", system_prompt) when cacheable_prefix is empty or is not
+    actually a prefix of system_prompt, so a stale prefix never changes the prompt.
+    """
+    if not cacheable_prefix or not system_prompt.startswith(cacheable_prefix):
+        return "", system_prompt
+    return cacheable_prefix, system_prompt[len(cacheable_prefix):]
+
+
+def cached_system_blocks(system_prompt: str, cacheable_prefix: Optional[str]) -> Optional[List[Dict[str, Any]]]:
+    """
+    Anthropic-style system content blocks with an ephemeral cache_control
+    breakpoint after the stable prefix, or None if there is no prefix to cache.
+    """
+    prefix, remainder = split_cacheable_prefix(system_prompt, cacheable_prefix)
+    if not prefix:
+        return None
+    blocks = [{"type": "text", "text": prefix, "cache_control": {"type": "ephemeral"}}]
+    if remainder:
+        blocks.append({"type": "text", "text": remainder})
+    return blocks
+
+
+# =============================================================================
+# Provider base class
+# =============================================================================
+
+class LLMProvider:
+    """
+    Base class for a text completion backend.
+
+    Subclasses implement _create_client() and complete(). The SDK client is
+    created on first access and reused by every subsequent request.
+    """
+
+    name: str = ""
+    display_name: str = ""
+
+    def __init__(self):
+        self._client = None
+
+    @property
+    def client(self):
+        """Lazily created, process-wide SDK client."""
+        if self._client is None:
+            self._client = self._create_client()
+        return self._client
+
+    def is_configured(self) -> bool:
+        """Whether credentials for this provider are present."""
+        raise NotImplementedError
+
+    def resolve_model(self, model: Optional[str] = None, use_onboarding_model: bool = False) -> str:
+        """Pick the model to call: explicit override, onboarding model, then default."""
+        raise NotImplementedError
+
+    def resolve_small_model(self) -> str:
+        """Model for small-tier tasks ({NAME}_SMALL_MODEL), falling back to the default model."""
+        return getattr(settings, f"{self.name}_small_model", "") or self.resolve_model()
+
+    def _create_client(self):
+        raise NotImplementedError
+
+    async def complete(
+        self,
+        system_prompt: str,
+        user_message: str,
+        model: str,
+        temperature: float = 0.7,
+        conversation_history: Optional[List[Dict[str, str]]] = None,
+        image_attachments: Optional[List[Dict[str, Any]]] = None,
+        cacheable_prefix: Optional[str] = None,
+        response_schema: Optional[ResponseSchema] = None
+    ) -> Tuple[str, Dict[str, Any]]:
+        """
+        Run a single completion.
+
+        cacheable_prefix, if given, is the leading part of system_prompt that is
+        identical across requests (static instructions + user profile). Providers
+        mark it for prompt caching where the API supports explicit breakpoints;
+        others rely on automatic prefix caching.
+
+        response_schema, if given, requests provider-native structured output
+        for models that support it (see supports_structured_output); the usage
+        dict then carries "structured_output": True. Otherwise it is ignored
+        and the caller parses the text as before.
+
+        Returns:
+            Tuple of (response_text, token_usage_dict)
+        """
+        raise NotImplementedError
+
+    def supports_structured_output(self, model: str) -> bool:
+        """Whether the provider can constrain this model's output to a JSON schema."""
+        return False
+
+    def structured_schema(self, model: str, response_schema: Optional[ResponseSchema]) -> Optional[ResponseSchema]:
+        """response_schema if it can be enforced for this model, else None."""
+        if response_schema is not None and self.supports_structured_output(model):
+            return response_schema
+        return None
+
+    async def stream(
+        self,
+        system_prompt: str,
+        user_message: str,
+        model: str,
+        temperature: float = 0.7,
+        conversation_history: Optional[List[Dict[str, str]]] = None,
+        image_attachments: Optional[List[Dict[str, Any]]] = None,
+        token_usage: Optional[Dict[str, Any]] = None,
+        cacheable_prefix: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        """
+        Stream a completion as text deltas.
+
+        token_usage, if given, is filled in once the stream is exhausted.
+        Providers without a streaming API yield the full completion once.
+        """
+        text, usage = await self.complete(
+            system_prompt, user_message, model, temperature, conversation_history, image_attachments, cacheable_prefix
+        )
+        if token_usage is not None:
+            token_usage.update(usage)
+        if text:
+            yield text
+
+    async def aclose(self):
+        """Release the underlying client's connection pool."""
+        client = self._client
+        self._client = None
+        if client is not None and hasattr(client, "close"):
+            await client.close()
+
+
+# =============================================================================
+# OpenAI-compatible providers (OpenAI, OpenRouter)
+# =============================================================================
+
+def build_openai_messages(
+    system_prompt: str,
+    user_message: str,
+    conversation_history: Optional[List[Dict[str, str]]] = None,
+    image_attachments: Optional[List[Dict[str, Any]]] = None,
+    cacheable_prefix: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """
+    Build a chat.completions messages array with optional vision content.
+
+    With cacheable_prefix the system message is sent as content parts with a
+    cache_control breakpoint (OpenRouter passes these through to Anthropic and
+    Gemini). Without it the system message is a plain string, which OpenAI
+    caches automatically by prefix.
+    """
+    system_blocks = cached_system_blocks(system_prompt, cacheable_prefix)
+    messages = [{"role": "system", "content": system_blocks or system_prompt}]
+
+    if conversation_history:
+        for msg in conversation_history:
+            # Ensure role is valid (user or assistant)
+            role = msg.get("role", "user")
+            if role not in ["user", "assistant"]:
+                role = "user"
+            messages.append({
+                "role": role,
+                "content": msg.get("content", "")
+            })
+
+    if image_attachments:
+        # Use multimodal content format for vision
+        user_content = [{"type": "text", "text": user_message}]
+        for img in image_attachments:
+            user_content.append({
+                "type": "image_url",
+                "image_url": {
+                    "url": f"data:{img['type']};base64,{img['data']}",
+                    "detail": "high"
+                }
+            })
+        messages.append({"role": "user", "content": user_content})
+    else:
+        messages.append({"role": "user", "content": user_message})
+
+    return messages
+
+
+class OpenAIProvider(LLMProvider):
+    """OpenAI chat completions via AsyncOpenAI."""
+
+    name = "openai"
+    display_name = "OpenAI"
+
+    def is_configured(self) -> bool:
+        return bool(settings.openai_api_key)
+
+    def resolve_model(self, model: Optional[str] = None, use_onboarding_model: bool = False) -> str:
+        if model:
+            return model
+        if use_onboarding_model and settings.openai_onboarding_model:
+            return settings.openai_onboarding_model
+        return settings.openai_model
+
+    def _create_client(self):
+        return AsyncOpenAI(
+            api_key=settings.openai_api_key,
+            timeout=settings.ai_request_timeout_seconds,
+            max_retries=settings.ai_sdk_max_retries
+        )
+
+    async def complete(
+        self,
+        system_prompt: str,
+        user_message: str,
+        model: str,
+        temperature: float = 0.7,
+        conversation_history: Optional[List[Dict[str, str]]] = None,
+        image_attachments: Optional[List[Dict[str, Any]]] = None,
+        cacheable_prefix: Optional[str] = None,
+        response_schema: Optional[ResponseSchema] = None
+    ) -> Tuple[str, Dict[str, Any]]:
+        messages = build_openai_messages(
+            system_prompt, user_message, conversation_history, image_attachments,
+            cacheable_prefix if self.uses_cache_control(model) else None
+        )
+        if image_attachments:
+            logger.debug(f"{self.display_name} ({model}): Processing {len(image_attachments)} image(s) for vision analysis")
+
+        structured = self.structured_schema(model, response_schema)
+        extra = {"response_format": structured.openai_response_format()} if structured else {}
+        response = await self.client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            **extra
+        )
+
+        usage = self._extract_usage(response.usage, model)
+        if structured:
+            usage["structured_output"] = True
+        return response.choices[0].message.content or "", usage
+
+    async def stream(
+        self,
+        system_prompt: str,
+        user_message: str,
+        model: str,
+        temperature: float = 0.7,
+        conversation_history: Optional[List[Dict[str, str]]] = None,
+        image_attachments: Optional[List[Dict[str, Any]]] = None,
+        token_usage: Optional[Dict[str, Any]] = None,
+        cacheable_prefix: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        messages = build_openai_messages(
+            system_prompt, user_message, conversation_history, image_attachments,
+            cacheable_prefix if self.uses_cache_control(model) else None
+        )
+
+        response = await self.client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            stream=True,
+            stream_options={"include_usage": True}
+        )
+
+        usage = None
+        try:
+            async for chunk in response:
+                # The final chunk carries usage and has no choices
+                if chunk.usage:
+                    usage = chunk.usage
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            await response.close()
+
+        if token_usage is not None:
+            token_usage.update(self._extract_usage(usage, model))
+
+    def uses_cache_control(self, model: str) -> bool:
+        """OpenAI caches prompt prefixes automatically; no breakpoints needed."""
+        return False
+
+    def supports_structured_output(self, model: str) -> bool:
+        """json_schema response_format: gpt-4o (2024-08-06 and later), gpt-4.1+, o-series."""
+        return model.startswith(OPENAI_STRUCTURED_OUTPUT_PREFIXES) and model != "gpt-4o-2024-05-13"
+
+    def _extract_usage(self, usage: Any, model: str) -> Dict[str, Any]:
+        """Normalise chat.completions usage, including cached prompt tokens."""
+        if not usage:
+            return empty_token_usage(model, self.name)
+        details = getattr(usage, "prompt_tokens_details", None)
+        return {
+            "input_tokens": usage.prompt_tokens or 0,
+            "output_tokens": usage.completion_tokens or 0,
+            "total_tokens": usage.total_tokens or 0,
+            "cached_tokens": (getattr(details, "cached_tokens", 0) or 0) if details else 0,
+            "model": model,
+            "provider": self.name
+        }
+
+
+class OpenRouterProvider(OpenAIProvider):
+    """OpenRouter (OpenAI-compatible API with a custom base URL)."""
+
+    name = "openrouter"
+    display_name = "OpenRouter"
+
+    def is_configured(self) -> bool:
+        return bool(settings.openrouter_api_key)
+
+    def resolve_model(self, model: Optional[str] = None, use_onboarding_model: bool = False) -> str:
+        if model:
+            return model
+        if use_onboarding_model and settings.openrouter_onboarding_model:
+            return settings.openrouter_onboarding_model
+        return settings.openrouter_model
+
+    def _create_client(self):
+        return AsyncOpenAI(
+            base_url=OPENROUTER_BASE_URL,
+            api_key=settings.openrouter_api_key,
+            default_headers={
+                "HTTP-Referer": settings.frontend_url,
+                "X-Title": "PostInAi"
+            },
+            timeout=settings.ai_request_timeout_seconds,
+            max_retries=settings.ai_sdk_max_retries
+        )
+
+    def uses_cache_control(self, model: str) -> bool:
+        """Anthropic and Gemini models on OpenRouter only cache at explicit breakpoints."""
+        return model.startswith(OPENROUTER_CACHE_CONTROL_PREFIXES)
+
+    def supports_structured_output(self, model: str) -> bool:
+        """
+        OpenRouter forwards response_format to models that support it and drops
+        it for the rest; those responses fail validation and use the legacy parser.
+        """
+        return True
+
+
+# =============================================================================
+# Anthropic Claude
+# =============================================================================
+
+class ClaudeProvider(LLMProvider):
+    """
+    Anthropic Claude via AsyncAnthropic.
+
+    Model naming verified: claude-haiku-4-5, claude-sonnet-4-5, claude-opus-4-5
+    """
+
+    name = "claude"
+    display_name = "Claude"
+
+    def is_configured(self) -> bool:
+        return bool(settings.claude_api_key)
+
+    def resolve_model(self, model: Optional[str] = None, use_onboarding_model: bool = False) -> str:
+        return model or settings.claude_model
+
+    def _create_client(self):
+        return AsyncAnthropic(
+            api_key=settings.claude_api_key,
+            timeout=settings.ai_request_timeout_seconds,
+            max_retries=settings.ai_sdk_max_retries
+        )
+
+    @staticmethod
+    def build_messages(
+        user_message: str,
+        conversation_history: Optional[List[Dict[str, str]]] = None,
+        image_attachments: Optional[List[Dict[str, Any]]] = None
+    ) -> List[Dict[str, Any]]:
+        """Build a Messages API payload (system prompt is passed separately)."""
+        messages = []
+
+        if conversation_history:
+            for msg in conversation_history:
+                role = msg.get("role", "user")
+                if role in ["user", "assistant"]:
+                    messages.append({"role": role, "content": msg.get("content", "")})
+
+        current_content = []
+        if image_attachments:
+            for img in image_attachments:
+                current_content.append({
+                    "type": "image",
+                    "source": {
+                        "type": "base64",
+                        "media_type": img['type'],
+                        "data": img['data']
+                    }
+                })
+        current_content.append({"type": "text", "text": user_message})
+
+        messages.append({
+            "role": "user",
+            "content": current_content if len(current_content) > 1 else user_message
+        })
+        return messages
+
+    async def complete(
+        self,
+        system_prompt: str,
+        user_message: str,
+        model: str,
+        temperature: float = 0.7,
+        conversation_history: Optional[List[Dict[str, str]]] = None,
+        image_attachments: Optional[List[Dict[str, Any]]] = None,
+        cacheable_prefix: Optional[str] = None,
+        response_schema: Optional[ResponseSchema] = None
+    ) -> Tuple[str, Dict[str, Any]]:
+        messages = self.build_messages(user_message, conversation_history, image_attachments)
+        if image_attachments:
+            logger.debug(f"Claude: Processing {len(image_attachments)} image(s) for vision analysis")
+
+        structured = self.structured_schema(model, response_schema)
+        extra = {}
+        if structured:
+            # A single forced tool: its input is the structured response
+            extra = {"tools": [structured.claude_tool()], "tool_choice": {"type": "tool", "name": structured.name}}
+        response = await self.client.messages.create(
+            model=model,
+            max_tokens=CLAUDE_MAX_TOKENS,
+            temperature=temperature,
+            system=cached_system_blocks(system_prompt, cacheable_prefix) or system_prompt,
+            messages=messages,
+            **extra
+        )
+
+        usage = self._extract_usage(response.usage, model)
+        tool_input = next((block.input for block in response.content if block.type == "tool_use"), None) if structured else None
+        if tool_input is not None:
+            usage["structured_output"] = True
+            return json.dumps(tool_input, ensure_ascii=False), usage
+        response_text = "".join(block.text for block in response.content if block.type == "text")
+        return response_text, usage
+
+    async def stream(
+        self,
+        system_prompt: str,
+        user_message: str,
+        model: str,
+        temperature: float = 0.7,
+        conversation_history: Optional[List[Dict[str, str]]] = None,
+        image_attachments: Optional[List[Dict[str, Any]]] = None,
+        token_usage: Optional[Dict[str, Any]] = None,
+        cacheable_prefix: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        messages = self.build_messages(user_message, conversation_history, image_attachments)
+
+        async with self.client.messages.stream(
+            model=model,
+            max_tokens=CLAUDE_MAX_TOKENS,
+            temperature=temperature,
+            system=cached_system_blocks(system_prompt, cacheable_prefix) or system_prompt,
+            messages=messages
+        ) as response_stream:
+            async for text in response_stream.text_stream:
+                yield text
+            final_message = await response_stream.get_final_message()
+
+        if token_usage is not None:
+            token_usage.update(self._extract_usage(final_message.usage, model))
+
+    def supports_structured_output(self, model: str) -> bool:
+        """Every Claude 3+ model supports forced tool use."""
+        return True
+
+    def _extract_usage(self, usage: Any, model: str) -> Dict[str, Any]:
+        """
+        Normalise Messages API usage. Anthropic reports cache reads/writes
+        separately from input_tokens; they are folded back in so input_tokens
+        is the full prompt size, as for the other providers.
+        """
+        cache_read = getattr(usage, "cache_read_input_tokens", 0) or 0
+        cache_write = getattr(usage, "cache_creation_input_tokens", 0) or 0
+        input_tokens = usage.input_tokens + cache_read + cache_write
+        return {
+            "input_tokens": input_tokens,
+            "output_tokens": usage.output_tokens,
+            "total_tokens": input_tokens + usage.output_tokens,
+            "cached_tokens": cache_read,
+            "cache_write_tokens": cache_write,
+            "model": model,
+            "provider": self.name
+        }
+
+
+# =============================================================================
+# Google Gemini
+# =============================================================================
+
+class GeminiProvider(LLMProvider):
+    """
+    Google Gemini via google-generativeai.
+
+    Uses generate_content_async; falls back to the bounded executor when the
+    installed SDK only exposes the blocking generate_content. Gemini 2.5 models
+    cache repeated prompt prefixes implicitly, so the system prompt is kept first.
+    NOTE: Google Search grounding REMOVED - web search is handled by Brave API
+    """
+
+    name = "gemini"
+    display_name = "Gemini"
+
+    def is_configured(self) -> bool:
+        return bool(settings.gemini_api_key)
+
+    def resolve_model(self, model: Optional[str] = None, use_onboarding_model: bool = False) -> str:
+        if model:
+            return model
+        if use_onboarding_model and settings.gemini_onboarding_model:
+            return settings.gemini_onboarding_model
+        return settings.gemini_model
+
+    def _create_client(self):
+        # genai keeps its client in module state; configure it once per process
+        genai.configure(api_key=settings.gemini_api_key)
+        return genai
+
+    async def aclose(self):
+        self._client = None
+
+    @staticmethod
+    def build_contents(
+        system_prompt: str,
+        user_message: str,
+        conversation_history: Optional[List[Dict[str, str]]] = None,
+        image_attachments: Optional[List[Dict[str, Any]]] = None
+    ) -> Any:
+        """Flatten system prompt, history and user message into Gemini contents."""
+        history_text = ""
+        if conversation_history:
+            history_parts = []
+            for msg in conversation_history:
+                role = msg.get("role", "user")
+                content = msg.get("content", "")
+                if role == "user":
+                    history_parts.append(f"User: {content}")
+                elif role == "assistant":
+                    history_parts.append(f"Assistant: {content}")
+            if history_parts:
+                history_text = "\n\n".join(history_parts) + "\n\n"
+
+        combined_prompt = f"{system_prompt}\n\n{history_text}User: {user_message}"
+
+        if not image_attachments:
+            return combined_prompt
+
+        contents = [combined_prompt]
+        for img in image_attachments:
+            contents.append({
+                'mime_type': img['type'],
+                'data': base64.b64decode(img['data'])
+            })
+        return contents
+
+    async def complete(
+        self,
+        system_prompt: str,
+        user_message: str,
+        model: str,
+        temperature: float = 0.7,
+        conversation_history: Optional[List[Dict[str, str]]] = None,
+        image_attachments: Optional[List[Dict[str, Any]]] = None,
+        cacheable_prefix: Optional[str] = None,
+        response_schema: Optional[ResponseSchema] = None
+    ) -> Tuple[str, Dict[str, Any]]:
+        contents = self.build_contents(system_prompt, user_message, conversation_history, image_attachments)
+        if image_attachments:
+            logger.debug(f"Gemini: Processing {len(image_attachments)} image(s) for vision analysis")
+
+        generative_model = self.client.GenerativeModel(model)
+        structured = self.structured_schema(model, response_schema)
+        config = {"temperature": temperature}
+        if structured:
+            # JSON mode, constrained to the schema when Gemini's schema subset can express it
+            config["response_mime_type"] = "application/json"
+            gemini_schema = structured.gemini_schema()
+            if gemini_schema:
+                config["response_schema"] = gemini_schema
+        generation_config = self.client.types.GenerationConfig(**config)
+
+        if hasattr(generative_model, "generate_content_async"):
+            response = await generative_model.generate_content_async(contents, generation_config=generation_config)
+        else:
+            response = await run_blocking(generative_model.generate_content, contents, generation_config=generation_config)
+
+        usage = self._extract_usage(response, model)
+        if structured:
+            usage["structured_output"] = True
+        return response.text, usage
+
+    async def stream(
+        self,
+        system_prompt: str,
+        user_message: str,
+        model: str,
+        temperature: float = 0.7,
+        conversation_history: Optional[List[Dict[str, str]]] = None,
+        image_attachments: Optional[List[Dict[str, Any]]] = None,
+        token_usage: Optional[Dict[str, Any]] = None,
+        cacheable_prefix: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        generative_model = self.client.GenerativeModel(model)
+        if not hasattr(generative_model, "generate_content_async"):
+            async for text in super().stream(
+                system_prompt, user_message, model, temperature,
+                conversation_history, image_attachments, token_usage, cacheable_prefix
+            ):
+                yield text
+            return
+
+        contents = self.build_contents(system_prompt, user_message, conversation_history, image_attachments)
+        response = await generative_model.generate_content_async(
+            contents,
+            generation_config=self.client.types.GenerationConfig(temperature=temperature),
+            stream=True
+        )
+        async for chunk in response:
+            text = getattr(chunk, "text", "")
+            if text:
+                yield text
+
+        if token_usage is not None:
+            token_usage.update(self._extract_usage(response, model))
+
+    def supports_structured_output(self, model: str) -> bool:
+        return model.startswith(GEMINI_STRUCTURED_OUTPUT_PREFIXES)
+
+    def _extract_usage(self, response: Any, model: str) -> Dict[str, Any]:
+        """Read token counts from a Gemini response's usage_metadata."""
+        usage_metadata = getattr(response, 'usage_metadata', None)
+        if not usage_metadata:
+            return empty_token_usage(model, self.name)
+        return {
+            "input_tokens": getattr(usage_metadata, 'prompt_token_count', 0) or 0,
+            "output_tokens": getattr(usage_metadata, 'candidates_token_count', 0) or 0,
+            "total_tokens": getattr(usage_metadata, 'total_token_count', 0) or 0,
+            "cached_tokens": getattr(usage_metadata, 'cached_content_token_count', 0) or 0,
+            "model": model,
+            "provider": self.name
+        }
+
+
+# =============================================================================
+# Offline providers (load testing and CI without network access)
+# =============================================================================
+
+def approximate_tokens(text: Optional[str]) -> int:
+    """Rough token count (~4 characters per token) for providers without a tokenizer."""
+    return max(1, len(text) // CHARS_PER_TOKEN) if text else 0
+
+
+def _text_chunks(text: str, size: int = 64) -> List[str]:
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+class MockProvider(LLMProvider):
+    """
+    Network-free provider that answers with schema-valid canned responses
+    (see mock_llm_responses) after a simulated latency.
+
+    Latency and the size of free-form text are drawn from normal distributions
+    configured by LLM_MOCK_LATENCY_MS_* and LLM_MOCK_OUTPUT_TOKENS_*. Set
+    LLM_MOCK_SEED for reproducible content and timings across sequential calls.
+    """
+
+    name = "mock"
+    display_name = "Mock"
+
+    def __init__(self, seed: Optional[int] = None):
+        super().__init__()
+        self.rng = random.Random(settings.llm_mock_seed if seed is None else seed)
+
+    def is_configured(self) -> bool:
+        return True
+
+    def resolve_model(self, model: Optional[str] = None, use_onboarding_model: bool = False) -> str:
+        return model or ("mock-onboarding" if use_onboarding_model else "mock-default")
+
+    def resolve_small_model(self) -> str:
+        return "mock-small"
+
+    def supports_structured_output(self, model: str) -> bool:
+        return True
+
+    @staticmethod
+    def fit_schema(text: str, response_schema: ResponseSchema) -> str:
+        """
+        Canned responses match the prompts' JSON formats; list responses are
+        wrapped in the schema's single array property ({"ideas": [...]}).
+        """
+        properties = response_schema.json_schema.get("properties", {})
+        if len(properties) != 1:
+            return text
+        (name, prop), = properties.items()
+        try:
+            data = json.loads(text)
+        except json.JSONDecodeError:
+            return text
+        if prop.get("type") == "array" and isinstance(data, list):
+            return json.dumps({name: data}, ensure_ascii=False)
+        return text
+
+    def _create_client(self):
+        return None
+
+    def sample_latency_seconds(self) -> float:
+        latency_ms = self.rng.gauss(settings.llm_mock_latency_ms_mean, settings.llm_mock_latency_ms_stddev)
+        return max(0.0, latency_ms) / 1000
+
+    def sample_output_tokens(self) -> int:
+        return max(1, int(self.rng.gauss(settings.llm_mock_output_tokens_mean, settings.llm_mock_output_tokens_stddev)))
+
+    def generate(
+        self,
+        system_prompt: str,
+        user_message: str,
+        model: str,
+        conversation_history: Optional[List[Dict[str, str]]] = None
+    ) -> Tuple[str, Dict[str, Any]]:
+        """Build the response and its token usage without sleeping."""
+        scenario = detect_scenario(system_prompt, user_message)
+        text = build_response(scenario, self.rng, self.sample_output_tokens(), user_message)
+        history_text = "".join(str(message.get("content", "")) for message in conversation_history or [])
+        usage = empty_token_usage(model, self.name)
+        usage["input_tokens"] = approximate_tokens(system_prompt) + approximate_tokens(user_message) + approximate_tokens(history_text)
+        usage["output_tokens"] = approximate_tokens(text)
+        usage["total_tokens"] = usage["input_tokens"] + usage["output_tokens"]
+        return text, usage
+
+    async def complete(
+        self,
+        system_prompt: str,
+        user_message: str,
+        model: str,
+        temperature: float = 0.7,
+        conversation_history: Optional[List[Dict[str, str]]] = None,
+        image_attachments: Optional[List[Dict[str, Any]]] = None,
+        cacheable_prefix: Optional[str] = None,
+        response_schema: Optional[ResponseSchema] = None
+    ) -> Tuple[str, Dict[str, Any]]:
+        latency = self.sample_latency_seconds()
+        text, usage = self.generate(system_prompt, user_message, model, conversation_history)
+        if response_schema is not None:
+            text = self.fit_schema(text, response_schema)
+            usage["structured_output"] = True
+        await asyncio.sleep(latency)
+        return text, usage
+
+    async def stream(
+        self,
+        system_prompt: str,
+        user_message: str,
+        model: str,
+        temperature: float = 0.7,
+        conversation_history: Optional[List[Dict[str, str]]] = None,
+        image_attachments: Optional[List[Dict[str, Any]]] = None,
+        token_usage: Optional[Dict[str, Any]] = None,
+        cacheable_prefix: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        # The sampled latency is spread evenly across the chunks
+        latency = self.sample_latency_seconds()
+        text, usage = self.generate(system_prompt, user_message, model, conversation_history)
+        chunks = _text_chunks(text)
+        for chunk in chunks:
+            await asyncio.sleep(latency / len(chunks))
+            yield chunk
+        if token_usage is not None:
+            token_usage.update(usage)
+
+
+class ReplayMissError(ValueError):
+    """
+    Replay mode has no recording for a request. A ValueError so it is not
+    counted as a dependency failure by the circuit breakers.
+    """
+
+
+def recording_key(
+    system_prompt: str,
+    user_message: str,
+    model: str,
+    temperature: float,
+    conversation_history: Optional[List[Dict[str, str]]] = None,
+    image_attachments: Optional[List[Dict[str, Any]]] = None,
+    response_schema_name: Optional[str] = None
+) -> str:
+    """Stable hash of everything sent upstream; attachments contribute their digests."""
+    attachments = [
+        hashlib.sha256(json.dumps(attachment, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+        for attachment in image_attachments or []
+    ]
+    fields = [system_prompt, user_message, model, round(float(temperature), 3), conversation_history or [], attachments]
+    if response_schema_name:
+        # Only structured requests hash the schema, so earlier recordings keep their keys
+        fields.append(response_schema_name)
+    payload = json.dumps(
+        fields,
+        ensure_ascii=False,
+        separators=(",", ":"),
+        default=str
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class RecordReplayProvider(LLMProvider):
+    """
+    Records real request/response pairs to disk and replays them.
+
+    record: every call goes to LLM_REPLAY_UPSTREAM and the response is appended
+            to <LLM_REPLAY_DIR>/<key[:2]>/<key>.json
+    replay: calls are answered from those files without network. A request
+            recorded several times replays its responses in recorded order,
+            cycling, so a replayed run is deterministic.
+
+    Model names resolve through the upstream provider in both modes, so keys
+    recorded against a model match on replay. Prompts reach providers after
+    ai_service's PII redaction, but recordings still hold them verbatim: record
+    against test accounts only.
+    """
+
+    name = "replay"
+    display_name = "Record/Replay"
+
+    def __init__(self, mode: Optional[str] = None, directory: Optional[str] = None, upstream: Optional[str] = None):
+        super().__init__()
+        self.mode = (mode or settings.llm_replay_mode).lower()
+        self.directory = Path(directory or settings.llm_replay_dir)
+        self.upstream_name = (upstream or settings.llm_replay_upstream).lower()
+        if self.upstream_name == self.name:
+            raise ValueError("LLM_REPLAY_UPSTREAM cannot be the replay provider itself")
+        self._recordings: Dict[str, Dict[str, Any]] = {}
+        self._replay_counts: Dict[str, int] = {}
+        self._write_lock = asyncio.Lock()
+        self.recorded = 0
+        self.replayed = 0
+        self.misses = 0
+
+    @property
+    def upstream(self) -> LLMProvider:
+        return get_llm_provider(self.upstream_name)
+
+    def is_configured(self) -> bool:
+        return self.upstream.is_configured() if self.mode == "record" else True
+
+    def resolve_model(self, model: Optional[str] = None, use_onboarding_model: bool = False) -> str:
+        return self.upstream.resolve_model(model, use_onboarding_model)
+
+    def resolve_small_model(self) -> str:
+        return self.upstream.resolve_small_model()
+
+    def supports_structured_output(self, model: str) -> bool:
+        return self.upstream.supports_structured_output(model)
+
+    def _create_client(self):
+        return None
+
+    def path_for(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.json"
+
+    def _read(self, key: str) -> Optional[Dict[str, Any]]:
+        path = self.path_for(key)
+        if not path.exists():
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _write(self, key: str, recording: Dict[str, Any]):
+        path = self.path_for(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(recording, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+
+    async def _load(self, key: str) -> Optional[Dict[str, Any]]:
+        recording = self._recordings.get(key)
+        if recording is None:
+            recording = await run_blocking(self._read, key)
+            if recording is not None:
+                self._recordings[key] = recording
+        return recording
+
+    async def _record(self, key: str, request: Dict[str, Any], text: str, usage: Dict[str, Any], latency_ms: float):
+        async with self._write_lock:
+            recording = await self._load(key) or {"key": key, "request": request, "responses": []}
+            recording["responses"].append({"text": text, "usage": usage, "latency_ms": round(latency_ms, 1)})
+            self._recordings[key] = recording
+            await run_blocking(self._write, key, recording)
+        self.recorded += 1
+
+    async def _replay(
+        self,
+        key: str,
+        system_prompt: str,
+        user_message: str,
+        model: str,
+        temperature: float,
+        conversation_history: Optional[List[Dict[str, str]]],
+        response_schema: Optional[ResponseSchema] = None
+    ) -> Tuple[str, Dict[str, Any]]:
+        recording = await self._load(key)
+        if not recording or not recording.get("responses"):
+            self.misses += 1
+            if settings.llm_replay_on_miss == "mock":
+                logger.info(f"No recording for {key[:12]}; answering from the mock provider")
+                return await get_llm_provider("mock").complete(
+                    system_prompt, user_message, model, temperature, conversation_history,
+                    response_schema=response_schema
+                )
+            raise ReplayMissError(f"No recording for request {key[:12]} in {self.directory}")
+
+        responses = recording["responses"]
+        index = self._replay_counts.get(key, 0)
+        self._replay_counts[key] = index + 1
+        response = responses[index % len(responses)]
+        self.replayed += 1
+        if settings.llm_replay_latency:
+            await asyncio.sleep(response.get("latency_ms", 0) / 1000)
+        return response["text"], dict(response["usage"])
+
+    @staticmethod
+    def _request_summary(system_prompt, user_message, model, temperature, conversation_history, image_attachments) -> Dict[str, Any]:
+        return {
+            "system_prompt": system_prompt,
+            "user_message": user_message,
+            "model": model,
+            "temperature": temperature,
+            "conversation_history": conversation_history or [],
+            "image_attachments": len(image_attachments or []),
+        }
+
+    async def complete(
+        self,
+        system_prompt: str,
+        user_message: str,
+        model: str,
+        temperature: float = 0.7,
+        conversation_history: Optional[List[Dict[str, str]]] = None,
+        image_attachments: Optional[List[Dict[str, Any]]] = None,
+        cacheable_prefix: Optional[str] = None,
+        response_schema: Optional[ResponseSchema] = None
+    ) -> Tuple[str, Dict[str, Any]]:
+        structured = self.structured_schema(model, response_schema)
+        key = recording_key(
+            system_prompt, user_message, model, temperature, conversation_history, image_attachments,
+            structured.name if structured else None
+        )
+        if self.mode != "record":
+            return await self._replay(key, system_prompt, user_message, model, temperature, conversation_history, structured)
+
+        started_at = time.perf_counter()
+        text, usage = await self.upstream.complete(
+            system_prompt, user_message, model, temperature, conversation_history, image_attachments, cacheable_prefix,
+            structured
+        )
+        request = self._request_summary(system_prompt, user_message, model, temperature, conversation_history, image_attachments)
+        await self._record(key, request, text, usage, (time.perf_counter() - started_at) * 1000)
+        return text, usage
+
+    async def stream(
+        self,
+        system_prompt: str,
+        user_message: str,
+        model: str,
+        temperature: float = 0.7,
+        conversation_history: Optional[List[Dict[str, str]]] = None,
+        image_attachments: Optional[List[Dict[str, Any]]] = None,
+        token_usage: Optional[Dict[str, Any]] = None,
+        cacheable_prefix: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        key = recording_key(system_prompt, user_message, model, temperature, conversation_history, image_attachments)
+        if self.mode != "record":
+            text, usage = await self._replay(key, system_prompt, user_message, model, temperature, conversation_history)
+            for chunk in _text_chunks(text):
+                yield chunk
+            if token_usage is not None:
+                token_usage.update(usage)
+            return
+
+        # Streams recorded only when consumed to the end
+        started_at = time.perf_counter()
+        usage: Dict[str, Any] = {}
+        parts: List[str] = []
+        async for delta in self.upstream.stream(
+            system_prompt, user_message, model, temperature, conversation_history, image_attachments,
+            token_usage=usage, cacheable_prefix=cacheable_prefix
+        ):
+            parts.append(delta)
+            yield delta
+        request = self._request_summary(system_prompt, user_message, model, temperature, conversation_history, image_attachments)
+        await self._record(key, request, "".join(parts), usage, (time.perf_counter() - started_at) * 1000)
+        if token_usage is not None:
+            token_usage.update(usage)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "directory": str(self.directory),
+            "upstream": self.upstream_name,
+            "recorded": self.recorded,
+            "replayed": self.replayed,
+            "misses": self.misses,
+        }
+
+
+# =============================================================================
+# Process-wide provider registry
+# =============================================================================
+
+PROVIDER_CLASSES = {
+    "openrouter": OpenRouterProvider,
+    "openai": OpenAIProvider,
+    "gemini": GeminiProvider,
+    "claude": ClaudeProvider,
+    "mock": MockProvider,
+    "replay": RecordReplayProvider,
+}
+
+_providers: Dict[str, LLMProvider] = {}
+
+
+def get_llm_provider(name: str) -> LLMProvider:
+    """
+    Get the shared provider instance for a provider name.
+
+    Raises:
+        KeyError: If the provider name is unknown
+    """
+    name = name.lower()
+    provider = _providers.get(name)
+    if provider is None:
+        provider = PROVIDER_CLASSES[name]()
+        _providers[name] = provider
+    return provider
+
+
+async def close_llm_providers():
+    """Close all provider clients (called on application shutdown)."""
+    for provider in list(_providers.values()):
+        try:
+            await provider.aclose()
+        except Exception as e:
+            logger.warning(f"Error closing {provider.name} client: {type(e).__name__}")
+    _providers.clear()
+
+    global _blocking_executor
+    if _blocking_executor is not None:
+        _blocking_executor.shutdown(wait=False)
+        _blocking_executor = None
@@ -0,0 +1,332 @@
+"""
+LLM Routing Engine
+
+Routes completions across the configured providers (openrouter, openai,
+gemini, claude) instead of relying on a single backend:
+
+- Rolling latency (p50/p95) and error-rate windows per provider and model
+- Automatic failover to the next configured provider on timeouts, 429s and 5xx
+- Unhealthy routes (high recent error rate) are demoted behind healthy ones
+- Optional hedged requests: if the primary has not answered within its own
+  latency percentile, a second request is sent to the next route and the
+  first successful answer wins
+
+The primary route is settings.ai_provider; fallbacks come from
+settings.ai_fallback_providers (comma-separated, tried in order).
+"""
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from ..config import get_settings
+from .llm_providers import LLMProvider
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# HTTP statuses worth retrying on another provider
+RETRYABLE_STATUS_CODES = {408, 409, 425, 429}
+
+
+@dataclass(frozen=True)
+class Route:
+    """A provider plus the model to call on it."""
+    provider: LLMProvider
+    model: str
+
+    @property
+    def key(self) -> str:
+        return f"{self.provider.name}:{self.model}"
+
+
+@dataclass
+class RouterConfig:
+    """Configuration for routing, health tracking and hedging."""
+    window_size: int = 200  # Samples kept per route
+    window_seconds: float = 600.0  # Samples older than this are ignored
+    min_samples: int = 10  # Samples needed before percentiles/error rates are trusted
+    unhealthy_error_rate: float = 0.5  # Routes above this are tried last
+    hedge_enabled: bool = False
+    hedge_percentile: float = 95.0
+    hedge_min_delay_seconds: float = 2.0
+
+    @classmethod
+    def from_settings(cls) -> "RouterConfig":
+        return cls(
+            window_size=settings.ai_router_window_size,
+            window_seconds=settings.ai_router_window_seconds,
+            min_samples=settings.ai_router_min_samples,
+            unhealthy_error_rate=settings.ai_router_unhealthy_error_rate,
+            hedge_enabled=settings.ai_hedge_enabled,
+            hedge_percentile=settings.ai_hedge_percentile,
+            hedge_min_delay_seconds=settings.ai_hedge_min_delay_seconds,
+        )
+
+
+def is_retryable_error(error: BaseException) -> bool:
+    """
+    Whether an error should move the request to another provider.
+
+    Input problems (ValueError, 4xx other than throttling/timeouts) would fail
+    the same way everywhere and are raised immediately.
+    """
+    if isinstance(error, ValueError):
+        return False
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    if status is None and isinstance(getattr(error, "code", None), int):
+        status = error.code  # google.api_core exceptions
+    if status is None:
+        # Timeouts, connection resets and unknown SDK errors
+        return True
+    return status in RETRYABLE_STATUS_CODES or status >= 500
+
+
+def _percentile(sorted_values: List[float], percentile: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(percentile / 100 * (len(sorted_values) - 1)))))
+    return sorted_values[index]
+
+
+class RouteStats:
+    """Rolling window of (timestamp, latency_ms, ok) samples for one route."""
+
+    def __init__(self, window_size: int, window_seconds: float):
+        self.window_seconds = window_seconds
+        self._samples: Deque[Tuple[float, float, bool]] = deque(maxlen=window_size)
+        self.hedges_fired = 0
+        self.hedges_won = 0
+        self.failovers = 0
+
+    def record(self, latency_ms: float, ok: bool):
+        self._samples.append((time.time(), latency_ms, ok))
+
+    def _recent(self) -> List[Tuple[float, float, bool]]:
+        cutoff = time.time() - self.window_seconds
+        return [sample for sample in self._samples if sample[0] >= cutoff]
+
+    def snapshot(self) -> Dict[str, Any]:
+        recent = self._recent()
+        latencies = sorted(latency for _, latency, ok in recent if ok)
+        errors = sum(1 for _, _, ok in recent if not ok)
+        return {
+            "samples": len(recent),
+            "errors": errors,
+            "error_rate": round(errors / len(recent), 3) if recent else 0.0,
+            "p50_ms": round(_percentile(latencies, 50), 1),
+            "p95_ms": round(_percentile(latencies, 95), 1),
+            "hedges_fired": self.hedges_fired,
+            "hedges_won": self.hedges_won,
+            "failovers": self.failovers,
+        }
+
+    def error_rate(self, min_samples: int) -> Optional[float]:
+        recent = self._recent()
+        if len(recent) < min_samples:
+            return None
+        return sum(1 for _, _, ok in recent if not ok) / len(recent)
+
+    def latency_percentile(self, percentile: float, min_samples: int) -> Optional[float]:
+        latencies = sorted(latency for _, latency, ok in self._recent() if ok)
+        if len(latencies) < min_samples:
+            return None
+        return _percentile(latencies, percentile)
+
+
+class LLMRouter:
+    """
+    Orders candidate routes by health and runs a call across them with
+    failover and optional hedging.
+    """
+
+    def __init__(self, config: Optional[RouterConfig] = None):
+        self.config = config or RouterConfig.from_settings()
+        self._stats: Dict[str, RouteStats] = {}
+        self._lock = threading.Lock()
+
+    def stats_for(self, route: Route) -> RouteStats:
+        stats = self._stats.get(route.key)
+        if stats is None:
+            with self._lock:
+                stats = self._stats.setdefault(
+                    route.key, RouteStats(self.config.window_size, self.config.window_seconds)
+                )
+        return stats
+
+    def order_routes(self, routes: List[Route]) -> List[Route]:
+        """Keep configured order, but move routes with a high error rate to the end."""
+        healthy, unhealthy = [], []
+        for route in routes:
+            error_rate = self.stats_for(route).error_rate(self.config.min_samples)
+            if error_rate is not None and error_rate >= self.config.unhealthy_error_rate:
+                unhealthy.append(route)
+            else:
+                healthy.append(route)
+        return healthy + unhealthy
+
+    def hedge_delay(self, route: Route) -> Optional[float]:
+        """Seconds to wait on a route before hedging, or None if hedging is off/untrained."""
+        if not self.config.hedge_enabled:
+            return None
+        latency_ms = self.stats_for(route).latency_percentile(self.config.hedge_percentile, self.config.min_samples)
+        if latency_ms is None:
+            return None
+        return max(self.config.hedge_min_delay_seconds, latency_ms / 1000)
+
+    async def _attempt(self, route: Route, call: Callable[[Route], Awaitable[Any]]) -> Any:
+        """Run one call and record its latency/outcome (cancelled hedges are not recorded)."""
+        start = time.perf_counter()
+        try:
+            result = await call(route)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self.stats_for(route).record((time.perf_counter() - start) * 1000, ok=False)
+            raise
+        self.stats_for(route).record((time.perf_counter() - start) * 1000, ok=True)
+        return result
+
+    async def _attempt_with_hedge(
+        self,
+        primary: Route,
+        backup: Route,
+        delay: float,
+        call: Callable[[Route], Awaitable[Any]]
+    ) -> Any:
+        """
+        Start primary; start backup when primary exceeds `delay` or fails with a
+        retryable error. First success wins and the loser is cancelled.
+        """
+        primary_task = asyncio.create_task(self._attempt(primary, call))
+        tasks = {primary_task}
+        try:
+            await asyncio.wait(tasks, timeout=delay)
+            if primary_task.done():
+                error = primary_task.exception()
+                if error is None:
+                    return primary_task.result()
+                if not is_retryable_error(error):
+                    raise error
+                self.stats_for(primary).failovers += 1
+                logger.warning(f"LLM route {primary.key} failed ({type(error).__name__}); failing over to {backup.key}")
+                return await self._attempt(backup, call)
+
+            self.stats_for(primary).hedges_fired += 1
+            logger.info(f"LLM route {primary.key} exceeded {delay:.2f}s; hedging with {backup.key}")
+            backup_task = asyncio.create_task(self._attempt(backup, call))
+            tasks.add(backup_task)
+            last_error: Optional[BaseException] = None
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    error = task.exception()
+                    if error is None:
+                        if task is backup_task:
+                            self.stats_for(primary).hedges_won += 1
+                        return task.result()
+                    last_error = error
+            raise last_error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def run(self, routes: List[Route], call: Callable[[Route], Awaitable[Any]]) -> Any:
+        """
+        Run `call(route)` on the best available route, failing over down the list.
+
+        Raises the last error if every route fails, or the first non-retryable error.
+        """
+        if not routes:
+            raise ValueError("No LLM routes available")
+        ordered = self.order_routes(routes)
+        last_error: Optional[BaseException] = None
+        index = 0
+        while index < len(ordered):
+            route = ordered[index]
+            backup = ordered[index + 1] if index + 1 < len(ordered) else None
+            delay = self.hedge_delay(route) if backup is not None else None
+            try:
+                if delay is not None:
+                    return await self._attempt_with_hedge(route, backup, delay, call)
+                return await self._attempt(route, call)
+            except Exception as e:
+                if not is_retryable_error(e):
+                    raise
+                last_error = e
+                # A hedged pair has already tried both routes
+                index += 2 if delay is not None else 1
+                if index < len(ordered):
+                    self.stats_for(route).failovers += 1
+                    logger.warning(f"LLM route {route.key} failed ({type(e).__name__}); failing over to {ordered[index].key}")
+        raise last_error
+
+    async def stream(
+        self,
+        routes: List[Route],
+        stream_call: Callable[[Route], AsyncIterator[str]]
+    ) -> AsyncIterator[str]:
+        """
+        Stream from the best available route. Failover only happens before the
+        first delta; once text has been sent to the client the route is fixed.
+        """
+        if not routes:
+            raise ValueError("No LLM routes available")
+        ordered = self.order_routes(routes)
+        last_error: Optional[BaseException] = None
+        for position, route in enumerate(ordered):
+            start = time.perf_counter()
+            iterator = stream_call(route)
+            started = False
+            try:
+                async for delta in iterator:
+                    started = True
+                    yield delta
+                self.stats_for(route).record((time.perf_counter() - start) * 1000, ok=True)
+                return
+            except (asyncio.CancelledError, GeneratorExit):
+                raise
+            except Exception as e:
+                self.stats_for(route).record((time.perf_counter() - start) * 1000, ok=False)
+                if started or not is_retryable_error(e):
+                    raise
+                last_error = e
+                if position + 1 < len(ordered):
+                    self.stats_for(route).failovers += 1
+                    logger.warning(f"LLM stream route {route.key} failed ({type(e).__name__}); failing over to {ordered[position + 1].key}")
+            finally:
+                await iterator.aclose()
+        raise last_error
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Rolling per-route latency and error statistics for monitoring."""
+        return {key: stats.snapshot() for key, stats in list(self._stats.items())}
+
+
+def parse_fallback_providers(value: str) -> List[str]:
+    """Parse the comma-separated AI_FALLBACK_PROVIDERS setting."""
+    return [name.strip().lower() for name in (value or "").split(",") if name.strip()]
+
+
+# Global instance
+_llm_router: Optional[LLMRouter] = None
+
+
+def get_llm_router() -> LLMRouter:
+    """Get the global LLM router instance"""
+    global _llm_router
+    if _llm_router is None:
+        _llm_router = LLMRouter()
+    return _llm_router
+
+
+def get_llm_router_stats() -> Dict[str, Dict[str, Any]]:
+    """Convenience function for admin monitoring"""
+    return get_llm_router().stats()
@@ -0,0 +1,614 @@
+"""
+Content-Addressed Media Store
+
+Generated images and carousel PDFs used to live in the database as base64
+text (plus every slide again in generated_pdfs.slide_images), which inflates
+rows by a third, bloats backups and puts megabytes of base64 in API
+responses. They now live in a blob store:
+
+- keys are the SHA-256 of the bytes plus an extension from the sniffed
+  content type, so identical media (a regenerated PDF reusing unchanged
+  slides, the same image saved twice) is stored once
+- blobs are immutable; the /api/media/{key} endpoint streams them with
+  range support. Its URLs are signed and expire (media_url), since the
+  media is private until published and <img> tags cannot send auth headers
+- backends: local filesystem (default) and any S3-compatible service
+  (AWS S3, Cloudflare R2, MinIO) through boto3
+
+Rows written before the store existed keep their inline base64 until
+scripts/migrate_media_to_store.py moves them; the helpers here fall back to
+the inline column when a row has no key yet.
+
+Blobs are shared between rows, so deleting a row does not delete its blob.
+Deletes that remove media (a user's account) release the keys afterwards,
+which deletes the blobs no image_key, pdf_key or slide_keys still points to;
+scripts/sweep_media_store.py does the same for the whole store.
+"""
+import asyncio
+import base64
+import binascii
+import hashlib
+import hmac
+import logging
+import os
+import re
+import tempfile
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from ..config import get_settings
+
+try:
+    import boto3
+    from botocore.exceptions import ClientError
+    BOTO3_AVAILABLE = True
+except ImportError:
+    BOTO3_AVAILABLE = False
+
+    class ClientError(Exception):
+        """Stand-in so an injected S3 client can still signal missing objects."""
+
+        def __init__(self, error_response, operation_name):
+            super().__init__(f"{operation_name}: {error_response}")
+            self.response = error_response
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+CHUNK_SIZE = 256 * 1024
+
+CONTENT_TYPES = {
+    "png": "image/png",
+    "jpg": "image/jpeg",
+    "webp": "image/webp",
+    "gif": "image/gif",
+    "pdf": "application/pdf",
+    "bin": "application/octet-stream",
+}
+
+KEY_PATTERN = re.compile(r"^[0-9a-f]{64}\.(%s)$" % "|".join(CONTENT_TYPES))
+
+
+class MediaStoreError(Exception):
+    """A blob could not be stored or found."""
+
+
+def sniff_extension(data: bytes) -> str:
+    """File extension for the bytes, from their magic number."""
+    if data.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if data.startswith(b"\xff\xd8\xff"):
+        return "jpg"
+    if data.startswith(b"%PDF"):
+        return "pdf"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "webp"
+    if data[:6] in (b"GIF87a", b"GIF89a"):
+        return "gif"
+    return "bin"
+
+
+def content_key(data: bytes) -> str:
+    """Content address of the bytes: sha256 hex digest plus extension."""
+    return f"{hashlib.sha256(data).hexdigest()}.{sniff_extension(data)}"
+
+
+def content_type_for(key: str) -> str:
+    return CONTENT_TYPES.get(key.rsplit(".", 1)[-1], "application/octet-stream")
+
+
+def is_valid_key(key: str) -> bool:
+    return bool(KEY_PATTERN.match(key))
+
+
+class BlobStore:
+    """Immutable, content-addressed blob storage."""
+
+    name = "base"
+
+    def exists(self, key: str) -> bool:
+        raise NotImplementedError
+
+    def touch(self, key: str) -> bool:
+        """Reset the blob's modified time to now; False when it does not exist."""
+        raise NotImplementedError
+
+    def write(self, key: str, data: bytes):
+        raise NotImplementedError
+
+    def size(self, key: str) -> Optional[int]:
+        """Size in bytes, or None when the blob does not exist."""
+        raise NotImplementedError
+
+    def iter_range(self, key: str, start: int, end: int) -> Iterator[bytes]:
+        """Yield bytes start..end (inclusive) of the blob in chunks."""
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        raise NotImplementedError
+
+    def iter_blobs(self) -> Iterator[Tuple[str, int, float]]:
+        """Yield (key, size, modified timestamp) for every stored blob."""
+        raise NotImplementedError
+
+    def read(self, key: str) -> bytes:
+        size = self.size(key)
+        if size is None:
+            raise MediaStoreError(f"Blob not found: {key}")
+        return b"".join(self.iter_range(key, 0, size - 1)) if size else b""
+
+
+class FilesystemBlobStore(BlobStore):
+    """Blobs as files under root/ab/cd/<key>, written atomically."""
+
+    name = "filesystem"
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key[2:4], key)
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(self._path(key))
+
+    def touch(self, key: str) -> bool:
+        try:
+            os.utime(self._path(key))
+            return True
+        except FileNotFoundError:
+            return False
+
+    def write(self, key: str, data: bytes):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temp file in the same directory and rename, so readers
+        # never see a partial blob and concurrent writers of the same key are harmless
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def size(self, key: str) -> Optional[int]:
+        try:
+            return os.path.getsize(self._path(key))
+        except FileNotFoundError:
+            return None
+
+    def iter_range(self, key: str, start: int, end: int) -> Iterator[bytes]:
+        with open(self._path(key), "rb") as f:
+            f.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = f.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+
+    def delete(self, key: str):
+        try:
+            os.unlink(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def iter_blobs(self) -> Iterator[Tuple[str, int, float]]:
+        for directory, _, names in os.walk(self.root):
+            for name in names:
+                # Skips in-flight .tmp- files
+                if not is_valid_key(name):
+                    continue
+                try:
+                    stat = os.stat(os.path.join(directory, name))
+                except FileNotFoundError:
+                    continue
+                yield name, stat.st_size, stat.st_mtime
+
+
+class S3BlobStore(BlobStore):
+    """Blobs as objects in an S3-compatible bucket."""
+
+    name = "s3"
+
+    def __init__(
+        self,
+        bucket: str,
+        prefix: str = "",
+        endpoint_url: Optional[str] = None,
+        region: Optional[str] = None,
+        access_key_id: Optional[str] = None,
+        secret_access_key: Optional[str] = None,
+        client=None
+    ):
+        if client is None:
+            if not BOTO3_AVAILABLE:
+                raise ImportError("boto3 is not installed. Install it with: pip install boto3")
+            client = boto3.client(
+                "s3",
+                endpoint_url=endpoint_url or None,
+                region_name=region or None,
+                aws_access_key_id=access_key_id or None,
+                aws_secret_access_key=secret_access_key or None
+            )
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix
+
+    def _object_key(self, key: str) -> str:
+        return f"{self.prefix}{key}"
+
+    def _head(self, key: str) -> Optional[dict]:
+        try:
+            return self.client.head_object(Bucket=self.bucket, Key=self._object_key(key))
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+
+    def exists(self, key: str) -> bool:
+        return self._head(key) is not None
+
+    def touch(self, key: str) -> bool:
+        # S3 has no utime; copying the object onto itself resets LastModified
+        object_key = self._object_key(key)
+        try:
+            self.client.copy_object(
+                Bucket=self.bucket,
+                Key=object_key,
+                CopySource={"Bucket": self.bucket, "Key": object_key},
+                MetadataDirective="REPLACE",
+                ContentType=content_type_for(key),
+                CacheControl="private"
+            )
+            return True
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+
+    def write(self, key: str, data: bytes):
+        self.client.put_object(
+            Bucket=self.bucket,
+            Key=self._object_key(key),
+            Body=data,
+            ContentType=content_type_for(key),
+            CacheControl="private"
+        )
+
+    def size(self, key: str) -> Optional[int]:
+        head = self._head(key)
+        return None if head is None else head["ContentLength"]
+
+    def iter_range(self, key: str, start: int, end: int) -> Iterator[bytes]:
+        response = self.client.get_object(
+            Bucket=self.bucket, Key=self._object_key(key), Range=f"bytes={start}-{end}"
+        )
+        body = response["Body"]
+        try:
+            for chunk in iter(lambda: body.read(CHUNK_SIZE), b""):
+                yield chunk
+        finally:
+            body.close()
+
+    def delete(self, key: str):
+        self.client.delete_object(Bucket=self.bucket, Key=self._object_key(key))
+
+    def iter_blobs(self) -> Iterator[Tuple[str, int, float]]:
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self.prefix):
+            for item in page.get("Contents", []):
+                key = item["Key"][len(self.prefix):]
+                if is_valid_key(key):
+                    yield key, item["Size"], item["LastModified"].timestamp()
+
+
+class MediaStore:
+    """Deduplicating front for a BlobStore, with counters for stats()."""
+
+    def __init__(self, backend: BlobStore):
+        self.backend = backend
+        self.stored = 0
+        self.deduplicated = 0
+        self.bytes_stored = 0
+
+    def put(self, data: bytes) -> str:
+        """Store the bytes (once per distinct content) and return their key."""
+        if not data:
+            raise MediaStoreError("Refusing to store an empty blob")
+        key = content_key(data)
+        # On a hit, the row about to reference the blob is not committed yet;
+        # touching it restarts the sweep's grace period for an unreferenced blob
+        if self.backend.touch(key):
+            self.deduplicated += 1
+            return key
+        self.backend.write(key, data)
+        self.stored += 1
+        self.bytes_stored += len(data)
+        return key
+
+    @staticmethod
+    def decode_base64(data_b64: str) -> bytes:
+        """Bytes of base64 media, optionally given as a data: URL."""
+        if data_b64.startswith("data:") and "," in data_b64:
+            data_b64 = data_b64.split(",", 1)[1]
+        try:
+            return base64.b64decode(data_b64, validate=True)
+        except (binascii.Error, ValueError) as e:
+            raise MediaStoreError(f"Invalid base64 media: {e}")
+
+    def put_base64(self, data_b64: str) -> str:
+        """Store base64 (optionally a data: URL) and return the key."""
+        return self.put(self.decode_base64(data_b64))
+
+    def get(self, key: str) -> bytes:
+        return self.backend.read(key)
+
+    def get_base64(self, key: str) -> str:
+        return base64.b64encode(self.get(key)).decode("ascii")
+
+    def stats(self):
+        return {
+            "backend": self.backend.name,
+            "stored": self.stored,
+            "deduplicated": self.deduplicated,
+            "bytes_stored": self.bytes_stored,
+        }
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single-range "bytes=" header into inclusive (start, end).
+    Returns None for no/unsupported ranges (serve the whole blob); raises
+    ValueError for a range that cannot be satisfied.
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    start_text, _, end_text = header[6:].strip().partition("-")
+    try:
+        if start_text == "":
+            # Suffix range: the last N bytes
+            length = int(end_text)
+            if length <= 0:
+                raise ValueError("Empty suffix range")
+            return max(size - length, 0), size - 1
+        start = int(start_text)
+        end = int(end_text) if end_text else size - 1
+    except ValueError:
+        raise ValueError(f"Malformed range: {header}")
+    if start >= size or end < start:
+        raise ValueError(f"Unsatisfiable range: {header}")
+    return start, min(end, size - 1)
+
+
+def sign_media_key(key: str, expires: int) -> str:
+    """HMAC of the key and expiry, keyed with the JWT secret."""
+    message = f"{key}:{expires}".encode()
+    return hmac.new(settings.jwt_secret_key.encode(), message, hashlib.sha256).hexdigest()
+
+
+def verify_media_signature(key: str, expires: Optional[int], signature: Optional[str], now: Optional[float] = None) -> bool:
+    """True when the signature matches and has not expired."""
+    if expires is None or not signature:
+        return False
+    if expires < (time.time() if now is None else now):
+        return False
+    return hmac.compare_digest(sign_media_key(key, expires), signature)
+
+
+def media_url(key: Optional[str], now: Optional[float] = None) -> Optional[str]:
+    """
+    Signed, expiring URL for a stored blob. Only endpoints that checked the
+    caller owns the row hand these out. The expiry is rounded up to the next
+    media_url_ttl_seconds window, so URLs stay the same (and cacheable) for
+    one window and are valid for between one and two windows.
+    """
+    if not key:
+        return None
+    ttl = settings.media_url_ttl_seconds
+    expires = (int(time.time() if now is None else now) // ttl + 2) * ttl
+    return f"{settings.media_url_prefix}/{key}?expires={expires}&signature={sign_media_key(key, expires)}"
+
+
+async def save_media_base64(data_b64: str) -> str:
+    """Store base64 media off the event loop and return its key."""
+    return await asyncio.to_thread(get_media_store().put_base64, data_b64)
+
+
+async def load_media_base64(key: Optional[str], inline: Optional[str] = None) -> Optional[str]:
+    """Base64 of a blob, or the row's legacy inline base64 when it has no key yet."""
+    if key:
+        return await asyncio.to_thread(get_media_store().get_base64, key)
+    return inline
+
+
+async def load_media_base64_list(keys: Optional[List[str]], inline: Optional[List[str]] = None) -> List[str]:
+    if keys:
+        store = get_media_store()
+        return await asyncio.to_thread(lambda: [store.get_base64(key) for key in keys])
+    return inline or []
+
+
+def move_inline_media(db, batch_size: int = 100, dry_run: bool = False) -> Dict[str, int]:
+    """
+    Move legacy inline base64 images, PDFs and slides into the media store,
+    batch_size rows per commit, and clear the inline columns. Walks rows by id
+    so a row that fails (bad base64) is reported and skipped, not retried.
+    With dry_run, only validates and counts what would move.
+    """
+    from sqlalchemy.orm import undefer
+
+    from ..models import GeneratedImage, GeneratedPDF
+
+    store = get_media_store()
+    counts = {"images": 0, "pdfs": 0, "slides": 0, "bytes": 0, "failed": 0}
+
+    def batches(model, *columns):
+        last_id = ""
+        while True:
+            rows = db.query(model).options(*(undefer(column) for column in columns)).filter(
+                model.id > last_id, columns[0].isnot(None)
+            ).order_by(model.id).limit(batch_size).all()
+            if not rows:
+                return
+            last_id = rows[-1].id
+            yield rows
+            if dry_run:
+                db.rollback()
+            else:
+                db.commit()
+            db.expunge_all()
+
+    for rows in batches(GeneratedImage, GeneratedImage.image_data):
+        for image in rows:
+            counts["bytes"] += len(image.image_data)
+            try:
+                if dry_run:
+                    store.decode_base64(image.image_data)
+                else:
+                    image.image_key = image.image_key or store.put_base64(image.image_data)
+                    image.image_data = None
+                counts["images"] += 1
+            except MediaStoreError as e:
+                counts["failed"] += 1
+                logger.warning(f"Could not move image {image.id} to the media store: {e}")
+
+    for rows in batches(GeneratedPDF, GeneratedPDF.pdf_data, GeneratedPDF.slide_images):
+        for pdf in rows:
+            slides = pdf.slide_images or []
+            counts["bytes"] += len(pdf.pdf_data) + sum(len(slide) for slide in slides)
+            try:
+                if dry_run:
+                    for data in [pdf.pdf_data, *slides]:
+                        store.decode_base64(data)
+                else:
+                    pdf_key = pdf.pdf_key or store.put_base64(pdf.pdf_data)
+                    slide_keys = pdf.slide_keys or [store.put_base64(slide) for slide in slides]
+                    pdf.pdf_key, pdf.slide_keys = pdf_key, slide_keys
+                    pdf.pdf_data = None
+                    pdf.slide_images = None
+                counts["pdfs"] += 1
+                counts["slides"] += len(slides)
+            except MediaStoreError as e:
+                counts["failed"] += 1
+                logger.warning(f"Could not move PDF {pdf.id} to the media store: {e}")
+
+    return counts
+
+
+def collect_media_keys(db, user_id: str) -> Set[str]:
+    """Keys of a user's images, PDFs and slides."""
+    from ..models import GeneratedImage, GeneratedPDF
+
+    keys = {key for key, in db.query(GeneratedImage.image_key).filter(GeneratedImage.user_id == user_id)}
+    pdfs = db.query(GeneratedPDF.pdf_key, GeneratedPDF.slide_keys).filter(GeneratedPDF.user_id == user_id)
+    for pdf_key, slide_keys in pdfs:
+        keys.add(pdf_key)
+        keys.update(slide_keys or [])
+    keys.discard(None)
+    return keys
+
+
+def referenced_media_keys(db, candidates: Optional[Iterable[str]] = None) -> Set[str]:
+    """
+    Keys some row still points to. With candidates, only those keys are
+    looked up by image_key and pdf_key; slide_keys is JSON, so PDFs with
+    slides are always scanned (key columns only, in batches).
+    """
+    from ..models import GeneratedImage, GeneratedPDF
+
+    wanted = None if candidates is None else set(candidates)
+    if wanted is not None and not wanted:
+        return set()
+    referenced: Set[str] = set()
+    for column in (GeneratedImage.image_key, GeneratedPDF.pdf_key):
+        query = db.query(column).filter(column.isnot(None))
+        if wanted is not None:
+            query = query.filter(column.in_(wanted))
+        referenced.update(key for key, in query.distinct())
+    if wanted is not None and wanted <= referenced:
+        return referenced
+    query = db.query(GeneratedPDF.slide_keys).filter(GeneratedPDF.slide_keys.isnot(None))
+    for slide_keys, in query.yield_per(1000):
+        referenced.update(slide_keys or [])
+    return referenced if wanted is None else referenced & wanted
+
+
+def release_media(keys: Iterable[str]) -> int:
+    """
+    Delete the blobs among keys that no row references any more. Run after
+    the rows are committed (as a background task; it opens its own session).
+    Returns the number of blobs deleted.
+    """
+    from ..database import SessionLocal
+
+    keys = set(keys)
+    if not keys:
+        return 0
+    db = SessionLocal()
+    try:
+        unreferenced = keys - referenced_media_keys(db, keys)
+    finally:
+        db.close()
+    backend = get_media_store().backend
+    for key in unreferenced:
+        backend.delete(key)
+    if unreferenced:
+        logger.info(f"Deleted {len(unreferenced)} unreferenced media blobs")
+    return len(unreferenced)
+
+
+def sweep_unreferenced_media(db, grace_seconds: Optional[float] = None, dry_run: bool = False) -> Dict[str, int]:
+    """
+    Mark and sweep: delete every blob no row references. Blobs younger than
+    grace_seconds are kept, since a blob is written before the row that
+    points to it is committed. With dry_run, only counts what would go.
+    """
+    if grace_seconds is None:
+        grace_seconds = settings.media_sweep_grace_seconds
+    backend = get_media_store().backend
+    # List before marking: a blob written after the listing is not a candidate
+    cutoff = time.time() - grace_seconds
+    blobs = [(key, size) for key, size, modified in backend.iter_blobs() if modified < cutoff]
+    referenced = referenced_media_keys(db)
+    counts = {"blobs": len(blobs), "referenced": 0, "deleted": 0, "bytes_deleted": 0}
+    for key, size in blobs:
+        if key in referenced:
+            counts["referenced"] += 1
+            continue
+        if not dry_run:
+            backend.delete(key)
+        counts["deleted"] += 1
+        counts["bytes_deleted"] += size
+    return counts
+
+
+def build_backend() -> BlobStore:
+    if settings.media_store_backend == "s3":
+        return S3BlobStore(
+            bucket=settings.media_s3_bucket,
+            prefix=settings.media_s3_prefix,
+            endpoint_url=settings.media_s3_endpoint_url,
+            region=settings.media_s3_region,
+            access_key_id=settings.media_s3_access_key_id,
+            secret_access_key=settings.media_s3_secret_access_key
+        )
+    if settings.media_store_backend != "filesystem":
+        raise ValueError(f"Unknown media_store_backend: {settings.media_store_backend}")
+    return FilesystemBlobStore(settings.media_store_path)
+
+
+# Global instance
+_media_store: Optional[MediaStore] = None
+
+
+def get_media_store() -> MediaStore:
+    """Get the global media store"""
+    global _media_store
+    if _media_store is None:
+        _media_store = MediaStore(build_backend())
+    return _media_store
@@ -0,0 +1,254 @@
+"""
+Canned Responses for the Mock LLM Provider
+
+Builds responses that satisfy the parsers downstream of generate_completion,
+so /api/generate/post, onboarding and carousel flows run end to end without
+a network:
+- post generation: JSON with title, post_content, hashtags and, depending on
+  the requested format, image_prompt or image_prompts
+- TOON profile context that parse_toon_to_dict accepts
+- single image prompts and carousel image-prompt arrays
+- CV validation, context.json and worthiness JSON objects
+- trending / evergreen content idea arrays
+- conversation titles
+- anything else: plain text (profile markdown, style guides, comments)
+
+The scenario is detected from the system prompt, the same text the real
+providers see. Content is varied with the caller's random.Random so a seeded
+run is reproducible.
+"""
+import json
+import random
+import re
+
+# Average characters per token, used to size generated text to a token target
+CHARS_PER_TOKEN = 4
+
+_TOPICS = [
+    "shipping small changes daily",
+    "hiring for curiosity over credentials",
+    "what a failed launch taught our team",
+    "measuring developer productivity honestly",
+    "saying no to good ideas",
+    "onboarding that actually sticks",
+    "running meetings people want to attend",
+    "turning customer complaints into roadmap wins",
+]
+
+_HOOKS = [
+    "Three years ago I would have disagreed with everything in this post.",
+    "Most teams get this backwards.",
+    "We cut our cycle time in half. Here is what actually changed.",
+    "Nobody told me this when I became a manager.",
+    "The best advice I ever got fits in one sentence.",
+]
+
+_PARAGRAPHS = [
+    "The first version was messy. It worked anyway, because we put it in front of real users within a week and listened to what they did, not what they said.",
+    "Every process we added after that had to earn its place. If it did not make the next release faster or safer, it went.",
+    "The surprising part was how much of the improvement came from removing steps rather than adding tools.",
+    "Looking back, the turning point was agreeing on one metric that everyone could see and nobody could game.",
+    "If you try this, start small. Pick one team, one quarter and one number, and write down what you expect before you begin.",
+]
+
+_IMAGE_STYLES = [
+    "Modern flat illustration, professional character climbing a staircase of colorful blocks, teal and coral palette, clean white background, centered composition, optimistic mood",
+    "Photorealistic, small team collaborating around a laptop in a bright glass office, warm natural lighting, shallow depth of field, focused and energetic mood",
+    "Minimalist corporate illustration, two paths diverging through a geometric landscape, gradient blue to purple palette, soft ambient lighting, symmetrical composition, reflective mood",
+    "Infographic-style illustration, abstract rising bar shapes and flowing lines, navy and gold palette, crisp studio lighting, balanced composition, confident mood",
+]
+
+_HASHTAGS = ["#Leadership", "#Engineering", "#CareerGrowth", "#Productivity", "#Startups", "#TeamCulture", "#Innovation"]
+
+_FORMATS = ["carousel", "text", "text_with_image", "video"]
+
+
+def detect_scenario(system_prompt: str, user_message: str) -> str:
+    """Name of the response shape the caller will parse."""
+    system = system_prompt or ""
+    if '"image_prompts"' in system:
+        return "post_carousel"
+    if '"post_content"' in system:
+        if '"image_prompt"' in system:
+            return "post_image"
+        if "[Hook - 3-5 seconds]" in system:
+            return "post_video"
+        return "post_text"
+    if "Output TOON format" in system:
+        return "toon_context"
+    if "carousel slides" in system and "JSON array" in system:
+        return "carousel_image_prompts"
+    if system.startswith("You write image generation prompts"):
+        return "image_prompt"
+    if '"is_cv"' in system:
+        return "cv_validation"
+    if '"content_mix"' in system and '"current_role"' in system:
+        return "context_json"
+    if "trend analyst" in system:
+        return "trending_topics"
+    if "evergreen content ideas" in system:
+        return "evergreen_ideas"
+    if "worthiness evaluator" in system:
+        return "worthiness"
+    if "Output ONLY the title" in system:
+        return "title"
+    return "text"
+
+
+def _topic(rng: random.Random, user_message: str) -> str:
+    """A short topic: the first meaningful line of the request, or a canned one."""
+    for line in (user_message or "").splitlines():
+        line = re.sub(r"<[^>]+>", "", line).strip(" :-\"'")
+        if 8 <= len(line) <= 120:
+            return line[:80]
+    return rng.choice(_TOPICS)
+
+
+def _title(topic: str) -> str:
+    words = re.findall(r"[A-Za-z0-9']+", topic)[:6]
+    return " ".join(word.capitalize() for word in words) or "Lessons From The Field"
+
+
+def _body(rng: random.Random, topic: str, target_tokens: int) -> str:
+    """Post body padded with paragraphs until it is roughly target_tokens long."""
+    parts = [rng.choice(_HOOKS), f"Let's talk about {topic}."]
+    while len("\n\n".join(parts)) < target_tokens * CHARS_PER_TOKEN:
+        parts.append(rng.choice(_PARAGRAPHS))
+    parts.append("What would you add? Tell me in the comments.")
+    return "\n\n".join(parts)
+
+
+def _post(rng: random.Random, topic: str, target_tokens: int, post_content: str = None) -> dict:
+    hashtags = rng.sample(_HASHTAGS, 3)
+    content = post_content or _body(rng, topic, target_tokens)
+    return {
+        "title": _title(topic),
+        "post_content": f"{content}\n\n{' '.join(hashtags)}",
+        "hashtags": hashtags,
+    }
+
+
+def _slide_count(user_message: str, default: int = 5) -> int:
+    match = re.search(r"exactly (\d+)", user_message or "")
+    return max(1, min(15, int(match.group(1)))) if match else default
+
+
+def _ideas(rng: random.Random, count: int, source: str = None) -> list:
+    ideas = []
+    for topic in rng.sample(_TOPICS, min(count, len(_TOPICS))):
+        idea = {
+            "title": _title(topic),
+            "format": rng.choice(_FORMATS),
+            "hook": rng.choice(_HOOKS),
+            "why_relevant": f"Builds on hands-on experience with {topic}",
+        }
+        if source:
+            idea["source"] = source
+        else:
+            idea["ai_generated"] = False
+        ideas.append(idea)
+    return ideas
+
+
+def _toon_context(rng: random.Random) -> str:
+    skills = rng.sample(["Python", "System Design", "Team Leadership", "Cloud Architecture", "Product Strategy", "Data Analysis"], 4)
+    levels = ["Expert", "Advanced", "Advanced", "Intermediate"]
+    expertise = "\n".join(f"  {skill},{level},{8 - i * 2},false" for i, (skill, level) in enumerate(zip(skills, levels)))
+    return f"""name: Alex Morgan
+current_role: Senior Software Engineer
+company: Northwind Labs
+industry: B2B SaaS
+years_experience: 8
+
+expertise[4]{{skill,level,years,ai_generated}}:
+{expertise}
+
+target_audience[2]{{persona,description}}:
+  Software Developers,Early to mid-career developers learning best practices
+  Engineering Managers,Leads growing teams who want practical playbooks
+
+content_goals[4]: Build thought leadership,Grow professional network,Share lessons learned,Attract talent
+posting_frequency: 2-3x per week
+tone: technical yet accessible
+
+content_mix[5]{{category,percentage}}:
+  Best Practices,30
+  Tutorials,25
+  Career Advice,20
+  Trends,15
+  Personal,10
+
+ai_generated_fields[3]: target_audience,content_goals,content_mix"""
+
+
+def build_response(scenario: str, rng: random.Random, target_tokens: int, user_message: str = "") -> str:
+    """
+    Build the response text for a scenario.
+
+    target_tokens sizes free-form text (post bodies, plain text); structured
+    responses keep their natural size.
+    """
+    topic = _topic(rng, user_message)
+
+    if scenario == "post_carousel":
+        post = _post(rng, topic, target_tokens)
+        post["image_prompts"] = [f"Slide {i + 1}: {rng.choice(_IMAGE_STYLES)}" for i in range(_slide_count(user_message))]
+        return json.dumps(post)
+    if scenario == "post_image":
+        post = _post(rng, topic, target_tokens)
+        post["image_prompt"] = rng.choice(_IMAGE_STYLES)
+        return json.dumps(post)
+    if scenario == "post_video":
+        script = "\n\n".join([
+            f"[Hook - 3-5 seconds]\n{rng.choice(_HOOKS)}",
+            f"[Introduction - 10-15 seconds]\nToday: {topic}.",
+            "[Main Content - 40-60 seconds]\n" + "\n\n".join(rng.sample(_PARAGRAPHS, 3)),
+            "[Summary - 10-15 seconds]\nStart small, measure, and keep what works.",
+            "[CTA - 5-10 seconds]\nFollow for more and share your take below.",
+        ])
+        return json.dumps(_post(rng, topic, target_tokens, post_content=script))
+    if scenario == "post_text":
+        return json.dumps(_post(rng, topic, target_tokens))
+    if scenario == "toon_context":
+        return _toon_context(rng)
+    if scenario == "carousel_image_prompts":
+        return json.dumps([rng.choice(_IMAGE_STYLES) for _ in range(_slide_count(user_message))])
+    if scenario == "image_prompt":
+        return rng.choice(_IMAGE_STYLES)
+    if scenario == "cv_validation":
+        return json.dumps({
+            "is_cv": True,
+            "confidence": "high",
+            "reason": "Contains work experience, education and skills sections.",
+            "detected_type": "CV/Resume",
+        })
+    if scenario == "context_json":
+        return json.dumps({
+            "name": "Alex Morgan",
+            "current_role": "Senior Software Engineer",
+            "company": "Northwind Labs",
+            "industry": "B2B SaaS",
+            "target_audience": ["Software Developers", "Engineering Managers"],
+            "content_goals": ["Build thought leadership", "Grow professional network"],
+            "posting_frequency": "2-3x per week",
+            "tone": "technical yet accessible",
+            "expertise_tags": ["python", "system-design", "team-leadership"],
+            "content_mix": {"best_practices": 30, "tutorials": 25, "career_advice": 20, "trends": 15, "personal": 10},
+        })
+    if scenario == "trending_topics":
+        return json.dumps(_ideas(rng, 6, source="web_search"))
+    if scenario == "evergreen_ideas":
+        return json.dumps(_ideas(rng, 8))
+    if scenario == "worthiness":
+        scores = [rng.randint(3, 8) for _ in range(3)]
+        return json.dumps({
+            "unique_perspective": scores[0],
+            "value_addition": scores[1],
+            "expertise_match": scores[2],
+            "total_score": sum(scores),
+            "recommendation": "COMMENT" if sum(scores) >= 16 else "SKIP",
+            "reasoning": "Mock evaluation.",
+        })
+    if scenario == "title":
+        return _title(topic)
+    return _body(rng, topic, target_tokens)
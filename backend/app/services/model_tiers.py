@@ -0,0 +1,236 @@
+"""
+Model Tiers
+
+Every AI task used to run on the provider's default content model (only CV
+analysis could opt into the onboarding model), so a five-word conversation
+title cost as much per token and took as long to first byte as a full post.
+This module maps each ai_service entry point (task class) to a model tier:
+
+- small: short, structured outputs (titles, image prompts, CV validation,
+  summaries, worthiness scores) on the provider's small fast model
+  ({PROVIDER}_SMALL_MODEL)
+- onboarding: CV and profile analysis on {PROVIDER}_ONBOARDING_MODEL
+- standard: post and comment writing on {PROVIDER}_MODEL
+
+The routing table is editable at runtime from the admin AI config router and
+persisted as MODEL_TIER_OVERRIDES ("task:tier,task:tier"). Latency, tokens
+and cost are tracked per tier and per task so the savings are visible.
+"""
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Tuple
+
+from ..config import get_settings
+from .cost_calculator import calculate_text_generation_cost
+from .llm_providers import LLMProvider
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+TIER_SMALL = "small"
+TIER_ONBOARDING = "onboarding"
+TIER_STANDARD = "standard"
+TIERS = (TIER_SMALL, TIER_ONBOARDING, TIER_STANDARD)
+
+# Default tier per task class (the `task` argument of generate_completion)
+TASK_TIERS: Dict[str, str] = {
+    # Post writing: quality matters most
+    "post_generation": TIER_STANDARD,
+    "post_refinement": TIER_STANDARD,
+    "comment": TIER_STANDARD,
+    "trending_topics": TIER_STANDARD,
+    "topic_research": TIER_STANDARD,
+    # Onboarding analysis of CVs and writing samples
+    "profile_from_cv": TIER_ONBOARDING,
+    "writing_style": TIER_ONBOARDING,
+    "context_json": TIER_ONBOARDING,
+    "profile_context": TIER_ONBOARDING,
+    "evergreen_ideas": TIER_ONBOARDING,
+    # Short outputs a small model handles as well as a large one
+    "conversation_title": TIER_SMALL,
+    "image_prompt": TIER_SMALL,
+    "carousel_image_prompts": TIER_SMALL,
+    "cv_validation": TIER_SMALL,
+    "conversation_summary": TIER_SMALL,
+    "comment_worthiness": TIER_SMALL,
+}
+
+UNCLASSIFIED_TASK = "unclassified"
+
+
+def parse_tier_overrides(value: str) -> Dict[str, str]:
+    """Parse MODEL_TIER_OVERRIDES ("task:tier,task:tier"), skipping unknown tasks and tiers."""
+    overrides = {}
+    for item in (value or "").split(","):
+        if not item.strip():
+            continue
+        task, _, tier = item.partition(":")
+        task, tier = task.strip().lower(), tier.strip().lower()
+        if task not in TASK_TIERS or tier not in TIERS:
+            logger.warning(f"Ignoring invalid model tier override: {item.strip()}")
+            continue
+        overrides[task] = tier
+    return overrides
+
+
+def format_tier_overrides(overrides: Dict[str, str]) -> str:
+    """Inverse of parse_tier_overrides, in table order."""
+    return ",".join(f"{task}:{overrides[task]}" for task in TASK_TIERS if task in overrides)
+
+
+def _pricing_model(model: Optional[str]) -> str:
+    # OpenRouter ids ("google/gemini-2.5-flash") are priced like the underlying model
+    return (model or "").split("/")[-1]
+
+
+class TierStats:
+    """Rolling latency window plus cumulative token and cost totals for one tier."""
+
+    def __init__(self, window_size: int, window_seconds: float):
+        self.window_seconds = window_seconds
+        self._latencies: Deque[Tuple[float, float]] = deque(maxlen=window_size)
+        self.calls = 0
+        self.errors = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.cost_usd = 0.0
+        self.tasks: Dict[str, int] = {}
+        self.models: Dict[str, int] = {}
+
+    def record(self, task: str, latency_ms: float, token_usage: Optional[Dict[str, Any]]):
+        self.calls += 1
+        self.tasks[task] = self.tasks.get(task, 0) + 1
+        if token_usage is None:
+            self.errors += 1
+            return
+        self._latencies.append((time.time(), latency_ms))
+        model = token_usage.get("model") or "unknown"
+        self.models[model] = self.models.get(model, 0) + 1
+        input_tokens = token_usage.get("input_tokens", 0) or 0
+        output_tokens = token_usage.get("output_tokens", 0) or 0
+        self.input_tokens += input_tokens
+        self.output_tokens += output_tokens
+        self.cost_usd += calculate_text_generation_cost(
+            input_tokens, output_tokens, _pricing_model(model), token_usage.get("cached_tokens", 0) or 0
+        )
+
+    def snapshot(self) -> Dict[str, Any]:
+        cutoff = time.time() - self.window_seconds
+        latencies = sorted(latency for timestamp, latency in self._latencies if timestamp >= cutoff)
+        succeeded = self.calls - self.errors
+
+        def percentile(p: float) -> float:
+            if not latencies:
+                return 0.0
+            return round(latencies[min(len(latencies) - 1, int(round(p / 100 * (len(latencies) - 1))))], 1)
+
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "p50_ms": percentile(50),
+            "p95_ms": percentile(95),
+            "mean_ms": round(sum(latencies) / len(latencies), 1) if latencies else 0.0,
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "cost_usd": round(self.cost_usd, 8),
+            "avg_cost_usd": round(self.cost_usd / succeeded, 8) if succeeded else 0.0,
+            "tasks": dict(self.tasks),
+            "models": dict(self.models),
+        }
+
+
+class ModelTierRouter:
+    """Task class → tier → model resolution with per-tier monitoring."""
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        overrides: Optional[Dict[str, str]] = None,
+        small_models: Optional[Dict[str, str]] = None
+    ):
+        self.enabled = enabled
+        self.overrides: Dict[str, str] = dict(overrides or {})
+        # Admin-set small models per provider; unset providers use {PROVIDER}_SMALL_MODEL
+        self.small_models: Dict[str, str] = dict(small_models or {})
+        self._stats: Dict[str, TierStats] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls) -> "ModelTierRouter":
+        return cls(
+            enabled=settings.model_tier_routing_enabled,
+            overrides=parse_tier_overrides(settings.model_tier_overrides),
+        )
+
+    def tier_for(self, task: Optional[str], use_onboarding_model: bool = False) -> str:
+        """
+        Tier for a task class. Untagged calls keep the legacy behaviour
+        (onboarding model if requested, else the standard model), as does
+        every task while tier routing is disabled.
+        """
+        default_tier = TASK_TIERS.get(task or "")
+        if default_tier is None:
+            return TIER_ONBOARDING if use_onboarding_model else TIER_STANDARD
+        if not self.enabled:
+            return TIER_ONBOARDING if default_tier == TIER_ONBOARDING or use_onboarding_model else TIER_STANDARD
+        return self.overrides.get(task, default_tier)
+
+    def model_for(self, provider: LLMProvider, tier: str) -> str:
+        """Model a provider uses for a tier."""
+        if tier == TIER_SMALL:
+            return self.small_models.get(provider.name) or provider.resolve_small_model()
+        return provider.resolve_model(None, use_onboarding_model=tier == TIER_ONBOARDING)
+
+    def configure(
+        self,
+        enabled: Optional[bool] = None,
+        overrides: Optional[Dict[str, str]] = None,
+        small_models: Optional[Dict[str, str]] = None
+    ):
+        """Apply admin changes; takes effect for the next completion."""
+        if enabled is not None:
+            self.enabled = enabled
+        if overrides is not None:
+            # Entries equal to the default are dropped so the table stays minimal
+            self.overrides = {task: tier for task, tier in overrides.items() if TASK_TIERS.get(task) != tier}
+        if small_models is not None:
+            self.small_models.update(small_models)
+
+    def table(self) -> Dict[str, Dict[str, str]]:
+        """Default and effective tier for every task class."""
+        return {
+            task: {"default_tier": default_tier, "tier": self.tier_for(task)}
+            for task, default_tier in TASK_TIERS.items()
+        }
+
+    def record(self, task: Optional[str], tier: str, latency_ms: float, token_usage: Optional[Dict[str, Any]]):
+        """Record one completion; token_usage None marks a failed call."""
+        with self._lock:
+            stats = self._stats.get(tier)
+            if stats is None:
+                stats = self._stats[tier] = TierStats(settings.ai_router_window_size, settings.ai_router_window_seconds)
+            stats.record(task or UNCLASSIFIED_TASK, latency_ms, token_usage)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-tier latency, token and cost statistics for monitoring."""
+        with self._lock:
+            return {tier: stats.snapshot() for tier, stats in self._stats.items()}
+
+
+# Global instance
+_model_tier_router: Optional[ModelTierRouter] = None
+
+
+def get_model_tier_router() -> ModelTierRouter:
+    """Get the global model tier router instance"""
+    global _model_tier_router
+    if _model_tier_router is None:
+        _model_tier_router = ModelTierRouter.from_settings()
+    return _model_tier_router
+
+
+def get_model_tier_stats() -> Dict[str, Dict[str, Any]]:
+    """Convenience function for admin monitoring"""
+    return get_model_tier_router().stats()
@@ -0,0 +1,189 @@
+"""
+Onboarding Background Jobs
+
+Building a profile takes several AI calls (TOON context, profile markdown,
+writing style, content ideas, trending topics with web search) and can run
+for minutes. Instead of holding the /process request open for all of it,
+the build runs as a background task with a job id:
+
+- one job per user at a time; starting again while one runs returns it
+- every stage transition is recorded as an event, so a client that
+  subscribes late (or reconnects) replays what it missed, then follows live
+- finished jobs are kept for a while so the result can still be fetched
+
+Jobs live in this process's memory, like the other in-process registries
+(single-flight, bulkheads); a restart loses running jobs and the client
+starts a new one.
+"""
+import asyncio
+import logging
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+from ..config import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Runner for a job: called with a progress callback (stage, status), returns the result payload
+JobRunner = Callable[[Callable[[str, str], None]], Awaitable[Dict[str, Any]]]
+
+
+class JobFailed(Exception):
+    """Raised by a runner to fail a job with a message that is safe to show the user."""
+
+    def __init__(self, detail: str, status_code: int = 500):
+        super().__init__(detail)
+        self.detail = detail
+        self.status_code = status_code
+
+
+@dataclass
+class OnboardingJob:
+    """State and event log of one profile build."""
+    id: str
+    user_id: str
+    status: str = "running"
+    stages: Dict[str, str] = field(default_factory=dict)
+    events: List[Dict[str, Any]] = field(default_factory=list)
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[Dict[str, Any]] = None
+    created_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+    _changed: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+
+    @property
+    def done(self) -> bool:
+        return self.status != "running"
+
+    def _emit(self, event: str, data: Dict[str, Any]):
+        self.events.append({"event": event, "data": data})
+        # Wake current subscribers; they re-arm by waiting on a fresh event
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def progress(self, stage: str, status: str):
+        """Record a stage transition (called by the pipeline)."""
+        self.stages[stage] = status
+        self._emit("stage", {"stage": stage, "status": status})
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Job state for polling clients."""
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "stages": dict(self.stages),
+            "result": self.result,
+            "error": self.error,
+        }
+
+    async def subscribe(self) -> AsyncIterator[Dict[str, Any]]:
+        """Yield every event from the start of the job, then live ones until it finishes."""
+        index = 0
+        while True:
+            changed = self._changed
+            while index < len(self.events):
+                yield self.events[index]
+                index += 1
+            if self.done:
+                return
+            await changed.wait()
+
+
+class OnboardingJobRegistry:
+    """In-process registry of onboarding jobs, one active job per user."""
+
+    def __init__(self, ttl_seconds: int):
+        self.ttl_seconds = ttl_seconds
+        self._jobs: Dict[str, OnboardingJob] = {}
+        self._active: Dict[str, str] = {}  # user_id -> running job id
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self.started = 0
+        self.completed = 0
+        self.failed = 0
+        self.joined = 0
+
+    def start(self, user_id: str, runner: JobRunner) -> OnboardingJob:
+        """Start a job for the user, or return the one already running."""
+        self._prune()
+        active_id = self._active.get(user_id)
+        if active_id and not self._jobs[active_id].done:
+            self.joined += 1
+            return self._jobs[active_id]
+
+        job = OnboardingJob(id=str(uuid.uuid4()), user_id=user_id)
+        self._jobs[job.id] = job
+        self._active[user_id] = job.id
+        self.started += 1
+        task = asyncio.create_task(self._run(job, runner))
+        self._tasks[job.id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job.id, None))
+        return job
+
+    async def _run(self, job: OnboardingJob, runner: JobRunner):
+        try:
+            job.result = await runner(job.progress)
+            job.status = "completed"
+            self.completed += 1
+            job._emit("done", job.result)
+        except asyncio.CancelledError:
+            job.status = "failed"
+            job.error = {"detail": "Profile generation was cancelled. Please try again.", "status_code": 503}
+            self.failed += 1
+            job._emit("error", job.error)
+            raise
+        except JobFailed as e:
+            job.status = "failed"
+            job.error = {"detail": e.detail, "status_code": e.status_code}
+            self.failed += 1
+            job._emit("error", job.error)
+        except Exception as e:
+            logger.exception(f"Onboarding job {job.id} failed for user {job.user_id}")
+            job.status = "failed"
+            job.error = {"detail": f"Profile generation failed: {str(e)}", "status_code": 500}
+            self.failed += 1
+            job._emit("error", job.error)
+        finally:
+            job.finished_at = time.time()
+            if self._active.get(job.user_id) == job.id:
+                del self._active[job.user_id]
+
+    def get(self, job_id: str, user_id: str) -> Optional[OnboardingJob]:
+        """A job by id, only for the user who started it."""
+        job = self._jobs.get(job_id)
+        if job is None or job.user_id != user_id:
+            return None
+        return job
+
+    def _prune(self):
+        cutoff = time.time() - self.ttl_seconds
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished_at is not None and job.finished_at < cutoff
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": len(self._active),
+            "retained": len(self._jobs),
+            "started": self.started,
+            "completed": self.completed,
+            "failed": self.failed,
+            "joined": self.joined,
+        }
+
+
+# Global instance
+_registry: Optional[OnboardingJobRegistry] = None
+
+
+def get_onboarding_jobs() -> OnboardingJobRegistry:
+    """Get the global onboarding job registry"""
+    global _registry
+    if _registry is None:
+        _registry = OnboardingJobRegistry(settings.onboarding_job_ttl_seconds)
+    return _registry
@@ -0,0 +1,201 @@
+"""
+CV Text Extraction
+
+PyPDF2 is pure Python and CPU-bound: parsing a large (or deliberately
+pathological) upload on the event loop stalls every request on the worker.
+Extraction therefore runs in a separate process:
+
+- the worker streams page text back over a pipe as it goes, so whatever was
+  extracted before a budget ran out is still returned
+- page, character and time budgets stop extraction early; the time budget is
+  enforced by the parent too, which terminates a worker stuck inside a page
+- the parent waits on the pipe from a thread, so the event loop never blocks
+- concurrent extractions are capped, bounding the number of worker processes
+
+The result carries the text plus diagnostics (pages read, why it stopped,
+pages that failed) so callers can tell a complete CV from a truncated one.
+"""
+import asyncio
+import logging
+import multiprocessing
+import time
+from dataclasses import asdict, dataclass
+from io import BytesIO
+from typing import Any, Dict, List, Optional
+
+from ..config import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Seconds the parent waits past the time budget before terminating the worker
+HARD_TIMEOUT_GRACE_SECONDS = 1.0
+
+# forkserver forks workers from a clean single-threaded server, not from the app process
+_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+
+class PdfExtractionError(Exception):
+    """The PDF could not be opened or read at all."""
+
+
+@dataclass
+class PdfExtractionResult:
+    """Extracted text and how extraction went."""
+    text: str
+    pages_total: int
+    pages_read: int
+    stop_reason: str  # complete | page_limit | char_limit | time_limit | error
+    page_errors: int
+    elapsed_ms: int
+
+    @property
+    def truncated(self) -> bool:
+        return self.stop_reason != "complete"
+
+    def diagnostics(self) -> Dict[str, Any]:
+        """Everything except the text, for logs and API responses."""
+        info = asdict(self)
+        del info["text"]
+        info["chars"] = len(self.text)
+        info["truncated"] = self.truncated
+        return info
+
+
+def _extract_worker(conn, pdf_data: bytes, max_pages: int, max_chars: int, time_budget: float):
+    """
+    Worker process entry point. Sends ("start", page_count), then ("page", text)
+    per page, then ("done", stop_reason, page_errors) or ("error", message).
+    """
+    try:
+        import PyPDF2
+
+        started = time.monotonic()
+        reader = PyPDF2.PdfReader(BytesIO(pdf_data))
+        page_count = len(reader.pages)
+        conn.send(("start", page_count))
+
+        chars = 0
+        page_errors = 0
+        stop_reason = "complete"
+        for index in range(page_count):
+            if index >= max_pages:
+                stop_reason = "page_limit"
+                break
+            if time.monotonic() - started >= time_budget:
+                stop_reason = "time_limit"
+                break
+            try:
+                text = reader.pages[index].extract_text() or ""
+            except Exception:
+                page_errors += 1
+                text = ""
+            if chars + len(text) > max_chars:
+                conn.send(("page", text[:max_chars - chars]))
+                stop_reason = "char_limit"
+                break
+            chars += len(text)
+            conn.send(("page", text))
+        conn.send(("done", stop_reason, page_errors))
+    except Exception as e:
+        conn.send(("error", f"{type(e).__name__}: {e}"))
+    finally:
+        conn.close()
+
+
+def _run_worker(pdf_data: bytes, max_pages: int, max_chars: int, time_budget: float) -> Dict[str, Any]:
+    """
+    Start a worker process and receive its messages until it finishes or the
+    hard deadline passes, then make sure it is gone. Blocking; runs in a thread.
+    """
+    state: Dict[str, Any] = {
+        "pages": [], "pages_total": 0, "stop_reason": "time_limit", "page_errors": 0, "error": None
+    }
+    context = multiprocessing.get_context(_START_METHOD)
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(
+        target=_extract_worker,
+        args=(sender, pdf_data, max_pages, max_chars, time_budget),
+        daemon=True
+    )
+    deadline = time.monotonic() + time_budget + HARD_TIMEOUT_GRACE_SECONDS
+    process.start()
+    sender.close()  # The worker holds its own copy; EOF once it exits
+    try:
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not receiver.poll(remaining):
+                logger.warning("PDF extraction exceeded its time budget; terminating worker")
+                break
+            try:
+                message = receiver.recv()
+            except EOFError:
+                # Worker died without reporting (e.g. out of memory)
+                state["error"] = "worker exited unexpectedly"
+                state["stop_reason"] = "error"
+                break
+            kind = message[0]
+            if kind == "page":
+                state["pages"].append(message[1])
+            elif kind == "start":
+                state["pages_total"] = message[1]
+            elif kind == "done":
+                state["stop_reason"], state["page_errors"] = message[1], message[2]
+                break
+            else:
+                state["error"] = message[1]
+                state["stop_reason"] = "error"
+                break
+    finally:
+        receiver.close()
+        process.join(timeout=0.5)
+        if process.is_alive():
+            process.terminate()
+            process.join()
+    return state
+
+
+_semaphore: Optional[asyncio.Semaphore] = None
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(settings.pdf_extraction_max_concurrency)
+    return _semaphore
+
+
+async def extract_pdf_text(
+    pdf_data: bytes,
+    max_pages: Optional[int] = None,
+    max_chars: Optional[int] = None,
+    time_budget: Optional[float] = None
+) -> PdfExtractionResult:
+    """
+    Extract the text of a PDF in a worker process, within page, character and
+    time budgets (defaults from settings). Returns partial text when a budget
+    runs out; raises PdfExtractionError when nothing could be read.
+    """
+    max_pages = settings.pdf_extraction_max_pages if max_pages is None else max_pages
+    max_chars = settings.pdf_extraction_max_chars if max_chars is None else max_chars
+    time_budget = settings.pdf_extraction_timeout_seconds if time_budget is None else time_budget
+
+    async with _get_semaphore():
+        started = time.monotonic()
+        loop = asyncio.get_running_loop()
+        state = await loop.run_in_executor(None, _run_worker, pdf_data, max_pages, max_chars, time_budget)
+
+    pages: List[str] = state["pages"]
+    if state["error"] and not pages:
+        raise PdfExtractionError(state["error"])
+    result = PdfExtractionResult(
+        text="\n".join(pages).strip(),
+        pages_total=state["pages_total"],
+        pages_read=len(pages),
+        stop_reason=state["stop_reason"],
+        page_errors=state["page_errors"],
+        elapsed_ms=int((time.monotonic() - started) * 1000)
+    )
+    if result.truncated:
+        logger.info(f"PDF extraction stopped early: {result.diagnostics()}")
+    return result
@@ -1,8 +1,9 @@
 from typing import Dict, Any
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, undefer
 from datetime import datetime, timedelta
 from ..models import GeneratedPost, User, GeneratedImage, GeneratedPDF, PostFormat
 from ..services.linkedin_service import LinkedInService
+from ..services.media_store import load_media_base64
 from ..services.notification_service import send_notification
 from ..utils.encryption import encrypt_token, decrypt_token
 
@@ -65,12 +66,13 @@ async def publish_post_to_linkedin(post_id: str, db: Session) -> Dict[str, Any]:
     
     # Check for carousel PDF (carousel posts - PDF only, no fallback)
     if post.format == PostFormat.CAROUSEL:
-        current_pdf = db.query(GeneratedPDF).filter(
+        current_pdf = db.query(GeneratedPDF).options(undefer(GeneratedPDF.pdf_data)).filter(
             GeneratedPDF.post_id == post_id,
             GeneratedPDF.is_current == True
         ).first()
         
-        if not current_pdf or not current_pdf.pdf_data:
+        pdf_base64 = await load_media_base64(current_pdf.pdf_key, current_pdf.pdf_data) if current_pdf else None
+        if not pdf_base64:
             raise ValueError("No PDF found for this carousel post")
         
         # Upload PDF document
@@ -78,7 +80,7 @@ async def publish_post_to_linkedin(post_id: str, db: Session) -> Dict[str, Any]:
             document_urn = await LinkedInService.upload_document(
                 access_token=access_token,
                 linkedin_id=user.linkedin_id,
-                pdf_base64=current_pdf.pdf_data
+                pdf_base64=pdf_base64
             )
         except Exception as e:
             raise ValueError(f"Failed to upload PDF document to LinkedIn: {str(e)}")
@@ -87,17 +89,18 @@ async def publish_post_to_linkedin(post_id: str, db: Session) -> Dict[str, Any]:
     
     # Check for single image (image posts)
     elif post.format == PostFormat.IMAGE:
-        current_image = db.query(GeneratedImage).filter(
+        current_image = db.query(GeneratedImage).options(undefer(GeneratedImage.image_data)).filter(
             GeneratedImage.post_id == post_id,
             GeneratedImage.is_current == True
         ).first()
         
-        if current_image and current_image.image_data:
+        image_base64 = await load_media_base64(current_image.image_key, current_image.image_data) if current_image else None
+        if image_base64:
             try:
                 image_urn = await LinkedInService.upload_image(
                     access_token=access_token,
                     linkedin_id=user.linkedin_id,
-                    image_base64=current_image.image_data
+                    image_base64=image_base64
                 )
             except Exception as e:
                 # If image upload fails, publish as text-only
@@ -1,4 +1,5 @@
-from typing import Dict, List, Tuple
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
 from sqlalchemy.orm import Session
 from .ai_service import (
     generate_profile_from_cv,
@@ -13,110 +14,238 @@ from ..models import UserProfile
 from ..utils.toon_parser import parse_toon_to_dict, dict_to_toon
 import json
 
+DEFAULT_WRITING_STYLE_MD = """# Writing Style Guide
+
+## Tone & Voice
+Professional yet accessible, thought-leader focused on providing value
+
+## Sentence Structure
+- Short, punchy sentences for clarity
+- Average sentence length: 10-12 words
+- Single-line formatting for mobile readability
+
+## Formatting Preferences
+- Line breaks: One thought per line
+- Emoji usage: Minimal, strategic only
+- Hashtag strategy: 3-5 at end of post
+- White space: Generous for scannability
+
+## Content Structure
+Hook → Context → Insight → Takeaway
+
+## Key Characteristics
+- Leads with bold hooks
+- Data-driven insights
+- Clear takeaways
+- Mobile-first formatting
+"""
+
+# Stage progress callback: (stage name, "running" | "completed" | "failed")
+ProgressCallback = Callable[[str, str], None]
+
+
+class PipelineStageError(Exception):
+    """A profile pipeline stage failed; the original exception is the __cause__."""
+
+    def __init__(self, stage: str):
+        super().__init__(f"Profile pipeline stage '{stage}' failed")
+        self.stage = stage
+
+
+async def run_stage_graph(
+    stages: Dict[str, Tuple[Tuple[str, ...], Callable[..., Awaitable[Any]]]],
+    progress: Optional[ProgressCallback] = None
+) -> Dict[str, Any]:
+    """
+    Run a DAG of async stages, each as soon as the stages it depends on are done.
+
+    stages maps a name to (dependency names, coroutine function); the function
+    is called with the results of its dependencies in order, and stages must be
+    listed after their dependencies. Independent stages run concurrently.
+    On the first failure the remaining stages are cancelled and
+    PipelineStageError is raised from the stage's exception.
+    """
+    tasks: Dict[str, asyncio.Task] = {}
+
+    async def run(name: str, deps: Tuple[str, ...], func: Callable[..., Awaitable[Any]]) -> Any:
+        inputs = [await tasks[dep] for dep in deps]
+        if progress:
+            progress(name, "running")
+        try:
+            result = await func(*inputs)
+        except Exception as e:
+            if progress:
+                progress(name, "failed")
+            raise PipelineStageError(name) from e
+        if progress:
+            progress(name, "completed")
+        return result
+
+    for name, (deps, func) in stages.items():
+        tasks[name] = asyncio.create_task(run(name, deps, func))
+
+    try:
+        await asyncio.wait(tasks.values(), return_when=asyncio.FIRST_EXCEPTION)
+    finally:
+        # Cancel what is left after a failure (or when the caller is cancelled)
+        pending = [task for task in tasks.values() if not task.done()]
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+    # Report the failing stage itself, not a dependent that re-raised it
+    for task in tasks.values():
+        if task.done() and not task.cancelled() and task.exception() is not None:
+            error = task.exception()
+            if isinstance(error, PipelineStageError):
+                raise error
+    return {name: task.result() for name, task in tasks.items()}
+
+
+def _usage_entry(token_usage: Dict[str, Any]) -> Dict[str, int]:
+    return {
+        "input_tokens": token_usage.get("input_tokens", 0),
+        "output_tokens": token_usage.get("output_tokens", 0),
+        "total_tokens": token_usage.get("total_tokens", 0)
+    }
+
+
 async def build_user_profile(
     user_id: str,
     cv_text: str,
     writing_samples: List[str],
     style_choice: str,
-    db: Session
+    db: Session,
+    progress: Optional[ProgressCallback] = None
 ) -> Dict:
     """
     Build complete user profile from CV and writing samples using TOON format.
     Returns dict with profile_md, writing_style_md, context_toon, context_json, preferences
+
+    The AI calls run as a stage graph: the TOON context, profile markdown,
+    writing style analysis and preferences start together; evergreen ideas and
+    trending topics start as soon as the TOON context is parsed.
+    progress is called with (stage, status) as stages start and finish.
     """
     
     print(f"🚀 Building user profile with TOON context for user {user_id}...")
     
-    # Initialize token usage tracking
-    token_usage_details = {}
-    total_input_tokens = 0
-    total_output_tokens = 0
-    # total_tokens will be calculated as input + output at the end
-    model_name = None
-    provider_name = None
-    
-    # Step 1: Generate TOON-based profile context with intelligent defaults
-    print(f"📝 Generating TOON profile context...")
-    try:
+    async def toon_context_stage():
+        # Generate TOON-based profile context with intelligent defaults
+        print(f"📝 Generating TOON profile context...")
         toon_context, metadata = await generate_profile_context_toon(cv_text)
         print(f"✅ Generated TOON context with {len(metadata.get('ai_generated_fields', []))} AI-generated fields")
         
-        # Track TOON generation tokens
-        toon_token_usage = metadata.get('token_usage', {})
-        if toon_token_usage:
-            total_input_tokens += toon_token_usage.get("input_tokens", 0)
-            total_output_tokens += toon_token_usage.get("output_tokens", 0)
-            # Don't accumulate total_tokens - calculate it at the end as input + output
-            model_name = toon_token_usage.get("model")
-            provider_name = toon_token_usage.get("provider")
-            token_usage_details["toon_context"] = {
-                "input_tokens": toon_token_usage.get("input_tokens", 0),
-                "output_tokens": toon_token_usage.get("output_tokens", 0),
-                "total_tokens": toon_token_usage.get("total_tokens", 0)
-            }
-    except Exception as e:
-        print(f"❌ Error generating TOON context: {str(e)}")
-        # Fallback to legacy approach
-        return await build_user_profile_legacy(user_id, cv_text, writing_samples, style_choice, db)
+        # Parse TOON to get structured data
+        try:
+            parsed_context = parse_toon_to_dict(toon_context)
+            print(f"✅ Parsed TOON context successfully")
+        except Exception as e:
+            print(f"⚠️  Error parsing TOON: {str(e)}, using metadata parsed_data")
+            parsed_context = metadata.get('parsed_data', {})
+        
+        # Extract key info for content generation
+        expertise_areas = []
+        if 'expertise' in parsed_context:
+            expertise_areas = [e.get('skill', '') for e in parsed_context['expertise'] if e.get('skill')]
+        industry = parsed_context.get('industry', 'General')
+        return toon_context, metadata, parsed_context, expertise_areas, industry
     
-    # Step 2: Parse TOON to get structured data
-    try:
-        parsed_context = parse_toon_to_dict(toon_context)
-        print(f"✅ Parsed TOON context successfully")
-    except Exception as e:
-        print(f"⚠️  Error parsing TOON: {str(e)}, using metadata parsed_data")
-        parsed_context = metadata.get('parsed_data', {})
+    async def evergreen_ideas_stage(context):
+        _, _, _, expertise_areas, industry = context
+        print(f"💡 Generating evergreen content ideas...")
+        try:
+            evergreen_ideas, evergreen_token_usage = await generate_evergreen_content_ideas(
+                cv_text=cv_text,
+                expertise_areas=expertise_areas,
+                industry=industry
+            )
+            print(f"✅ Generated {len(evergreen_ideas)} evergreen content ideas")
+            return evergreen_ideas, evergreen_token_usage
+        except Exception as e:
+            print(f"❌ Error generating evergreen ideas: {str(e)}")
+            return [], None
+    
+    async def trending_topics_stage(context):
+        # Find trending topics using web search
+        _, _, _, expertise_areas, industry = context
+        print(f"🔍 Finding trending topics using web search...")
+        try:
+            if not expertise_areas:
+                print("⚠️  No expertise areas found, skipping trending topics")
+                return []
+            trending_ideas = await find_trending_topics(expertise_areas, industry)
+            print(f"✅ Found {len(trending_ideas)} trending topics")
+            return trending_ideas
+        except Exception as e:
+            print(f"❌ Error finding trending topics: {str(e)}")
+            return []
     
-    # Step 3: Extract key info for content generation
-    expertise_areas = []
-    if 'expertise' in parsed_context:
-        expertise_areas = [e.get('skill', '') for e in parsed_context['expertise'] if e.get('skill')]
+    async def writing_style_stage():
+        # Analyze writing style (only if user chose "my_style" and provided samples)
+        if style_choice == "my_style" and writing_samples:
+            print(f"✍️  Analyzing writing style from {len(writing_samples)} samples...")
+            return await analyze_writing_style(writing_samples)
+        # Use top creator format as default
+        return DEFAULT_WRITING_STYLE_MD, None
     
-    industry = parsed_context.get('industry', 'General')
+    async def profile_md_stage():
+        # Generate legacy profile.md for display
+        print(f"📄 Generating profile markdown...")
+        return await generate_profile_from_cv(cv_text)
     
-    # Step 4: Generate evergreen content ideas
-    print(f"💡 Generating evergreen content ideas...")
-    try:
-        evergreen_ideas_result, evergreen_token_usage = await generate_evergreen_content_ideas(
-            cv_text=cv_text,
-            expertise_areas=expertise_areas,
-            industry=industry
-        )
-        evergreen_ideas = evergreen_ideas_result
-        print(f"✅ Generated {len(evergreen_ideas)} evergreen content ideas")
-        total_input_tokens += evergreen_token_usage.get("input_tokens", 0)
-        total_output_tokens += evergreen_token_usage.get("output_tokens", 0)
-        # Don't accumulate total_tokens - calculate it at the end as input + output
-        token_usage_details["evergreen_ideas"] = {
-            "input_tokens": evergreen_token_usage.get("input_tokens", 0),
-            "output_tokens": evergreen_token_usage.get("output_tokens", 0),
-            "total_tokens": evergreen_token_usage.get("total_tokens", 0)
-        }
-    except Exception as e:
-        print(f"❌ Error generating evergreen ideas: {str(e)}")
-        evergreen_ideas = []
+    async def preferences_stage():
+        print(f"⚙️  Setting up preferences for style: {style_choice}...")
+        return await generate_default_preferences(style_choice)
     
-    # Step 5: Find trending topics using web search
-    print(f"🔍 Finding trending topics using web search...")
     try:
-        if expertise_areas:
-            trending_ideas = await find_trending_topics(expertise_areas, industry)
-            print(f"✅ Found {len(trending_ideas)} trending topics")
-        else:
-            print("⚠️  No expertise areas found, skipping trending topics")
-            trending_ideas = []
-    except Exception as e:
-        print(f"❌ Error finding trending topics: {str(e)}")
-        trending_ideas = []
+        results = await run_stage_graph({
+            "toon_context": ((), toon_context_stage),
+            "profile_md": ((), profile_md_stage),
+            "writing_style": ((), writing_style_stage),
+            "preferences": ((), preferences_stage),
+            "evergreen_ideas": (("toon_context",), evergreen_ideas_stage),
+            "trending_topics": (("toon_context",), trending_topics_stage),
+        }, progress)
+    except PipelineStageError as e:
+        if e.stage != "toon_context":
+            raise e.__cause__
+        print(f"❌ Error generating TOON context: {str(e.__cause__)}")
+        # Fallback to legacy approach
+        return await build_user_profile_legacy(user_id, cv_text, writing_samples, style_choice, db)
     
-    # Step 6: Add content ideas to TOON context
+    toon_context, metadata, parsed_context, _, _ = results["toon_context"]
+    evergreen_ideas, evergreen_token_usage = results["evergreen_ideas"]
+    trending_ideas = results["trending_topics"]
+    writing_style_md, writing_token_usage = results["writing_style"]
+    profile_md, profile_token_usage = results["profile_md"]
+    preferences = results["preferences"]
+    
+    # Token usage across stages (total_tokens is calculated as input + output at the end)
+    token_usage_details = {}
+    model_name = None
+    provider_name = None
+    toon_token_usage = metadata.get('token_usage', {})
+    if toon_token_usage:
+        model_name = toon_token_usage.get("model")
+        provider_name = toon_token_usage.get("provider")
+        token_usage_details["toon_context"] = _usage_entry(toon_token_usage)
+    if evergreen_token_usage is not None:
+        token_usage_details["evergreen_ideas"] = _usage_entry(evergreen_token_usage)
+    if writing_token_usage is not None:
+        token_usage_details["writing_style"] = _usage_entry(writing_token_usage)
+    token_usage_details["profile_md"] = _usage_entry(profile_token_usage)
+    total_input_tokens = sum(entry["input_tokens"] for entry in token_usage_details.values())
+    total_output_tokens = sum(entry["output_tokens"] for entry in token_usage_details.values())
+    
+    # Add content ideas to TOON context
     parsed_context['content_ideas_evergreen'] = evergreen_ideas
     parsed_context['content_ideas_trending'] = trending_ideas
     
-    # Step 6.5: Initialize additional_context as empty (user-editable, not AI-generated)
+    # Initialize additional_context as empty (user-editable, not AI-generated)
     parsed_context['additional_context'] = ""
     
-    # Step 7: Build complete TOON by appending new sections to original AI TOON
+    # Build complete TOON by appending new sections to original AI TOON
     # Preserve original AI TOON format and append content ideas as new sections
     try:
         ideas_only = {}
@@ -132,65 +261,6 @@ async def build_user_profile(
         print(f"⚠️  Error building complete TOON: {str(e)}, using original AI TOON")
         complete_toon = toon_context
     
-    # Step 8: Analyze writing style (only if user chose "my_style" and provided samples)
-    writing_style_md = None
-    if style_choice == "my_style" and writing_samples:
-        print(f"✍️  Analyzing writing style from {len(writing_samples)} samples...")
-        writing_style_result, writing_token_usage = await analyze_writing_style(writing_samples)
-        writing_style_md = writing_style_result
-        total_input_tokens += writing_token_usage.get("input_tokens", 0)
-        total_output_tokens += writing_token_usage.get("output_tokens", 0)
-        # Don't accumulate total_tokens - calculate it at the end as input + output
-        token_usage_details["writing_style"] = {
-            "input_tokens": writing_token_usage.get("input_tokens", 0),
-            "output_tokens": writing_token_usage.get("output_tokens", 0),
-            "total_tokens": writing_token_usage.get("total_tokens", 0)
-        }
-    else:
-        # Use top creator format as default
-        writing_style_md = """# Writing Style Guide
-
-## Tone & Voice
-Professional yet accessible, thought-leader focused on providing value
-
-## Sentence Structure
-- Short, punchy sentences for clarity
-- Average sentence length: 10-12 words
-- Single-line formatting for mobile readability
-
-## Formatting Preferences
-- Line breaks: One thought per line
-- Emoji usage: Minimal, strategic only
-- Hashtag strategy: 3-5 at end of post
-- White space: Generous for scannability
-
-## Content Structure
-Hook → Context → Insight → Takeaway
-
-## Key Characteristics
-- Leads with bold hooks
-- Data-driven insights
-- Clear takeaways
-- Mobile-first formatting
-"""
-    
-    # Step 9: Generate legacy profile.md for display
-    print(f"📄 Generating profile markdown...")
-    profile_md_result, profile_token_usage = await generate_profile_from_cv(cv_text)
-    profile_md = profile_md_result
-    total_input_tokens += profile_token_usage.get("input_tokens", 0)
-    total_output_tokens += profile_token_usage.get("output_tokens", 0)
-    # Don't accumulate total_tokens - calculate it at the end as input + output
-    token_usage_details["profile_md"] = {
-        "input_tokens": profile_token_usage.get("input_tokens", 0),
-        "output_tokens": profile_token_usage.get("output_tokens", 0),
-        "total_tokens": profile_token_usage.get("total_tokens", 0)
-    }
-    
-    # Step 10: Generate preferences based on style choice
-    print(f"⚙️  Setting up preferences for style: {style_choice}...")
-    preferences = await generate_default_preferences(style_choice)
-    
     print(f"✅ Profile build complete!")
     
     return {
@@ -233,31 +303,7 @@ async def build_user_profile_legacy(
         print(f"Analyzing writing style from {len(writing_samples)} samples...")
         writing_style_md = await analyze_writing_style(writing_samples)
     else:
-        writing_style_md = """# Writing Style Guide
-
-## Tone & Voice
-Professional yet accessible, thought-leader focused on providing value
-
-## Sentence Structure
-- Short, punchy sentences for clarity
-- Average sentence length: 10-12 words
-- Single-line formatting for mobile readability
-
-## Formatting Preferences
-- Line breaks: One thought per line
-- Emoji usage: Minimal, strategic only
-- Hashtag strategy: 3-5 at end of post
-- White space: Generous for scannability
-
-## Content Structure
-Hook → Context → Insight → Takeaway
-
-## Key Characteristics
-- Leads with bold hooks
-- Data-driven insights
-- Clear takeaways
-- Mobile-first formatting
-"""
+        writing_style_md = DEFAULT_WRITING_STYLE_MD
     
     # Generate context JSON
     print(f"Generating context metadata...")
@@ -289,7 +335,7 @@ Hook → Context → Insight → Takeaway
 async def update_user_profile_in_db(
     user_id: str,
     profile_data: Dict,
-    cv_data: bytes,
+    cv_data: Optional[bytes],
     cv_filename: str,
     cv_text: str,
     writing_samples: List[str],
@@ -297,6 +343,7 @@ async def update_user_profile_in_db(
 ) -> UserProfile:
     """
     Update user profile in database with generated data (including TOON context)
+    cv_data=None keeps the stored CV file, so the blob is neither loaded nor rewritten.
     """
     profile = db.query(UserProfile).filter(UserProfile.user_id == user_id).first()
     
@@ -305,7 +352,8 @@ async def update_user_profile_in_db(
         db.add(profile)
     
     # Update profile fields
-    profile.cv_data = cv_data
+    if cv_data is not None:
+        profile.cv_data = cv_data
     profile.cv_filename = cv_filename
     profile.cv_text = cv_text
     profile.profile_md = profile_data["profile_md"]
@@ -0,0 +1,107 @@
+"""
+Single-Flight Request Coalescing
+
+Concurrent callers asking for the same thing share one in-flight call
+instead of each making their own. Used for AI completions that many users
+trigger with identical inputs at the same moment (e.g. trending topics for
+the same industry and expertise during an onboarding burst): one upstream
+request, one token bill, every waiter gets the result.
+
+Only calls that are in flight at the same time are coalesced; nothing is
+cached once the call finishes.
+"""
+import asyncio
+import copy
+import hashlib
+import json
+import logging
+import re
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def _normalize(text: Optional[str]) -> str:
+    return _WHITESPACE.sub(" ", text or "").strip()
+
+
+def completion_key(
+    system_prompt: str,
+    user_message: str,
+    model: Optional[str],
+    temperature: float,
+    use_search: bool
+) -> str:
+    """Stable hash of the inputs that determine a completion (whitespace-insensitive)."""
+    payload = json.dumps(
+        [_normalize(system_prompt), _normalize(user_message), model or "", round(float(temperature), 3), bool(use_search)],
+        ensure_ascii=False,
+        separators=(",", ":")
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SingleFlight:
+    """
+    Keyed registry of in-flight calls.
+
+    The first caller for a key (the leader) starts the call as a task; later
+    callers with the same key await that task. Each caller awaits through
+    asyncio.shield, so one caller disconnecting does not cancel the shared
+    call for the others. Followers get a deep copy of the result.
+    """
+
+    def __init__(self):
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        self.calls = 0
+        self.leaders = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, call: Callable[[], Awaitable[Any]]) -> Any:
+        self.calls += 1
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            result = await asyncio.shield(task)
+            return copy.deepcopy(result)
+
+        self.leaders += 1
+        task = asyncio.ensure_future(call())
+        self._in_flight[key] = task
+        task.add_done_callback(lambda _: self._forget(key, task))
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task: asyncio.Task):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        if not task.cancelled() and task.exception() is not None:
+            # Retrieve the exception so an unobserved failure is not logged as "never retrieved"
+            logger.debug(f"Single-flight call {key[:12]} failed: {type(task.exception()).__name__}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "upstream_calls": self.leaders,
+            "coalesced": self.coalesced,
+            "coalesced_rate": round(self.coalesced / self.calls, 3) if self.calls else 0.0,
+            "in_flight": len(self._in_flight),
+        }
+
+
+# Global instance
+_single_flight: Optional[SingleFlight] = None
+
+
+def get_single_flight() -> SingleFlight:
+    """Get the global single-flight instance"""
+    global _single_flight
+    if _single_flight is None:
+        _single_flight = SingleFlight()
+    return _single_flight
+
+
+def get_single_flight_stats() -> Dict[str, Any]:
+    """Convenience function for admin monitoring"""
+    return get_single_flight().stats()
@@ -0,0 +1,194 @@
+"""
+Structured Output
+
+Callers used to ask for JSON in the prompt and then repair whatever came
+back: code fences, post_content nested inside post_content, video scripts
+returned as dicts, prose instead of JSON. Every response that could not be
+repaired became a user-initiated retry, i.e. another full LLM call.
+
+This module turns a pydantic response model into the provider-native
+structured output request:
+
+- OpenAI / OpenRouter: response_format={"type": "json_schema", ...}
+  (strict when the schema allows it)
+- Claude: a single forced tool whose input_schema is the model's schema;
+  the tool input is returned as the JSON text
+- Gemini: response_mime_type="application/json" plus response_schema
+  (JSON mode without a schema when the model uses constructs Gemini's
+  schema subset cannot express)
+
+Providers report whether the schema was enforced in token_usage
+("structured_output": True). Callers parse enforced responses with
+parse_structured() and only fall back to their legacy parsers otherwise.
+"""
+import json
+import logging
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Dict, Optional, Type, TypeVar
+
+from pydantic import BaseModel, ValidationError
+
+logger = logging.getLogger(__name__)
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+# Pydantic schema keys that carry no constraint and that some providers reject
+_ANNOTATION_KEYS = ("title", "default", "examples")
+
+
+def _resolve_refs(node: Any, definitions: Dict[str, Any]) -> Any:
+    """Inline local $refs and drop pydantic annotations, recursively."""
+    if isinstance(node, list):
+        return [_resolve_refs(item, definitions) for item in node]
+    if not isinstance(node, dict):
+        return node
+    ref = node.get("$ref")
+    if ref:
+        return _resolve_refs(definitions[ref.rsplit("/", 1)[-1]], definitions)
+    resolved = {}
+    for key, value in node.items():
+        if key in _ANNOTATION_KEYS or key == "$defs":
+            continue
+        if key == "properties":
+            # Property names are data, not schema keywords
+            resolved[key] = {name: _resolve_refs(prop, definitions) for name, prop in value.items()}
+        else:
+            resolved[key] = _resolve_refs(value, definitions)
+    return resolved
+
+
+def _is_strict_compatible(node: Any) -> bool:
+    """OpenAI strict mode needs every object to list its properties (no free-form dicts)."""
+    if isinstance(node, list):
+        return all(_is_strict_compatible(item) for item in node)
+    if not isinstance(node, dict):
+        return True
+    if node.get("type") == "object" and (not node.get("properties") or node.get("additionalProperties") not in (None, False)):
+        return False
+    children = list(node.get("properties", {}).values())
+    children += [value for key, value in node.items() if key not in ("properties", "enum")]
+    return all(_is_strict_compatible(child) for child in children)
+
+
+def _strict(node: Any) -> Any:
+    """Strict-mode form: closed objects, every property required (optionals stay nullable)."""
+    if isinstance(node, list):
+        return [_strict(item) for item in node]
+    if not isinstance(node, dict):
+        return node
+    strict = {key: value if key in ("enum", "properties") else _strict(value) for key, value in node.items()}
+    properties = node.get("properties")
+    if properties:
+        strict["properties"] = {name: _strict(prop) for name, prop in properties.items()}
+        strict["required"] = list(properties)
+        strict["additionalProperties"] = False
+    return strict
+
+
+def _gemini(node: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Gemini's OpenAPI schema subset, or None if the schema cannot be expressed in it."""
+    any_of = node.get("anyOf")
+    if any_of:
+        # Optional[X] is the only union Gemini can express (as nullable X)
+        options = [option for option in any_of if option.get("type") != "null"]
+        if len(options) != 1 or len(options) == len(any_of):
+            return None
+        converted = _gemini(options[0])
+        if converted is None:
+            return None
+        converted["nullable"] = True
+        return converted
+
+    schema_type = node.get("type")
+    if schema_type == "object":
+        properties = node.get("properties")
+        if not properties:
+            return None
+        converted_properties = {}
+        for name, prop in properties.items():
+            converted_prop = _gemini(prop)
+            if converted_prop is None:
+                return None
+            converted_properties[name] = converted_prop
+        converted = {"type": "object", "properties": converted_properties}
+        if node.get("required"):
+            converted["required"] = list(node["required"])
+        return converted
+    if schema_type == "array":
+        items = _gemini(node.get("items") or {})
+        return {"type": "array", "items": items} if items is not None else None
+    if schema_type in ("string", "integer", "number", "boolean"):
+        converted = {"type": schema_type}
+        if node.get("enum"):
+            converted["enum"] = list(node["enum"])
+            converted["format"] = "enum"
+        if node.get("description"):
+            converted["description"] = node["description"]
+        return converted
+    return None
+
+
+@dataclass(frozen=True)
+class ResponseSchema:
+    """JSON schema for a pydantic response model, in each provider's native form."""
+    name: str
+    json_schema: Dict[str, Any]  # Self-contained: $refs inlined, pydantic annotations removed
+    strict: bool  # Usable with OpenAI strict structured outputs
+
+    @classmethod
+    def from_model(cls, model: Type[BaseModel]) -> "ResponseSchema":
+        return _schema_for_model(model)
+
+    def openai_response_format(self) -> Dict[str, Any]:
+        """response_format for chat.completions (OpenAI and OpenRouter)."""
+        return {
+            "type": "json_schema",
+            "json_schema": {
+                "name": self.name,
+                "schema": _strict(self.json_schema) if self.strict else self.json_schema,
+                "strict": self.strict,
+            },
+        }
+
+    def claude_tool(self) -> Dict[str, Any]:
+        """Tool definition whose input is the structured response."""
+        return {
+            "name": self.name,
+            "description": "Return the response in this exact structure.",
+            "input_schema": self.json_schema,
+        }
+
+    def gemini_schema(self) -> Optional[Dict[str, Any]]:
+        """response_schema for Gemini, or None to use JSON mode without a schema."""
+        return _gemini(self.json_schema)
+
+
+@lru_cache(maxsize=64)
+def _schema_for_model(model: Type[BaseModel]) -> ResponseSchema:
+    raw = model.model_json_schema()
+    json_schema = _resolve_refs(raw, raw.get("$defs", {}))
+    return ResponseSchema(
+        name=model.__name__,
+        json_schema=json_schema,
+        strict=_is_strict_compatible(json_schema),
+    )
+
+
+def parse_structured(text: str, model: Type[ModelT]) -> Optional[ModelT]:
+    """
+    Validate a structured-output response against its model.
+    Returns None (caller falls back to its legacy parser) if it does not validate.
+    """
+    try:
+        return model.model_validate(json.loads(text))
+    except (json.JSONDecodeError, TypeError, ValidationError) as e:
+        logger.warning(f"Structured output for {model.__name__} did not validate: {type(e).__name__}")
+        return None
+
+
+def structured_payload(token_usage: Optional[Dict[str, Any]], text: str, model: Type[ModelT]) -> Optional[ModelT]:
+    """parse_structured for responses the provider actually constrained; None otherwise."""
+    if not token_usage or not token_usage.get("structured_output"):
+        return None
+    return parse_structured(text, model)
@@ -25,7 +25,8 @@ def log_text_generation(
     output_tokens: int,
     model: str,
     provider: str,
-    metadata: Optional[Dict] = None
+    metadata: Optional[Dict] = None,
+    cached_tokens: int = 0
 ) -> UsageTracking:
     """
     Log text generation usage
@@ -34,17 +35,18 @@ def log_text_generation(
         db: Database session
         user_id: User ID
         post_id: Post ID (optional)
-        input_tokens: Number of input tokens
+        input_tokens: Number of input tokens (including cached tokens)
         output_tokens: Number of output tokens
         model: Model name
         provider: Provider name (openai, gemini, claude)
         metadata: Additional metadata
+        cached_tokens: Input tokens served from the provider's prompt cache
     
     Returns:
         Created UsageTracking record
     """
     total_tokens = input_tokens + output_tokens
-    cost = calculate_text_generation_cost(input_tokens, output_tokens, model)
+    cost = calculate_text_generation_cost(input_tokens, output_tokens, model, cached_tokens)
     
     usage = UsageTracking(
         id=str(uuid.uuid4()),
@@ -54,6 +56,7 @@ def log_text_generation(
         input_tokens=input_tokens,
         output_tokens=output_tokens,
         total_tokens=total_tokens,
+        cached_input_tokens=cached_tokens,
         estimated_cost=cost_to_cents(cost),
         model=model,
         provider=provider,
@@ -184,7 +187,8 @@ def log_onboarding_usage(
     output_tokens: int,
     model: str,
     provider: str,
-    metadata: Optional[Dict] = None
+    metadata: Optional[Dict] = None,
+    cached_tokens: int = 0
 ) -> UsageTracking:
     """
     Log onboarding usage (CV analysis and profile generation)
@@ -192,17 +196,18 @@ def log_onboarding_usage(
     Args:
         db: Database session
         user_id: User ID
-        input_tokens: Number of input tokens
+        input_tokens: Number of input tokens (including cached tokens)
         output_tokens: Number of output tokens
         model: Model name
         provider: Provider name (openai, gemini, claude)
         metadata: Additional metadata (e.g., token breakdown by step)
+        cached_tokens: Input tokens served from the provider's prompt cache
     
     Returns:
         Created UsageTracking record
     """
     total_tokens = input_tokens + output_tokens
-    cost = calculate_text_generation_cost(input_tokens, output_tokens, model)
+    cost = calculate_text_generation_cost(input_tokens, output_tokens, model, cached_tokens)
     
     usage = UsageTracking(
         id=str(uuid.uuid4()),
@@ -212,6 +217,7 @@ def log_onboarding_usage(
         input_tokens=input_tokens,
         output_tokens=output_tokens,
         total_tokens=total_tokens,
+        cached_input_tokens=cached_tokens,
         estimated_cost=cost_to_cents(cost),
         model=model,
         provider=provider,
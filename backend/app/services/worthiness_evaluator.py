@@ -47,7 +47,8 @@ Format as JSON:
         result = await generate_completion(
             system_prompt="You are a comment worthiness evaluator. Provide objective assessments.",
             user_message=evaluation_prompt,
-            temperature=0.3
+            temperature=0.3,
+            task="comment_worthiness"
         )
         
         # Try to parse JSON from response
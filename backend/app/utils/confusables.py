@@ -0,0 +1,63 @@
+"""
+Compact Confusables Dataset
+
+Latin lookalikes from the Unicode confusables list (UTS #39) that are not
+already covered by NFKC: Cyrillic, Greek, Armenian, Cherokee and IPA /
+small-capital letters that render like ASCII letters and digits, plus the
+invisible characters used to split words past pattern filters.
+
+prompt_security folds these into a single str.translate table.
+"""
+
+# Lookalike character -> ASCII equivalent
+CONFUSABLES = {
+    # Cyrillic lowercase
+    'а': 'a', 'в': 'b', 'г': 'r', 'е': 'e', 'ё': 'e', 'һ': 'h', 'і': 'i', 'ї': 'i',
+    'ј': 'j', 'к': 'k', 'ԁ': 'd', 'ԛ': 'q', 'ԝ': 'w', 'м': 'm', 'н': 'h', 'о': 'o',
+    'п': 'n', 'р': 'p', 'с': 'c', 'ѕ': 's', 'т': 't', 'у': 'y', 'ў': 'y', 'х': 'x',
+    'ҽ': 'e', 'ӏ': 'l', 'ԍ': 'g', 'ь': 'b', 'ы': 'bl', 'ѵ': 'v', 'ү': 'y', 'ɡ': 'g',
+    # Cyrillic uppercase
+    'А': 'A', 'В': 'B', 'Е': 'E', 'Ё': 'E', 'З': '3', 'І': 'I', 'Ї': 'I', 'Ј': 'J',
+    'К': 'K', 'М': 'M', 'Н': 'H', 'О': 'O', 'Р': 'P', 'С': 'C', 'Ѕ': 'S', 'Т': 'T',
+    'У': 'Y', 'Х': 'X', 'Ү': 'Y', 'Ԁ': 'D', 'Ԛ': 'Q', 'Ԝ': 'W', 'Ӏ': 'I', 'Ь': 'b',
+    # Greek lowercase
+    'α': 'a', 'ɑ': 'a', 'β': 'b', 'γ': 'y', 'ε': 'e', 'ι': 'i', 'κ': 'k', 'ν': 'v',
+    'ο': 'o', 'ρ': 'p', 'ϲ': 'c', 'σ': 'o', 'τ': 't', 'υ': 'u', 'χ': 'x', 'ω': 'w',
+    'ϳ': 'j', 'ϱ': 'p',
+    # Greek uppercase
+    'Α': 'A', 'Β': 'B', 'Ε': 'E', 'Ζ': 'Z', 'Η': 'H', 'Ι': 'I', 'Κ': 'K', 'Μ': 'M',
+    'Ν': 'N', 'Ο': 'O', 'Ρ': 'P', 'Τ': 'T', 'Υ': 'Y', 'Χ': 'X', 'Ϲ': 'C', 'Ϳ': 'J',
+    # Armenian
+    'ա': 'w', 'զ': 'q', 'հ': 'h', 'ո': 'n', 'ս': 'u', 'ց': 'g', 'օ': 'o', 'Ս': 'U',
+    'Օ': 'O', 'Ց': 'G',
+    # Cherokee
+    'Ꭺ': 'A', 'Ᏼ': 'B', 'Ꮯ': 'C', 'Ꭰ': 'D', 'Ꭼ': 'E', 'Ꮐ': 'G', 'Ꮋ': 'H', 'Ꭻ': 'J',
+    'Ꮶ': 'K', 'Ꮮ': 'L', 'Ꮇ': 'M', 'Ꮲ': 'P', 'Ꮪ': 'S', 'Ꭲ': 'T', 'Ꮩ': 'V', 'Ꮃ': 'W',
+    'Ꮓ': 'Z',
+    # Latin small capitals and IPA
+    'ᴀ': 'a', 'ʙ': 'b', 'ᴄ': 'c', 'ᴅ': 'd', 'ᴇ': 'e', 'ɢ': 'g', 'ʜ': 'h', 'ɪ': 'i',
+    'ᴊ': 'j', 'ᴋ': 'k', 'ʟ': 'l', 'ᴍ': 'm', 'ɴ': 'n', 'ᴏ': 'o', 'ᴘ': 'p', 'ʀ': 'r',
+    'ꜱ': 's', 'ᴛ': 't', 'ᴜ': 'u', 'ᴠ': 'v', 'ᴡ': 'w', 'ʏ': 'y', 'ᴢ': 'z', 'ı': 'i',
+    'ȷ': 'j', 'ɩ': 'i', 'ʋ': 'u', 'ɯ': 'w', 'ƅ': 'b', 'ɵ': 'o', 'ƿ': 'p',
+    # Digits and letter-like symbols NFKC leaves alone
+    'Ɩ': 'l', 'ǀ': 'l', 'ⅼ': 'l', '߀': '0', '০': '0', '৪': '8', '୦': '0', 'Ꝺ': 'D',
+}
+
+# Invisible characters stripped before matching: zero-width space/joiners,
+# word joiner, BOM, soft hyphen, Mongolian vowel separator, invisible math
+# operators, combining grapheme joiner and bidirectional controls
+INVISIBLE_CHARS = (
+    '\u200b\u200c\u200d\u2060\ufeff\u00ad\u180e\u2061\u2062\u2063\u2064\u034f'
+    '\u202a\u202b\u202c\u202d\u202e\u2066\u2067\u2068\u2069\u200e\u200f'
+)
+
+# Blocks whose NFKC compatibility mappings are applied per character:
+# Latin-1 to CJK compatibility (fullwidth, letterlike, enclosed, super/subscript
+# forms), alphabetic presentation forms through halfwidth forms, mathematical
+# alphanumerics and enclosed alphanumeric supplement
+NFKC_RANGES = (
+    (0x00A0, 0x3400),
+    (0xFB00, 0xFFF0),
+    (0x1D400, 0x1D800),
+    (0x1F100, 0x1F200),
+)
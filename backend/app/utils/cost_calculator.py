@@ -85,6 +85,25 @@ PRICING = {
 }
 
 
+# Price of a cached (prompt-cache hit) input token relative to a normal input token,
+# matched by substring of the model name (OpenRouter ids like "anthropic/claude-..." included)
+CACHED_INPUT_PRICE_RATIOS = (
+    ("claude", 0.10),  # Anthropic cache reads: 10% of base input price
+    ("gemini", 0.25),  # Gemini implicit/explicit caching: 25%
+    ("gpt-", 0.50),    # OpenAI automatic prefix caching: 50%
+    ("o1", 0.50),
+)
+
+
+def cached_input_price_ratio(model: Optional[str]) -> float:
+    """Multiplier applied to the input price for cached prompt tokens (1.0 = no discount)."""
+    model_lower = (model or "").lower()
+    for marker, ratio in CACHED_INPUT_PRICE_RATIOS:
+        if marker in model_lower:
+            return ratio
+    return 1.0
+
+
 def calculate_cloudflare_image_cost(
     image_count: int,
     height: int = 1200,
@@ -149,7 +168,8 @@ def calculate_cost(
     image_count: Optional[int] = None,
     image_height: Optional[int] = None,
     image_width: Optional[int] = None,
-    image_steps: Optional[int] = None
+    image_steps: Optional[int] = None,
+    cached_tokens: int = 0
 ) -> Dict[str, float]:
     """
     Calculate estimated cost for API usage
@@ -157,12 +177,13 @@ def calculate_cost(
     Args:
         provider: "openai", "gemini", or "cloudflare"
         model: Model name (e.g., "gpt-4o", "gemini-2.5-flash")
-        input_tokens: Number of input tokens
+        input_tokens: Number of input tokens (including cached tokens)
         output_tokens: Number of output tokens
         image_count: Number of images generated (for Cloudflare)
         image_height: Image height in pixels (for Cloudflare)
         image_width: Image width in pixels (for Cloudflare)
         image_steps: Number of diffusion steps (for Cloudflare)
+        cached_tokens: Input tokens served from the prompt cache (billed at a discount)
     
     Returns:
         Dict with "input_cost", "output_cost", "total_cost" in USD
@@ -188,8 +209,11 @@ def calculate_cost(
             "total_cost": 0.0
         }
     
-    # Calculate costs (pricing is per 1M tokens)
-    input_cost = (input_tokens / 1_000_000) * model_pricing.get("input", 0)
+    # Calculate costs (pricing is per 1M tokens); cached prompt tokens are discounted
+    cached_tokens = min(max(cached_tokens, 0), input_tokens)
+    input_price = model_pricing.get("input", 0)
+    input_cost = ((input_tokens - cached_tokens) / 1_000_000) * input_price
+    input_cost += (cached_tokens / 1_000_000) * input_price * cached_input_price_ratio(model)
     output_cost = (output_tokens / 1_000_000) * model_pricing.get("output", 0)
     total_cost = input_cost + output_cost
     
@@ -215,6 +239,7 @@ def calculate_token_usage_cost(token_usage: Dict[str, any]) -> Dict[str, float]:
     input_tokens = token_usage.get("input_tokens", 0)
     output_tokens = token_usage.get("output_tokens", 0)
     image_count = token_usage.get("image_count")
+    cached_tokens = token_usage.get("cached_tokens", 0)
     
-    return calculate_cost(provider, model, input_tokens, output_tokens, image_count)
+    return calculate_cost(provider, model, input_tokens, output_tokens, image_count, cached_tokens=cached_tokens)
 
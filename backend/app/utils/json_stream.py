@@ -0,0 +1,167 @@
+"""
+Incremental JSON Field Extraction
+
+Pulls the value of a single top-level string field out of a JSON object while
+the object is still being streamed by an LLM, so the field can be forwarded to
+the client token by token before the full response can be parsed.
+"""
+import json
+from typing import Optional
+
+_SIMPLE_ESCAPES = {
+    '"': '"',
+    '\\': '\\',
+    '/': '/',
+    'b': '\b',
+    'f': '\f',
+    'n': '\n',
+    'r': '\r',
+    't': '\t',
+}
+
+
+class JsonStringFieldExtractor:
+    """
+    Streaming extractor for one JSON string field, e.g. "post_content".
+
+    Feed raw completion chunks with feed(); each call returns the newly decoded
+    characters of the field value (possibly empty). Escape sequences split
+    across chunks, including \\uXXXX surrogate pairs, are buffered until complete.
+
+    Only the first occurrence of the key is extracted. If the model emits
+    something other than a string for the field, nothing is yielded and the
+    caller should fall back to the fully parsed response.
+    """
+
+    # States
+    _SEEKING_KEY = 0
+    _SEEKING_COLON = 1
+    _SEEKING_VALUE = 2
+    _IN_VALUE = 3
+    _DONE = 4
+
+    def __init__(self, field_name: str):
+        self._needle = json.dumps(field_name)
+        self._state = self._SEEKING_KEY
+        self._buffer = ""
+        self._pending_escape = ""
+        self._pending_high_surrogate: Optional[int] = None
+
+    @property
+    def done(self) -> bool:
+        """True once the closing quote of the field value has been seen."""
+        return self._state == self._DONE
+
+    def feed(self, chunk: str) -> str:
+        """Consume a chunk and return any newly decoded field characters."""
+        if self._state == self._DONE or not chunk:
+            return ""
+
+        self._buffer += chunk
+        output = []
+
+        while self._buffer and self._state != self._DONE:
+            if self._state == self._SEEKING_KEY:
+                index = self._buffer.find(self._needle)
+                if index == -1:
+                    # Keep a tail in case the key is split across chunks
+                    self._buffer = self._buffer[-(len(self._needle) - 1):]
+                    break
+                self._buffer = self._buffer[index + len(self._needle):]
+                self._state = self._SEEKING_COLON
+
+            elif self._state == self._SEEKING_COLON:
+                stripped = self._buffer.lstrip()
+                if not stripped:
+                    self._buffer = ""
+                    break
+                if stripped[0] != ':':
+                    # Matched the key text inside a value; keep looking
+                    self._buffer = stripped
+                    self._state = self._SEEKING_KEY
+                    continue
+                self._buffer = stripped[1:]
+                self._state = self._SEEKING_VALUE
+
+            elif self._state == self._SEEKING_VALUE:
+                stripped = self._buffer.lstrip()
+                if not stripped:
+                    self._buffer = ""
+                    break
+                if stripped[0] != '"':
+                    # Not a string value; nothing to stream
+                    self._buffer = ""
+                    self._state = self._DONE
+                    break
+                self._buffer = stripped[1:]
+                self._state = self._IN_VALUE
+
+            else:  # _IN_VALUE
+                output.append(self._consume_value())
+                break
+
+        return "".join(output)
+
+    def _consume_value(self) -> str:
+        """Decode as much of the string value as the buffer allows."""
+        text = self._pending_escape + self._buffer
+        self._pending_escape = ""
+        self._buffer = ""
+        decoded = []
+        i = 0
+        length = len(text)
+
+        while i < length:
+            char = text[i]
+            if char == '"':
+                self._state = self._DONE
+                break
+            if char != '\\':
+                # Copy the run of plain characters in one slice
+                end = i + 1
+                while end < length and text[end] not in '"\\':
+                    end += 1
+                self._flush_surrogate(decoded)
+                decoded.append(text[i:end])
+                i = end
+                continue
+
+            if i + 1 >= length:
+                self._pending_escape = text[i:]
+                break
+            escape = text[i + 1]
+            if escape == 'u':
+                if i + 6 > length:
+                    self._pending_escape = text[i:]
+                    break
+                try:
+                    code_point = int(text[i + 2:i + 6], 16)
+                except ValueError:
+                    code_point = 0xFFFD
+                self._append_code_point(decoded, code_point)
+                i += 6
+                continue
+
+            self._flush_surrogate(decoded)
+            decoded.append(_SIMPLE_ESCAPES.get(escape, escape))
+            i += 2
+
+        return "".join(decoded)
+
+    def _append_code_point(self, decoded: list, code_point: int):
+        if 0xD800 <= code_point <= 0xDBFF:
+            self._flush_surrogate(decoded)
+            self._pending_high_surrogate = code_point
+            return
+        if 0xDC00 <= code_point <= 0xDFFF and self._pending_high_surrogate is not None:
+            high = self._pending_high_surrogate
+            self._pending_high_surrogate = None
+            decoded.append(chr(0x10000 + ((high - 0xD800) << 10) + (code_point - 0xDC00)))
+            return
+        self._flush_surrogate(decoded)
+        decoded.append(chr(code_point))
+
+    def _flush_surrogate(self, decoded: list):
+        if self._pending_high_surrogate is not None:
+            decoded.append('\ufffd')
+            self._pending_high_surrogate = None
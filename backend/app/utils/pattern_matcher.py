@@ -0,0 +1,228 @@
+"""
+Multi-Pattern Matcher
+
+Matches a list of regexes against a text in a single scan while keeping
+per-pattern attribution, so the cost of checking a message no longer grows
+with the number of patterns.
+
+Python's re module has no multi-pattern engine: a single alternation of all
+patterns is tried alternative-by-alternative at every position and is slower
+than the separate searches it replaces. Instead each pattern is reduced to the
+literal strings any match must contain (e.g. "reveal|show ... system prompt|
+instructions" needs one of reveal/show/... AND one of system prompt/
+instruction/...). All literals of all patterns are compiled into one
+case-insensitive trie regex - an Aho-Corasick style prefilter - and scanned
+once. Only patterns whose required literals were all seen are confirmed with
+their own regex, which for ordinary text is none or a handful. Patterns with
+no required literal (e.g. a base64 character run) are always confirmed.
+
+Literals are read from the regex parse tree of re's private parser module. If
+it is unavailable or its tree changes shape in a future Python, the prefilter
+is disabled and every pattern is confirmed: slower, never wrong.
+
+The result is exactly [p for p in patterns if p.search(text)].
+"""
+import re
+from typing import Dict, FrozenSet, Iterable, List, Optional, Sequence, Set, Tuple
+
+try:
+    from re import _parser as sre_parse  # Python 3.11+
+    from re import _constants as sre_constants
+except ImportError:  # pragma: no cover - Python < 3.11, or the private modules moved again
+    try:
+        import sre_parse
+        import sre_constants
+    except ImportError:
+        sre_parse = sre_constants = None
+
+# Literals shorter than this are only used as anchors when a pattern has no longer ones
+_MIN_ANCHOR_LENGTH = 3
+
+_REPEATS = set()
+if sre_constants is not None:
+    _REPEATS = {sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT}
+    if hasattr(sre_constants, "POSSESSIVE_REPEAT"):
+        _REPEATS.add(sre_constants.POSSESSIVE_REPEAT)
+
+# Characters re.IGNORECASE treats as equal beyond str.lower() (dotless i, long s,
+# Greek and Cyrillic variant forms, ...). Same groups as CPython's re._casefix.
+_EXTRA_CASE_GROUPS = (
+    (0x69, 0x131), (0x73, 0x17F), (0xB5, 0x3BC), (0x345, 0x3B9, 0x1FBE),
+    (0x390, 0x1FD3), (0x3B0, 0x1FE3), (0x3B2, 0x3D0), (0x3B5, 0x3F5),
+    (0x3B8, 0x3D1), (0x3BA, 0x3F0), (0x3C0, 0x3D6), (0x3C1, 0x3F1),
+    (0x3C2, 0x3C3), (0x3C6, 0x3D5), (0x432, 0x1C80), (0x434, 0x1C81),
+    (0x43E, 0x1C82), (0x441, 0x1C83), (0x442, 0x1C84, 0x1C85), (0x44A, 0x1C86),
+    (0x463, 0x1C87), (0x1C88, 0xA64B), (0x1E61, 0x1E9B), (0xFB05, 0xFB06),
+)
+_CASE_FOLD = {member: min(group) for group in _EXTRA_CASE_GROUPS for member in group}
+
+
+def fold_case(text: str) -> str:
+    """
+    Fold text so that two strings re.IGNORECASE considers equal compare equal.
+    Scanning folded text case-sensitively is several times faster than an
+    IGNORECASE scan.
+    """
+    if text.isascii():
+        return text.lower()
+    # U+0130 is the only character whose str.lower() is several characters; re uses the simple mapping
+    return text.translate({0x130: ord("i")}).lower().translate(_CASE_FOLD)
+
+
+def _anchor_sets(sets: List[FrozenSet[str]]) -> List[FrozenSet[str]]:
+    """
+    The literal sets worth scanning for. Short literals ("a", "to", "<") occur
+    at almost every position and would make the prefilter report constantly,
+    so they are only used when a pattern has nothing longer.
+    """
+    strong = [literals for literals in sets if min(map(len, literals)) >= _MIN_ANCHOR_LENGTH]
+    return strong or ([_best_literal_set(sets)] if sets else [])
+
+
+def _best_literal_set(sets: List[FrozenSet[str]]) -> Optional[FrozenSet[str]]:
+    """The most selective set: longest shortest literal, then fewest alternatives."""
+    if not sets:
+        return None
+    return max(sets, key=lambda literals: (min(map(len, literals)), -len(literals)))
+
+
+def _required_literal_sets(items) -> List[FrozenSet[str]]:
+    """
+    Sets of literals such that every match contains at least one literal of
+    each set. Sound but not complete: constructs it cannot reason about
+    (classes, optional parts, lookarounds) simply contribute nothing.
+    """
+    sets: List[FrozenSet[str]] = []
+    run: List[str] = []
+
+    def flush():
+        if run:
+            sets.append(frozenset([fold_case("".join(run))]))
+            run.clear()
+
+    for op, av in items:
+        if op is sre_constants.LITERAL:
+            run.append(chr(av))
+            continue
+        flush()
+        if op is sre_constants.SUBPATTERN:
+            sets.extend(_required_literal_sets(av[-1]))
+        elif op is sre_constants.BRANCH:
+            alternatives = [_best_literal_set(_required_literal_sets(branch)) for branch in av[1]]
+            if all(alternatives):
+                sets.append(frozenset().union(*alternatives))
+        elif op in _REPEATS and av[0] >= 1:
+            repeated = av[2]
+            if len(repeated) == 1 and repeated[0][0] is sre_constants.LITERAL:
+                # x{3} contributes "xxx", not just "x"
+                sets.append(frozenset([fold_case(chr(repeated[0][1])) * min(av[0], _MIN_ANCHOR_LENGTH)]))
+            else:
+                sets.extend(_required_literal_sets(repeated))
+    flush()
+    return sets
+
+
+def _trie_regex(literals: Iterable[str]) -> str:
+    """Regex matching any of the literals, factored as a trie; the longest literal wins at a position."""
+    trie: Dict[str, dict] = {}
+    for literal in literals:
+        node = trie
+        for char in literal:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def emit(node: Dict[str, dict]) -> str:
+        branches = [re.escape(char) + emit(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if "" in node:
+            return ("(?:" + body + ")?") if len(branches) == 1 else body + "?"
+        return body
+
+    return emit(trie)
+
+
+def _pattern_requirements(pattern: "re.Pattern[str]") -> List[FrozenSet[str]]:
+    """Anchor literal sets of a pattern; none (always confirm) if its parse tree can't be read."""
+    if sre_parse is None:
+        return []
+    try:
+        return _anchor_sets(_required_literal_sets(sre_parse.parse(pattern.pattern, pattern.flags)))
+    except Exception:
+        return []
+
+
+class PatternMatcher:
+    """One-pass matcher over compiled regexes with per-pattern attribution."""
+
+    def __init__(self, patterns: Sequence["re.Pattern[str]"]):
+        self.patterns: List["re.Pattern[str]"] = list(patterns)
+        # Per pattern: the literal sets that must all be hit (empty: always confirm)
+        self._requirements: List[List[FrozenSet[str]]] = [_pattern_requirements(pattern) for pattern in self.patterns]
+        literals = sorted({literal for sets in self._requirements for literal_set in sets for literal in literal_set})
+        # A hit on a literal is also a hit on every literal it contains (the scan reports one per position)
+        self._contained: Dict[str, Tuple[str, ...]] = {
+            literal: tuple(other for other in literals if other in literal) for literal in literals
+        }
+        # Lookahead: literals overlapping a previous hit are still reported
+        self._prefilter = re.compile("(?=(" + _trie_regex(literals) + "))") if literals else None
+
+    @property
+    def always_confirmed(self) -> List[int]:
+        """Indices of patterns without a literal anchor (confirmed on every call)."""
+        return [index for index, sets in enumerate(self._requirements) if not sets]
+
+    def _literals_in(self, text: str) -> Set[str]:
+        found: Set[str] = set()
+        if self._prefilter is None:
+            return found
+        # findall + set keeps the per-hit work in C; only distinct literals reach Python
+        for literal in set(self._prefilter.findall(fold_case(text))):
+            found.update(self._contained[literal])
+        return found
+
+    def candidates(self, text: str) -> List[int]:
+        """Indices of patterns whose required literals all occur in text."""
+        found = self._literals_in(text)
+        return [
+            index for index, sets in enumerate(self._requirements)
+            if all(not found.isdisjoint(literal_set) for literal_set in sets)
+        ]
+
+    def matching(self, text: str) -> List[int]:
+        """Indices (in pattern order) of the patterns that match anywhere in text."""
+        return [index for index in self.candidates(text) if self.patterns[index].search(text)]
+
+    def spans(self, text: str, indices: Iterable[int]) -> List[Tuple[int, int]]:
+        """Every match of the given patterns, merged into sorted non-overlapping spans."""
+        return merge_spans(match.span() for index in indices for match in self.patterns[index].finditer(text))
+
+
+def merge_spans(spans: Iterable[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """Sort spans and merge the ones that overlap or touch."""
+    merged: List[Tuple[int, int]] = []
+    for start, end in sorted(spans):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def replace_spans(text: str, spans: List[Tuple[int, int]], replace, escape=None) -> str:
+    """
+    Rebuild text with each span replaced by replace(span_text) and, optionally,
+    the text between spans passed through escape() - one join instead of one
+    re.sub pass per pattern.
+    """
+    escape = escape or (lambda segment: segment)
+    parts: List[str] = []
+    position = 0
+    for start, end in spans:
+        parts.append(escape(text[position:start]))
+        parts.append(replace(text[start:end]))
+        position = end
+    parts.append(escape(text[position:]))
+    return "".join(parts)
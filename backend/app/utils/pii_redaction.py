@@ -6,7 +6,8 @@ This helps comply with privacy regulations and reduces data exposure risk.
 """
 
 import re
-from typing import Dict, List, Tuple, Optional
+from functools import lru_cache
+from typing import Dict, Iterator, List, Tuple, Optional
 import logging
 
 logger = logging.getLogger(__name__)
@@ -103,6 +104,25 @@ REDACTION_PLACEHOLDERS = {
     "zip_code": "[ZIP_REDACTED]",
 }
 
+# Inline flags for the scoped groups of the combined scanner
+_INLINE_FLAGS = ((re.IGNORECASE, "i"), (re.VERBOSE, "x"), (re.MULTILINE, "m"), (re.DOTALL, "s"))
+
+
+@lru_cache(maxsize=16)
+def _combined_pattern(pii_types: Tuple[str, ...]) -> "re.Pattern[str]":
+    """
+    One regex over all requested PII types, each wrapped in a named group with
+    its own flags. The leftmost match wins; at the same position the type
+    listed first wins, as when types were redacted one after another.
+    """
+    groups = []
+    for pii_type in pii_types:
+        pattern = PII_PATTERNS[pii_type]
+        flags = "".join(letter for flag, letter in _INLINE_FLAGS if pattern.flags & flag)
+        body = f"(?{flags}:{pattern.pattern})" if flags else f"(?:{pattern.pattern})"
+        groups.append(f"(?P<{pii_type}>{body})")
+    return re.compile("|".join(groups))
+
 
 class PIIRedactor:
     """
@@ -128,6 +148,27 @@ class PIIRedactor:
         self.redact_types = redact_types or list(PII_PATTERNS.keys())
         self.preserve_patterns = [re.compile(p) for p in (preserve_patterns or [])]
         self.log_detections = log_detections
+        types = tuple(pii_type for pii_type in self.redact_types if pii_type in PII_PATTERNS)
+        self._scanner = _combined_pattern(types) if types else None
+    
+    def _is_preserved(self, matched_text: str) -> bool:
+        return any(preserve.search(matched_text) for preserve in self.preserve_patterns)
+    
+    def iter_pii(self, text: str) -> Iterator[Tuple[str, "re.Match[str]"]]:
+        """
+        Scan text once for all PII types.
+        
+        Args:
+            text: Text to scan for PII
+            
+        Yields:
+            (pii_type, match) for each non-preserved match, left to right
+        """
+        if not text or self._scanner is None:
+            return
+        for match in self._scanner.finditer(text):
+            if not self._is_preserved(match.group()):
+                yield match.lastgroup, match
     
     def detect_pii(self, text: str) -> Dict[str, List[str]]:
         """
@@ -139,37 +180,14 @@ class PIIRedactor:
         Returns:
             Dictionary mapping PII type to list of found values
         """
-        if not text:
-            return {}
-        
-        detected = {}
-        
-        for pii_type in self.redact_types:
-            pattern = PII_PATTERNS.get(pii_type)
-            if not pattern:
-                continue
-            
-            matches = pattern.findall(text)
-            if matches:
-                # Filter out preserved patterns
-                filtered_matches = []
-                for match in matches:
-                    should_preserve = False
-                    for preserve in self.preserve_patterns:
-                        if preserve.search(match):
-                            should_preserve = True
-                            break
-                    if not should_preserve:
-                        filtered_matches.append(match)
-                
-                if filtered_matches:
-                    detected[pii_type] = filtered_matches
-        
+        detected: Dict[str, List[str]] = {}
+        for pii_type, match in self.iter_pii(text):
+            detected.setdefault(pii_type, []).append(match.group())
         return detected
     
     def redact(self, text: str) -> Tuple[str, Dict[str, int]]:
         """
-        Redact PII from text.
+        Redact PII from text in a single scan.
         
         Args:
             text: Text containing potential PII
@@ -181,39 +199,23 @@ class PIIRedactor:
         if not text:
             return text, {}
         
-        redacted = text
-        stats = {}
+        parts: List[str] = []
+        stats: Dict[str, int] = {}
+        position = 0
         
-        for pii_type in self.redact_types:
-            pattern = PII_PATTERNS.get(pii_type)
-            placeholder = REDACTION_PLACEHOLDERS.get(pii_type, "[REDACTED]")
-            
-            if not pattern:
-                continue
-            
-            # Find all matches first
-            matches = list(pattern.finditer(redacted))
-            count = 0
-            
-            # Replace from end to start to preserve indices
-            for match in reversed(matches):
-                matched_text = match.group()
-                
-                # Check if should be preserved
-                should_preserve = False
-                for preserve in self.preserve_patterns:
-                    if preserve.search(matched_text):
-                        should_preserve = True
-                        break
-                
-                if not should_preserve:
-                    redacted = redacted[:match.start()] + placeholder + redacted[match.end():]
-                    count += 1
-            
-            if count > 0:
-                stats[pii_type] = count
+        for pii_type, match in self.iter_pii(text):
+            parts.append(text[position:match.start()])
+            parts.append(REDACTION_PLACEHOLDERS.get(pii_type, "[REDACTED]"))
+            position = match.end()
+            stats[pii_type] = stats.get(pii_type, 0) + 1
+        
+        if not stats:
+            return text, {}
+        
+        parts.append(text[position:])
+        redacted = "".join(parts)
         
-        if stats and self.log_detections:
+        if self.log_detections:
             total = sum(stats.values())
             logger.warning(
                 f"PII redacted from content: {stats} (total: {total} items)"
@@ -313,5 +315,5 @@ def detect_pii_in_text(text: str) -> bool:
     Returns:
         True if PII detected, False otherwise
     """
-    detected = get_pii_redactor().detect_pii(text)
-    return len(detected) > 0
+    # Stops at the first match
+    return next(get_pii_redactor().iter_pii(text), None) is not None
@@ -0,0 +1,73 @@
+"""
+Prompt Ruleset Versioning
+
+A conversation message reaches the model in a prompt-ready form: user
+messages sanitized against prompt injection, every message PII-redacted.
+That form is computed once when the message is written and stored with
+PROMPT_RULESET_VERSION, a fingerprint of the rules that produced it. When
+the patterns or placeholders change, the version changes and stored forms
+are recomputed lazily the next time the conversation is loaded.
+"""
+
+import hashlib
+import json
+import unicodedata
+from typing import Optional
+
+from .confusables import CONFUSABLES, INVISIBLE_CHARS, NFKC_RANGES
+from .pii_redaction import PII_PATTERNS, REDACTION_PLACEHOLDERS, get_pii_redactor
+from .prompt_security import (
+    ENCODING_PATTERNS,
+    EXTENDED_INJECTION_PATTERNS,
+    HOMOGLYPH_CHARS,
+    INJECTION_PATTERNS,
+    sanitize_user_input,
+)
+
+# Bump when sanitize_user_input or PIIRedactor.redact change their output
+# without a pattern change (e.g. a new marker format)
+SANITIZER_REVISION = 1
+
+
+def _ruleset_version() -> str:
+    redactor = get_pii_redactor()
+    rules = {
+        "injection": INJECTION_PATTERNS,
+        "extended": EXTENDED_INJECTION_PATTERNS,
+        "encoding": ENCODING_PATTERNS,
+        "homoglyphs": sorted(HOMOGLYPH_CHARS.items()),
+        "confusables": sorted(CONFUSABLES.items()),
+        "invisible": INVISIBLE_CHARS,
+        "nfkc": [list(block) for block in NFKC_RANGES],
+        "unicode": unicodedata.unidata_version,
+        "pii": [
+            [pii_type, PII_PATTERNS[pii_type].pattern, int(PII_PATTERNS[pii_type].flags)]
+            for pii_type in redactor.redact_types
+            if pii_type in PII_PATTERNS
+        ],
+        "placeholders": sorted(REDACTION_PLACEHOLDERS.items()),
+    }
+    digest = hashlib.sha256(json.dumps(rules, ensure_ascii=False).encode("utf-8")).hexdigest()
+    return f"v{SANITIZER_REVISION}-{digest[:16]}"
+
+
+PROMPT_RULESET_VERSION = _ruleset_version()
+
+
+def prompt_ready_content(role: str, content: Optional[str]) -> Optional[str]:
+    """
+    The form of a conversation message that is sent to the model.
+    
+    Args:
+        role: Message role ("user" or "assistant", any case)
+        content: Message content as stored
+        
+    Returns:
+        Content sanitized (user messages only) and PII-redacted
+    """
+    if not content:
+        return content
+    if role.lower() == "user":
+        content, _ = sanitize_user_input(content, strict=False)
+    redacted, _ = get_pii_redactor().redact(content)
+    return redacted
@@ -10,9 +10,13 @@ in LLM-powered applications. It implements multiple layers of defense:
 """
 
 import re
+import unicodedata
 from typing import List, Dict, Any, Optional, Tuple
 import html
 
+from .confusables import CONFUSABLES, INVISIBLE_CHARS, NFKC_RANGES
+from .pattern_matcher import PatternMatcher, merge_spans, replace_spans
+
 # Common prompt injection patterns to detect
 INJECTION_PATTERNS = [
     # Direct instruction overrides
@@ -151,6 +155,90 @@ _COMPILED_ENCODING_PATTERNS = [re.compile(p) for p in ENCODING_PATTERNS]
 _COMPILED_OUTPUT_LEAKAGE = [re.compile(p) for p in OUTPUT_LEAKAGE_PATTERNS]
 _COMPILED_PII_PATTERNS = [re.compile(p) for p in PII_PATTERNS]
 
+# One-pass matchers over the compiled patterns (see pattern_matcher.py).
+# Basic and extended patterns run on homoglyph-normalized text, encoding
+# patterns on the original text, so they are kept in separate matchers.
+_INJECTION_MATCHER = PatternMatcher(_COMPILED_PATTERNS + _COMPILED_EXTENDED_PATTERNS)
+_BASIC_PATTERN_COUNT = len(_COMPILED_PATTERNS)
+_ENCODING_MATCHER = PatternMatcher(_COMPILED_ENCODING_PATTERNS)
+_OUTPUT_LEAKAGE_MATCHER = PatternMatcher(_COMPILED_OUTPUT_LEAKAGE)
+
+_IDENTITY_RANGES = ((0x0000, 0x0250), (0x0370, 0x0590), (0x2000, 0x2070), (0x1F300, 0x1FB00))
+
+
+def _build_normalization_table() -> Dict[int, str]:
+    """
+    One str.translate table doing all of normalize_homoglyphs: NFKC per
+    character for the compatibility blocks, lookalikes folded to ASCII and
+    invisible characters removed.
+    """
+    lookalikes = {**CONFUSABLES, **HOMOGLYPH_CHARS}
+    table: Dict[int, str] = {}
+    for start, end in NFKC_RANGES:
+        for code in range(start, end):
+            char = chr(code)
+            compatible = unicodedata.normalize('NFKC', char)
+            if compatible != char:
+                table[code] = ''.join(lookalikes.get(c, c) for c in compatible)
+    for char, ascii_char in lookalikes.items():
+        table[ord(char)] = ascii_char
+    for char in INVISIBLE_CHARS:
+        table[ord(char)] = ''
+    # A missed lookup costs translate a raised KeyError; identity entries keep
+    # the common characters of non-ASCII text (ASCII, Latin, Greek, Cyrillic,
+    # Armenian, typographic punctuation, emoji) on the fast path
+    for start, end in _IDENTITY_RANGES:
+        for code in range(start, end):
+            table.setdefault(code, chr(code))
+    return table
+
+
+_NORMALIZATION_TABLE = _build_normalization_table()
+# Latin-1 text can only contain the Latin-1 entries; str.replace scans for each in C
+_LATIN1_NORMALIZATION = [
+    (chr(code), replacement)
+    for code, replacement in sorted(_NORMALIZATION_TABLE.items())
+    if code < 0x100 and replacement != chr(code)
+]
+
+
+def _mapped_chars_pattern(table: Dict[int, str]) -> re.Pattern:
+    """
+    Character class finding the table entries that change their character.
+    sre only builds a bitmap for BMP classes and tests other ranges one by
+    one, so mapped characters outside the BMP share a single range and each
+    match there is checked against the table.
+    """
+    mapped = sorted(code for code, replacement in table.items() if replacement != chr(code))
+    astral = [code for code in mapped if code > 0xFFFF]
+    ranges: List[List[int]] = []
+    for code in mapped:
+        if code > 0xFFFF:
+            break
+        if ranges and ranges[-1][1] == code - 1:
+            ranges[-1][1] = code
+        else:
+            ranges.append([code, code])
+    if astral:
+        ranges.append([astral[0], astral[-1]])
+    return re.compile('[' + ''.join(
+        re.escape(chr(start)) if start == end else f'{re.escape(chr(start))}-{re.escape(chr(end))}'
+        for start, end in ranges
+    ) + ']')
+
+
+# Most non-Latin-1 text (emoji, CJK, Cyrillic prose) has few distinct mapped
+# characters; one regex scan finds them and a C-level str.replace per
+# character is much cheaper than a translate lookup per character
+_MAPPED_CHARS = _mapped_chars_pattern(_NORMALIZATION_TABLE)
+# Past this many distinct mapped characters the rest goes through translate
+_MAX_REPLACE_SCANS = 32
+
+
+def _escape_delimiters(text: str) -> str:
+    """Escape characters that could be interpreted as prompt delimiters."""
+    return text.replace('<', '&lt;').replace('>', '&gt;').replace('[', '&#91;').replace(']', '&#93;')
+
 
 def detect_injection_patterns(text: str) -> List[str]:
     """
@@ -162,17 +250,19 @@ def detect_injection_patterns(text: str) -> List[str]:
     Returns:
         List of detected injection patterns (empty if clean)
     """
-    detected = []
-    for pattern in _COMPILED_PATTERNS:
-        if pattern.search(text):
-            detected.append(pattern.pattern)
-    return detected
+    return [
+        _INJECTION_MATCHER.patterns[index].pattern
+        for index in _INJECTION_MATCHER.matching(text)
+        if index < _BASIC_PATTERN_COUNT
+    ]
 
 
 def normalize_homoglyphs(text: str) -> str:
     """
     Normalize Unicode homoglyph characters to their ASCII equivalents.
     This prevents attackers from using Cyrillic/Greek lookalikes to bypass filters.
+    Compatibility forms (fullwidth, mathematical, enclosed letters) are NFKC-folded
+    and zero-width characters removed, using one precomputed translate table.
     
     Args:
         text: Text potentially containing homoglyphs
@@ -180,10 +270,70 @@ def normalize_homoglyphs(text: str) -> str:
     Returns:
         Text with homoglyphs replaced by ASCII equivalents
     """
-    normalized = text
-    for homoglyph, ascii_char in HOMOGLYPH_CHARS.items():
-        normalized = normalized.replace(homoglyph, ascii_char)
-    return normalized
+    if text.isascii():
+        return text
+    try:
+        text.encode('latin-1')
+    except UnicodeEncodeError:
+        return _normalize_mapped_chars(text)
+    # str.translate looks up every character in the table; for Latin-1 text a
+    # few C-level replace scans are much cheaper
+    for char, replacement in _LATIN1_NORMALIZATION:
+        if char in text:
+            text = text.replace(char, replacement)
+    return text
+
+
+def _normalize_mapped_chars(text: str) -> str:
+    """Apply the normalization table to text outside Latin-1."""
+    match = _MAPPED_CHARS.search(text)
+    scans = 0
+    # Replacements contain no mapped characters, so everything before the
+    # current match is final and each distinct character needs one replace
+    while match is not None:
+        char = match.group()
+        replacement = _NORMALIZATION_TABLE.get(ord(char), char)
+        if replacement == char:
+            match = _MAPPED_CHARS.search(text, match.end())
+            continue
+        if scans == _MAX_REPLACE_SCANS:
+            return text[:match.start()] + text[match.start():].translate(_NORMALIZATION_TABLE)
+        scans += 1
+        text = text.replace(char, replacement)
+        match = _MAPPED_CHARS.search(text, match.start())
+    return text
+
+
+def _normalized_spans(text: str, normalized: str, spans: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """Map spans of normalize_homoglyphs(text) back to positions in text."""
+    if normalized is text:
+        return spans
+    # Original index of each normalized character
+    origins: List[int] = []
+    for index, char in enumerate(text):
+        origins.extend([index] * len(_NORMALIZATION_TABLE.get(ord(char), char)))
+    origins.append(len(text))
+    return [(origins[start], origins[end - 1] + 1 if end > start else origins[start]) for start, end in spans]
+
+
+def _injection_indices(text: str, normalized: str) -> List[int]:
+    """
+    Injection patterns matching the homoglyph-normalized text, or the original
+    text when normalization changed it: native-script patterns (e.g. Russian)
+    no longer match once lookalike letters are folded to Latin.
+    """
+    indices = _INJECTION_MATCHER.matching(normalized)
+    if normalized != text:
+        indices = sorted(set(indices).union(_INJECTION_MATCHER.matching(text)))
+    return indices
+
+
+def _injection_spans(text: str, normalized: str, indices: List[int]) -> List[Tuple[int, int]]:
+    """Merged spans in text of the given injection patterns (matched on both forms)."""
+    spans = _normalized_spans(text, normalized, _INJECTION_MATCHER.spans(normalized, indices))
+    if normalized != text:
+        spans = merge_spans(spans + _INJECTION_MATCHER.spans(text, indices))
+    return spans
 
 
 def detect_extended_injection(text: str) -> Dict[str, List[str]]:
@@ -211,20 +361,14 @@ def detect_extended_injection(text: str) -> Dict[str, List[str]]:
     # Normalize homoglyphs before detection
     normalized_text = normalize_homoglyphs(text)
     
-    # Check basic patterns
-    for pattern in _COMPILED_PATTERNS:
-        if pattern.search(normalized_text):
-            result['basic'].append(pattern.pattern)
-    
-    # Check extended patterns
-    for pattern in _COMPILED_EXTENDED_PATTERNS:
-        if pattern.search(normalized_text):
-            result['extended'].append(pattern.pattern)
+    # Check basic and extended patterns in one scan
+    for index in _injection_indices(text, normalized_text):
+        category = 'basic' if index < _BASIC_PATTERN_COUNT else 'extended'
+        result[category].append(_INJECTION_MATCHER.patterns[index].pattern)
     
     # Check encoding patterns
-    for pattern in _COMPILED_ENCODING_PATTERNS:
-        if pattern.search(text):  # Use original text for encoding detection
-            result['encoding'].append(pattern.pattern)
+    for index in _ENCODING_MATCHER.matching(text):  # Use original text for encoding detection
+        result['encoding'].append(_ENCODING_MATCHER.patterns[index].pattern)
     
     # Calculate risk level
     total_detections = len(result['basic']) + len(result['extended']) + len(result['encoding'])
@@ -254,11 +398,7 @@ def detect_output_leakage(output: str) -> List[str]:
     Returns:
         List of detected leakage patterns
     """
-    detected = []
-    for pattern in _COMPILED_OUTPUT_LEAKAGE:
-        if pattern.search(output):
-            detected.append(pattern.pattern)
-    return detected
+    return [_OUTPUT_LEAKAGE_MATCHER.patterns[index].pattern for index in _OUTPUT_LEAKAGE_MATCHER.matching(output)]
 
 
 def detect_pii(text: str) -> Dict[str, List[str]]:
@@ -317,13 +457,13 @@ def sanitize_output(output: str, user_input: str = "") -> Tuple[str, Dict[str, A
     sanitized = output
     
     # Check for system leakage
-    leakage = detect_output_leakage(output)
-    if leakage:
-        issues['leakage_detected'] = leakage
+    leakage_indices = _OUTPUT_LEAKAGE_MATCHER.matching(output)
+    if leakage_indices:
+        issues['leakage_detected'] = [_OUTPUT_LEAKAGE_MATCHER.patterns[index].pattern for index in leakage_indices]
         issues['sanitized'] = True
         # Redact leaked content
-        for pattern in _COMPILED_OUTPUT_LEAKAGE:
-            sanitized = pattern.sub('[CONTENT FILTERED]', sanitized)
+        spans = _OUTPUT_LEAKAGE_MATCHER.spans(output, leakage_indices)
+        sanitized = replace_spans(output, spans, lambda match: '[CONTENT FILTERED]')
     
     # Check for PII
     pii = detect_pii(output)
@@ -363,34 +503,34 @@ def sanitize_user_input(text: str, strict: bool = False, use_extended: bool = Tr
     # Normalize homoglyphs first to catch Unicode bypass attempts
     normalized_text = normalize_homoglyphs(text)
     
-    # Use extended detection for comprehensive coverage
+    # One scan attributes every matching pattern; the same indices drive substitution
+    injection_indices = _injection_indices(text, normalized_text)
     if use_extended:
-        detection_result = detect_extended_injection(text)
-        all_patterns = detection_result['basic'] + detection_result['extended'] + detection_result['encoding']
-        detected_patterns = all_patterns
+        detected_patterns = [_INJECTION_MATCHER.patterns[index].pattern for index in injection_indices]
+        detected_patterns += [_ENCODING_MATCHER.patterns[index].pattern for index in _ENCODING_MATCHER.matching(text)]
     else:
-        detected_patterns = detect_injection_patterns(normalized_text)
+        injection_indices = [index for index in injection_indices if index < _BASIC_PATTERN_COUNT]
+        detected_patterns = [_INJECTION_MATCHER.patterns[index].pattern for index in injection_indices]
     
     if not detected_patterns:
         return text, []
     
-    sanitized = text
+    # Spans found in the normalized text are mapped back onto the original;
+    # only patterns that matched are re-run
+    spans = _injection_spans(text, normalized_text, injection_indices)
     
     if strict:
         # Remove detected patterns entirely
-        for pattern in _COMPILED_PATTERNS:
-            sanitized = pattern.sub('[REDACTED]', sanitized)
-        for pattern in _COMPILED_EXTENDED_PATTERNS:
-            sanitized = pattern.sub('[REDACTED]', sanitized)
+        sanitized = replace_spans(text, spans, lambda match: '[REDACTED]')
     else:
-        # Escape special characters that could be interpreted as delimiters
-        sanitized = sanitized.replace('<', '&lt;').replace('>', '&gt;')
-        sanitized = sanitized.replace('[', '&#91;').replace(']', '&#93;')
-        # Add visual markers around suspicious content
-        for pattern in _COMPILED_PATTERNS:
-            sanitized = pattern.sub(r'[USER_INPUT: \g<0>]', sanitized)
-        for pattern in _COMPILED_EXTENDED_PATTERNS:
-            sanitized = pattern.sub(r'[USER_INPUT: \g<0>]', sanitized)
+        # Escape special characters that could be interpreted as delimiters and
+        # add visual markers around suspicious content
+        sanitized = replace_spans(
+            text,
+            spans,
+            lambda match: f'[USER_INPUT: {_escape_delimiters(match)}]',
+            escape=_escape_delimiters,
+        )
     
     return sanitized, detected_patterns
 
@@ -89,7 +89,8 @@ class RateLimiter:
     def check_rate_limit(
         self,
         user_id: str,
-        endpoint: str = "default"
+        endpoint: str = "default",
+        cost: int = 1
     ) -> Tuple[bool, Optional[Dict]]:
         """
         Check if a request should be allowed.
@@ -97,6 +98,8 @@ class RateLimiter:
         Args:
             user_id: Unique user identifier
             endpoint: Optional endpoint identifier for granular limiting
+            cost: Requests this call counts as (e.g. one per post of a bulk
+                generation); all of them must fit or none are recorded
             
         Returns:
             Tuple of (allowed: bool, rate_limit_info: dict or None)
@@ -127,7 +130,7 @@ class RateLimiter:
             state.day_requests = [ts for ts in state.day_requests if ts > day_cutoff]
             
             # Check minute limit
-            if len(state.minute_requests) >= self.config.requests_per_minute:
+            if len(state.minute_requests) + cost > self.config.requests_per_minute:
                 oldest = min(state.minute_requests)
                 retry_after = int(oldest + self.config.minute_window - current_time) + 1
                 
@@ -146,7 +149,7 @@ class RateLimiter:
                 }
             
             # Check daily limit
-            if len(state.day_requests) >= self.config.requests_per_day:
+            if len(state.day_requests) + cost > self.config.requests_per_day:
                 oldest = min(state.day_requests)
                 retry_after = int(oldest + self.config.day_window - current_time) + 1
                 
@@ -168,8 +171,8 @@ class RateLimiter:
                 }
             
             # Request allowed - record it
-            state.minute_requests.append(current_time)
-            state.day_requests.append(current_time)
+            state.minute_requests.extend([current_time] * cost)
+            state.day_requests.extend([current_time] * cost)
             
             return True, None
     
@@ -234,18 +237,19 @@ def get_rate_limiter() -> RateLimiter:
     return _rate_limiter
 
 
-def check_rate_limit(user_id: str, endpoint: str = "generation") -> Tuple[bool, Optional[Dict]]:
+def check_rate_limit(user_id: str, endpoint: str = "generation", cost: int = 1) -> Tuple[bool, Optional[Dict]]:
     """
     Convenience function to check rate limit.
     
     Args:
         user_id: User ID to check
         endpoint: Endpoint identifier
+        cost: Requests this call counts as
         
     Returns:
         Tuple of (allowed, error_info)
     """
-    return get_rate_limiter().check_rate_limit(user_id, endpoint)
+    return get_rate_limiter().check_rate_limit(user_id, endpoint, cost)
 
 
 def get_rate_limit_headers(user_id: str, endpoint: str = "generation") -> Dict[str, str]:
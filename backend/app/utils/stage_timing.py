@@ -0,0 +1,51 @@
+"""
+Stage Timing for Multi-Call Pipelines
+
+Records how long each stage of a request pipeline takes (main completion,
+image prompts, conversation title, ...) and runs independent stages
+concurrently in an asyncio task group, so a request pays the slowest of
+its independent LLM round trips instead of their sum.
+"""
+import asyncio
+import time
+from contextlib import contextmanager
+from typing import Any, Awaitable, Dict, Iterator
+
+
+class StageTimer:
+    """Collects per-stage wall-clock timings in milliseconds."""
+
+    def __init__(self):
+        self.timings_ms: Dict[str, float] = {}
+
+    @contextmanager
+    def measure(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings_ms[name] = round((time.perf_counter() - start) * 1000, 1)
+
+    async def run(self, name: str, awaitable: Awaitable[Any]) -> Any:
+        """Await one stage and record its duration."""
+        with self.measure(name):
+            return await awaitable
+
+    async def run_parallel(self, stages: Dict[str, Awaitable[Any]]) -> Dict[str, Any]:
+        """
+        Run independent stages concurrently and return their results by name.
+
+        Each stage is timed individually; the wall time of the whole group is
+        recorded as "parallel[<names>]". If a stage raises, the others are
+        cancelled (task group semantics) and the first error is re-raised
+        unwrapped, so callers' existing except clauses still match.
+        """
+        if not stages:
+            return {}
+        with self.measure(f"parallel[{'+'.join(stages)}]"):
+            try:
+                async with asyncio.TaskGroup() as group:
+                    tasks = {name: group.create_task(self.run(name, awaitable)) for name, awaitable in stages.items()}
+            except BaseExceptionGroup as errors:
+                raise errors.exceptions[0]
+        return {name: task.result() for name, task in tasks.items()}
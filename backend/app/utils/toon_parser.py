@@ -8,6 +8,29 @@ import re
 import json
 
 
+# A line is classified with one match: tabular array header ("expertise[5]{skill,level}:"),
+# indexed/simple array ("content_goals[0]: value"), key-value ("name: John Doe") or
+# nested object start ("personal_info:")
+_LINE_PATTERN = re.compile(
+    r'(?P<key>\w+)(?:'
+    r'\[\d+\](?:\{(?P<fields>[^}]+)\}:\s*$|:\s*(?P<items>.+)$)'
+    r'|:\s*(?P<value>.+)$'
+    r'|:\s*$)'
+)
+_TABULAR_HEADER_PATTERN = re.compile(r'(\w+)\[\d+\]\{[^}]+\}:\s*$')
+_KEY_PREFIX_PATTERN = re.compile(r'[A-Za-z_]\w*:')
+_NUMBERED_KEY_PATTERN = re.compile(r'^(.+?)(\d+)$')
+
+# Top-level section headers as written by dict_to_toon, and the start of the next section
+_SECTION_HEADER_PATTERN = re.compile(r'^(\w+)(?:\[\d+\](?:\{[^}\n]*\})?)?:', re.MULTILINE)
+_NEXT_SECTION_PATTERN = re.compile(r'\n(?=[^ \n])')
+_SECTION_NAME_PATTERN = re.compile(r'\w+')
+
+# Escaped character or run of plain characters in a CSV row; a trailing lone backslash is literal
+_CSV_TOKEN_PATTERN = re.compile(r'([^\\,]+|\\$)|\\(.)|(,)', re.DOTALL)
+_CSV_ESCAPES = {'n': '\n', 't': '\t'}
+
+
 def parse_toon_to_dict(toon_string: str) -> Dict[str, Any]:
     """
     Parse TOON format string into Python dictionary
@@ -20,57 +43,58 @@ def parse_toon_to_dict(toon_string: str) -> Dict[str, Any]:
     """
     result = {}
     lines = toon_string.strip().split('\n')
+    line_count = len(lines)
     i = 0
     
-    while i < len(lines):
+    while i < line_count:
         line = lines[i].rstrip()
         
-        # Skip empty lines
-        if not line.strip():
+        # Skip empty lines and lines that are not TOON entries
+        match = _LINE_PATTERN.match(line) if line else None
+        if not match:
             i += 1
             continue
+        field_name = match.group('key')
             
-        # Check if this is a tabular array declaration (e.g., "expertise[5]{skill,level}:")
+        # Tabular array declaration (e.g., "expertise[5]{skill,level}:")
         # AI may use [N] as either a row COUNT or an INDEX — handle both cases
-        tabular_match = re.match(r'^(\w+)\[(\d+)\]\{([^}]+)\}:\s*$', line)
-        if tabular_match:
-            field_name = tabular_match.group(1)
-            fields = [f.strip() for f in tabular_match.group(3).split(',')]
+        if match.group('fields') is not None:
+            fields = [f.strip() for f in match.group('fields').split(',')]
+            field_count = len(fields)
             
             # Read data rows until we hit a non-data line (empty line, new section header,
             # or unindented non-data line). Ignore the [N] count — AI uses it inconsistently.
             rows = []
             i += 1
-            while i < len(lines):
-                row_line = lines[i].strip()
+            while i < line_count:
+                raw_line = lines[i]
+                row_line = raw_line.strip()
                 if not row_line:
                     break
                 
-                # Stop if we hit a new tabular declaration for a DIFFERENT field
-                next_tab = re.match(r'^(\w+)\[\d+\]\{[^}]+\}:\s*$', row_line)
-                if next_tab and next_tab.group(1) != field_name:
-                    break
-                
-                # If it's another declaration for the SAME field (indexed entries), skip header
-                if next_tab and next_tab.group(1) == field_name:
-                    i += 1
-                    continue
+                # Another tabular declaration: stop for a DIFFERENT field,
+                # skip the header for the SAME field (indexed entries)
+                if row_line[-1] == ':':
+                    next_tab = _TABULAR_HEADER_PATTERN.match(row_line)
+                    if next_tab:
+                        if next_tab.group(1) != field_name:
+                            break
+                        i += 1
+                        continue
                 
                 # Stop if we hit an unindented key-value or section header
-                if re.match(r'^[A-Za-z_]\w*:', row_line) and not lines[i].startswith(' '):
+                if raw_line[0] != ' ' and _KEY_PREFIX_PATTERN.match(row_line):
                     break
                     
                 # Parse the data row — handle excess commas by merging into last field
                 values = _split_csv_line(row_line)
-                if len(values) == len(fields):
-                    row_dict = {f: _parse_value(v) for f, v in zip(fields, values)}
-                    rows.append(row_dict)
-                elif len(values) > len(fields) and len(fields) >= 2:
+                if len(values) == field_count:
+                    rows.append({f: _parse_value(v) for f, v in zip(fields, values)})
+                elif len(values) > field_count and field_count >= 2:
                     # Merge excess values into the last field (for descriptions with commas)
-                    merged = values[:len(fields) - 1]
-                    merged.append(','.join(values[len(fields) - 1:]))
-                    row_dict = {f: _parse_value(v) for f, v in zip(fields, merged)}
-                    rows.append(row_dict)
+                    merged = values[:field_count - 1]
+                    merged.append(','.join(values[field_count - 1:]))
+                    rows.append({f: _parse_value(v) for f, v in zip(fields, merged)})
                 i += 1
             
             # Append to existing list if field was already seen (indexed entries)
@@ -80,14 +104,12 @@ def parse_toon_to_dict(toon_string: str) -> Dict[str, Any]:
                 result[field_name] = rows
             continue
         
-        # Check if this is a simple indexed array (e.g., "content_goals[0]: value")
+        # Simple indexed array (e.g., "content_goals[0]: value")
         # AI outputs content_goals[0], content_goals[1], etc. as individual entries
-        simple_array_match = re.match(r'^(\w+)\[(\d+)\]:\s*(.+)$', line)
-        if simple_array_match:
-            field_name = simple_array_match.group(1)
-            values_str = simple_array_match.group(3)
+        values_str = match.group('items')
+        if values_str is not None:
             # Check if this is a multi-value array or single indexed entry
-            values = [_parse_value(v.strip()) for v in _split_csv_line(values_str)]
+            values = [_parse_value(v) for v in _split_csv_line(values_str)]
             # Append to existing list if field already exists (indexed entries)
             if field_name in result and isinstance(result[field_name], list):
                 result[field_name].extend(values)
@@ -96,30 +118,21 @@ def parse_toon_to_dict(toon_string: str) -> Dict[str, Any]:
             i += 1
             continue
         
-        # Check if this is a simple key-value pair (e.g., "name: John Doe")
-        kv_match = re.match(r'^(\w+):\s*(.+)$', line)
-        if kv_match:
-            key = kv_match.group(1)
-            value = kv_match.group(2).strip()
-            result[key] = _parse_value(value)
+        # Simple key-value pair (e.g., "name: John Doe")
+        value = match.group('value')
+        if value is not None:
+            result[field_name] = _parse_value(value)
             i += 1
             continue
         
-        # Check if this is a nested object start (key with colon but no value)
-        nested_match = re.match(r'^(\w+):\s*$', line)
-        if nested_match:
-            key = nested_match.group(1)
-            # Parse nested lines (indented)
-            nested_lines = []
-            i += 1
-            while i < len(lines) and lines[i].startswith('  '):
-                nested_lines.append(lines[i][2:])  # Remove 2-space indent
-                i += 1
-            if nested_lines:
-                result[key] = parse_toon_to_dict('\n'.join(nested_lines))
-            continue
-        
+        # Nested object start (key with colon but no value): parse the indented lines
+        nested_lines = []
         i += 1
+        while i < line_count and lines[i].startswith('  '):
+            nested_lines.append(lines[i][2:])  # Remove 2-space indent
+            i += 1
+        if nested_lines:
+            result[field_name] = parse_toon_to_dict('\n'.join(nested_lines))
     
     # Post-processing: consolidate numbered keys (e.g., expertise1, expertise2 → expertise list)
     result = _consolidate_numbered_keys(result)
@@ -167,6 +180,51 @@ def dict_to_toon(data: Dict[str, Any], indent: int = 0) -> str:
     return '\n'.join(lines)
 
 
+def toon_section_keys(toon_string: str) -> List[str]:
+    """
+    Top-level section names of a TOON document, in order
+
+    Args:
+        toon_string: TOON formatted string
+
+    Returns:
+        Keys of the unindented section headers
+    """
+    return _SECTION_HEADER_PATTERN.findall(toon_string)
+
+
+def patch_toon_field(toon_string: str, key: str, value: Any) -> str:
+    """
+    Replace one top-level section of a TOON document without a parse/serialize cycle
+
+    Only the section for key is serialized; the rest of the document is kept
+    as is. For a document written by dict_to_toon the result equals
+    dict_to_toon of the updated dict. A key without a section is appended.
+
+    Args:
+        toon_string: TOON formatted string
+        key: Top-level field name (letters, digits and underscores)
+        value: New value of the field
+
+    Returns:
+        TOON formatted string with the section replaced
+    """
+    if not _SECTION_NAME_PATTERN.fullmatch(key):
+        raise ValueError(f"Not a TOON section name: {key!r}")
+
+    section = dict_to_toon({key: value})
+    header = re.search(
+        rf'^{key}(?::(?: |$)|\[\d+\](?:\{{[^}}\n]*\}})?:)', toon_string, re.MULTILINE
+    )
+    if not header:
+        return f"{toon_string}\n{section}" if toon_string else section
+
+    # The section runs until the next unindented, non-empty line
+    next_section = _NEXT_SECTION_PATTERN.search(toon_string, header.end())
+    end = next_section.start() if next_section else len(toon_string)
+    return toon_string[:header.start()] + section + toon_string[end:]
+
+
 def validate_toon_structure(toon_string: str) -> bool:
     """
     Validate TOON syntax
@@ -211,7 +269,7 @@ def _consolidate_numbered_keys(data: Dict[str, Any]) -> Dict[str, Any]:
     
     for key, value in data.items():
         # Match keys ending with a number (e.g., expertise1, target_audience3)
-        match = re.match(r'^(.+?)(\d+)$', key)
+        match = _NUMBERED_KEY_PATTERN.match(key) if key[-1:].isdigit() else None
         if match:
             base_name = match.group(1)
             index = int(match.group(2))
@@ -306,40 +364,25 @@ def _parse_curly_brace_value(value: Any, field_names: List[str]) -> Union[Dict[s
 
 def _split_csv_line(line: str) -> List[str]:
     """
-    Split a CSV line respecting quoted strings and escaped characters
+    Split a CSV line respecting escaped characters
     """
+    if '\\' not in line:
+        # No escapes: a plain split (a trailing comma does not add an empty value)
+        values = line.split(',')
+        if not values[-1]:
+            values.pop()
+        return [value.strip() for value in values]
+    
     values = []
     current = []
-    in_quotes = False
-    i = 0
-    
-    while i < len(line):
-        char = line[i]
-        
-        if char == '\\' and i + 1 < len(line):
-            # Escape sequence
-            next_char = line[i + 1]
-            if next_char == 'n':
-                current.append('\n')
-            elif next_char == 't':
-                current.append('\t')
-            elif next_char == '\\':
-                current.append('\\')
-            elif next_char == ',':
-                current.append(',')
-            else:
-                current.append(next_char)
-            i += 2
-            continue
-        
-        if char == ',' and not in_quotes:
+    for text, escaped, comma in _CSV_TOKEN_PATTERN.findall(line):
+        if comma:
             values.append(''.join(current).strip())
             current = []
-            i += 1
-            continue
-        
-        current.append(char)
-        i += 1
+        elif text:
+            current.append(text)
+        else:
+            current.append(_CSV_ESCAPES.get(escaped, escaped))
     
     if current:
         values.append(''.join(current).strip())
@@ -352,18 +395,21 @@ def _parse_value(value: str) -> Any:
     Parse a string value into appropriate Python type
     """
     value = value.strip()
+    lowered = value.lower()
     
     # Check for boolean
-    if value.lower() == 'true':
+    if lowered == 'true':
         return True
-    if value.lower() == 'false':
+    if lowered == 'false':
         return False
     
     # Check for null/none
-    if value.lower() in ('null', 'none', ''):
+    if lowered in ('null', 'none', ''):
         return None
     
-    # Try to parse as number
+    # Try to parse as number (int() and float() only accept these leading characters)
+    if not (value[0].isdigit() or value[0] in '+-.'):
+        return value
     try:
         if '.' in value:
             return float(value)
@@ -0,0 +1,27 @@
+"""add cached_input_tokens to usage_tracking
+
+Revision ID: c3d4e5f6a7b8
+Revises: a79a20d7a40f
+Create Date: 2026-10-16 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3d4e5f6a7b8'
+down_revision: Union[str, None] = 'a79a20d7a40f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Prompt-cache hits reported by the LLM provider (subset of input_tokens)
+    op.add_column('usage_tracking', sa.Column('cached_input_tokens', sa.Integer(), nullable=True, server_default='0'))
+
+
+def downgrade() -> None:
+    op.drop_column('usage_tracking', 'cached_input_tokens')
@@ -0,0 +1,29 @@
+"""add history summary to conversations
+
+Revision ID: d4e5f6a7b8c9
+Revises: c3d4e5f6a7b8
+Create Date: 2026-10-16 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4e5f6a7b8c9'
+down_revision: Union[str, None] = 'c3d4e5f6a7b8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Rolling summary of older conversation turns, and how many leading messages it covers
+    op.add_column('conversations', sa.Column('history_summary', sa.Text(), nullable=True))
+    op.add_column('conversations', sa.Column('history_summary_message_count', sa.Integer(), nullable=True, server_default='0'))
+
+
+def downgrade() -> None:
+    op.drop_column('conversations', 'history_summary_message_count')
+    op.drop_column('conversations', 'history_summary')
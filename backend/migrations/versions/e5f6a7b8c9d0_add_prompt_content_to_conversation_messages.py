@@ -0,0 +1,30 @@
+"""add prompt content to conversation messages
+
+Revision ID: e5f6a7b8c9d0
+Revises: d4e5f6a7b8c9
+Create Date: 2026-10-16 21:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5f6a7b8c9d0'
+down_revision: Union[str, None] = 'd4e5f6a7b8c9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Sanitized + PII-redacted content and the ruleset version that produced it.
+    # Existing rows stay NULL and are filled lazily when their conversation is loaded.
+    op.add_column('conversation_messages', sa.Column('prompt_content', sa.Text(), nullable=True))
+    op.add_column('conversation_messages', sa.Column('prompt_ruleset_version', sa.String(length=32), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('conversation_messages', 'prompt_ruleset_version')
+    op.drop_column('conversation_messages', 'prompt_content')
@@ -0,0 +1,56 @@
+"""add media store keys to generated images and pdfs
+
+Revision ID: f6a7b8c9d0e1
+Revises: e5f6a7b8c9d0
+Create Date: 2026-10-16 23:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f6a7b8c9d0e1'
+down_revision: Union[str, None] = 'e5f6a7b8c9d0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Images and carousel PDFs now live in the content-addressed media store;
+    # rows keep the key. The inline base64 columns become nullable: existing rows
+    # keep their data (and are still served from it) until
+    # scripts/migrate_media_to_store.py moves them out in batches.
+    op.add_column('generated_images', sa.Column('image_key', sa.String(length=80), nullable=True))
+    op.add_column('generated_pdfs', sa.Column('pdf_key', sa.String(length=80), nullable=True))
+    op.add_column('generated_pdfs', sa.Column('slide_keys', sa.JSON(), nullable=True))
+
+    conn = op.get_bind()
+    if 'mysql' in str(conn.dialect).lower():
+        op.execute('ALTER TABLE generated_images MODIFY image_data LONGTEXT NULL')
+        op.execute('ALTER TABLE generated_pdfs MODIFY pdf_data LONGTEXT NULL')
+    else:
+        with op.batch_alter_table('generated_images') as batch_op:
+            batch_op.alter_column('image_data', existing_type=sa.Text(), nullable=True)
+        with op.batch_alter_table('generated_pdfs') as batch_op:
+            batch_op.alter_column('pdf_data', existing_type=sa.Text(), nullable=True)
+
+
+def downgrade() -> None:
+    # Rows already moved to the media store have NULL inline data; downgrading
+    # loses access to them unless they are copied back first.
+    conn = op.get_bind()
+    if 'mysql' in str(conn.dialect).lower():
+        op.execute('ALTER TABLE generated_images MODIFY image_data LONGTEXT NOT NULL')
+        op.execute('ALTER TABLE generated_pdfs MODIFY pdf_data LONGTEXT NOT NULL')
+    else:
+        with op.batch_alter_table('generated_images') as batch_op:
+            batch_op.alter_column('image_data', existing_type=sa.Text(), nullable=False)
+        with op.batch_alter_table('generated_pdfs') as batch_op:
+            batch_op.alter_column('pdf_data', existing_type=sa.Text(), nullable=False)
+
+    op.drop_column('generated_pdfs', 'slide_keys')
+    op.drop_column('generated_pdfs', 'pdf_key')
+    op.drop_column('generated_images', 'image_key')
@@ -0,0 +1,109 @@
+"""
+Microbenchmark the TOON parser and serializer
+
+Runs a corpus of profile contexts shaped like the ones onboarding produces
+(an AI-written TOON as returned by generate_profile_context_toon, and
+context_json documents of increasing size) through parse_toon_to_dict and
+dict_to_toon, next to the JSON round-trip of the same data. Also times an
+update-field edit as a full dict_to_toon against patch_toon_field.
+
+Usage:
+    python -m scripts.benchmark_toon
+"""
+
+import json
+import os
+import sys
+import timeit
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.toon_parser import dict_to_toon, parse_toon_to_dict, patch_toon_field
+
+AI_TOON = """name: Priya Raman
+current_role: Senior Product Manager
+company: Northwind Analytics
+industry: B2B SaaS, data platforms
+years_experience: 9
+content_goals[4]: Build thought leadership,Grow professional network,Attract product talent,Share lessons learned
+expertise[6]{skill,level,years,ai_generated}:
+  Product Strategy,Expert,9,false
+  SQL,Advanced,6,false
+  Roadmapping,Expert,7,false
+  Stakeholder Management,Expert,8,true
+  Experimentation,Advanced,4,false
+  Pricing,Intermediate,2,true
+target_audience[3]{persona,description}:
+  Product Managers,Early to mid-career PMs learning to prioritise, ship and measure outcomes
+  Engineering Leaders,Managers who partner with product on roadmaps and delivery trade-offs
+  Founders,Early-stage founders looking for product-market fit signals
+posting_frequency: 2-3x per week
+tone: technical yet accessible, educator mindset
+content_mix[5]{category,percentage}:
+  Best Practices,30
+  Tutorials,25
+  Career Advice,20
+  Trends,15
+  Personal,10
+ai_generated_fields[3]: posting_frequency,tone,content_mix
+"""
+
+
+def profile_context(ideas: int) -> dict:
+    """A context_json with the onboarding sections and the given number of content ideas."""
+    context = parse_toon_to_dict(AI_TOON)
+    context["content_ideas_evergreen"] = [
+        {"title": f"Lesson {i}: what shipping taught us about scope, pricing and trust",
+         "angle": "Story from a recent launch, with one concrete takeaway", "format": "text"}
+        for i in range(ideas)
+    ]
+    context["content_ideas_trending"] = [
+        {"title": f"Trend {i}: AI copilots in analytics, hype versus adoption",
+         "angle": "Contrarian take backed by customer interviews", "format": "carousel"}
+        for i in range(ideas)
+    ]
+    context["additional_context"] = "Avoid buzzwords.\nPrefer short paragraphs, one idea each."
+    return context
+
+
+CORPUS = {
+    "ai toon": AI_TOON,
+    "profile": dict_to_toon(profile_context(5)),
+    "profile+ideas": dict_to_toon(profile_context(25)),
+    "large": dict_to_toon(profile_context(200)),
+}
+
+
+def best_of(func, number: int) -> float:
+    return min(timeit.repeat(func, number=number, repeat=5)) / number * 1_000_000
+
+
+def main():
+    print(f"{'document':<16}{'bytes':>8}{'parse us':>11}{'json.loads':>12}{'serialize':>11}{'json.dumps':>12}")
+    for label, toon in CORPUS.items():
+        data = parse_toon_to_dict(toon)
+        as_json = json.dumps(data)
+        number = 2000 if len(toon) < 10_000 else 100
+        print(
+            f"{label:<16}{len(toon):>8}"
+            f"{best_of(lambda: parse_toon_to_dict(toon), number):>11.1f}"
+            f"{best_of(lambda: json.loads(as_json), number):>12.1f}"
+            f"{best_of(lambda: dict_to_toon(data), number):>11.1f}"
+            f"{best_of(lambda: json.dumps(data), number):>12.1f}"
+        )
+
+    print()
+    print(f"{'update-field edit':<30}{'full us':>10}{'patch us':>10}")
+    for label in ("profile", "profile+ideas", "large"):
+        toon = CORPUS[label]
+        data = parse_toon_to_dict(toon)
+        updated = {**data, "tone": "warm, candid, practical"}
+        number = 2000 if len(toon) < 10_000 else 200
+        full = best_of(lambda: dict_to_toon(updated), number)
+        patch = best_of(lambda: patch_toon_field(toon, "tone", "warm, candid, practical"), number)
+        print(f"{label:<30}{full:>10.1f}{patch:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+Move generated images and carousel PDFs out of the database
+
+Rows written before the media store existed keep their base64 in
+generated_images.image_data and generated_pdfs.pdf_data / slide_images.
+This moves them to the configured media store (MEDIA_STORE_BACKEND) in
+batches, one commit per batch, and clears the inline columns. It is safe to
+stop and re-run: moved rows no longer match, and blobs are deduplicated.
+
+Run after the f6a7b8c9d0e1 migration. On MySQL the freed space is returned
+to the filesystem only after OPTIMIZE TABLE generated_images, generated_pdfs.
+
+Usage:
+    python -m scripts.migrate_media_to_store [--batch-size 100] [--dry-run]
+"""
+
+import argparse
+import os
+import sys
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import SessionLocal
+from app.services.media_store import get_media_store, move_inline_media
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move inline images and PDFs to the media store")
+    parser.add_argument("--batch-size", type=int, default=100, help="Rows per commit")
+    parser.add_argument("--dry-run", action="store_true", help="Count what would move without writing")
+    args = parser.parse_args()
+
+    store = get_media_store()
+    print(f"Media store backend: {store.backend.name}{' (dry run)' if args.dry_run else ''}")
+
+    db = SessionLocal()
+    try:
+        counts = move_inline_media(db, batch_size=args.batch_size, dry_run=args.dry_run)
+    finally:
+        db.close()
+
+    print(f"Images: {counts['images']}")
+    print(f"PDFs:   {counts['pdfs']} ({counts['slides']} slides)")
+    print(f"Inline base64 {'to move' if args.dry_run else 'moved'}: {counts['bytes'] / 1024 / 1024:.1f} MB")
+    print(f"Stored: {store.stored} blobs, deduplicated: {store.deduplicated}")
+    if counts["failed"]:
+        print(f"Failed: {counts['failed']} (see log; left in the database)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Delete media blobs that no row references
+
+Blobs are content-addressed and shared between rows, so deleting an image,
+PDF or user leaves the blob behind unless the delete released it. This
+marks every key in generated_images.image_key and generated_pdfs.pdf_key /
+slide_keys and deletes the other blobs in the configured media store
+(MEDIA_STORE_BACKEND). Blobs younger than the grace period are kept, since a
+blob is written just before the row pointing to it is committed.
+
+Usage:
+    python -m scripts.sweep_media_store [--grace-seconds 3600] [--dry-run]
+"""
+
+import argparse
+import os
+import sys
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.config import get_settings
+from app.database import SessionLocal
+from app.services.media_store import get_media_store, sweep_unreferenced_media
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Delete media blobs that no row references")
+    parser.add_argument(
+        "--grace-seconds", type=int, default=get_settings().media_sweep_grace_seconds,
+        help="Keep blobs younger than this"
+    )
+    parser.add_argument("--dry-run", action="store_true", help="Count what would be deleted without deleting")
+    args = parser.parse_args()
+
+    store = get_media_store()
+    print(f"Media store backend: {store.backend.name}{' (dry run)' if args.dry_run else ''}")
+
+    db = SessionLocal()
+    try:
+        counts = sweep_unreferenced_media(db, grace_seconds=args.grace_seconds, dry_run=args.dry_run)
+    finally:
+        db.close()
+
+    print(f"Blobs older than {args.grace_seconds}s: {counts['blobs']} ({counts['referenced']} referenced)")
+    print(
+        f"Unreferenced {'to delete' if args.dry_run else 'deleted'}: {counts['deleted']} "
+        f"({counts['bytes_deleted'] / 1024 / 1024:.1f} MB)"
+    )
+
+
+if __name__ == "__main__":
+    main()
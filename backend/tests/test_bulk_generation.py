@@ -0,0 +1,185 @@
+"""
+Tests for bulk post generation: batch building, credit costs, request validation
+and settlement of the reserved credits.
+"""
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import Mock
+
+import pytest
+from fastapi import HTTPException
+from pydantic import ValidationError
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.database import Base
+from app.models import AdminSetting, PurchasedCreditsBalance, Subscription, User, UserProfile
+from app.routers import generation
+from app.routers.generation import _build_bulk_items, get_post_credit_cost
+from app.schemas.generation import MAX_BULK_TOPICS, BulkGenerationRequest
+from app.services import credit_service
+from app.utils import rate_limiter
+from app.utils.rate_limiter import RateLimitConfig, RateLimiter
+
+
+@pytest.fixture
+def no_recent_posts(monkeypatch):
+    monkeypatch.setattr(generation, "get_recent_post_titles", lambda db, user_id, hours=24: [])
+
+
+class TestBulkGenerationRequest:
+    """Topics are cleaned and bounded"""
+
+    def test_blank_topics_are_dropped(self):
+        request = BulkGenerationRequest(topics=["  AI in sales ", "", "   "])
+        assert request.topics == ["AI in sales"]
+
+    def test_topic_count_is_bounded(self):
+        with pytest.raises(ValidationError):
+            BulkGenerationRequest(topics=["topic"] * (MAX_BULK_TOPICS + 1))
+
+
+class TestBuildBulkItems:
+    """One PostGenerationRequest per post in the batch"""
+
+    def test_explicit_topics_share_options(self, no_recent_posts):
+        request = BulkGenerationRequest(topics=["A", "B"], options={"post_type": "carousel"})
+        items = _build_bulk_items(request, SimpleNamespace(context_json={}), "user-1", Mock())
+        assert [item.message for item in items] == ["A", "B"]
+        assert all(item.options == {"post_type": "carousel"} for item in items)
+        # Items must not share one options dict (the pipeline mutates per item)
+        assert items[0].options is not items[1].options
+
+    def test_fill_week_uses_content_ideas_and_skips_recent(self, monkeypatch):
+        monkeypatch.setattr(generation, "get_recent_post_titles", lambda db, user_id, hours=24: ["Used Idea"])
+        profile = SimpleNamespace(context_json={
+            "content_ideas_trending": [{"title": "Trend", "format": "carousel", "hook": "Big news"}],
+            "content_ideas_evergreen": [{"title": "Used Idea", "format": "text"}, {"title": "Evergreen", "format": "video"}],
+        })
+        items = _build_bulk_items(BulkGenerationRequest(fill_week=True, count=3), profile, "user-1", Mock())
+        assert items[0].message.startswith("Trend") and "Big news" in items[0].message
+        assert items[0].options["post_type"] == "carousel"
+        assert items[1].message == "Evergreen" and items[1].options["post_type"] == "video_script"
+        # Not enough ideas: the model picks a fresh topic
+        assert len(items) == 3 and "post_type" not in items[2].options
+
+    def test_credit_costs_match_single_post_pricing(self):
+        assert get_post_credit_cost("carousel") == 2.5
+        assert get_post_credit_cost("image") == 1.0
+        assert get_post_credit_cost("video_script") == 0.5
+        assert get_post_credit_cost("auto") == 0.5
+
+
+@pytest.fixture
+def credit_db(monkeypatch):
+    """SQLite session with a user on 1 subscription credit plus 5 purchased credits."""
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(bind=engine)
+    monkeypatch.setattr(generation, "SessionLocal", factory)
+    monkeypatch.setattr(credit_service, "check_and_notify_credits", lambda db, user_id: None)
+    db = factory()
+    db.add(User(id="u1", email="u1@example.com"))
+    db.add(UserProfile(user_id="u1", onboarding_completed=True))
+    db.add(AdminSetting(key="bulk_generation_enabled", value="true"))
+    db.add(Subscription(user_id="u1", subscription_credits_limit=1.0, subscription_credits_used=0.0))
+    db.add(PurchasedCreditsBalance(user_id="u1", balance=5.0))
+    db.commit()
+    yield db
+    db.close()
+
+
+def balances(db):
+    db.expire_all()
+    subscription = db.query(Subscription).filter(Subscription.user_id == "u1").first()
+    purchased = db.query(PurchasedCreditsBalance).filter(PurchasedCreditsBalance.user_id == "u1").first()
+    return subscription.subscription_credits_used, purchased.balance
+
+
+class TestRefundDeductedCredits:
+    """Refunds go back to the sources the deduction drew on"""
+
+    def test_mixed_deduction_partial_refund(self, credit_db):
+        deduction = credit_service.deduct_credits(credit_db, "u1", 3.0, "bulk_generation")
+        assert (deduction["from_subscription"], deduction["from_purchased"]) == (1.0, 2.0)
+        assert balances(credit_db) == (1.0, 3.0)
+
+        refund = credit_service.refund_deducted_credits(credit_db, "u1", deduction, 2.5, "Refund")
+        # Purchased credits come back first, the rest to the subscription
+        assert (refund["to_purchased"], refund["to_subscription"]) == (2.0, 0.5)
+        assert balances(credit_db) == (0.5, 5.0)
+
+    def test_refund_is_capped_at_deduction(self, credit_db):
+        deduction = credit_service.deduct_credits(credit_db, "u1", 0.5, "bulk_generation")
+        credit_service.refund_deducted_credits(credit_db, "u1", deduction, 10.0, "Refund")
+        assert balances(credit_db) == (0.0, 5.0)
+
+
+class TestBulkGenerationSettlement:
+    """Credits are settled against the posts actually saved"""
+
+    @pytest.mark.asyncio
+    async def test_disconnect_charges_queued_items(self, credit_db, monkeypatch):
+        never = asyncio.Event()
+
+        async def generate(item, user_id, db):
+            if item.message == "t1":
+                await asyncio.sleep(0.01)
+            elif item.message == "t2":
+                await never.wait()
+            return Mock(model_dump=lambda mode: {"content": item.message})
+
+        items = [SimpleNamespace(message=f"t{i}", options={"post_type": "auto"}) for i in range(3)]
+        monkeypatch.setattr(generation, "enforce_rate_limit", lambda user_id, endpoint, cost=1: None)
+        monkeypatch.setattr(generation, "check_maintenance_mode", lambda db: (False, ""))
+        monkeypatch.setattr(generation, "_build_bulk_items", lambda request, profile, user_id, db: items)
+        monkeypatch.setattr(generation, "_generate_bulk_item", generate)
+        monkeypatch.setattr(generation.get_settings(), "bulk_generation_max_concurrency", 2)
+
+        async def is_disconnected():
+            # By the time the client is gone, t1 was saved but not yet streamed
+            await asyncio.sleep(0.05)
+            return True
+
+        response = await generation.generate_posts_bulk(
+            BulkGenerationRequest(topics=["a", "b", "c"]), SimpleNamespace(is_disconnected=is_disconnected),
+            user_id="u1", db=credit_db
+        )
+        events = [chunk async for chunk in response.body_iterator]
+        assert [event.split("\n")[0] for event in events] == ["event: started", "event: item"]
+
+        # 1.5 reserved (1.0 subscription + 0.5 purchased); t0 and t1 are charged,
+        # only t2 is refunded, to the purchased balance it came from
+        assert balances(credit_db) == (1.0, 5.0)
+
+
+class TestBulkRateLimit:
+    """A batch counts once per post against the generation limit"""
+
+    def test_cost_is_all_or_nothing(self):
+        limiter = RateLimiter(RateLimitConfig(requests_per_minute=5))
+        assert limiter.check_rate_limit("u1", "generation", cost=3)[0]
+        allowed, info = limiter.check_rate_limit("u1", "generation", cost=3)
+        assert not allowed and info["current"] == 3
+        assert limiter.check_rate_limit("u1", "generation", cost=2)[0]
+        assert not limiter.check_rate_limit("u1", "generation")[0]
+
+    @pytest.mark.asyncio
+    async def test_bulk_request_uses_generation_limit(self, credit_db, monkeypatch):
+        limiter = RateLimiter()
+        monkeypatch.setattr(rate_limiter, "_rate_limiter", limiter)
+        monkeypatch.setattr(generation, "check_maintenance_mode", lambda db: (False, ""))
+        monkeypatch.setattr(generation, "_build_bulk_items", lambda request, profile, user_id, db: [
+            SimpleNamespace(message=topic, options={"post_type": "auto"}) for topic in request.topics
+        ])
+        for _ in range(28):
+            assert limiter.check_rate_limit("u1", "generation")[0]
+
+        with pytest.raises(HTTPException) as exc_info:
+            await generation.generate_posts_bulk(
+                BulkGenerationRequest(topics=["a", "b", "c"]), SimpleNamespace(), user_id="u1", db=credit_db
+            )
+        assert exc_info.value.status_code == 429
+        # Rejected before any credits were reserved
+        assert balances(credit_db) == (0.0, 5.0)
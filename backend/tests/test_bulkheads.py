@@ -0,0 +1,116 @@
+"""
+Tests for per-provider concurrency bulkheads and 503 backpressure.
+"""
+import asyncio
+
+import pytest
+
+from app.services.bulkheads import (
+    Bulkhead,
+    BulkheadConfig,
+    BulkheadRegistry,
+    ServiceOverloadedError,
+    _parse_overrides,
+)
+from app.services.llm_router import is_retryable_error
+
+
+class TestBulkhead:
+    """Concurrency cap, bounded queue and queue timeout"""
+
+    @pytest.mark.asyncio
+    async def test_caps_concurrency_and_queues_the_rest(self):
+        bulkhead = Bulkhead("llm:openai:gpt-4o", BulkheadConfig(max_concurrent=2, max_queue=10, max_wait_seconds=5))
+        peak = 0
+
+        async def call():
+            nonlocal peak
+            async with bulkhead.slot():
+                peak = max(peak, bulkhead.active)
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(*(call() for _ in range(6)))
+        stats = bulkhead.stats()
+        assert peak == 2
+        assert stats["completed"] == 6
+        assert stats["max_waiting_seen"] >= 1
+        assert stats["active"] == 0 and stats["waiting"] == 0
+
+    @pytest.mark.asyncio
+    async def test_full_queue_rejects_with_503_and_retry_after(self):
+        bulkhead = Bulkhead("image:cloudflare:model", BulkheadConfig(max_concurrent=1, max_queue=1, max_wait_seconds=5))
+        release = asyncio.Event()
+
+        async def hold():
+            async with bulkhead.slot():
+                await release.wait()
+
+        holder = asyncio.create_task(hold())
+        queued = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        try:
+            with pytest.raises(ServiceOverloadedError) as exc_info:
+                async with bulkhead.slot():
+                    pass
+        finally:
+            release.set()
+            await asyncio.gather(holder, queued)
+
+        error = exc_info.value
+        assert error.status_code == 503
+        assert int(error.headers["Retry-After"]) >= 1
+        assert "cloudflare" in error.detail
+        assert bulkhead.stats()["rejected"] == 1
+
+    @pytest.mark.asyncio
+    async def test_queue_wait_timeout_raises(self):
+        bulkhead = Bulkhead("llm:claude:model", BulkheadConfig(max_concurrent=1, max_queue=5, max_wait_seconds=0.05))
+        release = asyncio.Event()
+
+        async def hold():
+            async with bulkhead.slot():
+                await release.wait()
+
+        holder = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        try:
+            with pytest.raises(ServiceOverloadedError):
+                async with bulkhead.slot():
+                    pass
+        finally:
+            release.set()
+            await holder
+
+        stats = bulkhead.stats()
+        assert stats["timeouts"] == 1
+        assert stats["waiting"] == 0
+
+    def test_overload_is_retryable_on_another_provider(self):
+        assert is_retryable_error(ServiceOverloadedError("llm:openai:gpt-4o", 5))
+
+
+class TestBulkheadRegistry:
+    """Limits resolve from kind defaults, then provider, then model overrides"""
+
+    def test_override_resolution(self):
+        registry = BulkheadRegistry(
+            defaults={"llm": BulkheadConfig(max_concurrent=16, max_queue=64, max_wait_seconds=30)},
+            overrides=_parse_overrides(
+                '{"llm:openai": {"max_concurrent": 8, "bogus": 1},'
+                ' "llm:openai:gpt-4o": {"max_queue": 4}}'
+            ),
+        )
+        model = registry.config_for("llm:openai:gpt-4o")
+        provider = registry.config_for("llm:openai:gpt-4o-mini")
+        other = registry.config_for("llm:claude:sonnet")
+        assert (model.max_concurrent, model.max_queue) == (8, 4)
+        assert (provider.max_concurrent, provider.max_queue) == (8, 64)
+        assert (other.max_concurrent, other.max_queue) == (16, 64)
+
+    def test_get_reuses_bulkheads_and_reports_stats(self):
+        registry = BulkheadRegistry(defaults={}, overrides={})
+        assert registry.get("image:cloudflare:a") is registry.get("image:cloudflare:a")
+        assert set(registry.stats()) == {"image:cloudflare:a"}
+
+    def test_invalid_override_json_is_ignored(self):
+        assert _parse_overrides("{not json") == {}
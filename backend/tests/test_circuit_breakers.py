@@ -0,0 +1,142 @@
+"""
+Tests for circuit breakers around external dependencies.
+"""
+import pytest
+
+from app.services import circuit_breakers as cb
+from app.services.bulkheads import ServiceOverloadedError
+from app.services.circuit_breakers import (
+    CircuitBreaker,
+    CircuitBreakerConfig,
+    CircuitOpenError,
+    CircuitState,
+    is_dependency_failure,
+)
+from app.services.llm_router import is_retryable_error
+
+
+class StatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(cb, "time", fake)
+    return fake
+
+
+async def fail(breaker, error):
+    with pytest.raises(type(error)):
+        async with breaker.guard():
+            raise error
+
+
+async def succeed(breaker):
+    async with breaker.guard():
+        pass
+
+
+class TestFailureClassification:
+    """Only dependency outages count towards opening a breaker"""
+
+    def test_outages_count(self):
+        assert is_dependency_failure(TimeoutError())
+        assert is_dependency_failure(StatusError(502))
+        assert is_dependency_failure(StatusError(408))
+
+    def test_client_errors_and_local_rejections_do_not(self):
+        assert not is_dependency_failure(StatusError(400))
+        assert not is_dependency_failure(StatusError(429))
+        assert not is_dependency_failure(ValueError("bad json"))
+        assert not is_dependency_failure(ServiceOverloadedError("llm:openai:gpt-4o", 5))
+        assert not is_dependency_failure(CircuitOpenError("brave", 5))
+
+    def test_open_circuit_is_retryable_on_another_route(self):
+        assert is_retryable_error(CircuitOpenError("llm:openai:gpt-4o", 5))
+
+
+class TestCircuitBreaker:
+    """closed -> open -> half_open -> closed/open transitions"""
+
+    @pytest.mark.asyncio
+    async def test_opens_after_consecutive_failures_and_fails_fast(self, clock):
+        breaker = CircuitBreaker("brave", CircuitBreakerConfig(failure_threshold=3, recovery_seconds=30))
+        await fail(breaker, StatusError(500))
+        await fail(breaker, TimeoutError())
+        assert breaker.state == CircuitState.CLOSED
+        await fail(breaker, StatusError(503))
+        assert breaker.state == CircuitState.OPEN
+
+        with pytest.raises(CircuitOpenError) as exc_info:
+            async with breaker.guard():
+                pytest.fail("call should not run while open")
+        assert exc_info.value.status_code == 503
+        assert exc_info.value.headers["Retry-After"] == "30"
+        assert breaker.stats()["rejected"] == 1
+
+    @pytest.mark.asyncio
+    async def test_success_resets_consecutive_failures(self, clock):
+        breaker = CircuitBreaker("brave", CircuitBreakerConfig(failure_threshold=2))
+        await fail(breaker, StatusError(500))
+        await succeed(breaker)
+        await fail(breaker, StatusError(500))
+        assert breaker.state == CircuitState.CLOSED
+
+    @pytest.mark.asyncio
+    async def test_half_open_trial_success_closes(self, clock):
+        breaker = CircuitBreaker("cloudflare", CircuitBreakerConfig(failure_threshold=1, recovery_seconds=10))
+        await fail(breaker, StatusError(500))
+        clock.now += 10
+        assert not breaker.is_open()
+        assert breaker.state == CircuitState.HALF_OPEN
+        await succeed(breaker)
+        assert breaker.state == CircuitState.CLOSED
+
+    @pytest.mark.asyncio
+    async def test_half_open_trial_failure_reopens(self, clock):
+        breaker = CircuitBreaker("cloudflare", CircuitBreakerConfig(failure_threshold=1, recovery_seconds=10))
+        await fail(breaker, StatusError(500))
+        clock.now += 10
+        await fail(breaker, StatusError(500))
+        assert breaker.state == CircuitState.OPEN
+        assert breaker.stats()["times_opened"] == 2
+
+    @pytest.mark.asyncio
+    async def test_half_open_limits_trial_calls(self, clock):
+        breaker = CircuitBreaker("llm:openai:gpt-4o", CircuitBreakerConfig(failure_threshold=1, recovery_seconds=10, half_open_max_calls=1))
+        await fail(breaker, StatusError(500))
+        clock.now += 10
+        async with breaker.guard():
+            with pytest.raises(CircuitOpenError):
+                async with breaker.guard():
+                    pass
+        assert breaker.state == CircuitState.CLOSED
+
+    @pytest.mark.asyncio
+    async def test_client_error_during_trial_closes(self, clock):
+        breaker = CircuitBreaker("brave", CircuitBreakerConfig(failure_threshold=1, recovery_seconds=10))
+        await fail(breaker, StatusError(500))
+        clock.now += 10
+        await fail(breaker, StatusError(400))
+        assert breaker.state == CircuitState.CLOSED
+
+    @pytest.mark.asyncio
+    async def test_reset_closes(self, clock):
+        breaker = CircuitBreaker("brave", CircuitBreakerConfig(failure_threshold=1))
+        await fail(breaker, StatusError(500))
+        breaker.reset()
+        assert breaker.stats()["state"] == "closed"
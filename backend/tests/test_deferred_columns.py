@@ -0,0 +1,124 @@
+"""
+Tests for deferred blob columns: metadata queries must not fetch CV, image
+or PDF bytes, and the endpoints that serve them load them in one query.
+"""
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.database import Base
+from app.models import GeneratedImage, GeneratedPDF, GeneratedPost, PostFormat, User, UserProfile
+from app.routers import images, pdfs
+
+BLOB = "A" * 200_000
+
+
+class QueryRecorder:
+    """Records SELECT statements and the bytes of every value fetched."""
+
+    def __init__(self, engine):
+        self.statements = []
+        self.bytes_fetched = 0
+        event.listen(engine, "before_cursor_execute", self._before_execute)
+        event.listen(engine, "connect", self._on_connect)
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            self.statements.append(statement)
+
+    def _on_connect(self, dbapi_connection, connection_record):
+        def row_factory(cursor, row):
+            self.bytes_fetched += sum(len(value) for value in row if isinstance(value, (str, bytes)))
+            return row
+        dbapi_connection.row_factory = row_factory
+
+    def reset(self):
+        self.statements.clear()
+        self.bytes_fetched = 0
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    recorder = QueryRecorder(engine)
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    session.add(User(id="u1", email="u1@example.com"))
+    session.add(UserProfile(user_id="u1", cv_filename="cv.pdf", cv_data=BLOB.encode(), cv_text="cv"))
+    session.add(GeneratedPost(id="p1", user_id="u1", content="post", format=PostFormat.CAROUSEL, attachments=[{"data": BLOB}]))
+    for index in range(3):
+        session.add(GeneratedImage(
+            id=f"i{index}", post_id="p1", user_id="u1", image_data=BLOB, prompt="prompt", is_current=index == 0
+        ))
+        session.add(GeneratedPDF(
+            id=f"d{index}", post_id="p1", user_id="u1", pdf_data=BLOB, slide_images=[BLOB], slide_count=1,
+            prompts=["prompt"], is_current=index == 0
+        ))
+    session.commit()
+    session.expunge_all()
+    recorder.reset()
+    session.recorder = recorder
+    yield session
+    session.close()
+
+
+def selected_blob_columns(statements):
+    blobs = ("cv_data", "image_data", "pdf_data", "slide_images", "attachments")
+    return {blob for statement in statements for blob in blobs if blob in statement}
+
+
+class TestMetadataQueries:
+    """Ownership checks and lookups leave the blobs in the database"""
+
+    def test_profile_lookup_skips_cv_data(self, db):
+        profile = db.query(UserProfile).filter(UserProfile.user_id == "u1").first()
+        assert profile.cv_text == "cv"
+        assert selected_blob_columns(db.recorder.statements) == set()
+        assert db.recorder.bytes_fetched < 1_000
+
+    def test_post_lookup_skips_attachments(self, db):
+        db.query(GeneratedPost).filter(GeneratedPost.id == "p1").first()
+        assert selected_blob_columns(db.recorder.statements) == set()
+
+    @pytest.mark.asyncio
+    async def test_set_current_image(self, db):
+        response = await images.set_current_image("i2", user_id="u1", db=db)
+        assert response["post_id"] == "p1"
+        # Ownership check + the post-commit reload of the row, both without the blob
+        assert len(db.recorder.statements) == 2
+        assert selected_blob_columns(db.recorder.statements) == set()
+        assert db.recorder.bytes_fetched < 1_000
+
+    @pytest.mark.asyncio
+    async def test_set_current_pdf(self, db):
+        response = await pdfs.set_current_pdf("d2", user_id="u1", db=db)
+        assert response["post_id"] == "p1"
+        # Ownership check + the post-commit reload of the row, both without the blob
+        assert len(db.recorder.statements) == 2
+        assert selected_blob_columns(db.recorder.statements) == set()
+        assert db.recorder.bytes_fetched < 1_000
+
+
+class TestBlobEndpoints:
+    """Endpoints that return the bytes load them with the row, not per access"""
+
+    @pytest.mark.asyncio
+    async def test_current_image(self, db):
+        response = await images.get_current_image("p1", user_id="u1", db=db)
+        assert response["image"] == BLOB
+        # Post ownership check + the image row with its data
+        assert len(db.recorder.statements) == 2
+        assert len(BLOB) <= db.recorder.bytes_fetched < len(BLOB) + 1_000
+
+    @pytest.mark.asyncio
+    async def test_image_history(self, db):
+        response = await images.get_image_history("p1", user_id="u1", db=db)
+        assert [item.image for item in response.images] == [BLOB] * 3
+        assert len(db.recorder.statements) == 2
+
+    @pytest.mark.asyncio
+    async def test_pdf_history(self, db):
+        response = await pdfs.get_pdf_history("p1", user_id="u1", db=db)
+        assert [(item.pdf, item.slide_images) for item in response.pdfs] == [(BLOB, [BLOB])] * 3
+        assert len(db.recorder.statements) == 2
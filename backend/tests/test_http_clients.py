@@ -0,0 +1,72 @@
+"""
+Tests for the shared outbound HTTP client pools.
+"""
+import httpx
+import pytest
+
+from app.services.http_clients import HTTPClientManager, HostPoolConfig
+
+
+def make_manager():
+    return HTTPClientManager(pools={"test": HostPoolConfig(timeout=5.0, max_connections=3)})
+
+
+class TestHTTPClientManager:
+    """Clients are shared and survive borrow blocks"""
+
+    @pytest.mark.asyncio
+    async def test_use_returns_same_open_client(self):
+        manager = make_manager()
+        async with manager.use("test") as first:
+            pass
+        async with manager.use("test") as second:
+            pass
+        assert first is second
+        assert not first.is_closed
+        await manager.aclose()
+        assert first.is_closed
+
+    @pytest.mark.asyncio
+    async def test_pool_limits_and_timeouts_applied(self):
+        manager = make_manager()
+        client = manager.get_client("test")
+        assert client.timeout.read == 5.0
+        assert client._transport._pool._max_connections == 3
+        await manager.aclose()
+
+    @pytest.mark.asyncio
+    async def test_cookies_are_not_shared_between_requests(self):
+        manager = make_manager()
+        client = manager.get_client("test")
+        sent_cookies = []
+
+        def handler(request):
+            sent_cookies.append(request.headers.get("cookie"))
+            return httpx.Response(200, headers={"Set-Cookie": "session=user-a; Path=/"})
+
+        client._transport = httpx.MockTransport(handler)
+        await client.get("https://api.example.com/first")
+        await client.get("https://api.example.com/second")
+        assert sent_cookies == [None, None]
+        assert len(client.cookies) == 0
+        await manager.aclose()
+
+    @pytest.mark.asyncio
+    async def test_stats_count_requests_and_errors(self):
+        manager = make_manager()
+        async with manager.use("test"):
+            pass
+        with pytest.raises(httpx.ConnectError):
+            async with manager.use("test"):
+                raise httpx.ConnectError("boom")
+        stats = manager.stats()["test"]
+        assert stats["requests"] == 2
+        assert stats["errors"] == 1
+        assert stats["in_flight"] == 0
+        assert stats["started"] is True
+        await manager.aclose()
+        assert manager.stats()["test"]["started"] is False
+
+    def test_unknown_pool_raises(self):
+        with pytest.raises(KeyError):
+            make_manager().get_client("missing")
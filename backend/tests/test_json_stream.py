@@ -0,0 +1,46 @@
+"""
+Tests for incremental JSON field extraction used by the streaming endpoint.
+"""
+import json
+
+from app.utils.json_stream import JsonStringFieldExtractor
+
+
+def feed_all(chunks, field="post_content"):
+    extractor = JsonStringFieldExtractor(field)
+    return "".join(extractor.feed(chunk) for chunk in chunks), extractor
+
+
+class TestJsonStringFieldExtractor:
+    """Streaming extraction of a single string field"""
+
+    def test_extracts_value_split_into_single_characters(self):
+        payload = json.dumps({"format_type": "text", "post_content": "Line 1\nLine \"2\" — done"})
+        text, extractor = feed_all(list(payload))
+        assert text == "Line 1\nLine \"2\" — done"
+        assert extractor.done
+
+    def test_handles_escaped_surrogate_pairs_across_chunks(self):
+        payload = json.dumps({"post_content": "Launch \U0001F680 day"}, ensure_ascii=True)
+        split = payload.index("\\ud83d") + 3
+        text, _ = feed_all([payload[:split], payload[split:]])
+        assert text == "Launch \U0001F680 day"
+
+    def test_key_split_across_chunks(self):
+        text, _ = feed_all(['{"post_con', 'tent": "hi"}'])
+        assert text == "hi"
+
+    def test_key_text_inside_other_value_is_ignored(self):
+        payload = json.dumps({"note": "see \"post_content\" below", "post_content": "real"})
+        text, _ = feed_all([payload])
+        assert text == "real"
+
+    def test_non_string_value_yields_nothing(self):
+        text, extractor = feed_all(['{"post_content": {"a": 1}}'])
+        assert text == ""
+        assert extractor.done
+
+    def test_ignores_input_after_value_closes(self):
+        extractor = JsonStringFieldExtractor("post_content")
+        assert extractor.feed('{"post_content": "a"') == "a"
+        assert extractor.feed(', "post_content": "b"}') == ""
@@ -0,0 +1,176 @@
+"""
+Tests for the async LLM provider layer.
+
+Uses fake SDK clients so no network access or API keys are required.
+"""
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import ai_service
+from app.services.llm_providers import (
+    OpenAIProvider, OpenRouterProvider, ClaudeProvider, GeminiProvider,
+    build_openai_messages, cached_system_blocks, get_llm_provider
+)
+from app.utils.cost_calculator import calculate_cost
+
+
+class FakeOpenAIClient:
+    """Mimics AsyncOpenAI.chat.completions.create with a fixed delay."""
+
+    def __init__(self, delay: float = 0.0, text: str = "hello", cached_tokens: int = 0):
+        self.delay = delay
+        self.text = text
+        self.cached_tokens = cached_tokens
+        self.calls = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    async def _create(self, **kwargs):
+        self.calls.append(kwargs)
+        await asyncio.sleep(self.delay)
+        return SimpleNamespace(
+            usage=SimpleNamespace(
+                prompt_tokens=10, completion_tokens=5, total_tokens=15,
+                prompt_tokens_details=SimpleNamespace(cached_tokens=self.cached_tokens)
+            ),
+            choices=[SimpleNamespace(message=SimpleNamespace(content=self.text))]
+        )
+
+
+class TestMessageBuilding:
+    """Provider-native payloads"""
+
+    def test_openai_messages_normalize_roles(self):
+        messages = build_openai_messages(
+            "system",
+            "current",
+            conversation_history=[{"role": "tool", "content": "x"}, {"role": "assistant", "content": "y"}]
+        )
+        assert [m["role"] for m in messages] == ["system", "user", "assistant", "user"]
+        assert messages[-1]["content"] == "current"
+
+    def test_openai_messages_with_images(self):
+        messages = build_openai_messages(
+            "system", "look", image_attachments=[{"type": "image/png", "data": "AAAA"}]
+        )
+        content = messages[-1]["content"]
+        assert content[0] == {"type": "text", "text": "look"}
+        assert content[1]["image_url"]["url"] == "data:image/png;base64,AAAA"
+
+    def test_claude_messages_skip_unknown_roles(self):
+        messages = ClaudeProvider.build_messages(
+            "current", conversation_history=[{"role": "system", "content": "x"}, {"role": "user", "content": "y"}]
+        )
+        assert messages == [{"role": "user", "content": "y"}, {"role": "user", "content": "current"}]
+
+    def test_gemini_contents_flatten_history(self):
+        contents = GeminiProvider.build_contents(
+            "system", "current", conversation_history=[{"role": "assistant", "content": "prev"}]
+        )
+        assert contents == "system\n\nAssistant: prev\n\nUser: current"
+
+
+class TestPromptCaching:
+    """Stable system-prompt prefix is marked for provider prompt caching"""
+
+    def test_cache_breakpoint_after_prefix(self):
+        blocks = cached_system_blocks("STABLE|request", "STABLE|")
+        assert blocks == [
+            {"type": "text", "text": "STABLE|", "cache_control": {"type": "ephemeral"}},
+            {"type": "text", "text": "request"}
+        ]
+
+    def test_stale_prefix_is_ignored(self):
+        assert cached_system_blocks("new prompt", "old prefix") is None
+        messages = build_openai_messages("new prompt", "hi", cacheable_prefix="old prefix")
+        assert messages[0] == {"role": "system", "content": "new prompt"}
+
+    def test_openrouter_marks_anthropic_models_only(self):
+        provider = OpenRouterProvider()
+        assert provider.uses_cache_control("anthropic/claude-3.5-haiku")
+        assert not provider.uses_cache_control("openai/gpt-4o")
+        assert not OpenAIProvider().uses_cache_control("gpt-4o")
+
+    @pytest.mark.asyncio
+    async def test_openrouter_sends_cache_control_and_reports_cached_tokens(self):
+        provider = OpenRouterProvider()
+        provider._client = FakeOpenAIClient(cached_tokens=8)
+        _, usage = await provider.complete(
+            "PREFIX-rest", "hi", model="anthropic/claude-3.5-haiku", cacheable_prefix="PREFIX-"
+        )
+        system_content = provider._client.calls[0]["messages"][0]["content"]
+        assert system_content[0]["cache_control"] == {"type": "ephemeral"}
+        assert usage["cached_tokens"] == 8
+
+    def test_claude_usage_folds_cache_reads_into_input(self):
+        usage = SimpleNamespace(
+            input_tokens=100, output_tokens=20, cache_read_input_tokens=900, cache_creation_input_tokens=0
+        )
+        result = ClaudeProvider()._extract_usage(usage, "claude-haiku-4-5")
+        assert result["input_tokens"] == 1000
+        assert result["cached_tokens"] == 900
+        assert result["total_tokens"] == 1020
+
+    def test_cached_tokens_are_discounted(self):
+        full = calculate_cost("openai", "gpt-4o", 1_000_000, 0)
+        cached = calculate_cost("openai", "gpt-4o", 1_000_000, 0, cached_tokens=1_000_000)
+        assert cached["input_cost"] == pytest.approx(full["input_cost"] * 0.5)
+
+
+class TestProviderRegistry:
+    """Clients are created once per process"""
+
+    def test_provider_instances_are_shared(self):
+        assert get_llm_provider("openai") is get_llm_provider("OpenAI")
+
+    def test_client_created_lazily_once(self):
+        provider = OpenAIProvider()
+        created = []
+        provider._create_client = lambda: created.append(1) or FakeOpenAIClient()
+        first = provider.client
+        second = provider.client
+        assert first is second
+        assert len(created) == 1
+
+    def test_unknown_provider_raises(self):
+        with pytest.raises(KeyError):
+            get_llm_provider("does-not-exist")
+
+
+class TestAsyncCompletion:
+    """Completions run concurrently on the event loop"""
+
+    @pytest.mark.asyncio
+    async def test_complete_returns_text_and_usage(self):
+        provider = OpenAIProvider()
+        provider._client = FakeOpenAIClient(text="result")
+        text, usage = await provider.complete("system", "hi", model="gpt-4o-mini")
+        assert text == "result"
+        assert usage == {
+            "input_tokens": 10,
+            "output_tokens": 5,
+            "total_tokens": 15,
+            "cached_tokens": 0,
+            "model": "gpt-4o-mini",
+            "provider": "openai"
+        }
+
+    @pytest.mark.asyncio
+    async def test_concurrent_completions_overlap(self):
+        provider = OpenAIProvider()
+        provider._client = FakeOpenAIClient(delay=0.2)
+        start = time.perf_counter()
+        await asyncio.gather(*[provider.complete("s", f"m{i}", model="m") for i in range(5)])
+        elapsed = time.perf_counter() - start
+        # Five 200ms calls should take roughly one round trip, not five
+        assert elapsed < 0.6
+
+    @pytest.mark.asyncio
+    async def test_unconfigured_provider_raises_safe_error(self):
+        provider = OpenAIProvider()
+        provider.is_configured = lambda: False
+        with pytest.raises(ai_service.AIServiceError) as exc_info:
+            await ai_service._generate_with_provider(provider, "s", "m", "gpt-4o")
+        assert "not available" in exc_info.value.user_message
@@ -0,0 +1,125 @@
+"""
+Tests for LLM routing: failover, health ordering and hedged requests.
+"""
+import asyncio
+
+import pytest
+
+from app.services.llm_router import LLMRouter, Route, RouterConfig, is_retryable_error
+
+
+class FakeProvider:
+    def __init__(self, name):
+        self.name = name
+        self.display_name = name
+
+
+class StatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+def make_routes(*names):
+    return [Route(FakeProvider(name), f"{name}-model") for name in names]
+
+
+class TestRetryClassification:
+    """Only transient failures move to another provider"""
+
+    def test_transient_errors_are_retryable(self):
+        assert is_retryable_error(StatusError(503))
+        assert is_retryable_error(StatusError(429))
+        assert is_retryable_error(asyncio.TimeoutError())
+
+    def test_input_errors_are_not_retryable(self):
+        assert not is_retryable_error(StatusError(400))
+        assert not is_retryable_error(ValueError("bad image"))
+
+
+class TestFailover:
+    """Requests move down the route list on transient failures"""
+
+    @pytest.mark.asyncio
+    async def test_fails_over_on_server_error(self):
+        router = LLMRouter(RouterConfig())
+        routes = make_routes("primary", "backup")
+
+        async def call(route):
+            if route.provider.name == "primary":
+                raise StatusError(502)
+            return route.provider.name
+
+        assert await router.run(routes, call) == "backup"
+        stats = router.stats()
+        assert stats["primary:primary-model"]["errors"] == 1
+        assert stats["primary:primary-model"]["failovers"] == 1
+        assert stats["backup:backup-model"]["samples"] == 1
+
+    @pytest.mark.asyncio
+    async def test_non_retryable_error_is_raised_immediately(self):
+        router = LLMRouter(RouterConfig())
+        calls = []
+
+        async def call(route):
+            calls.append(route.provider.name)
+            raise StatusError(400)
+
+        with pytest.raises(StatusError):
+            await router.run(make_routes("primary", "backup"), call)
+        assert calls == ["primary"]
+
+    def test_unhealthy_route_is_demoted(self):
+        router = LLMRouter(RouterConfig(min_samples=2, unhealthy_error_rate=0.5))
+        primary, backup = make_routes("primary", "backup")
+        router.stats_for(primary).record(10, ok=False)
+        router.stats_for(primary).record(10, ok=False)
+        assert router.order_routes([primary, backup]) == [backup, primary]
+
+    @pytest.mark.asyncio
+    async def test_stream_fails_over_before_first_delta(self):
+        router = LLMRouter(RouterConfig())
+
+        async def stream_call(route):
+            if route.provider.name == "primary":
+                raise StatusError(503)
+            yield "a"
+            yield "b"
+
+        chunks = [delta async for delta in router.stream(make_routes("primary", "backup"), stream_call)]
+        assert chunks == ["a", "b"]
+
+
+class TestHedging:
+    """Slow primaries are hedged with the next route"""
+
+    @pytest.mark.asyncio
+    async def test_hedge_wins_when_primary_is_slow(self):
+        router = LLMRouter(RouterConfig(hedge_enabled=True, min_samples=1, hedge_min_delay_seconds=0.05))
+        primary, backup = make_routes("primary", "backup")
+        router.stats_for(primary).record(50, ok=True)  # p95 = 50ms
+        cancelled = []
+
+        async def call(route):
+            if route is primary:
+                try:
+                    await asyncio.sleep(1.0)
+                except asyncio.CancelledError:
+                    cancelled.append(route.provider.name)
+                    raise
+                return "primary"
+            await asyncio.sleep(0.01)
+            return "backup"
+
+        assert await router.run([primary, backup], call) == "backup"
+        await asyncio.sleep(0)
+        assert cancelled == ["primary"]
+        stats = router.stats()["primary:primary-model"]
+        assert stats["hedges_fired"] == 1
+        assert stats["hedges_won"] == 1
+
+    @pytest.mark.asyncio
+    async def test_no_hedge_without_latency_history(self):
+        router = LLMRouter(RouterConfig(hedge_enabled=True, min_samples=5))
+        primary, backup = make_routes("primary", "backup")
+        assert router.hedge_delay(primary) is None
@@ -0,0 +1,341 @@
+"""
+Tests for the content-addressed media store, the media download endpoint
+and the move of inline base64 media out of the database.
+"""
+import base64
+import hashlib
+import os
+from datetime import datetime, timezone
+
+import pytest
+from fastapi import BackgroundTasks, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import app.database
+from app.database import Base
+from app.models import GeneratedImage, GeneratedPDF, GeneratedPost, PostFormat, User
+from app.routers import admin, images, media
+from app.services import media_store
+from app.services.media_store import (
+    FilesystemBlobStore, MediaStore, MediaStoreError, S3BlobStore, move_inline_media, parse_range,
+    media_url, release_media, sweep_unreferenced_media
+)
+
+PNG = b"\x89PNG\r\n\x1a\n" + bytes(range(256)) * 40
+PDF = b"%PDF-1.4\n" + b"x" * 5000
+
+
+def b64(data: bytes) -> str:
+    return base64.b64encode(data).decode()
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = MediaStore(FilesystemBlobStore(str(tmp_path)))
+    monkeypatch.setattr(media_store, "_media_store", store)
+    return store
+
+
+class TestMediaStore:
+    """Keys are content hashes; identical content is stored once"""
+
+    def test_put_and_dedupe(self, store, tmp_path):
+        key = store.put_base64(b64(PNG))
+        assert key == f"{hashlib.sha256(PNG).hexdigest()}.png"
+        assert store.put_base64("data:image/png;base64," + b64(PNG)) == key
+        assert store.get(key) == PNG
+        assert (store.stored, store.deduplicated, store.bytes_stored) == (1, 1, len(PNG))
+        assert (tmp_path / key[:2] / key[2:4] / key).exists()
+
+    def test_extension_from_content(self, store):
+        assert store.put(PDF).endswith(".pdf")
+        assert store.put(b"\xff\xd8\xff\xe0jpeg").endswith(".jpg")
+        assert store.put(b"plain").endswith(".bin")
+
+    def test_rejects_invalid_input(self, store):
+        with pytest.raises(MediaStoreError):
+            store.put_base64("not base64!")
+        with pytest.raises(MediaStoreError):
+            store.put(b"")
+
+    def test_iter_range(self, store):
+        key = store.put(PNG)
+        assert b"".join(store.backend.iter_range(key, 10, 19)) == PNG[10:20]
+
+
+class FakeS3Client:
+    """Just enough of the boto3 S3 client for S3BlobStore."""
+
+    def __init__(self):
+        self.objects = {}
+        self.modified = {}
+
+    def head_object(self, Bucket, Key):
+        if Key not in self.objects:
+            raise media_store.ClientError({"Error": {"Code": "404"}}, "HeadObject")
+        return {"ContentLength": len(self.objects[Key])}
+
+    def put_object(self, Bucket, Key, Body, ContentType, CacheControl):
+        self.objects[Key] = Body
+        self.modified[Key] = datetime.now(timezone.utc)
+
+    def copy_object(self, Bucket, Key, CopySource, MetadataDirective, ContentType, CacheControl):
+        if CopySource["Key"] not in self.objects:
+            raise media_store.ClientError({"Error": {"Code": "NoSuchKey"}}, "CopyObject")
+        self.objects[Key] = self.objects[CopySource["Key"]]
+        self.modified[Key] = datetime.now(timezone.utc)
+
+    def get_paginator(self, operation):
+        return self
+
+    def paginate(self, Bucket, Prefix):
+        contents = [
+            {"Key": key, "Size": len(body), "LastModified": self.modified[key]}
+            for key, body in self.objects.items() if key.startswith(Prefix)
+        ]
+        return [{"Contents": contents[:1]}, {"Contents": contents[1:]}]
+
+    def get_object(self, Bucket, Key, Range):
+        start, end = (int(part) for part in Range[6:].split("-"))
+        return {"Body": _Body(self.objects[Key][start:end + 1])}
+
+    def delete_object(self, Bucket, Key):
+        self.objects.pop(Key, None)
+
+
+class _Body:
+    def __init__(self, data):
+        self.data = data
+
+    def read(self, size):
+        chunk, self.data = self.data[:size], self.data[size:]
+        return chunk
+
+    def close(self):
+        pass
+
+
+class TestS3BlobStore:
+    """Objects are written once under the prefix and read by range"""
+
+    def test_round_trip(self):
+        client = FakeS3Client()
+        store = MediaStore(S3BlobStore("bucket", prefix="media/", client=client))
+        key = store.put(PDF)
+        client.modified[f"media/{key}"] = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        assert store.put(PDF) == key and store.deduplicated == 1
+        # The dedupe hit refreshed LastModified
+        assert client.modified[f"media/{key}"].year > 2024
+        assert list(client.objects) == [f"media/{key}"]
+        assert store.get(key) == PDF
+        assert b"".join(store.backend.iter_range(key, 0, 3)) == b"%PDF"
+        assert store.backend.size("0" * 64 + ".pdf") is None
+
+    def test_iter_blobs(self):
+        client = FakeS3Client()
+        store = MediaStore(S3BlobStore("bucket", prefix="media/", client=client))
+        keys = {store.put(PDF), store.put(PNG)}
+        client.objects["other/file.txt"] = b"x"
+        assert {key for key, _, _ in store.backend.iter_blobs()} == keys
+
+
+class TestParseRange:
+    """Single byte ranges, suffix ranges and unsatisfiable ranges"""
+
+    def test_ranges(self):
+        assert parse_range(None, 100) is None
+        assert parse_range("bytes=0-9", 100) == (0, 9)
+        assert parse_range("bytes=90-", 100) == (90, 99)
+        assert parse_range("bytes=-10", 100) == (90, 99)
+        assert parse_range("bytes=50-500", 100) == (50, 99)
+        assert parse_range("bytes=0-1,5-6", 100) is None
+
+    def test_unsatisfiable(self):
+        for header in ("bytes=100-", "bytes=5-2", "bytes=a-b", "bytes=-0"):
+            with pytest.raises(ValueError):
+                parse_range(header, 100)
+
+
+class TestMediaEndpoint:
+    """Downloads need a valid signed URL and stream with range and cache support"""
+
+    @pytest.fixture
+    def client(self, store):
+        app = FastAPI()
+        app.include_router(media.router, prefix="/api/media")
+        return TestClient(app)
+
+    def test_full_and_partial(self, client, store):
+        key = store.put(PDF)
+        response = client.get(media_url(key))
+        assert response.status_code == 200
+        assert response.content == PDF
+        assert response.headers["content-type"] == "application/pdf"
+        assert response.headers["accept-ranges"] == "bytes"
+        assert response.headers["cache-control"].startswith("private, max-age=")
+
+        response = client.get(media_url(key), headers={"Range": "bytes=0-3"})
+        assert response.status_code == 206
+        assert response.content == b"%PDF"
+        assert response.headers["content-range"] == f"bytes 0-3/{len(PDF)}"
+
+    def test_not_modified_and_errors(self, client, store):
+        key = store.put(PNG)
+        etag = client.get(media_url(key)).headers["etag"]
+        assert client.get(media_url(key), headers={"If-None-Match": etag}).status_code == 304
+        assert client.get(media_url(key), headers={"Range": f"bytes={len(PNG)}-"}).status_code == 416
+        assert client.get("/api/media/..%2F..%2Fetc%2Fpasswd").status_code == 404
+        assert client.get(media_url(f"{'0' * 64}.png")).status_code == 404
+
+    def test_requires_valid_signature(self, client, store):
+        key, other_key = store.put(PNG), store.put(PDF)
+        assert client.get(f"/api/media/{key}").status_code == 403
+        # A signature is only valid for its own key and expiry
+        signed = media_url(key)
+        assert client.get(signed.replace(key, other_key)).status_code == 403
+        assert client.get(signed.replace("expires=", "expires=1")).status_code == 403
+        # Expired long ago
+        expired = media_url(key, now=0)
+        assert client.get(expired).status_code == 403
+
+    def test_urls_are_stable_within_a_window(self):
+        ttl = media_store.settings.media_url_ttl_seconds
+        key = "a" * 64 + ".png"
+        assert media_url(key, now=ttl * 10) == media_url(key, now=ttl * 11 - 1) != media_url(key, now=ttl * 11)
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    session.add(User(id="u1", email="u1@example.com"))
+    session.add(GeneratedPost(id="p1", user_id="u1", content="post", format=PostFormat.CAROUSEL))
+    session.commit()
+    yield session
+    session.close()
+
+
+class TestMoveInlineMedia:
+    """Legacy rows move out of the database in batches"""
+
+    def test_moves_rows_and_dedupes(self, db, store):
+        for index in range(3):
+            db.add(GeneratedImage(id=f"i{index}", post_id="p1", user_id="u1", image_data=b64(PNG), prompt="p"))
+        db.add(GeneratedImage(id="i9", post_id="p1", user_id="u1", image_data="not base64!", prompt="p"))
+        db.add(GeneratedPDF(
+            id="d1", post_id="p1", user_id="u1", pdf_data=b64(PDF), slide_images=[b64(PNG), b64(PNG)],
+            slide_count=2, prompts=["a", "b"]
+        ))
+        db.commit()
+
+        assert move_inline_media(db, batch_size=2, dry_run=True)["images"] == 3
+        assert store.stored == 0
+
+        counts = move_inline_media(db, batch_size=2)
+        assert (counts["images"], counts["pdfs"], counts["slides"], counts["failed"]) == (3, 1, 2, 1)
+        # One PNG and one PDF, however many rows referenced them
+        assert store.stored == 2
+
+        image = db.query(GeneratedImage).filter(GeneratedImage.id == "i0").first()
+        assert image.image_data is None and store.get(image.image_key) == PNG
+        pdf = db.query(GeneratedPDF).filter(GeneratedPDF.id == "d1").first()
+        assert pdf.pdf_data is None and pdf.slide_images is None
+        assert store.get(pdf.pdf_key) == PDF
+        assert pdf.slide_keys == [image.image_key] * 2
+
+        # Re-running only revisits the row that could not be moved
+        assert move_inline_media(db)["failed"] == 1
+
+    @pytest.mark.asyncio
+    async def test_endpoint_returns_url(self, db, store, monkeypatch):
+        key = store.put(PNG)
+        db.add(GeneratedImage(id="i1", post_id="p1", user_id="u1", image_key=key, prompt="p", is_current=True))
+        db.commit()
+
+        response = await images.get_current_image("p1", user_id="u1", db=db)
+        assert response["image"] is None
+        assert response["image_url"].startswith(f"/api/media/{key}?expires=")
+
+        monkeypatch.setattr(images.settings, "media_inline_base64_responses", True)
+        response = await images.get_current_image("p1", user_id="u1", db=db)
+        assert response["image_url"].startswith(f"/api/media/{key}?expires=")
+        assert response["image"] == b64(PNG)
+
+
+def age_blobs(store, seconds):
+    for key, _, modified in list(store.backend.iter_blobs()):
+        path = store.backend._path(key)
+        os.utime(path, (modified - seconds, modified - seconds))
+
+
+class TestMediaCleanup:
+    """Blobs no row references are deleted; shared blobs are kept"""
+
+    @pytest.fixture
+    def keys(self, db, store):
+        image_key, pdf_key, slide_key, orphan_key = (
+            store.put(PNG), store.put(PDF), store.put(PNG[:100]), store.put(b"\xff\xd8\xff orphan")
+        )
+        db.add(GeneratedImage(id="i1", post_id="p1", user_id="u1", image_key=image_key, prompt="p"))
+        db.add(GeneratedPDF(
+            id="d1", post_id="p1", user_id="u1", pdf_key=pdf_key, slide_keys=[image_key, slide_key],
+            slide_count=2, prompts=["a", "b"]
+        ))
+        db.commit()
+        return image_key, pdf_key, slide_key, orphan_key
+
+    def test_sweep(self, db, store, keys):
+        image_key, pdf_key, slide_key, orphan_key = keys
+        # Fresh blobs may belong to a row that is not committed yet
+        assert sweep_unreferenced_media(db)["deleted"] == 0
+
+        age_blobs(store, 7200)
+        counts = sweep_unreferenced_media(db, dry_run=True)
+        assert (counts["blobs"], counts["referenced"], counts["deleted"]) == (4, 3, 1)
+        assert store.backend.exists(orphan_key)
+
+        counts = sweep_unreferenced_media(db)
+        assert counts["bytes_deleted"] == len(b"\xff\xd8\xff orphan")
+        assert not store.backend.exists(orphan_key)
+        assert all(store.backend.exists(key) for key in (image_key, pdf_key, slide_key))
+
+    def test_dedupe_hit_restarts_grace_period(self, db, store):
+        key = store.put(PDF + b"unreferenced")
+        age_blobs(store, 7200)
+        # A new row is about to reference the old, unreferenced blob
+        assert store.put(PDF + b"unreferenced") == key and store.deduplicated == 1
+        assert sweep_unreferenced_media(db)["deleted"] == 0
+        assert store.backend.exists(key)
+
+    def test_release_keeps_referenced_blobs(self, db, store, keys, monkeypatch):
+        image_key, pdf_key, slide_key, orphan_key = keys
+        monkeypatch.setattr(app.database, "SessionLocal", sessionmaker(bind=db.get_bind()))
+        assert release_media(keys) == 1
+        assert not store.backend.exists(orphan_key)
+
+        # The slide is also the current image, so only the PDF and the other slide go
+        db.query(GeneratedPDF).delete()
+        db.commit()
+        assert release_media([image_key, pdf_key, slide_key]) == 2
+        assert store.backend.exists(image_key)
+        assert not store.backend.exists(pdf_key) and not store.backend.exists(slide_key)
+
+    @pytest.mark.asyncio
+    async def test_user_delete_releases_media(self, db, store, keys, monkeypatch):
+        image_key, pdf_key, slide_key, _ = keys
+        monkeypatch.setattr(app.database, "SessionLocal", sessionmaker(bind=db.get_bind()))
+        # Another user generated the same PDF
+        db.add(User(id="u2", email="u2@example.com"))
+        db.add(GeneratedPost(id="p2", user_id="u2", content="post", format=PostFormat.CAROUSEL))
+        db.add(GeneratedPDF(id="d2", post_id="p2", user_id="u2", pdf_key=pdf_key, slide_count=0, prompts=[]))
+        db.commit()
+
+        background_tasks = BackgroundTasks()
+        await admin.delete_user("u1", background_tasks, admin=None, db=db)
+        await background_tasks()
+        assert store.backend.exists(pdf_key)
+        assert not store.backend.exists(image_key) and not store.backend.exists(slide_key)
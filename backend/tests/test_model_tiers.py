@@ -0,0 +1,135 @@
+"""
+Tests for task-class model tier routing and per-tier reporting.
+"""
+import pytest
+from fastapi import HTTPException
+
+from app.routers import ai_config
+from app.services import ai_service, llm_providers, model_tiers
+from app.services.llm_providers import get_llm_provider
+from app.services.model_tiers import (
+    ModelTierRouter, format_tier_overrides, get_model_tier_router, parse_tier_overrides
+)
+
+
+@pytest.fixture(autouse=True)
+def fresh_router(monkeypatch):
+    monkeypatch.setattr(model_tiers, "_model_tier_router", ModelTierRouter())
+
+
+@pytest.fixture
+def mock_llm(monkeypatch):
+    monkeypatch.setattr(ai_service.settings, "ai_provider", "mock")
+    monkeypatch.setattr(ai_service.settings, "ai_fallback_providers", "")
+    monkeypatch.setattr(llm_providers.settings, "llm_mock_latency_ms_mean", 0.0)
+    monkeypatch.setattr(llm_providers.settings, "llm_mock_latency_ms_stddev", 0.0)
+
+
+class TestTierTable:
+    """Task classes resolve to tiers"""
+
+    def test_defaults(self):
+        router = ModelTierRouter()
+        assert router.tier_for("conversation_title") == "small"
+        assert router.tier_for("profile_from_cv") == "onboarding"
+        assert router.tier_for("post_generation") == "standard"
+        # Untagged calls keep the legacy flag behaviour
+        assert router.tier_for(None) == "standard"
+        assert router.tier_for(None, use_onboarding_model=True) == "onboarding"
+
+    def test_overrides_and_disabled(self):
+        router = ModelTierRouter(overrides={"image_prompt": "standard"})
+        assert router.tier_for("image_prompt") == "standard"
+        router.configure(enabled=False)
+        assert router.tier_for("conversation_title") == "standard"
+        assert router.tier_for("cv_validation", use_onboarding_model=True) == "onboarding"
+        assert router.tier_for("writing_style") == "onboarding"
+
+    def test_override_parsing_round_trip(self):
+        overrides = parse_tier_overrides("comment:small, image_prompt:standard,bogus:small,title:huge")
+        assert overrides == {"comment": "small", "image_prompt": "standard"}
+        assert parse_tier_overrides(format_tier_overrides(overrides)) == overrides
+
+
+class TestModelResolution:
+    """Each provider route uses its own model for the tier"""
+
+    def test_small_tier_models(self, monkeypatch):
+        monkeypatch.setattr(llm_providers.settings, "openai_small_model", "gpt-4o-mini")
+        router = ModelTierRouter()
+        openai = get_llm_provider("openai")
+        assert router.model_for(openai, "small") == "gpt-4o-mini"
+        assert router.model_for(openai, "standard") == llm_providers.settings.openai_model
+        router.configure(small_models={"openai": "gpt-3.5-turbo"})
+        assert router.model_for(openai, "small") == "gpt-3.5-turbo"
+
+    def test_fallback_routes_use_tier(self, monkeypatch):
+        monkeypatch.setattr(ai_service.settings, "ai_provider", "mock")
+        monkeypatch.setattr(ai_service.settings, "ai_fallback_providers", "openai")
+        monkeypatch.setattr(llm_providers.settings, "openai_api_key", "sk-test")
+        monkeypatch.setattr(llm_providers.settings, "openai_small_model", "gpt-4o-mini")
+        routes = ai_service._resolve_routes(None, "small")
+        assert [route.key for route in routes] == ["mock:mock-small", "openai:gpt-4o-mini"]
+        # An explicit model still overrides the primary only
+        assert ai_service._resolve_routes("custom", "small")[0].model == "custom"
+
+
+class TestTierReporting:
+    """Latency, tokens and cost per tier"""
+
+    @pytest.mark.asyncio
+    async def test_title_runs_on_small_tier(self, mock_llm):
+        title = await ai_service.generate_conversation_title("Help me write about remote work")
+        _, usage = await ai_service.generate_completion("Write a post.", "About hiring", task="post_generation")
+
+        stats = get_model_tier_router().stats()
+        assert title
+        assert usage["model"] == "mock-default"
+        assert stats["small"]["models"] == {"mock-small": 1}
+        assert stats["small"]["tasks"] == {"conversation_title": 1}
+        assert stats["standard"]["tasks"] == {"post_generation": 1}
+
+    def test_cost_per_tier(self):
+        router = ModelTierRouter()
+        for tier, model in (("standard", "gpt-4o"), ("small", "gpt-4o-mini")):
+            router.record("task", tier, 100.0, {"model": model, "input_tokens": 1000, "output_tokens": 200})
+        router.record("task", "small", 50.0, None)
+
+        stats = router.stats()
+        assert stats["small"]["avg_cost_usd"] < stats["standard"]["avg_cost_usd"] / 10
+        assert stats["small"]["errors"] == 1 and stats["small"]["calls"] == 2
+        assert stats["standard"]["p50_ms"] == 100.0
+
+
+class TestAdminConfig:
+    """Admin updates apply immediately and persist to .env"""
+
+    @pytest.mark.asyncio
+    async def test_update_persists(self, tmp_path, monkeypatch):
+        env_path = tmp_path / ".env"
+        env_path.write_text("AI_PROVIDER=openai\n")
+        monkeypatch.setattr(ai_config, "get_env_file_path", lambda: str(env_path))
+
+        result = await ai_config.update_model_tiers(
+            ai_config.ModelTierUpdateRequest(
+                task_tiers={"image_prompt": "standard", "conversation_title": "small"},
+                small_models={"openai": "gpt-3.5-turbo"}
+            ),
+            admin=None
+        )
+        assert result["tasks"]["image_prompt"]["tier"] == "standard"
+        assert get_model_tier_router().tier_for("image_prompt") == "standard"
+        env = ai_config.read_env_file()
+        # Entries equal to the default are not persisted
+        assert env["MODEL_TIER_OVERRIDES"] == "image_prompt:standard"
+        assert env["OPENAI_SMALL_MODEL"] == "gpt-3.5-turbo"
+        assert env["AI_PROVIDER"] == "openai"
+
+    @pytest.mark.asyncio
+    async def test_invalid_tier_rejected(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(ai_config, "get_env_file_path", lambda: str(tmp_path / ".env"))
+        with pytest.raises(HTTPException):
+            await ai_config.update_model_tiers(
+                ai_config.ModelTierUpdateRequest(task_tiers={"image_prompt": "huge"}), admin=None
+            )
+        assert not (tmp_path / ".env").exists()
@@ -0,0 +1,136 @@
+"""
+Tests for the offline mock and record/replay LLM providers.
+"""
+import json
+
+import pytest
+
+from app.prompts.carousel_instructions import CAROUSEL_AI_INSTRUCTIONS
+from app.prompts.format_instructions import (
+    CAROUSEL_JSON_FORMAT, IMAGE_JSON_FORMAT, TEXT_JSON_FORMAT, RESPONSE_FORMAT_REQUIREMENTS
+)
+from app.services import ai_service, llm_providers
+from app.services.llm_providers import MockProvider, RecordReplayProvider, ReplayMissError
+from app.utils.toon_parser import parse_toon_to_dict
+
+
+@pytest.fixture(autouse=True)
+def no_mock_latency(monkeypatch):
+    monkeypatch.setattr(llm_providers.settings, "llm_mock_latency_ms_mean", 0.0)
+    monkeypatch.setattr(llm_providers.settings, "llm_mock_latency_ms_stddev", 0.0)
+
+
+def post_prompt(json_format: str) -> str:
+    return f"You are a LinkedIn ghostwriter.\n\n{RESPONSE_FORMAT_REQUIREMENTS}\n{json_format}"
+
+
+class TestMockProvider:
+    """Responses parse the way the real callers parse them"""
+
+    @pytest.mark.asyncio
+    async def test_post_formats_are_schema_valid(self):
+        provider = MockProvider(seed=1)
+        carousel, _ = await provider.complete(post_prompt(CAROUSEL_JSON_FORMAT), "Write about hiring", model="m")
+        image, _ = await provider.complete(post_prompt(IMAGE_JSON_FORMAT), "Write about hiring", model="m")
+        text, usage = await provider.complete(post_prompt(TEXT_JSON_FORMAT), "Write about hiring", model="m")
+
+        carousel, image, text = json.loads(carousel), json.loads(image), json.loads(text)
+        assert isinstance(carousel["image_prompts"], list) and carousel["image_prompts"]
+        assert isinstance(image["image_prompt"], str)
+        for post in (carousel, image, text):
+            assert post["title"] and post["post_content"] and len(post["hashtags"]) == 3
+        assert "image_prompt" not in text and "image_prompts" not in text
+        assert usage["provider"] == "mock"
+        assert usage["total_tokens"] == usage["input_tokens"] + usage["output_tokens"]
+
+    @pytest.mark.asyncio
+    async def test_toon_context_parses(self):
+        provider = MockProvider(seed=1)
+        toon, _ = await provider.complete("Extract context.\n\nOutput TOON format with these sections:", "CV", model="m")
+        parsed = parse_toon_to_dict(toon)
+        assert parsed["name"] == "Alex Morgan"
+        assert len(parsed["expertise"]) == 4
+        assert "content_mix" in parsed
+
+    @pytest.mark.asyncio
+    async def test_carousel_image_prompts_match_requested_count(self):
+        provider = MockProvider(seed=1)
+        user_message = CAROUSEL_AI_INSTRUCTIONS["image_prompt_user"].format(
+            slide_count=7, post_content="post", industry="tech", expertise_str="python"
+        )
+        result, _ = await provider.complete(CAROUSEL_AI_INSTRUCTIONS["image_prompt_system"], user_message, model="m")
+        assert len(json.loads(result)) == 7
+
+    @pytest.mark.asyncio
+    async def test_seeded_runs_are_reproducible(self):
+        first = [await MockProvider(seed=7).complete("s", f"message {i}", model="m") for i in range(3)]
+        second = [await MockProvider(seed=7).complete("s", f"message {i}", model="m") for i in range(3)]
+        assert first == second
+
+    @pytest.mark.asyncio
+    async def test_output_size_follows_token_target(self, monkeypatch):
+        monkeypatch.setattr(llm_providers.settings, "llm_mock_output_tokens_mean", 600)
+        monkeypatch.setattr(llm_providers.settings, "llm_mock_output_tokens_stddev", 0)
+        _, usage = await MockProvider(seed=1).complete("Write a profile.", "CV text", model="m")
+        assert 600 <= usage["output_tokens"] < 700
+
+    @pytest.mark.asyncio
+    async def test_stream_matches_completion(self):
+        usage = {}
+        chunks = [chunk async for chunk in MockProvider(seed=3).stream("s", "m", model="m", token_usage=usage)]
+        text, expected_usage = await MockProvider(seed=3).complete("s", "m", model="m")
+        assert len(chunks) > 1
+        assert "".join(chunks) == text
+        assert usage == expected_usage
+
+    @pytest.mark.asyncio
+    async def test_generate_completion_runs_offline(self, monkeypatch):
+        monkeypatch.setattr(ai_service.settings, "ai_provider", "mock")
+        monkeypatch.setattr(ai_service.settings, "ai_fallback_providers", "")
+        result, usage = await ai_service.generate_completion(post_prompt(TEXT_JSON_FORMAT), "Write about hiring")
+        assert json.loads(result)["post_content"]
+        assert usage["provider"] == "mock"
+
+
+class TestRecordReplayProvider:
+    """Recorded responses replay without touching the upstream"""
+
+    @pytest.mark.asyncio
+    async def test_record_then_replay(self, tmp_path, monkeypatch):
+        recorder = RecordReplayProvider(mode="record", directory=str(tmp_path), upstream="mock")
+        recorded = [await recorder.complete("s", "hello", model="m") for _ in range(2)]
+        assert recorder.recorded == 2
+        assert len(list(tmp_path.rglob("*.json"))) == 1
+
+        player = RecordReplayProvider(mode="replay", directory=str(tmp_path), upstream="mock")
+        monkeypatch.setattr(MockProvider, "complete", None)  # Any upstream call would fail
+        replayed = [await player.complete("s", "hello", model="m") for _ in range(3)]
+        assert replayed == [recorded[0], recorded[1], recorded[0]]
+
+    @pytest.mark.asyncio
+    async def test_streams_are_recorded_and_replayed(self, tmp_path):
+        recorder = RecordReplayProvider(mode="record", directory=str(tmp_path), upstream="mock")
+        recorded = "".join([chunk async for chunk in recorder.stream("s", "hi", model="m")])
+
+        player = RecordReplayProvider(mode="replay", directory=str(tmp_path), upstream="mock")
+        usage = {}
+        replayed = "".join([chunk async for chunk in player.stream("s", "hi", model="m", token_usage=usage)])
+        assert replayed == recorded
+        assert usage["provider"] == "mock"
+
+    @pytest.mark.asyncio
+    async def test_replay_miss(self, tmp_path, monkeypatch):
+        player = RecordReplayProvider(mode="replay", directory=str(tmp_path), upstream="mock")
+        with pytest.raises(ReplayMissError):
+            await player.complete("s", "never recorded", model="m")
+
+        monkeypatch.setattr(llm_providers.settings, "llm_replay_on_miss", "mock")
+        text, usage = await player.complete("s", "never recorded", model="m")
+        assert text and usage["provider"] == "mock"
+        assert player.misses == 2
+
+    def test_key_depends_on_request(self):
+        key = llm_providers.recording_key("s", "u", "m", 0.7)
+        assert key == llm_providers.recording_key("s", "u", "m", 0.7)
+        assert key != llm_providers.recording_key("s", "u", "m", 0.2)
+        assert key != llm_providers.recording_key("s", "u", "m", 0.7, image_attachments=[{"data": "AAAA"}])
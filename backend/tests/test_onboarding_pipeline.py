@@ -0,0 +1,202 @@
+"""
+Tests for the concurrent profile pipeline and onboarding background jobs.
+"""
+import asyncio
+
+import pytest
+
+from app.services import profile_builder
+from app.services.onboarding_jobs import JobFailed, OnboardingJobRegistry
+from app.services.profile_builder import PipelineStageError, build_user_profile, run_stage_graph
+
+USAGE = {"input_tokens": 10, "output_tokens": 5, "total_tokens": 15}
+
+TOON = """name: Ada
+industry: Software
+expertise[1]{skill,level,years,ai_generated}:
+  Python,Expert,10,false
+"""
+
+
+class TestRunStageGraph:
+    """Stages run as soon as their dependencies finish"""
+
+    @pytest.mark.asyncio
+    async def test_independent_stages_overlap(self):
+        active = []
+        peak = {}
+
+        def stage(name, value):
+            async def run(*inputs):
+                active.append(name)
+                peak[name] = list(active)
+                await asyncio.sleep(0.01)
+                active.remove(name)
+                return value + sum(inputs)
+            return run
+
+        results = await run_stage_graph({
+            "a": ((), stage("a", 1)),
+            "b": ((), stage("b", 2)),
+            "c": (("a", "b"), stage("c", 10)),
+        })
+        assert results == {"a": 1, "b": 2, "c": 13}
+        assert peak["b"] == ["a", "b"]
+        assert peak["c"] == ["c"]
+
+    @pytest.mark.asyncio
+    async def test_failure_cancels_remaining_stages(self):
+        cancelled = asyncio.Event()
+        events = []
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise ValueError("boom")
+
+        async def slow():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        async def dependent(_):
+            return "never"
+
+        with pytest.raises(PipelineStageError) as error:
+            await run_stage_graph({
+                "fail": ((), fail),
+                "slow": ((), slow),
+                "dependent": (("fail",), dependent),
+            }, lambda stage, status: events.append((stage, status)))
+        assert error.value.stage == "fail"
+        assert isinstance(error.value.__cause__, ValueError)
+        assert cancelled.is_set()
+        assert ("fail", "failed") in events
+        assert ("dependent", "running") not in events
+
+
+@pytest.fixture
+def fake_ai(monkeypatch):
+    """AI calls that record when they start and finish."""
+    timeline = []
+
+    def fake(name, result, delay=0.02):
+        async def call(*args, **kwargs):
+            timeline.append(("start", name))
+            await asyncio.sleep(delay)
+            timeline.append(("end", name))
+            return result
+        monkeypatch.setattr(profile_builder, name, call)
+
+    fake("generate_profile_context_toon", (TOON, {"ai_generated_fields": ["tone"], "token_usage": {**USAGE, "model": "m", "provider": "p"}}))
+    fake("generate_evergreen_content_ideas", ([{"title": "Idea"}], USAGE))
+    fake("find_trending_topics", [{"title": "Trend"}])
+    fake("analyze_writing_style", ("# Style", USAGE))
+    fake("generate_profile_from_cv", ("# Profile", USAGE))
+    fake("generate_default_preferences", {"length": "medium"}, delay=0)
+    return timeline
+
+
+class TestBuildUserProfile:
+    """The pipeline result matches the sequential build, with stages overlapped"""
+
+    @pytest.mark.asyncio
+    async def test_stages_run_concurrently(self, fake_ai):
+        events = []
+        profile = await build_user_profile("u1", "cv", ["post"], "my_style", None, lambda *e: events.append(e))
+
+        starts = [name for kind, name in fake_ai if kind == "start"]
+        first_end = next(i for i, (kind, _) in enumerate(fake_ai) if kind == "end")
+        # Style analysis and profile markdown start alongside the TOON context
+        assert {"generate_profile_context_toon", "analyze_writing_style", "generate_profile_from_cv"} <= set(starts[:first_end])
+        # Ideas and trending topics start together once the TOON context is done
+        toon_end = fake_ai.index(("end", "generate_profile_context_toon"))
+        ideas_start = fake_ai.index(("start", "generate_evergreen_content_ideas"))
+        trending_start = fake_ai.index(("start", "find_trending_topics"))
+        assert toon_end < ideas_start and toon_end < trending_start
+        assert fake_ai.index(("end", "generate_evergreen_content_ideas")) > trending_start
+
+        assert profile["context_json"]["content_ideas_evergreen"] == [{"title": "Idea"}]
+        assert profile["context_json"]["content_ideas_trending"] == [{"title": "Trend"}]
+        assert profile["writing_style_md"] == "# Style"
+        assert profile["profile_md"] == "# Profile"
+        assert profile["context_toon"].startswith("name: Ada")
+        usage = profile["token_usage"]
+        assert list(usage["details"]) == ["toon_context", "evergreen_ideas", "writing_style", "profile_md"]
+        assert (usage["input_tokens"], usage["output_tokens"], usage["total_tokens"]) == (40, 20, 60)
+        assert ("trending_topics", "completed") in events
+
+    @pytest.mark.asyncio
+    async def test_toon_failure_falls_back_to_legacy(self, fake_ai, monkeypatch):
+        async def fail(cv_text):
+            raise RuntimeError("provider down")
+
+        async def legacy(*args):
+            return {"legacy": True}
+
+        monkeypatch.setattr(profile_builder, "generate_profile_context_toon", fail)
+        monkeypatch.setattr(profile_builder, "build_user_profile_legacy", legacy)
+        assert await build_user_profile("u1", "cv", [], "top_creator", None) == {"legacy": True}
+
+    @pytest.mark.asyncio
+    async def test_other_stage_failure_propagates(self, fake_ai, monkeypatch):
+        async def fail(cv_text):
+            raise RuntimeError("markdown failed")
+
+        monkeypatch.setattr(profile_builder, "generate_profile_from_cv", fail)
+        with pytest.raises(RuntimeError, match="markdown failed"):
+            await build_user_profile("u1", "cv", [], "top_creator", None)
+
+
+class TestOnboardingJobs:
+    """Background jobs with replayable progress events"""
+
+    @pytest.mark.asyncio
+    async def test_job_progress_and_result(self):
+        registry = OnboardingJobRegistry(ttl_seconds=60)
+
+        async def runner(progress):
+            progress("toon_context", "running")
+            await asyncio.sleep(0.01)
+            progress("toon_context", "completed")
+            return {"success": True}
+
+        job = registry.start("u1", runner)
+        events = [event async for event in job.subscribe()]
+        assert [e["event"] for e in events] == ["stage", "stage", "done"]
+        assert events[-1]["data"] == {"success": True}
+        # A late subscriber replays the whole log
+        assert [event async for event in job.subscribe()] == events
+        assert job.snapshot()["stages"] == {"toon_context": "completed"}
+        assert registry.stats()["completed"] == 1
+
+    @pytest.mark.asyncio
+    async def test_one_running_job_per_user(self):
+        registry = OnboardingJobRegistry(ttl_seconds=60)
+        release = asyncio.Event()
+
+        async def runner(progress):
+            await release.wait()
+            return {}
+
+        job = registry.start("u1", runner)
+        assert registry.start("u1", runner) is job
+        assert registry.start("u2", runner) is not job
+        assert registry.get(job.id, "u2") is None
+        release.set()
+        await asyncio.sleep(0)
+        [event async for event in job.subscribe()]
+        assert registry.start("u1", runner) is not job
+
+    @pytest.mark.asyncio
+    async def test_failed_job_reports_error(self):
+        registry = OnboardingJobRegistry(ttl_seconds=60)
+
+        async def runner(progress):
+            raise JobFailed("CV not found. Please upload CV first.", status_code=400)
+
+        job = registry.start("u1", runner)
+        events = [event async for event in job.subscribe()]
+        assert events == [{"event": "error", "data": {"detail": "CV not found. Please upload CV first.", "status_code": 400}}]
+        assert job.status == "failed"
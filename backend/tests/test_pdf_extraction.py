@@ -0,0 +1,92 @@
+"""
+Tests for off-loop CV text extraction with page, character and time budgets.
+"""
+import asyncio
+from io import BytesIO
+
+import pytest
+from fastapi import HTTPException, UploadFile
+from reportlab.pdfgen import canvas
+
+from app.routers import onboarding
+from app.services.pdf_extraction import PdfExtractionError, extract_pdf_text
+
+
+def make_pdf(pages: int, line: str = "Experience at Northwind") -> bytes:
+    buffer = BytesIO()
+    pdf = canvas.Canvas(buffer)
+    for index in range(pages):
+        pdf.drawString(72, 720, f"Page {index + 1}: {line}")
+        pdf.showPage()
+    pdf.save()
+    return buffer.getvalue()
+
+
+class TestExtractPdfText:
+    """Budgets stop extraction early and keep the partial text"""
+
+    @pytest.mark.asyncio
+    async def test_complete_extraction(self):
+        result = await extract_pdf_text(make_pdf(3), max_pages=10, max_chars=10_000, time_budget=30)
+        assert result.stop_reason == "complete" and not result.truncated
+        assert (result.pages_total, result.pages_read) == (3, 3)
+        lines = [line for line in result.text.splitlines() if line]
+        assert lines == [f"Page {i}: Experience at Northwind" for i in (1, 2, 3)]
+
+    @pytest.mark.asyncio
+    async def test_page_limit(self):
+        result = await extract_pdf_text(make_pdf(5), max_pages=2, max_chars=10_000, time_budget=30)
+        assert result.stop_reason == "page_limit"
+        assert (result.pages_total, result.pages_read) == (5, 2)
+        assert "Page 3" not in result.text
+
+    @pytest.mark.asyncio
+    async def test_char_limit(self):
+        result = await extract_pdf_text(make_pdf(5), max_pages=10, max_chars=40, time_budget=30)
+        assert result.stop_reason == "char_limit"
+        assert result.text.startswith("Page 1: Experience at Northwind")
+        assert "Page 2" in result.text and "Page 3" not in result.text
+        assert result.pages_read == 2
+        diagnostics = result.diagnostics()
+        assert diagnostics["truncated"] and "text" not in diagnostics
+
+    @pytest.mark.asyncio
+    async def test_time_budget(self):
+        result = await extract_pdf_text(make_pdf(3), max_pages=10, max_chars=10_000, time_budget=0)
+        assert result.stop_reason == "time_limit"
+        assert result.pages_read == 0 and result.text == ""
+
+    @pytest.mark.asyncio
+    async def test_invalid_pdf(self):
+        with pytest.raises(PdfExtractionError):
+            await extract_pdf_text(b"not a pdf", max_pages=10, max_chars=10_000, time_budget=30)
+
+    @pytest.mark.asyncio
+    async def test_event_loop_keeps_running(self):
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.005)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        try:
+            await extract_pdf_text(make_pdf(40), max_pages=100, max_chars=100_000, time_budget=30)
+        finally:
+            task.cancel()
+        assert ticks > 0
+
+
+class TestUploadCvSizeLimit:
+    """Oversized uploads are rejected without reading them whole"""
+
+    @pytest.mark.asyncio
+    async def test_reads_at_most_one_byte_past_the_limit(self, monkeypatch):
+        monkeypatch.setattr(onboarding.settings, "max_upload_size", 1000)
+        upload = UploadFile(BytesIO(b"%PDF" + b"x" * 50_000), filename="cv.pdf")
+        with pytest.raises(HTTPException) as exc_info:
+            await onboarding.upload_cv(upload, user_id="u1", db=None)
+        assert exc_info.value.status_code == 413
+        assert upload.file.tell() == 1001
@@ -0,0 +1,62 @@
+"""
+Tests for one-pass PII detection and redaction.
+"""
+from app.utils.pii_redaction import PIIRedactor, detect_pii_in_text
+
+CV_LINE = "Contact jane.smith@example.com or +1 (555) 123-4567. Passport AB1234567."
+
+
+def make_redactor(**kwargs):
+    kwargs.setdefault("redact_types", ["email", "phone", "ssn", "credit_card", "iban", "passport"])
+    return PIIRedactor(log_detections=False, **kwargs)
+
+
+class TestRedact:
+    """redact scans once and builds the result with one join"""
+
+    def test_redacts_each_type_with_stats(self):
+        redacted, stats = make_redactor().redact(CV_LINE)
+        assert redacted == "Contact [EMAIL_REDACTED] or [PHONE_REDACTED]. Passport [PASSPORT_REDACTED]."
+        assert stats == {"email": 1, "phone": 1, "passport": 1}
+
+    def test_text_without_pii_is_returned_as_is(self):
+        text = "Shipped the new onboarding flow this week."
+        redacted, stats = make_redactor().redact(text)
+        assert redacted is text
+        assert stats == {}
+
+    def test_leftmost_match_wins(self):
+        # Phone is listed before passport, but the passport starts first
+        redacted, stats = make_redactor().redact("AB1234567")
+        assert redacted == "[PASSPORT_REDACTED]"
+        assert stats == {"passport": 1}
+
+    def test_preserve_patterns(self):
+        redacted, stats = make_redactor(preserve_patterns=[r"@example\.com$"]).redact(CV_LINE)
+        assert "jane.smith@example.com" in redacted
+        assert "email" not in stats
+
+    def test_repeated_matches_on_large_input(self):
+        text = CV_LINE * 2000
+        redacted, stats = make_redactor().redact(text)
+        assert stats == {"email": 2000, "phone": 2000, "passport": 2000}
+        assert "@" not in redacted
+
+
+class TestDetect:
+    """Detection reuses the same scanner"""
+
+    def test_detect_pii_groups_by_type(self):
+        assert make_redactor().detect_pii(CV_LINE) == {
+            "email": ["jane.smith@example.com"],
+            "phone": ["+1 (555) 123-4567"],
+            "passport": ["AB1234567"],
+        }
+
+    def test_detect_pii_in_text(self):
+        assert detect_pii_in_text(CV_LINE)
+        assert not detect_pii_in_text("No personal data here.")
+        assert not detect_pii_in_text("")
+
+    def test_only_requested_types(self):
+        assert make_redactor(redact_types=["email"]).detect_pii(CV_LINE) == {"email": ["jane.smith@example.com"]}
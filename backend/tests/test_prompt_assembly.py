@@ -0,0 +1,109 @@
+"""
+Tests for the cached per-profile post prompt prefix.
+"""
+from types import SimpleNamespace
+
+from app.prompts.format_instructions import RESPONSE_FORMAT_REQUIREMENTS, get_json_format
+from app.services.prompt_assembly import (
+    TEMPLATE_VERSION,
+    ProfilePromptCache,
+    build_profile_prompt,
+    extract_compact_writing_style,
+    format_sections,
+    normalize_post_type,
+)
+import app.services.prompt_assembly as prompt_assembly
+
+
+def make_profile(**overrides):
+    fields = {
+        "context_json": {"name": "Ada", "industry": "Software", "additional_context": "Prefer short posts"},
+        "custom_instructions": None,
+        "writing_style_md": "Tone: direct\nStructure: Hook → Story",
+    }
+    fields.update(overrides)
+    return SimpleNamespace(**fields)
+
+
+class TestProfilePromptCache:
+    """Entries are reused until the profile content or templates change"""
+
+    def test_hit_after_miss(self):
+        cache = ProfilePromptCache(max_entries=10)
+        first = cache.get(make_profile(), "user-1")
+        second = cache.get(make_profile(), "user-1")
+        assert first is second
+        stats = cache.stats()
+        assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 1)
+        assert stats["hit_rate"] == 0.5
+        assert stats["template_version"] == TEMPLATE_VERSION
+
+    def test_profile_edit_is_a_miss(self):
+        cache = ProfilePromptCache(max_entries=10)
+        first = cache.get(make_profile(), "user-1")
+        edited = cache.get(make_profile(writing_style_md="Tone: playful"), "user-1")
+        assert edited is not first
+        assert "playful" in edited.compact_style
+        assert cache.stats()["misses"] == 2
+
+    def test_entries_are_per_user(self):
+        cache = ProfilePromptCache(max_entries=10)
+        assert cache.get(make_profile(), "user-1") is not cache.get(make_profile(), "user-2")
+
+    def test_template_version_is_part_of_key(self, monkeypatch):
+        cache = ProfilePromptCache(max_entries=10)
+        first = cache.get(make_profile(), "user-1")
+        monkeypatch.setattr(prompt_assembly, "TEMPLATE_VERSION", "changed")
+        assert cache.get(make_profile(), "user-1") is not first
+
+    def test_least_recently_used_is_evicted(self):
+        cache = ProfilePromptCache(max_entries=2)
+        a = cache.get(make_profile(), "a")
+        cache.get(make_profile(), "b")
+        cache.get(make_profile(), "a")  # a is now most recent
+        cache.get(make_profile(), "c")  # evicts b
+        stats = cache.stats()
+        assert stats["entries"] == 2 and stats["evictions"] == 1
+        assert cache.get(make_profile(), "a") is a
+        cache.get(make_profile(), "b")
+        assert cache.stats()["misses"] == 4
+
+    def test_zero_size_disables_caching(self):
+        cache = ProfilePromptCache(max_entries=0)
+        assert cache.get(make_profile(), "u") is not cache.get(make_profile(), "u")
+        assert cache.stats()["entries"] == 0
+
+
+class TestProfilePrompt:
+    """The assembled prefix is the prompt generate_post used to build inline"""
+
+    def test_prefix_contents(self):
+        entry = build_profile_prompt(make_profile(), "user-1")
+        prefix = entry.prefix("carousel")
+        assert prefix.startswith("LinkedIn content expert.")
+        assert entry.toon_context in prefix
+        assert "## ADDITIONAL USER PREFERENCES:\nPrefer short posts" in prefix
+        assert "WRITING STYLE:\n" + extract_compact_writing_style("Tone: direct\nStructure: Hook → Story") in prefix
+        assert prefix.endswith(f"\n\n{RESPONSE_FORMAT_REQUIREMENTS}\n{get_json_format('carousel')}")
+        assert entry.prefix("carousel") is prefix
+
+    def test_no_additional_context_section_when_empty(self):
+        entry = build_profile_prompt(make_profile(context_json={"name": "Ada"}), "user-1")
+        assert "ADDITIONAL USER PREFERENCES" not in entry.prefix("text")
+
+    def test_braces_in_profile_are_kept_verbatim(self):
+        entry = build_profile_prompt(make_profile(writing_style_md="Tone: {curly} {0}"), "user-1")
+        assert "Tone: {curly} {0}" in entry.prefix("text")
+
+    def test_toon_fallback_from_custom_instructions(self):
+        entry = build_profile_prompt(
+            make_profile(context_json=None, custom_instructions="TOON_CONTEXT:\nname: Ada"), "user-1"
+        )
+        assert entry.toon_context == "name: Ada"
+
+    def test_format_sections_per_post_type(self):
+        assert "## Format Instructions" not in format_sections("auto")
+        assert "## Format Instructions" not in format_sections("carousel")
+        assert "## Format Instructions" in format_sections("image")
+        assert normalize_post_type("text_with_image") == "image"
+        assert normalize_post_type(None) == "text"
@@ -0,0 +1,104 @@
+"""
+Tests for the refinement fast path: compact prompt, image prompt reuse and savings.
+"""
+from types import SimpleNamespace
+from unittest.mock import Mock
+
+from app.models import PostFormat
+from app.routers.generation import (
+    PostGenerationPlan, RefinementFastPath, _content_similarity, _refinement_fast_path_plan,
+    _refinement_savings, _reusable_image_prompts
+)
+from app.schemas.generation import PostGenerationRequest
+
+PREVIOUS_POST = "Hiring for curiosity beats hiring for credentials.\n\nOur best engineers asked better questions in interviews."
+
+
+def full_plan(**overrides) -> PostGenerationPlan:
+    values = dict(
+        system_prompt="LinkedIn content expert. " + "Profile context and format rules. " * 200,
+        cacheable_prefix="LinkedIn content expert.",
+        user_message="make it shorter",
+        use_web_search=False,
+        conversation_history=[
+            {"role": "USER", "content": "Write about hiring"},
+            {"role": "ASSISTANT", "content": PREVIOUS_POST},
+        ],
+        image_attachments=None,
+        request_options={"hashtag_count": 3},
+        post_type="image",
+        credits_needed=1.0,
+        is_refinement_request=True,
+        previous_post_content=PREVIOUS_POST,
+    )
+    values.update(overrides)
+    return PostGenerationPlan(**values)
+
+
+def db_with_previous_post(post_format: PostFormat = PostFormat.IMAGE):
+    previous = SimpleNamespace(id="post-1", format=post_format, generation_options={"image_prompt": "Flat illustration"})
+    db = Mock()
+    db.query.return_value.filter.return_value.order_by.return_value.first.return_value = previous
+    return db
+
+
+def refinement(**overrides) -> RefinementFastPath:
+    values = dict(
+        previous_post_id="post-1", image_prompt="Slide A", image_prompts=["Slide A", "Slide B"],
+        full_input_tokens=2000, fast_input_tokens=300, history_messages_skipped=2
+    )
+    values.update(overrides)
+    return RefinementFastPath(**values)
+
+
+class TestFastPathPlan:
+    """Compact prompt instead of the full generation prompt"""
+
+    def test_refinement_uses_compact_prompt(self):
+        request = PostGenerationRequest(message="make it shorter", options={}, conversation_id="conv-1")
+        profile = SimpleNamespace(writing_style_md="Tone: direct")
+        plan = _refinement_fast_path_plan(full_plan(), request, profile, "user-1", db_with_previous_post())
+
+        assert plan.refinement is not None
+        assert plan.conversation_history == []
+        assert plan.cacheable_prefix is None
+        assert PREVIOUS_POST in plan.user_message and "make it shorter" in plan.user_message
+        assert "exactly 3 relevant hashtags" in plan.system_prompt
+        assert plan.refinement.image_prompt == "Flat illustration"
+        assert plan.refinement.fast_input_tokens < plan.refinement.full_input_tokens
+        assert plan.refinement.history_messages_skipped == 2
+
+    def test_full_path_when_edit_needs_more(self):
+        request = PostGenerationRequest(message="make it shorter", options={}, conversation_id="conv-1")
+        profile = SimpleNamespace(writing_style_md="")
+        # Format change, new attachments and web search all need the full prompt
+        assert _refinement_fast_path_plan(full_plan(), request, profile, "u", db_with_previous_post(PostFormat.TEXT)) is None
+        assert _refinement_fast_path_plan(
+            full_plan(image_attachments=[{"type": "image/png", "data": "AAAA"}]), request, profile, "u", db_with_previous_post()
+        ) is None
+        assert _refinement_fast_path_plan(full_plan(use_web_search=True), request, profile, "u", db_with_previous_post()) is None
+
+
+class TestImagePromptReuse:
+    """Image prompts survive edits that keep the content"""
+
+    def test_similarity(self):
+        assert _content_similarity(PREVIOUS_POST, PREVIOUS_POST) == 1.0
+        assert _content_similarity(PREVIOUS_POST, "Completely unrelated sentence about gardening") == 0.0
+        assert _content_similarity("", PREVIOUS_POST) == 0.0
+
+    def test_reused_when_content_is_close(self):
+        edited = "Hiring for curiosity beats credentials.\n\nOur best engineers asked better questions."
+        assert _reusable_image_prompts(refinement(), PREVIOUS_POST, edited, None) == ["Slide A", "Slide B"]
+
+    def test_regenerated_when_content_changes(self):
+        assert _reusable_image_prompts(refinement(), PREVIOUS_POST, "A post about sourdough baking at home", None) is None
+
+    def test_regenerated_when_slide_count_changes(self):
+        assert _reusable_image_prompts(refinement(), PREVIOUS_POST, PREVIOUS_POST, 6) is None
+
+    def test_savings_report(self):
+        savings = _refinement_savings(refinement(), {"provider": "openai", "model": "gpt-4o"}, image_prompt_reused=True)
+        assert savings["estimated_input_tokens_saved"] == 1700
+        assert savings["estimated_input_cost_saved"] > 0
+        assert savings["image_prompt_reused"] is True
@@ -0,0 +1,86 @@
+"""
+Tests for single-flight coalescing of identical in-flight AI requests.
+"""
+import asyncio
+
+import pytest
+
+from app.services.single_flight import SingleFlight, completion_key
+
+
+class TestCompletionKey:
+    """Key covers every input that changes the completion"""
+
+    def test_whitespace_insensitive(self):
+        assert completion_key("sys  prompt\n", "Find  topics", None, 0.7, True) == \
+            completion_key("sys prompt", "Find topics ", None, 0.7, True)
+
+    def test_distinguishes_inputs(self):
+        base = completion_key("sys", "msg", None, 0.7, True)
+        assert base != completion_key("sys", "msg", None, 0.7, False)
+        assert base != completion_key("sys", "msg", "gpt-4o", 0.7, True)
+        assert base != completion_key("sys", "msg", None, 0.5, True)
+        assert base != completion_key("sys", "other", None, 0.7, True)
+
+
+class TestSingleFlight:
+    """Concurrent identical calls share one upstream call"""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_calls_share_one_upstream_call(self):
+        flight = SingleFlight()
+        upstream_calls = 0
+
+        async def call():
+            nonlocal upstream_calls
+            upstream_calls += 1
+            await asyncio.sleep(0.01)
+            return "topics", {"input_tokens": 10}
+
+        results = await asyncio.gather(*(flight.do("key", call) for _ in range(5)))
+        assert upstream_calls == 1
+        assert all(result == ("topics", {"input_tokens": 10}) for result in results)
+        # Followers get their own copy
+        assert results[1][1] is not results[0][1]
+        assert flight.stats()["coalesced"] == 4
+        assert flight.stats()["in_flight"] == 0
+
+    @pytest.mark.asyncio
+    async def test_sequential_calls_are_not_cached(self):
+        flight = SingleFlight()
+        upstream_calls = 0
+
+        async def call():
+            nonlocal upstream_calls
+            upstream_calls += 1
+            return upstream_calls
+
+        assert await flight.do("key", call) == 1
+        assert await flight.do("key", call) == 2
+
+    @pytest.mark.asyncio
+    async def test_errors_propagate_to_all_waiters(self):
+        flight = SingleFlight()
+
+        async def call():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("provider down")
+
+        results = await asyncio.gather(*(flight.do("key", call) for _ in range(3)), return_exceptions=True)
+        assert all(isinstance(result, RuntimeError) for result in results)
+        assert flight.stats()["in_flight"] == 0
+
+    @pytest.mark.asyncio
+    async def test_cancelled_leader_does_not_cancel_followers(self):
+        flight = SingleFlight()
+
+        async def call():
+            await asyncio.sleep(0.02)
+            return "done"
+
+        leader = asyncio.create_task(flight.do("key", call))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(flight.do("key", call))
+        await asyncio.sleep(0)
+        leader.cancel()
+        assert await follower == "done"
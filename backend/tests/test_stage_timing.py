@@ -0,0 +1,68 @@
+"""
+Tests for per-stage timing and concurrent follow-up stages.
+"""
+import asyncio
+import time
+
+import pytest
+
+from app.utils.stage_timing import StageTimer
+
+
+class TestStageTimer:
+    """Independent stages run concurrently and are timed individually"""
+
+    @pytest.mark.asyncio
+    async def test_parallel_stages_cost_the_slowest_not_the_sum(self):
+        timer = StageTimer()
+
+        async def stage(value, delay):
+            await asyncio.sleep(delay)
+            return value
+
+        start = time.perf_counter()
+        results = await timer.run_parallel({
+            "image_prompt": stage(("prompt", {}), 0.1),
+            "conversation_title": stage("Title", 0.1),
+        })
+        elapsed = time.perf_counter() - start
+
+        assert results == {"image_prompt": ("prompt", {}), "conversation_title": "Title"}
+        assert elapsed < 0.18
+        assert set(timer.timings_ms) == {"image_prompt", "conversation_title", "parallel[image_prompt+conversation_title]"}
+        assert timer.timings_ms["image_prompt"] >= 90
+
+    @pytest.mark.asyncio
+    async def test_no_stages_is_a_no_op(self):
+        timer = StageTimer()
+        assert await timer.run_parallel({}) == {}
+        assert timer.timings_ms == {}
+
+    @pytest.mark.asyncio
+    async def test_stage_error_is_raised_unwrapped_and_cancels_siblings(self):
+        timer = StageTimer()
+        cancelled = asyncio.Event()
+
+        async def slow():
+            try:
+                await asyncio.sleep(1)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        async def failing():
+            raise ValueError("bad prompt")
+
+        with pytest.raises(ValueError):
+            await timer.run_parallel({"slow": slow(), "failing": failing()})
+        assert cancelled.is_set()
+
+    @pytest.mark.asyncio
+    async def test_run_records_single_stage(self):
+        timer = StageTimer()
+
+        async def completion():
+            return "post"
+
+        assert await timer.run("main_completion", completion()) == "post"
+        assert "main_completion" in timer.timings_ms
@@ -0,0 +1,134 @@
+"""
+Tests for provider-native structured output and the legacy parser fallback.
+"""
+import json
+from types import SimpleNamespace
+
+import pytest
+from google.generativeai.types import generation_types
+
+from app.routers.generation import _parse_post_json_legacy
+from app.schemas.generation import PostGenerationRequest
+from app.services import ai_service, llm_providers
+from app.services.ai_service import (
+    CarouselPostResponse, ContentIdeaList, ContextJsonResponse, CVValidationResponse, ImagePostResponse,
+    PostResponse, post_response_model
+)
+from app.services.llm_providers import ClaudeProvider, OpenAIProvider
+from app.services.structured_output import ResponseSchema, parse_structured, structured_payload
+
+
+@pytest.fixture
+def mock_llm(monkeypatch):
+    monkeypatch.setattr(ai_service.settings, "ai_provider", "mock")
+    monkeypatch.setattr(ai_service.settings, "ai_fallback_providers", "")
+    monkeypatch.setattr(llm_providers.settings, "llm_mock_latency_ms_mean", 0.0)
+    monkeypatch.setattr(llm_providers.settings, "llm_mock_latency_ms_stddev", 0.0)
+
+
+class TestSchemas:
+    """Pydantic models become provider-native schemas"""
+
+    def test_openai_strict_schema(self):
+        response_format = ResponseSchema.from_model(CarouselPostResponse).openai_response_format()
+        schema = response_format["json_schema"]["schema"]
+        assert response_format["json_schema"]["strict"] is True
+        assert schema["additionalProperties"] is False
+        assert set(schema["required"]) == {"title", "post_content", "hashtags", "image_prompts"}
+        assert "default" not in json.dumps(schema) and "title" not in schema
+
+    def test_nested_models_are_inlined(self):
+        schema = ResponseSchema.from_model(ContentIdeaList).json_schema
+        assert "$ref" not in json.dumps(schema) and "$defs" not in schema
+        assert schema["properties"]["ideas"]["items"]["properties"]["format"]["enum"]
+
+    def test_free_form_dicts_are_not_strict(self):
+        response_schema = ResponseSchema.from_model(ContextJsonResponse)
+        assert response_schema.strict is False
+        # Gemini's schema subset cannot express Dict[str, int]; JSON mode is used instead
+        assert response_schema.gemini_schema() is None
+
+    def test_gemini_schema_is_accepted_by_sdk(self):
+        for model in (CVValidationResponse, ImagePostResponse, ContentIdeaList):
+            gemini_schema = ResponseSchema.from_model(model).gemini_schema()
+            config = generation_types.to_generation_config_dict(
+                {"response_mime_type": "application/json", "response_schema": gemini_schema}
+            )
+            assert config["response_schema"].properties
+
+    def test_post_type_models(self):
+        assert post_response_model("carousel") is CarouselPostResponse
+        assert post_response_model("text_with_image") is ImagePostResponse
+        assert post_response_model("video_script") is PostResponse
+
+
+class FakeCompletions:
+    def __init__(self, response):
+        self.response = response
+        self.kwargs = None
+
+    async def create(self, **kwargs):
+        self.kwargs = kwargs
+        return self.response
+
+
+class TestProviders:
+    """Schemas are sent only where the provider supports them"""
+
+    @pytest.mark.asyncio
+    async def test_openai_response_format_by_model(self):
+        message = SimpleNamespace(content='{"is_cv": true}')
+        completions = FakeCompletions(SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None))
+        provider = OpenAIProvider()
+        provider._client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+        response_schema = ResponseSchema.from_model(CVValidationResponse)
+
+        _, usage = await provider.complete("s", "u", model="gpt-4o-mini", response_schema=response_schema)
+        assert completions.kwargs["response_format"]["type"] == "json_schema"
+        assert usage["structured_output"] is True
+
+        _, usage = await provider.complete("s", "u", model="gpt-3.5-turbo", response_schema=response_schema)
+        assert "response_format" not in completions.kwargs
+        assert "structured_output" not in usage
+
+    @pytest.mark.asyncio
+    async def test_claude_forced_tool(self):
+        tool_input = {"is_cv": True, "confidence": "high", "reason": "r", "detected_type": "CV/Resume"}
+        response = SimpleNamespace(
+            content=[SimpleNamespace(type="tool_use", input=tool_input)],
+            usage=SimpleNamespace(input_tokens=10, output_tokens=5)
+        )
+        messages = FakeCompletions(response)
+        provider = ClaudeProvider()
+        provider._client = SimpleNamespace(messages=messages)
+
+        text, usage = await provider.complete(
+            "s", "u", model="claude-haiku-4-5", response_schema=ResponseSchema.from_model(CVValidationResponse)
+        )
+        assert messages.kwargs["tool_choice"] == {"type": "tool", "name": "CVValidationResponse"}
+        assert json.loads(text) == tool_input
+        assert structured_payload(usage, text, CVValidationResponse).is_cv is True
+
+
+class TestCallers:
+    """Structured responses skip the legacy parsers"""
+
+    @pytest.mark.asyncio
+    async def test_cv_validation_and_ideas(self, mock_llm):
+        is_cv, message, usage = await ai_service.validate_cv_content("Jane Doe\nExperience: Engineer at Acme")
+        assert is_cv is True and usage["structured_output"] is True
+
+        ideas, usage = await ai_service.generate_evergreen_content_ideas("CV text", ["python"], "tech")
+        assert usage["structured_output"] is True
+        assert ideas and all(idea["title"] for idea in ideas)
+
+    def test_unenforced_responses_use_legacy_parser(self):
+        text = '{"title": "T", "post_content": "Body", "hashtags": []}'
+        assert structured_payload({"provider": "openai"}, text, PostResponse) is None
+        assert parse_structured("not json", PostResponse) is None
+
+    def test_legacy_parser_unwraps_nested_post_content(self):
+        request = PostGenerationRequest(message="Write about hiring", options={})
+        nested = json.dumps({"title": "Hiring", "post_content": json.dumps({"post_content": "Real body"})})
+        response_data, title, content = _parse_post_json_legacy(f"```json\n{nested}\n```", request, "text")
+        assert title == "Hiring" and content == "Real body"
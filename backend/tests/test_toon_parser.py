@@ -0,0 +1,117 @@
+"""
+Tests for the TOON parser, serializer and section patching.
+"""
+import random
+
+import pytest
+
+from app.utils.toon_parser import (
+    _split_csv_line,
+    dict_to_toon,
+    parse_toon_to_dict,
+    patch_toon_field,
+    toon_section_keys,
+)
+
+PROFILE = {
+    "name": "Ada Lovelace",
+    "current_role": "Staff Engineer",
+    "years_experience": 12,
+    "expertise": [
+        {"skill": "Python", "level": "Expert", "years": 10, "ai_generated": False},
+        {"skill": "Data, ML", "level": "Advanced", "years": 4, "ai_generated": True},
+    ],
+    "content_goals": ["Thought leadership", "Hiring"],
+    "preferences": {"length": "short", "emoji": False},
+    "empty": {},
+    "additional_context": "Line one\nLine two\twith tab and \\ backslash",
+}
+
+AI_TOON = """name: Jane Doe
+current_role: Data Scientist
+content_goals[0]: Educate
+content_goals[1]: Grow network
+expertise[3]{skill,level,years,ai_generated}:
+  Python,Expert,8,false
+  SQL,Advanced,5,false
+  Storytelling,Intermediate,2,true
+target_audience[1]{persona,description}:
+  Analysts,Early-career analysts, learning the ropes
+tone: technical yet accessible
+expertise4: {Spark,Advanced,3,false}
+"""
+
+
+class TestParse:
+    """Parsing AI-written and serializer-written documents"""
+
+    def test_round_trip(self):
+        parsed = parse_toon_to_dict(dict_to_toon(PROFILE))
+        assert parsed["expertise"] == PROFILE["expertise"]
+        assert parsed["preferences"] == PROFILE["preferences"]
+        assert parsed["name"] == PROFILE["name"]
+        assert parsed["years_experience"] == 12
+
+    def test_ai_document(self):
+        parsed = parse_toon_to_dict(AI_TOON)
+        assert [row["skill"] for row in parsed["expertise"]] == ["Python", "SQL", "Storytelling"]
+        assert parsed["target_audience"][0]["description"] == "Early-career analysts,learning the ropes"
+        assert parsed["content_goals"] == ["Educate", "Grow network"]
+        assert parsed["tone"] == "technical yet accessible"
+
+    def test_numbered_keys_are_consolidated(self):
+        parsed = parse_toon_to_dict("expertise1: {Go,Expert,6,false}\nexpertise2: {Rust,Beginner,1,true}")
+        assert parsed["expertise"] == [
+            {"skill": "Go", "level": "Expert", "years": 6, "ai_generated": False},
+            {"skill": "Rust", "level": "Beginner", "years": 1, "ai_generated": True},
+        ]
+
+
+class TestSplitCsvLine:
+    """The fast paths split exactly like the escape-aware scanner"""
+
+    @pytest.mark.parametrize("line,expected", [
+        ("a,b , c", ["a", "b", "c"]),
+        ("a,", ["a"]),
+        ("a, ", ["a", ""]),
+        ("", []),
+        ("a\\,b,c", ["a,b", "c"]),
+        ("x\\ny\\tz", ["x\ny\tz"]),
+        ("\\\\,end\\", ["\\", "end\\"]),
+        ('"a,b"', ['"a', 'b"']),
+    ])
+    def test_split(self, line, expected):
+        assert _split_csv_line(line) == expected
+
+
+class TestPatchToonField:
+    """Patching one section equals re-serializing the whole document"""
+
+    @pytest.mark.parametrize("key,value", [
+        ("name", "Ada King"),
+        ("expertise", [{"skill": "Rust", "level": "Beginner", "years": 1, "ai_generated": True}]),
+        ("content_goals", []),
+        ("preferences", {"length": "long"}),
+        ("empty", "now a value"),
+        ("additional_context", "x, y"),
+        ("content_mix", [{"category": "Tutorials", "percentage": 40}]),
+    ])
+    def test_matches_full_serialization(self, key, value):
+        updated = {**PROFILE, key: value}
+        assert patch_toon_field(dict_to_toon(PROFILE), key, value) == dict_to_toon(updated)
+
+    def test_random_documents(self):
+        rng = random.Random(3)
+        values = ["text", "a, b", 3, 2.5, True, None, [], ["x", "y"], {}, {"k": "v"},
+                  [{"a": 1, "b": "c"}], {"nested": {"deep": 1}}]
+        keys = ["alpha", "beta", "gamma", "delta", "alpha_2"]
+        for _ in range(500):
+            data = {key: rng.choice(values) for key in rng.sample(keys, rng.randint(0, len(keys)))}
+            key, value = rng.choice(keys), rng.choice(values)
+            document = dict_to_toon(data)
+            assert toon_section_keys(document) == list(data)
+            assert patch_toon_field(document, key, value) == dict_to_toon({**data, key: value})
+
+    def test_rejects_non_word_key(self):
+        with pytest.raises(ValueError):
+            patch_toon_field("name: x", "bad key", 1)
@@ -26,6 +26,7 @@ import {
   AlertCircle
 } from "lucide-react";
 import { api } from "@/lib/api-client";
+import { downloadMedia, imageSrc, pdfSrc, slideSrcs } from "@/lib/media";
 import axios from "axios";
 import {
   Select,
@@ -331,14 +332,14 @@ export default function GeneratePage() {
   const [promptAreaHeight, setPromptAreaHeight] = useState(0);
 
   // Track generated images by message ID (post ID)
-  const [currentImages, setCurrentImages] = useState<Record<string, string>>({}); // post_id -> base64 image
+  const [currentImages, setCurrentImages] = useState<Record<string, string>>({}); // post_id -> image URL
   const [imageHistory, setImageHistory] = useState<Record<string, any[]>>({}); // post_id -> array of images
   const [generatingImages, setGeneratingImages] = useState<Record<string, boolean>>({}); // post_id -> boolean
   const [showImageHistory, setShowImageHistory] = useState<Record<string, boolean>>({}); // post_id -> boolean
   const [postIdMap, setPostIdMap] = useState<Record<string, string>>({}); // message_id -> post_id
 
   // Track generated PDFs for carousel posts
-  const [currentPDFs, setCurrentPDFs] = useState<Record<string, string>>({}); // post_id -> base64 PDF
+  const [currentPDFs, setCurrentPDFs] = useState<Record<string, string>>({}); // post_id -> PDF URL
   const [currentPDFSlides, setCurrentPDFSlides] = useState<Record<string, string[]>>({}); // post_id -> array of slide images
   const [pdfHistory, setPdfHistory] = useState<Record<string, any[]>>({}); // post_id -> array of PDFs
   const [generatingPDFs, setGeneratingPDFs] = useState<Record<string, boolean>>({}); // post_id -> boolean
@@ -868,8 +869,8 @@ export default function GeneratePage() {
   const loadCurrentImage = async (postId: string) => {
     try {
       const response = await api.images.getCurrent(postId);
-      if (response.data?.image) {
-        const imageDataUrl = `data:image/png;base64,${response.data.image}`;
+      const imageDataUrl = response.data && imageSrc(response.data);
+      if (imageDataUrl) {
         setCurrentImages(prev => ({
           ...prev,
           [postId]: imageDataUrl
@@ -887,12 +888,12 @@ export default function GeneratePage() {
 
     try {
       const response = await api.images.generateFromPost(postId);
-      const imageData = response.data.image;
+      const imageData = imageSrc(response.data) ?? '';
 
       // Store the current image
       setCurrentImages(prev => ({
         ...prev,
-        [postId]: `data:image/png;base64,${imageData}`
+        [postId]: imageData
       }));
 
       // Load image history
@@ -921,7 +922,7 @@ export default function GeneratePage() {
         ...prev,
         [postId]: sortedImages.map((img: any) => ({
           ...img,
-          image: `data:image/png;base64,${img.image}`
+          image: imageSrc(img)
         }))
       }));
     } catch (error) {
@@ -955,15 +956,15 @@ export default function GeneratePage() {
 
     try {
       const response = await api.pdfs.generateCarousel(postId, prompts);
-      const pdfData = response.data.pdf;
-      const slideImages = response.data.slide_images || [];
+      const pdfData = pdfSrc(response.data) ?? '';
+      const slideImages = slideSrcs(response.data);
 
       clearInterval(progressInterval);
 
       // Store the current PDF
       setCurrentPDFs(prev => ({
         ...prev,
-        [postId]: `data:application/pdf;base64,${pdfData}`
+        [postId]: pdfData
       }));
 
       // Store slide images for preview
@@ -995,16 +996,18 @@ export default function GeneratePage() {
   const loadCurrentPDF = async (postId: string) => {
     try {
       const response = await api.pdfs.getCurrent(postId);
-      if (response.data?.pdf) {
+      const pdf = response.data && pdfSrc(response.data);
+      if (pdf) {
         setCurrentPDFs(prev => ({
           ...prev,
-          [postId]: `data:application/pdf;base64,${response.data.pdf}`
+          [postId]: pdf
         }));
       }
-      if (response.data?.slide_images && response.data.slide_images.length > 0) {
+      const slides = response.data ? slideSrcs(response.data) : [];
+      if (slides.length > 0) {
         setCurrentPDFSlides(prev => ({
           ...prev,
-          [postId]: response.data.slide_images
+          [postId]: slides
         }));
       }
     } catch (error) {
@@ -1026,8 +1029,8 @@ export default function GeneratePage() {
           ...prev,
           [postId]: sortedPdfs.map((pdf: any) => ({
             ...pdf,
-            pdf: `data:application/pdf;base64,${pdf.pdf}`,
-            slide_images: pdf.slide_images || []
+            pdf: pdfSrc(pdf),
+            slide_images: slideSrcs(pdf)
           }))
         }));
       }
@@ -2000,12 +2003,12 @@ export default function GeneratePage() {
 
                                 try {
                                   const response = await api.images.generateFromPost(postId);
-                                  const imageData = response.data.image;
+                                  const imageData = imageSrc(response.data) ?? '';
 
                                   // Store the current image
                                   setCurrentImages(prev => ({
                                     ...prev,
-                                    [postId]: `data:image/png;base64,${imageData}`
+                                    [postId]: imageData
                                   }));
 
                                   // Update token usage with Cloudflare cost if provided
@@ -2065,12 +2068,12 @@ export default function GeneratePage() {
 
                                 try {
                                   const response = await api.images.generateFromPost(postId, customPrompt);
-                                  const imageData = response.data.image;
+                                  const imageData = imageSrc(response.data) ?? '';
 
                                   // Store the current image
                                   setCurrentImages(prev => ({
                                     ...prev,
-                                    [postId]: `data:image/png;base64,${imageData}`
+                                    [postId]: imageData
                                   }));
 
                                   // Update message's image_prompt with the custom prompt
@@ -2203,15 +2206,15 @@ export default function GeneratePage() {
                                     promptsToRegenerate,
                                     slideIndices.length === msg.image_prompts.length ? undefined : slideIndices
                                   );
-                                  const pdfData = response.data.pdf;
-                                  const slideImages = response.data.slide_images || [];
+                                  const pdfData = pdfSrc(response.data) ?? '';
+                                  const slideImages = slideSrcs(response.data);
 
                                   clearInterval(progressInterval);
 
                                   // Store the current PDF
                                   setCurrentPDFs(prev => ({
                                     ...prev,
-                                    [postId]: `data:application/pdf;base64,${pdfData}`
+                                    [postId]: pdfData
                                   }));
 
                                   // Store slide images for preview
@@ -2289,7 +2292,7 @@ export default function GeneratePage() {
                                     [promptForSlide],
                                     [slideIndex]
                                   );
-                                  const slideImages = response.data.slide_images || [];
+                                  const slideImages = slideSrcs(response.data);
 
                                   // Replace ALL slides with the new PDF slides (backend returns all slides)
                                   if (slideImages.length > 0) {
@@ -2307,10 +2310,10 @@ export default function GeneratePage() {
                                   }
 
                                   // Also update PDF
-                                  const pdfData = response.data.pdf;
+                                  const pdfData = pdfSrc(response.data) ?? '';
                                   setCurrentPDFs(prev => ({
                                     ...prev,
-                                    [postId]: `data:application/pdf;base64,${pdfData}`
+                                    [postId]: pdfData
                                   }));
 
                                   // Reload PDF history
@@ -2351,13 +2354,9 @@ export default function GeneratePage() {
                                   return;
                                 }
 
-                                // Create download link
-                                const link = document.createElement('a');
-                                link.href = pdfData;
-                                link.download = `linkedin-carousel-${postId}.pdf`;
-                                document.body.appendChild(link);
-                                link.click();
-                                document.body.removeChild(link);
+                                downloadMedia(pdfData, `linkedin-carousel-${postId}.pdf`).catch((error) => {
+                                  console.error("PDF download failed:", error);
+                                });
                               }}
                               onDownloadImage={() => {
                                 const postId = postIdMap[msg.id] || msg.id;
@@ -2367,13 +2366,9 @@ export default function GeneratePage() {
                                   return;
                                 }
 
-                                // Create download link
-                                const link = document.createElement('a');
-                                link.href = imageData;
-                                link.download = `linkedin-post-${postId}.png`;
-                                document.body.appendChild(link);
-                                link.click();
-                                document.body.removeChild(link);
+                                downloadMedia(imageData, `linkedin-post-${postId}.png`).catch((error) => {
+                                  console.error("Image download failed:", error);
+                                });
                               }}
                               onShowImageHistory={() => {
                                 const postId = postIdMap[msg.id] || msg.id;
@@ -3050,14 +3045,14 @@ export default function GeneratePage() {
                       promptsToRegenerate,
                       selectedIndices.length === msg.image_prompts.length ? undefined : selectedIndices
                     );
-                    const pdfData = response.data.pdf;
-                    const slideImages = response.data.slide_images || [];
+                    const pdfData = pdfSrc(response.data) ?? '';
+                    const slideImages = slideSrcs(response.data);
 
                     clearInterval(progressInterval);
 
                     setCurrentPDFs(prev => ({
                       ...prev,
-                      [postId]: `data:application/pdf;base64,${pdfData}`
+                      [postId]: pdfData
                     }));
 
                     setCurrentPDFSlides(prev => ({
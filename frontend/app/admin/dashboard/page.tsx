@@ -2,7 +2,7 @@
 
 import { useEffect, useState } from 'react';
 import axios from 'axios';
-import { Users, FileText, MessageSquare, TrendingUp, DollarSign, Activity } from 'lucide-react';
+import { Users, FileText, MessageSquare, TrendingUp, DollarSign, Activity, ShieldAlert } from 'lucide-react';
 
 interface DashboardStats {
   total_users: number;
@@ -16,14 +16,50 @@ interface DashboardStats {
   revenue_yearly: number;
 }
 
+interface CircuitBreakerStats {
+  state: 'closed' | 'open' | 'half_open';
+  consecutive_failures: number;
+  failure_threshold: number;
+  retry_after_seconds: number;
+  total_failures: number;
+  rejected: number;
+  times_opened: number;
+  last_failure: string | null;
+}
+
+const breakerStateStyles: Record<CircuitBreakerStats['state'], string> = {
+  closed: 'bg-green-100 text-green-700',
+  half_open: 'bg-yellow-100 text-yellow-700',
+  open: 'bg-red-100 text-red-700',
+};
+
 export default function AdminDashboardPage() {
   const [stats, setStats] = useState<DashboardStats | null>(null);
   const [loading, setLoading] = useState(true);
+  const [breakers, setBreakers] = useState<Record<string, CircuitBreakerStats>>({});
 
   useEffect(() => {
     fetchStats();
+    fetchCircuitBreakers();
+    const interval = setInterval(fetchCircuitBreakers, 15000);
+    return () => clearInterval(interval);
   }, []);
 
+  const fetchCircuitBreakers = async () => {
+    try {
+      const token = localStorage.getItem('admin_token');
+      const response = await axios.get(
+        `${process.env.NEXT_PUBLIC_API_URL}/api/admin/system/circuit-breakers`,
+        {
+          headers: { Authorization: `Bearer ${token}` },
+        }
+      );
+      setBreakers(response.data.breakers || {});
+    } catch (error) {
+      console.error('Failed to fetch circuit breakers:', error);
+    }
+  };
+
   const fetchStats = async () => {
     try {
       const token = localStorage.getItem('admin_token');
@@ -172,6 +208,38 @@ export default function AdminDashboardPage() {
           ))}
         </div>
       </div>
+
+      {/* External Service Health */}
+      <div className="bg-white rounded-xl shadow-sm border border-gray-200 p-6">
+        <div className="flex items-center gap-2 mb-4">
+          <ShieldAlert className="w-5 h-5 text-gray-500" />
+          <h2 className="text-xl font-bold text-gray-900">External Service Health</h2>
+        </div>
+        {Object.keys(breakers).length === 0 ? (
+          <p className="text-sm text-gray-500">No external calls recorded since the last restart.</p>
+        ) : (
+          <div className="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-3 gap-4">
+            {Object.entries(breakers).map(([name, breaker]) => (
+              <div key={name} className="border border-gray-200 rounded-lg p-4">
+                <div className="flex items-center justify-between gap-2">
+                  <p className="text-sm font-medium text-gray-900 truncate" title={name}>{name}</p>
+                  <span className={`text-xs font-semibold px-2 py-0.5 rounded-full ${breakerStateStyles[breaker.state]}`}>
+                    {breaker.state.replace('_', '-')}
+                  </span>
+                </div>
+                <p className="text-xs text-gray-500 mt-2">
+                  {breaker.consecutive_failures}/{breaker.failure_threshold} consecutive failures
+                  {breaker.state === 'open' && ` · retry in ${breaker.retry_after_seconds}s`}
+                </p>
+                <p className="text-xs text-gray-500 mt-1">
+                  Opened {breaker.times_opened}x · {breaker.rejected} calls short-circuited
+                  {breaker.last_failure && ` · last: ${breaker.last_failure}`}
+                </p>
+              </div>
+            ))}
+          </div>
+        )}
+      </div>
     </div>
   );
 }
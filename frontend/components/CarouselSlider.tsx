@@ -5,7 +5,7 @@ import { ChevronLeft, ChevronRight } from 'lucide-react';
 import { Button } from './ui/button';
 
 interface CarouselSliderProps {
-  slides: string[]; // Array of base64 image URLs
+  slides: string[]; // Slide image URLs (media store or data: URLs)
   className?: string;
   onRegenerateSlide?: (slideIndex: number) => void;
   regeneratingSlideIndex?: number | null;
@@ -141,7 +141,7 @@ export function CarouselSlider({
         onTouchEnd={handleTouchEnd}
       >
         <img
-          src={`data:image/png;base64,${slides[currentSlide]}`}
+          src={slides[currentSlide]}
           alt={`Slide ${currentSlide + 1} of ${slides.length}`}
           className="w-full h-full object-contain select-none"
           draggable={false}
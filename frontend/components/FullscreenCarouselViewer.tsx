@@ -160,7 +160,7 @@ export function FullscreenCarouselViewer({
             onTouchEnd={handleTouchEnd}
           >
             <img
-              src={`data:image/png;base64,${slides[currentSlide]}`}
+              src={slides[currentSlide]}
               alt={`Slide ${currentSlide + 1} of ${slides.length}`}
               className="max-w-full max-h-full object-contain select-none"
               draggable={false}
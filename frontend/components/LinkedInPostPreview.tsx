@@ -77,9 +77,9 @@ interface LinkedInPostPreviewProps {
   onRegenerate?: () => void;
   onSchedule?: () => void;
   onPost?: () => void;
-  currentImage?: string; // base64 image data URL
-  currentPDF?: string; // base64 PDF data URL for carousel
-  currentPDFSlides?: string[]; // Array of base64 slide images for carousel preview
+  currentImage?: string; // Image URL (media store or data: URL)
+  currentPDF?: string; // PDF URL (media store or data: URL) for carousel
+  currentPDFSlides?: string[]; // Slide image URLs for carousel preview
   generatingImage?: boolean;
   generatingPDF?: boolean; // For carousel PDF generation
   generatingPDFProgress?: { current: number; total: number }; // Progress tracking
@@ -135,7 +135,7 @@ function PDFHistoryCarousel({
   return (
     <div className="relative aspect-square bg-black">
       <img
-        src={`data:image/png;base64,${slides[currentSlide]}`}
+        src={slides[currentSlide]}
         alt={`Slide ${currentSlide + 1} of ${slides.length}`}
         className="w-full h-full object-contain select-none"
         draggable={false}
@@ -30,6 +30,7 @@ import {
   DropdownMenuSeparator,
 } from "@/components/ui/dropdown-menu";
 import { api } from "@/lib/api-client";
+import { imageSrc, slideSrcs } from "@/lib/media";
 import { useToast } from "@/components/ui/toaster";
 
 type PostStatus = "draft" | "scheduled" | "published";
@@ -101,13 +102,15 @@ export function PostHistoryItem({
       try {
         if (post.format === "image") {
           const response = await api.images.getCurrent(post.id);
-          if (response.data.image) {
-            setCurrentImage(`data:image/png;base64,${response.data.image}`);
+          const image = imageSrc(response.data);
+          if (image) {
+            setCurrentImage(image);
           }
         } else if (post.format === "carousel") {
           const response = await api.pdfs.getCurrent(post.id);
-          if (response.data.slide_images && response.data.slide_images.length > 0) {
-            setCurrentPDFSlides(response.data.slide_images);
+          const slides = slideSrcs(response.data);
+          if (slides.length > 0) {
+            setCurrentPDFSlides(slides);
           }
         }
       } catch (error) {
@@ -13,6 +13,7 @@ import {
 import { Button } from "@/components/ui/button";
 import { LinkedInPostPreview } from "@/components/LinkedInPostPreview";
 import { api } from "@/lib/api-client";
+import { imageSrc, slideSrcs } from "@/lib/media";
 import { useToast } from "@/components/ui/toaster";
 import { Calendar, Clock, X, ExternalLink, Edit2 } from "lucide-react";
 import { format } from "date-fns";
@@ -61,13 +62,15 @@ export function ScheduledPostModal({
     try {
       if (post.format === "image") {
         const response = await api.images.getCurrent(post.id);
-        if (response.data.image) {
-          setCurrentImage(`data:image/png;base64,${response.data.image}`);
+        const image = imageSrc(response.data);
+        if (image) {
+          setCurrentImage(image);
         }
       } else if (post.format === "carousel") {
         const response = await api.pdfs.getCurrent(post.id);
-        if (response.data.slide_images && response.data.slide_images.length > 0) {
-          setCurrentPDFSlides(response.data.slide_images);
+        const slides = slideSrcs(response.data);
+        if (slides.length > 0) {
+          setCurrentPDFSlides(slides);
         }
       }
     } catch (error) {
@@ -126,7 +126,7 @@ export function SlideSelectionModal({
                   {/* Slide Preview */}
                   <div className="aspect-square bg-black relative">
                     <img
-                      src={`data:image/png;base64,${slide}`}
+                      src={slide}
                       alt={`Slide ${index + 1}`}
                       className="w-full h-full object-contain"
                     />
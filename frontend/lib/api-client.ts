@@ -1,7 +1,7 @@
 import axios from 'axios';
 
 // Detect if we're running through Cloudflare tunnel and use backend tunnel URL
-const getApiUrl = () => {
+export const getApiUrl = () => {
   // If we're in the browser, check if we're on a Cloudflare tunnel domain
   if (typeof window !== 'undefined') {
     const hostname = window.location.hostname;
@@ -0,0 +1,52 @@
+import { getApiUrl } from './api-client';
+
+// Generated images and carousel PDFs are served by the backend media store
+// (/api/media/{key}). Responses carry image_url / pdf_url / slide_urls, signed
+// URLs that expire after an hour or two, so they are loaded again with the
+// post rather than kept; rows not yet moved to the store still come back as
+// inline base64 instead.
+
+interface ImageMedia {
+  image?: string | null;
+  image_url?: string | null;
+}
+
+interface PDFMedia {
+  pdf?: string | null;
+  pdf_url?: string | null;
+  slide_images?: string[] | null;
+  slide_urls?: string[] | null;
+}
+
+// src for an <img>/<a>: the media URL when there is one, else a data URL
+export const mediaSrc = (url?: string | null, base64?: string | null, mimeType = 'image/png'): string | undefined => {
+  if (url) {
+    return url.startsWith('/') ? `${getApiUrl()}${url}` : url;
+  }
+  return base64 ? `data:${mimeType};base64,${base64}` : undefined;
+};
+
+export const imageSrc = (media: ImageMedia) => mediaSrc(media.image_url, media.image);
+
+export const pdfSrc = (media: PDFMedia) => mediaSrc(media.pdf_url, media.pdf, 'application/pdf');
+
+export const slideSrcs = (media: PDFMedia): string[] => {
+  if (media.slide_urls && media.slide_urls.length > 0) {
+    return media.slide_urls.map((url) => mediaSrc(url) as string);
+  }
+  return (media.slide_images || []).map((slide) => mediaSrc(null, slide) as string);
+};
+
+// <a download> is ignored for cross-origin URLs, so media URLs are fetched first
+export const downloadMedia = async (src: string, filename: string) => {
+  const href = src.startsWith('data:') ? src : URL.createObjectURL(await (await fetch(src)).blob());
+  const link = document.createElement('a');
+  link.href = href;
+  link.download = filename;
+  document.body.appendChild(link);
+  link.click();
+  document.body.removeChild(link);
+  if (href !== src) {
+    URL.revokeObjectURL(href);
+  }
+};